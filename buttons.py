@@ -4,6 +4,7 @@ from PySide6.QtCore import QTimer, Signal, QSize
 from PySide6.QtGui import QIcon
 
 from button_state import resolve_button_state
+from counter_id_utils import counter_tag
 
 logger = logging.getLogger("appcomptoir.buttons")
 
@@ -82,7 +83,7 @@ class DebounceButton(QPushButton):
 
 
 class IconeButton(DebounceButton):
-    def __init__(self, icon_path, icon_inactive_path, flask_url, tooltip_text, tooltip_inactive_text, state, is_always_visible=True, parent=None, accessible_name=None):
+    def __init__(self, icon_path, icon_inactive_path, flask_url, tooltip_text, tooltip_inactive_text, state, is_always_visible=True, parent=None, accessible_name=None, offline_action=None):
         super().__init__(parent)
 
         # Nom accessible (point 28) : un bouton purement iconographique n'a pas de
@@ -110,6 +111,9 @@ class IconeButton(DebounceButton):
         # session au moment de l'appel (plus de copie périmée de app_token) et le
         # renouvellement sur 401 (avec un seul rejeu) y est intégré.
         self.main_window = parent
+        # Nom d'action éligible au mode hors ligne (voir MainWindow.offline_wrap),
+        # ou None : le bouton n'est alors jamais journalisé.
+        self.offline_action = offline_action
         self.is_always_visible = is_always_visible
         self.setFixedSize(50, 50)
         self.setIcon(self._icon_active)
@@ -162,9 +166,19 @@ class IconeButton(DebounceButton):
 
         # make_request_thread : session partagée (jeton courant ajouté au moment
         # de l'appel) + renouvellement automatique du jeton sur 401 avec un seul
-        # rejeu de la requête.
-        self.request_thread = self.main_window.make_request_thread(url, method='POST', data=data)
-        self.request_thread.result.connect(self.handle_response)
+        # rejeu de la requête. Clé d'ordre = URL du bouton : deux bascules du même
+        # bouton restent dans l'ordre, mais ne bloquent pas les autres actions.
+        # Étiquette du comptoir : annulée si on change de comptoir entre-temps.
+        headers, on_result = None, self.handle_response
+        if self.offline_action is not None and hasattr(self.main_window, "offline_wrap"):
+            # Mode hors ligne : l'action (changement de papier) est mémorisée si
+            # le serveur est injoignable, puis envoyée à son retour.
+            headers, on_result = self.main_window.offline_wrap(
+                self.offline_action, url, 'POST', data, None, self.handle_response)
+        self.request_thread = self.main_window.make_request_thread(
+            url, method='POST', data=data, headers=headers, order_key=self.flask_url,
+            tag=counter_tag(self.main_window.counter_id))
+        self.request_thread.result.connect(on_result)
         self.request_thread.start()
 
     def update_button_icon(self, state=None):
@@ -0,0 +1,120 @@
+"""Latence « clic -> écran » des actions du comptoir (sans dépendance PySide,
+testable seul).
+
+Ce que ressent le pharmacien, c'est le temps entre l'appui sur « Suivant »
+(clic du bouton ou raccourci global via ``_dispatch_shortcut``) et l'affichage
+du nouveau patient dans ``label_patient`` : anti-rebond, attente en file,
+HTTP et ``handle_result`` compris. ``ClickLatencyTracker`` horodate l'appui
+(``press``) puis la fin du traitement de la réponse dans le thread GUI
+(``shown``), et garde par action une fenêtre glissante des dernières mesures
+d'où sont tirés p50/p95/p99. ``summary_line()`` donne un résumé compact,
+journalisé à la fermeture : une régression se voit en production sans
+profileur.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+DEFAULT_WINDOW = 500
+
+# Un appui resté sans réponse plus longtemps est abandonné (action refusée en
+# amont, fenêtre fermée...) : il ne doit pas gonfler la mesure suivante.
+DEFAULT_STALE_AFTER_S = 30.0
+
+
+def percentile(sorted_values, pct):
+    """Percentile ``pct`` (0-100, rang le plus proche) d'une liste triée, ou
+    None si elle est vide."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ClickLatencyTracker:
+    """Mesures clic -> écran par action (``next``, ``validate``, ``pause``,
+    ``recall``...). Un seul appui en attente par action : le premier gagne
+    (le raccourci clavier horodate avant le clic simulé du bouton, qui ne doit
+    pas repousser le début de la mesure)."""
+
+    def __init__(self, window=DEFAULT_WINDOW, stale_after_s=DEFAULT_STALE_AFTER_S,
+                 clock=time.monotonic):
+        self._window = max(1, window)
+        self._stale_after_s = stale_after_s
+        self._clock = clock
+        self._pending = {}
+        self._samples = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def press(self, action, t=None):
+        """Début de la mesure pour ``action`` (ignoré si un appui est déjà en
+        attente et encore récent)."""
+        now = self._clock() if t is None else t
+        with self._lock:
+            started = self._pending.get(action)
+            if started is None or now - started > self._stale_after_s:
+                self._pending[action] = now
+
+    def pending(self, action):
+        with self._lock:
+            return action in self._pending
+
+    def shown(self, action, t=None):
+        """Fin de la mesure : la réponse a été appliquée à l'écran. Retourne la
+        durée (secondes), ou None sans appui en attente."""
+        now = self._clock() if t is None else t
+        with self._lock:
+            started = self._pending.pop(action, None)
+            if started is None:
+                return None
+            elapsed = max(0.0, now - started)
+            samples = self._samples.get(action)
+            if samples is None:
+                samples = self._samples[action] = deque(maxlen=self._window)
+            samples.append(elapsed)
+            return elapsed
+
+    def cancel(self, action, failed=False):
+        """Abandonne l'appui en attente (action refusée, ou en échec si
+        ``failed`` : compté à part, hors percentiles)."""
+        with self._lock:
+            if self._pending.pop(action, None) is not None and failed:
+                self._failures[action] = self._failures.get(action, 0) + 1
+
+    def summary(self):
+        """``{action: {count, failures, p50_s, p95_s, p99_s, max_s}}``."""
+        with self._lock:
+            actions = set(self._samples) | set(self._failures)
+            snapshot = {a: sorted(self._samples.get(a, ())) for a in actions}
+            failures = dict(self._failures)
+        summary = {}
+        for action in sorted(snapshot):
+            values = snapshot[action]
+            summary[action] = {
+                "count": len(values),
+                "failures": failures.get(action, 0),
+                "p50_s": percentile(values, 50),
+                "p95_s": percentile(values, 95),
+                "p99_s": percentile(values, 99),
+                "max_s": values[-1] if values else None,
+            }
+        return summary
+
+    def summary_line(self):
+        """Résumé compact pour le journal, ex.
+        ``next n=42 p50=612ms p95=880ms p99=1204ms max=1310ms ; pause n=3 ...``."""
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f}ms"
+
+        parts = []
+        for action, stats in self.summary().items():
+            part = (f"{action} n={stats['count']} p50={ms(stats['p50_s'])} "
+                    f"p95={ms(stats['p95_s'])} p99={ms(stats['p99_s'])} "
+                    f"max={ms(stats['max_s'])}")
+            if stats["failures"]:
+                part += f" échecs={stats['failures']}"
+            parts.append(part)
+        return " ; ".join(parts) if parts else "aucune mesure"
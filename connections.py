@@ -1,38 +1,127 @@
 """Gestionnaire réseau centralisé de l'App comptoir.
 
-Un unique worker (thread dédié) possède la SEULE ``requests.Session`` et traite
-une file de requêtes en série. Cela élimine tout accès concurrent à la session
-(et à ses en-têtes, dont le jeton) et centralise :
+Le gestionnaire possède le SEUL transport HTTP (``net_transport`` : une
+``requests.Session`` par défaut, ou le moteur asyncio) ; des workers (threads
+dédiés, un seul par défaut) traitent une file de requêtes. Il centralise :
 
 - l'ajout du jeton applicatif (porté par la session, posé sous verrou) ;
-- le timeout de chaque requête ;
+- le timeout de chaque requête, adapté par point d'accès à la latence observée
+  (``net_timeouts``) : une panne se constate vite sur le réseau local, un
+  point d'accès lent garde sa marge ; un ``timeout`` explicite reste prioritaire ;
 - un résultat homogène ``NetResult`` (statut, données JSON éventuelles, message
   utilisateur, détail technique) ; ``status == 0`` pour une erreur réseau/timeout ;
 - le renouvellement du jeton sur 401 avec un seul rejeu ;
-- l'idempotence (en-tête ``X-Idempotency-Key`` par requête).
+- l'idempotence (en-tête ``X-Idempotency-Key`` par requête) et le rejeu
+  automatique des requêtes idempotentes (GET, ou POST portant une clé
+  d'idempotence) sur échec transitoire (réseau, 502/503/504) : backoff
+  exponentiel avec jitter (``net_core.RetryPolicy``), même clé d'idempotence,
+  dans la limite de l'échéance ; ``NetResult.attempts`` compte les envois ;
+- la priorité : deux voies (``net_scheduler``), les actions utilisateur passant
+  devant le trafic de fond (démarrage, resync, jeton) ;
+- le regroupement des GET identiques en vol (``net_singleflight``) : un GET
+  déjà en attente (même URL, mêmes en-têtes) n'est pas renvoyé, le demandeur se
+  rattache au job existant et reçoit le même ``NetResult`` ;
+- la revalidation conditionnelle (``net_cache``) : pour un GET dont la réponse
+  porte un ``ETag``/``Last-Modified``, le validateur est renvoyé ensuite
+  (``If-None-Match``/``If-Modified-Since``) ; sur ``304`` l'appelant reçoit le
+  corps mémorisé sous forme d'un ``NetResult`` 200 ordinaire ;
+- le disjoncteur par serveur (``net_circuit``) : après plusieurs échecs réseau
+  consécutifs, les requêtes échouent immédiatement (``NetResult.network_error``)
+  au lieu de payer chacune le timeout de connexion ; une sonde de fond vérifie
+  périodiquement le retour du serveur et ``circuit_changed`` informe l'interface ;
+- le parallélisme borné : avec ``workers > 1``, des actions indépendantes (rappel,
+  papier, appel automatique, recherche du staff) ne s'attendent plus quand le
+  serveur est lent. L'ordre reste garanti entre requêtes de même ``order_key``
+  (jamais deux en vol à la fois) ; le pool de connexions (``HTTPAdapter``) est
+  dimensionné sur le nombre de workers ;
+- l'échéance et l'annulation : chaque requête porte un ``CancelToken`` et,
+  optionnellement, une échéance (``deadline_s``) et une étiquette (``tag``, p. ex.
+  le comptoir). Une requête annulée ou échue est lâchée AVANT l'envoi (et avant
+  le rejeu d'un 401) ; ``cancel_tag(tag)`` annule d'un coup tout ce qui porte
+  une étiquette périmée (changement de comptoir/serveur). L'appelant reçoit
+  ``NetResult.cancelled`` (``is_cancelled``), qui ne compte pas comme une panne.
+  Avec un transport qui le permet (moteur asyncio), l'annulation coupe aussi la
+  requête EN VOL au lieu d'attendre sa réponse ou son timeout ;
+- le préchauffage des connexions : ``prewarm(url, n)`` ouvre ``n`` connexions
+  vers le serveur (HEAD simultanés, hors file) au démarrage et après une
+  reconnexion, pour que le premier clic ne paie pas DNS + TCP + TLS ; tant que
+  le réseau est inactif, un HEAD périodique (``keepalive_interval_s``) les garde
+  ouvertes. La latence du premier clic (première action utilisateur après le
+  démarrage ou une période d'inactivité) est mesurée à part (``warmup_stats``) ;
+- la compression (``net_compression``) : réponses gzip/deflate (br si
+  disponible) négociées et décodées par le transport ; corps de POST volumineux
+  compressés en gzip sur option (``compress_requests``), renvoyés en clair si le
+  serveur répond 415 ; octets avant/après compression comptés par point
+  d'accès (``bandwidth_stats``) ;
+- le traçage (``net_trace``) : chaque requête porte un ``X-Request-Id`` (le même
+  pour ses rejeux, repris dans ``NetResult.request_id`` et dans les logs) et un
+  span qui décompose son temps (file, connexion, serveur, réseau, décodage,
+  livraison au slot GUI) ; les derniers spans sont consultables via
+  ``traces()`` / ``trace(request_id)``.
 
-Deux modes d'utilisation :
+Jeton et workers multiples : les en-têtes de la session ne sont jamais modifiés
+en place. Le jeton est posé en copie-puis-remplacement (``_set_token_header``)
+sous ``_session_lock`` : un worker en train d'envoyer lit soit l'ancien dict,
+soit le nouveau, jamais un dict en cours de modification. ``_token_lock``
+sérialise les obtentions de jeton (un seul POST à la fois).
+
+Renouvellement du jeton en vol unique : chaque obtention terminée incrémente une
+*génération*. Une requête qui reçoit un 401 mémorise la génération du jeton avec
+lequel elle est partie ; si un autre renouvellement s'est terminé entre-temps
+(plusieurs 401 simultanés, ou renouvellement demandé par le WebSocket), elle
+rejoue avec le jeton déjà renouvelé au lieu d'en redemander un. Les jobs
+``fetch_token_blocking`` en attente sont eux aussi regroupés. Enfin, le jeton est
+renouvelé de façon proactive avant son expiration (durée de vie annoncée par le
+serveur, ``expires_in``/``ttl``, ou à défaut durée de vie observée au premier
+401) : le 401 suivi d'un rejeu disparaît du chemin des actions utilisateur.
+
+Modes d'utilisation :
 - asynchrone (thread GUI) : ``make_handle(...)`` -> ``RequestHandle`` dont le
   signal ``result(NetResult)`` est émis vers le thread appelant ; ``.start()``
-  met la requête en file ;
+  met la requête en file (voie interactive par défaut) ;
+- futur : ``submit(...)`` -> ``concurrent.futures.Future`` résolu avec le
+  ``NetResult`` (voie de fond par défaut). Plusieurs requêtes se composent sans
+  thread dédié par flux ; ``future.cancel()`` annule la requête si elle n'est
+  pas encore livrée. Les rappels ``add_done_callback`` s'exécutent dans un
+  worker réseau : passer par un signal Qt pour toucher à l'interface ;
+- asyncio : ``await request_async(...)`` (même chose, dans une boucle asyncio,
+  p. ex. intégrée à Qt) ; annuler la tâche annule la requête ;
 - bloquant (threads de fond : démarrage, resync) : ``request_blocking(...)`` (rend
-  un ``NetResult``) et ``fetch_token_blocking(...)`` attendent le worker.
+  un ``NetResult``) et ``fetch_token_blocking(...)`` attendent le worker (voie de
+  fond par défaut).
   Ne JAMAIS les appeler depuis le worker lui-même (interblocage) ni, en pratique,
   depuis le thread GUI (il bloquerait).
 """
 
+import asyncio
 import logging
-import queue
 import threading
 import time
-import uuid
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 
-import requests
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, Timeout
 from PySide6.QtCore import QObject, QThread, Signal
 
-from net_core import perform_with_reauth
+from net_cache import ResponseCache
+from net_circuit import OPEN, CircuitRegistry, base_url
+from net_compression import (
+    DEFAULT_MIN_REQUEST_BYTES, UNSUPPORTED_MEDIA_TYPE, ByteCounters, compress_body, form_body,
+    response_sizes,
+)
+from net_core import (
+    DROP_CANCELLED, DROP_EXPIRED, CancelToken, RetryPolicy, drop_reason, perform_with_reauth,
+    proactive_refresh_delay, token_ttl_from_payload,
+)
 from net_result import NetResult
+from net_scheduler import LANE_BACKGROUND, LANE_INTERACTIVE, PriorityJobQueue
+from net_singleflight import SingleFlight, flight_key
+from net_timeouts import AdaptiveTimeouts
+from net_trace import (
+    REQUEST_ID_HEADER, LatencyHistogram, RequestSpan, TraceBuffer, server_time_s,
+)
+from net_transport import TransportCancelled, requests_transport
 
 logger = logging.getLogger("appcomptoir.connections")
 
@@ -40,9 +129,44 @@ logger = logging.getLogger("appcomptoir.connections")
 # bloquée indéfiniment quand le serveur ou le réseau ne répond plus.
 DEFAULT_TIMEOUT = (5, 10)
 
+# Nombre de workers par défaut : un seul (comportement série historique).
+DEFAULT_WORKERS = 1
+
 # Sentinelle d'arrêt du worker.
 _STOP = object()
 
+# Clé de regroupement des jobs de jeton (un seul renouvellement en file).
+_TOKEN_FLIGHT = ("token",)
+
+# En dessous, une durée de vie « observée » (temps entre l'installation d'un
+# jeton et son premier 401) n'est pas une expiration mais un rejet (secret
+# changé, jeton révoqué) : on ne s'en sert pas pour programmer un renouvellement.
+MIN_OBSERVED_TOKEN_TTL_S = 60.0
+
+# Connexions préchauffées par défaut, et intervalle d'inactivité au-delà duquel
+# un HEAD les garde ouvertes (sous le délai keep-alive usuel des serveurs).
+DEFAULT_PREWARM_CONNECTIONS = 2
+KEEPALIVE_INTERVAL_S = 25.0
+# Cible des HEAD de préchauffage/keep-alive : route d'API en POST seul, à
+# laquelle le serveur répond 405 dès le routage (ni base de données ni gabarit,
+# contrairement à la page d'accueil « / »). Toute réponse entretient la connexion.
+WARM_PATH = "/api/get_app_token"
+
+# Nombre de mesures de « premier clic » conservées.
+FIRST_CLICK_SAMPLES = 50
+
+# Message montré quand une action n'a pas pu partir avant son échéance (une
+# annulation voulue, elle, reste silencieuse).
+EXPIRED_MESSAGE = "Action abandonnée : le serveur n'a pas pu la traiter à temps."
+
+
+class _Dropped(Exception):
+    """Levée par ``_send`` quand la requête doit être lâchée avant l'envoi."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
 
 class RequestHandle(QObject):
     """Résultat asynchrone d'une requête.
@@ -60,6 +184,9 @@ class RequestHandle(QObject):
         self._manager = manager
         self._spec = spec
         self._started = False
+        # Connecté en premier, exécuté dans le thread du handle (GUI) juste
+        # avant les slots de l'appelant : mesure la livraison au slot.
+        self.result.connect(self._on_dispatched)
 
     def start(self):
         """Met la requête en file (idempotent). Compatible avec l'ancien usage
@@ -68,30 +195,75 @@ class RequestHandle(QObject):
             self._started = True
             self._manager._enqueue(self, self._spec)
 
+    def cancel(self):
+        """Annule la requête : lâchée avant son envoi si elle ne l'est pas déjà
+        (``result`` portera alors un ``NetResult.cancelled``). Sans effet sur
+        une requête déjà livrée."""
+        self._spec.cancel_token.cancel()
+        if self._started:
+            self._manager._purge_dropped()
+
+    def _on_dispatched(self, _result):
+        self._spec.span.mark("dispatched")
+
 
 class _RequestSpec:
-    __slots__ = ("url", "method", "data", "headers", "idempotency_key", "timeout")
+    __slots__ = ("url", "method", "data", "headers", "idempotency_key", "timeout", "lane",
+                 "order_key", "deadline", "cancel_token", "tag", "idempotent", "span")
 
-    def __init__(self, url, method, data, headers, idempotency_key, timeout=None):
+    def __init__(self, url, method, data, headers, idempotency_key, timeout=None,
+                 lane=LANE_INTERACTIVE, order_key=None, deadline_s=None, cancel_token=None,
+                 tag=None, idempotent=None):
         self.url = url
         self.method = method
         self.data = data
         self.headers = headers
         self.idempotency_key = idempotency_key
         self.timeout = timeout  # surcharge le timeout par défaut si fourni
+        self.lane = lane        # voie de priorité (net_scheduler)
+        self.order_key = order_key  # sérialise les requêtes de même clé
+        # Échéance absolue (horloge monotone) au-delà de laquelle on n'envoie plus.
+        self.deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+        self.cancel_token = cancel_token or CancelToken()
+        self.tag = tag              # étiquette d'annulation groupée (cancel_tag)
+        # Rejouable sans risque sur échec transitoire : GET, ou POST dont la clé
+        # d'idempotence évite un double effet côté serveur.
+        if idempotent is None:
+            idempotent = method == "GET" or bool(idempotency_key)
+        self.idempotent = idempotent
+        self.span = RequestSpan(method, url, lane)
+
+    def drop_reason(self):
+        return drop_reason(self.cancel_token, self.deadline, time.monotonic())
 
 
 class _Job:
     """Élément de file : soit une requête (handle async ou event bloquant), soit
-    un renouvellement de jeton."""
-    __slots__ = ("kind", "spec", "handle", "event", "result_box")
+    un renouvellement de jeton, soit une tâche locale bloquante (``call``)."""
+    __slots__ = ("kind", "spec", "handle", "event", "result_box", "lane", "order_key",
+                 "flight_key", "token_generation", "future", "call")
 
-    def __init__(self, kind, spec=None, handle=None, event=None):
-        self.kind = kind            # "request" | "token"
+    def __init__(self, kind, spec=None, handle=None, event=None, lane=None):
+        self.kind = kind            # "request" | "token" | "call"
         self.spec = spec
         self.handle = handle        # RequestHandle si async, sinon None
         self.event = event          # threading.Event si bloquant
+        self.future = None          # concurrent.futures.Future (submit)
         self.result_box = {}        # rempli pour les jobs bloquants
+        # Voie de la file : explicite, sinon celle de la requête, sinon le fond.
+        self.lane = lane or (spec.lane if spec is not None else LANE_BACKGROUND)
+        self.order_key = spec.order_key if spec is not None else None
+        # Clé de regroupement des GET identiques (None = jamais regroupé).
+        self.flight_key = None
+        if kind == "request" and spec is not None:
+            self.flight_key = flight_key(spec.method, spec.url, spec.headers,
+                                         spec.data, spec.idempotency_key)
+        elif kind == "token":
+            self.flight_key = _TOKEN_FLIGHT
+        # Génération du jeton connue à la demande (jobs de jeton) : si elle a
+        # changé avant l'exécution, le jeton a déjà été renouvelé entre-temps.
+        self.token_generation = None
+        self.call = None            # callable sans argument (kind == "call")
 
 
 class _NetworkWorker(QThread):
@@ -110,52 +282,276 @@ class NetworkManager(QObject):
     # la fenêtre principale mette à jour son app_token (WebSocket, login...).
     token_refreshed = Signal(str)
     token_failed = Signal()
+    # Émis à chaque changement d'état d'un disjoncteur : (url de base, état
+    # "closed" | "open" | "half_open").
+    circuit_changed = Signal(str, str)
 
     def __init__(self, token_url_provider, secret_provider,
-                 timeout=DEFAULT_TIMEOUT, parent=None):
+                 timeout=DEFAULT_TIMEOUT, workers=DEFAULT_WORKERS, cache=None,
+                 circuits=None, probe=None, timeouts=None, retry_policy=None, transport=None,
+                 keepalive_interval_s=KEEPALIVE_INTERVAL_S, compress_requests=False,
+                 compress_min_bytes=DEFAULT_MIN_REQUEST_BYTES, parent=None):
         super().__init__(parent)
         self._token_url_provider = token_url_provider
         self._secret_provider = secret_provider
         self._timeout = timeout
+        # Timeouts par point d'accès déduits de la latence observée ; ``timeout``
+        # reste la valeur de départ (et le plafond de connexion).
+        self._timeouts = timeouts if timeouts is not None else AdaptiveTimeouts(default=timeout)
+        # Corps des GET revalidables (ETag/Last-Modified), borné en taille et TTL.
+        self._cache = cache if cache is not None else ResponseCache()
+        # Disjoncteurs par serveur ; ``probe(url_de_base)`` lève RequestException
+        # si le serveur est toujours injoignable (injectable pour les tests).
+        self._circuits = circuits if circuits is not None else CircuitRegistry()
+        self._probe = probe or self._default_probe
+        self._probe_timers = {}
+        # Rejeu des requêtes idempotentes sur échec transitoire.
+        self._retry = retry_policy if retry_policy is not None else RetryPolicy()
+        # Compression des corps de POST (serveurs qui l'ont refusée : en clair)
+        # et octets échangés par point d'accès.
+        self._compress_requests = compress_requests
+        self._compress_min_bytes = compress_min_bytes
+        self._gzip_refused = set()
+        self._bytes = ByteCounters()
+        self._traces = TraceBuffer()
+        # Latence création -> livraison par voie (histogrammes, diagnostic).
+        self._latency = {}
+        self._latency_lock = threading.Lock()
 
-        self._session = requests.Session()
+        # Transport HTTP (net_transport). Par défaut, une requests.Session dont
+        # le pool par hôte est dimensionné sur le nombre de workers : chaque
+        # worker peut garder sa connexion ouverte (pas de « pool is full »).
+        # Pool dimensionné pour les workers ET les connexions préchauffées :
+        # sinon urllib3 jette (« Connection pool is full ») celles en trop.
+        self._session = (transport if transport is not None
+                         else requests_transport(max(workers, DEFAULT_PREWARM_CONNECTIONS)))
         self._session_lock = threading.Lock()  # protège l'écriture des en-têtes (jeton)
-        self._queue = queue.Queue()
+        # Préchauffage / keep-alive : {url de base: nb de connexions}, dernière
+        # activité réseau et mesures du premier clic (sous _warm_lock).
+        self._keepalive_interval = keepalive_interval_s
+        self._keepalive_timer = None
+        self._warm_targets = {}
+        self._warm_lock = threading.Lock()
+        self._last_activity = time.monotonic()
+        self._first_click_pending = True
+        self._first_clicks = deque(maxlen=FIRST_CLICK_SAMPLES)
+        self._warm_counts = {"prewarms": 0, "keepalives": 0, "failures": 0}
+        # Threads des HEAD simultanés, réutilisés d'un tour à l'autre (créés à
+        # la première demande, agrandis si la cible demande plus de connexions).
+        self._warm_pool = None
+        self._warm_pool_size = 0
+        self._token_lock = threading.Lock()    # une seule obtention de jeton à la fois
+        self._token_generation = 0             # +1 à chaque obtention terminée
+        self._token_installed_at = None        # horodatage (monotonic) du jeton courant
+        self._token_ttl = None                 # durée de vie annoncée du jeton courant
+        self._observed_token_ttl = None        # durée de vie constatée au 1er 401
+        self._refresh_timer = None             # renouvellement proactif programmé
+        self._timer_lock = threading.Lock()
+        # File à deux voies : interactive (actions utilisateur) servie avant
+        # le fond (démarrage, resync, jeton).
+        self._queue = PriorityJobQueue()
+        self._flights = SingleFlight()        # GET identiques en vol
+        self._token_flights = SingleFlight()  # demandes de jeton en attente
+        # Jetons d'annulation des requêtes étiquetées non encore livrées.
+        self._tagged = {}
+        self._tag_lock = threading.Lock()
         self._stopping = False
-        self._worker = _NetworkWorker(self)
-        self._worker.start()
+        self._workers = [_NetworkWorker(self) for _ in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
 
     # ------------------------------------------------------------------ #
     # API publique (thread GUI et threads de fond)
     # ------------------------------------------------------------------ #
     def make_handle(self, url, method="GET", data=None, headers=None,
-                    idempotency_key=None, timeout=None):
-        """Crée un RequestHandle non démarré (compatibilité make_request_thread)."""
-        spec = _RequestSpec(url, method, data, headers, idempotency_key, timeout)
+                    idempotency_key=None, timeout=None, lane=LANE_INTERACTIVE,
+                    order_key=None, deadline_s=None, tag=None, cancel_token=None,
+                    idempotent=None):
+        """Crée un RequestHandle non démarré (compatibilité make_request_thread).
+
+        Voie interactive par défaut : un handle est créé pour une action
+        utilisateur, qui doit passer devant le trafic de fond. ``order_key`` :
+        les requêtes de même clé sont exécutées une à une, dans l'ordre.
+        ``deadline_s`` : délai (depuis maintenant) au-delà duquel la requête
+        n'est plus envoyée ; ``tag`` : étiquette pour ``cancel_tag`` ;
+        ``idempotent`` : autorise le rejeu automatique (déduit par défaut de la
+        méthode et de la clé d'idempotence)."""
+        spec = _RequestSpec(url, method, data, headers, idempotency_key, timeout, lane,
+                            order_key, deadline_s, cancel_token, tag, idempotent)
         return RequestHandle(self, spec)
 
     def request_blocking(self, url, method="GET", data=None, headers=None,
-                         idempotency_key=None, timeout=None, timeout_s=30):
+                         idempotency_key=None, timeout=None, timeout_s=30,
+                         lane=LANE_BACKGROUND, order_key=None, deadline_s=None, tag=None,
+                         cancel_token=None, idempotent=None):
         """Exécute une requête et attend le résultat (threads de fond seulement).
 
         ``timeout`` surcharge le timeout HTTP ; ``timeout_s`` borne l'attente du
-        résultat côté appelant. Retourne un ``NetResult``."""
-        spec = _RequestSpec(url, method, data, headers, idempotency_key, timeout)
-        job = _Job("request", spec=spec, event=threading.Event())
-        self._queue.put(job)
-        if not job.event.wait(timeout_s):
+        résultat côté appelant (la requête est alors annulée) ; ``lane`` choisit
+        la voie (fond par défaut : démarrage, resync). Retourne un ``NetResult``."""
+        future = self.submit(url, method, data, headers, idempotency_key, timeout, lane,
+                             order_key, deadline_s, tag, cancel_token, idempotent)
+        try:
+            return future.result(timeout_s)
+        except FutureTimeout:
+            future.cancel()
             return NetResult.network_error("timeout interne du gestionnaire réseau")
-        return job.result_box.get("result", NetResult.network_error("résultat indisponible"))
+
+    def submit(self, url, method="GET", data=None, headers=None, idempotency_key=None,
+               timeout=None, lane=LANE_BACKGROUND, order_key=None, deadline_s=None,
+               tag=None, cancel_token=None, idempotent=None):
+        """Met une requête en file et renvoie un ``concurrent.futures.Future``
+        résolu avec son ``NetResult`` (jamais d'exception). Mêmes options que
+        ``make_handle`` ; voie de fond par défaut. ``future.cancel()`` annule la
+        requête tant qu'elle n'est pas livrée (comme ``RequestHandle.cancel``)."""
+        spec = _RequestSpec(url, method, data, headers, idempotency_key, timeout, lane,
+                            order_key, deadline_s, cancel_token, tag, idempotent)
+        job = _Job("request", spec=spec)
+        job.future = Future()
+        job.future.add_done_callback(lambda f: f.cancelled() and self._cancel_spec(spec))
+        self._submit_job(job)
+        return job.future
+
+    async def request_async(self, url, method="GET", **options):
+        """Variante asyncio de ``submit`` : ``result = await
+        manager.request_async(url)``. À appeler depuis une boucle asyncio en
+        cours (p. ex. boucle intégrée à Qt) ; annuler la tâche annule la requête."""
+        return await asyncio.wrap_future(self.submit(url, method, **options))
 
     def fetch_token_blocking(self, timeout_s=30):
         """Renouvelle le jeton et attend (threads de fond). Retourne le jeton ou
         None."""
-        job = _Job("token", event=threading.Event())
-        self._queue.put(job)
+        job = _Job("token", event=threading.Event(), lane=LANE_BACKGROUND)
+        job.token_generation = self._token_generation
+        self._submit_job(job)
         if not job.event.wait(timeout_s):
             return None
         return job.result_box.get("token")
 
+    def lane_stats(self):
+        """Compteurs par voie (profondeur de file, temps d'attente avant envoi) :
+        ``{voie: {depth, enqueued, dequeued, avg_wait_s, max_wait_s, last_wait_s}}``."""
+        return self._queue.stats()
+
+    def coalescing_stats(self):
+        """GET identiques regroupés : ``{"leaders": envoyés, "saved": économisés}``."""
+        return self._flights.stats()
+
+    def circuit_states(self):
+        """État des disjoncteurs : ``{url de base: "closed"|"open"|"half_open"}``."""
+        return self._circuits.states()
+
+    def timeout_stats(self):
+        """Latence observée et timeouts en vigueur par point d'accès :
+        ``{motif: {srtt_s, rttvar_s, samples, timeout}}``."""
+        return self._timeouts.snapshot()
+
+    def warmup_stats(self):
+        """Préchauffage et premier clic : ``{targets, prewarms, keepalives,
+        failures, first_click: {count, last_s, avg_s, max_s}}`` (HEAD envoyés,
+        échoués ; latence de la première action après démarrage/inactivité)."""
+        with self._warm_lock:
+            samples = list(self._first_clicks)
+            stats = dict(self._warm_counts, targets=dict(self._warm_targets))
+        stats["first_click"] = {
+            "count": len(samples),
+            "last_s": samples[-1] if samples else None,
+            "avg_s": sum(samples) / len(samples) if samples else None,
+            "max_s": max(samples) if samples else None,
+        }
+        return stats
+
+    def prewarm(self, url, connections=DEFAULT_PREWARM_CONNECTIONS):
+        """Ouvre ``connections`` connexions vers le serveur de ``url`` (HEAD
+        simultanés hors file, sans bloquer l'appelant) puis les garde ouvertes
+        pendant l'inactivité. Remplace la cible précédente (changement de
+        serveur) ; ``connections == 0`` désactive le préchauffage."""
+        base = base_url(url)
+        with self._warm_lock:
+            self._warm_targets = {base: connections} if connections and base else {}
+            self._first_click_pending = True
+        if self._stopping or not self._warm_targets:
+            self._cancel_keepalive_timer()
+            return
+        self._warm(base, connections, "prewarms")
+        self._schedule_keepalive()
+
+    def bandwidth_stats(self):
+        """Octets par point d'accès : ``{motif: {requests, request_bytes,
+        request_wire_bytes, responses, response_bytes, response_wire_bytes,
+        saved_bytes}}`` (``*_bytes`` : décompressés ; ``*_wire_bytes`` : sur le
+        réseau)."""
+        return self._bytes.snapshot()
+
+    def traces(self, limit=None):
+        """Derniers spans terminés (``RequestSpan.to_dict``), du plus ancien au
+        plus récent."""
+        return [span.to_dict() for span in self._traces.recent(limit)]
+
+    def trace(self, request_id):
+        """Span d'une requête (``NetResult.request_id``), ou None s'il est sorti
+        du tampon."""
+        span = self._traces.get(request_id)
+        return span.to_dict() if span is not None else None
+
+    def latency_histograms(self):
+        """Latence création -> livraison par voie : ``{voie: {bounds, counts,
+        count, sum_s}}`` (voir ``net_trace.LatencyHistogram``)."""
+        with self._latency_lock:
+            histograms = dict(self._latency)
+        return {lane: h.snapshot() for lane, h in histograms.items()}
+
+    def cache_stats(self):
+        """Cache conditionnel : ``{entries, hits (304 servis), stores, evictions}``."""
+        return self._cache.stats()
+
+    def cancel_tag(self, tag):
+        """Annule toutes les requêtes portant l'étiquette ``tag`` et pas encore
+        livrées (en file, rattachées à un GET en vol, ou en cours : celles-ci ne
+        seront pas rejouées après un 401). Retourne le nombre de requêtes
+        annulées."""
+        with self._tag_lock:
+            tokens = self._tagged.pop(tag, set())
+        for token in tokens:
+            token.cancel()
+        if tokens:
+            logger.info("%s requête(s) annulée(s) (étiquette %r)", len(tokens), tag)
+            self._purge_dropped()
+        return len(tokens)
+
+    def run_in_background(self, call, order_key=None):
+        """Exécute ``call()`` (sans argument, résultat ignoré) dans un worker,
+        en voie de fond : pour une opération bloquante hors réseau (magasin
+        sécurisé...) qui ne doit pas figer le thread GUI. Deux tâches de même
+        ``order_key`` s'exécutent dans l'ordre de soumission. Abandonnée si le
+        gestionnaire s'arrête avant."""
+        job = _Job("call", lane=LANE_BACKGROUND)
+        job.call = call
+        job.order_key = order_key
+        self._submit_job(job)
+
+    @property
+    def worker_count(self):
+        return len(self._workers)
+
+    @property
+    def token_ttl(self):
+        """Durée de vie (s) annoncée par le serveur pour le jeton courant, ou None."""
+        return self._token_ttl
+
+    def install_token(self, token, ttl_s=None):
+        """Installe un jeton obtenu hors du gestionnaire (jeton mémorisé, au
+        démarrage à chaud). ``ttl_s`` : durée de vie restante si connue, pour
+        programmer son renouvellement. S'il est refusé (401), le renouvellement
+        normal prend le relais. N'émet pas ``token_refreshed``."""
+        with self._token_lock:
+            self._set_token_header(token)
+            # Âge réel inconnu : pas d'observation de durée de vie sur ce jeton.
+            self._token_installed_at = None
+            self._token_ttl = ttl_s
+            self._token_generation += 1
+        self._schedule_refresh(ttl_s or self._observed_token_ttl)
+
     def current_token(self):
         with self._session_lock:
             return self._session.headers.get("X-App-Token")
@@ -163,27 +559,95 @@ class NetworkManager(QObject):
     def clear_token(self):
         """Retire le jeton de la session (ex: changement de serveur/secret) pour
         ne plus présenter un jeton périmé avant d'en obtenir un nouveau."""
-        with self._session_lock:
-            self._session.headers.pop("X-App-Token", None)
+        self._cancel_refresh_timer()
+        self._set_token_header(None)
 
     def stop(self, timeout_ms=3000):
         """Arrête le worker (idempotent) et attend au plus ``timeout_ms``.
 
         Les jobs encore en file sont purgés et leurs attentes débloquées par le
         worker (voir _drain_pending), pour ne jamais laisser un appelant bloquant
-        (StartupWorker/ResyncWorker) suspendu. Retourne True si le worker s'est
-        terminé dans le délai."""
-        if self._stopping:
-            return self._worker.wait(timeout_ms)
-        self._stopping = True
-        self._queue.put(_STOP)
-        return self._worker.wait(timeout_ms)
+        (StartupWorker) suspendu. Retourne True si tous les workers
+        se sont terminés dans le délai (partagé entre eux)."""
+        if not self._stopping:
+            self._stopping = True
+            self._cancel_refresh_timer()
+            self._cancel_probe_timers()
+            self._cancel_keepalive_timer()
+            with self._warm_lock:
+                if self._warm_pool is not None:
+                    self._warm_pool.shutdown(wait=False, cancel_futures=True)
+                    self._warm_pool = None
+            coalesced = self._flights.stats()
+            if coalesced["saved"]:
+                logger.info("GET identiques regroupés : %s requête(s) économisée(s) "
+                            "pour %s envoyée(s)", coalesced["saved"], coalesced["leaders"])
+            # Sentinelle en queue de la voie de fond : tout ce qui était déjà en
+            # file est traité avant l'arrêt, comme avec l'ancienne file FIFO.
+            self._queue.put(_STOP, lane=LANE_BACKGROUND)
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        stopped = True
+        for worker in self._workers:
+            remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+            stopped = worker.wait(remaining_ms) and stopped
+        if stopped:
+            self._close_transport()
+        return stopped
+
+    def _close_transport(self):
+        close = getattr(self._session, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception:
+            logger.debug("Fermeture du transport HTTP incomplète", exc_info=True)
 
     # ------------------------------------------------------------------ #
     # Interne — appelé depuis le thread appelant
     # ------------------------------------------------------------------ #
     def _enqueue(self, handle, spec):
-        self._queue.put(_Job("request", spec=spec, handle=handle))
+        self._submit_job(_Job("request", spec=spec, handle=handle))
+
+    def _submit_job(self, job):
+        """Met un job en file, sauf si un job identique est déjà en vol (GET de
+        même URL/en-têtes, ou demande de jeton) : il y est alors rattaché et
+        recevra le même résultat."""
+        if job.spec is not None and job.spec.tag is not None:
+            with self._tag_lock:
+                self._tagged.setdefault(job.spec.tag, set()).add(job.spec.cancel_token)
+        if job.flight_key is not None and not self._flights_for(job).join(job.flight_key, job):
+            logger.debug("Job identique déjà en vol, rattaché : %s",
+                         job.spec.url if job.spec is not None else job.kind)
+            return
+        self._queue.put(job)
+
+    def _flights_for(self, job):
+        return self._token_flights if job.kind == "token" else self._flights
+
+    def _cancel_spec(self, spec):
+        spec.cancel_token.cancel()
+        self._purge_dropped()
+
+    def _purge_dropped(self):
+        """Retire de la file les requêtes annulées ou échues sans attendre
+        qu'un worker les atteigne (le bouton concerné est libéré tout de suite)."""
+        for job in self._queue.remove_if(_is_dropped_job):
+            self._settle_dropped(job)
+
+    def _settle_dropped(self, job):
+        """Livre ``NetResult.cancelled`` au meneur lâché et à ses rattachés
+        eux-mêmes lâchés ; les rattachés encore valides sont remis en file
+        (le premier devient le nouveau meneur)."""
+        still_wanted = []
+        for waiter in self._flight_waiters(job):
+            reason = waiter.spec.drop_reason()
+            if reason is None:
+                still_wanted.append(waiter)
+            else:
+                self._deliver(waiter, _dropped_result(reason))
+        for waiter in still_wanted:
+            self._submit_job(waiter)
 
     # ------------------------------------------------------------------ #
     # Interne — TOUT ce qui suit s'exécute DANS le worker
@@ -193,70 +657,195 @@ class NetworkManager(QObject):
             job = self._queue.get()
             if job is _STOP:
                 self._drain_pending()
+                # Remise en file pour les autres workers (chacun s'arrête en la
+                # rencontrant ; la dernière copie restante est inoffensive).
+                self._queue.put(_STOP, lane=LANE_BACKGROUND)
                 break
             try:
                 if job.kind == "token":
                     self._handle_token_job(job)
+                elif job.kind == "call":
+                    job.call()
                 else:
                     self._handle_request_job(job)
             except Exception:  # garde-fou : le worker ne doit jamais mourir
                 logger.exception("Erreur inattendue dans le worker réseau")
                 if job.event is not None:
                     job.event.set()
+                _resolve_future(job.future,
+                                NetResult.network_error("erreur interne du gestionnaire réseau"))
+            finally:
+                # Libère la clé d'ordre : la requête suivante de même clé peut partir.
+                self._queue.task_done(job)
 
     def _drain_pending(self):
         """À l'arrêt : vide la file et débloque immédiatement les jobs restants
         (résultat d'échec), pour qu'aucun appelant bloquant ne reste suspendu et
         qu'aucun handle async n'attende indéfiniment son 'finished'."""
-        while True:
-            try:
-                job = self._queue.get_nowait()
-            except queue.Empty:
-                break
+        for job in self._queue.drain():
             if job is _STOP:
                 continue
             aborted = NetResult.network_error("arrêt en cours")
-            if job.handle is not None:
-                job.handle.result.emit(aborted)
-                job.handle.finished.emit()
-            if job.event is not None:
-                job.result_box["result"] = aborted
-                job.result_box["token"] = None
-                job.event.set()
+            for waiter in self._flight_waiters(job):
+                waiter.result_box["token"] = None
+                self._deliver(waiter, aborted)
 
     def _handle_request_job(self, job):
-        result = self._execute(job.spec)
+        job.spec.span.mark("dequeued")
+        if job.spec.drop_reason() is not None:
+            logger.debug("Requête lâchée avant envoi : %s %s", job.spec.method, job.spec.url)
+            self._settle_dropped(job)
+            return
+        breaker = self._circuits.breaker_for(job.spec.url)
+        if breaker.allow():
+            first_click = job.lane == LANE_INTERACTIVE and self._take_first_click()
+            started = time.monotonic()
+            result = self._execute_with_retry(job.spec, breaker)
+            if first_click and not result.is_cancelled:
+                self._record_first_click(time.monotonic() - started)
+            if result.is_cancelled:
+                # Lâchée entre un 401 et son rejeu, ou pendant l'attente d'un rejeu.
+                self._settle_dropped(job)
+                return
+        else:
+            # Serveur réputé injoignable : échec immédiat, sans attendre un
+            # timeout de connexion (la sonde de fond détectera son retour).
+            logger.debug("Circuit ouvert -> échec immédiat : %s %s",
+                         job.spec.method, job.spec.url)
+            result = NetResult.network_error("serveur injoignable (circuit ouvert)")
+        result.request_id = job.spec.span.request_id
+        # Le vol est clos AVANT la distribution : un GET identique demandé
+        # maintenant repartira (il ne recevrait pas un résultat déjà émis).
+        for waiter in self._flight_waiters(job):
+            if waiter is not job:
+                waiter.spec.span.leader_id = job.spec.span.request_id
+            # Un rattaché annulé entre-temps ne reçoit pas le résultat (il
+            # pourrait concerner un comptoir qui n'est plus le sien).
+            reason = waiter.spec.drop_reason()
+            self._deliver(waiter, result if reason is None else _dropped_result(reason))
+
+    def _execute_with_retry(self, spec, breaker):
+        """``_execute`` puis, pour une requête idempotente en échec transitoire,
+        rejeux espacés (backoff + jitter) tant que la politique, l'échéance, le
+        disjoncteur et l'arrêt le permettent. L'attente s'interrompt dès
+        l'annulation. La clé d'ordre reste tenue pendant l'attente : une action
+        suivante de même clé ne peut pas doubler celle qui est rejouée."""
+        attempt = 1
+        while True:
+            result = self._execute(spec)
+            if result.is_cancelled:
+                return result
+            self._record_outcome(spec.url, reachable=not result.is_timeout)
+            if not (spec.idempotent and self._retry.should_retry(result.status, attempt)):
+                break
+            delay = self._retry.delay(attempt)
+            if spec.deadline is not None and time.monotonic() + delay >= spec.deadline:
+                break
+            if self._stopping or not breaker.allow():
+                break
+            logger.info("Échec transitoire (statut %s) sur %s %s -> rejeu %s/%s dans %.2fs",
+                        result.status, spec.method, spec.url, attempt + 1,
+                        self._retry.max_attempts, delay)
+            if spec.cancel_token.wait(delay):
+                return _dropped_result(DROP_CANCELLED)
+            attempt += 1
+        result.attempts = attempt
+        return result
+
+    def _flight_waiters(self, job):
+        """Le job et tous les demandeurs rattachés à son vol (clos au passage)."""
+        if job.flight_key is None:
+            return [job]
+        waiters = self._flights_for(job).finish(job.flight_key)
+        if job not in waiters:
+            waiters.insert(0, job)
+        return waiters
+
+    def _deliver(self, job, result):
+        if job.spec is not None:
+            span = job.spec.span
+            span.status = result.status
+            span.attempts = result.attempts
+            span.mark("delivered")
+            self._traces.add(span)
+            self._observe_latency(span)
+        if job.spec is not None and job.spec.tag is not None:
+            with self._tag_lock:
+                tokens = self._tagged.get(job.spec.tag)
+                if tokens is not None:
+                    tokens.discard(job.spec.cancel_token)
+                    if not tokens:
+                        del self._tagged[job.spec.tag]
         if job.handle is not None:
             job.handle.result.emit(result)
             job.handle.finished.emit()
         if job.event is not None:
             job.result_box["result"] = result
             job.event.set()
+        _resolve_future(job.future, result)
+
+    def _observe_latency(self, span):
+        with self._latency_lock:
+            histogram = self._latency.get(span.lane)
+            if histogram is None:
+                histogram = self._latency[span.lane] = LatencyHistogram()
+        histogram.observe(max(0.0, span.delivered_at - span.created_at))
 
     def _handle_token_job(self, job):
-        token = self._do_token_fetch()
-        if job.event is not None:
-            job.result_box["token"] = token
-            job.event.set()
+        token = self._do_token_fetch(job.token_generation)
+        for waiter in self._flight_waiters(job):
+            waiter.result_box["token"] = token
+            if waiter.event is not None:
+                waiter.event.set()
 
     def _execute(self, spec):
         """Exécute la requête et renvoie TOUJOURS un NetResult (jamais d'exception
         propagée) : le handle async émet donc toujours, et un bouton quitte
         toujours l'état « attente »."""
-        cid = uuid.uuid4().hex[:8]
+        cid = spec.span.request_id[:8]
         start = time.time()
+        # sent : génération du jeton avec lequel la requête est partie, et clé
+        # de cache (GET revalidable) pour y joindre les en-têtes conditionnels.
+        sent = {"cache_key": flight_key(spec.method, spec.url, spec.headers,
+                                        spec.data, spec.idempotency_key)}
         try:
             resp = perform_with_reauth(
-                send=lambda: self._send(spec),
-                reauth=self._reauth,
+                send=lambda: self._send(spec, sent),
+                reauth=lambda: self._reauth(sent.get("generation")),
             )
+            if resp.status_code == UNSUPPORTED_MEDIA_TYPE and sent.get("compressed"):
+                # Le serveur ne décompresse pas les requêtes : renvoi en clair,
+                # et plus de compression vers lui.
+                logger.info("[cid=%s] corps compressé refusé (415) -> renvoi en clair", cid)
+                self._gzip_refused.add(base_url(spec.url))
+                resp = self._send(spec, sent)
             elapsed = time.time() - start
             content_type = resp.headers.get("Content-Type") if getattr(resp, "headers", None) else None
             logger.debug("[cid=%s] %s %s -> %s en %.3fs", cid, spec.method, spec.url,
                          resp.status_code, elapsed)
+            cache_key = sent["cache_key"]
+            if cache_key is not None:
+                if resp.status_code == 304:
+                    cached = self._cache.revalidated(cache_key)
+                    if cached is not None:
+                        logger.debug("[cid=%s] 304 -> corps servi depuis le cache", cid)
+                        return self._decoded(spec, 200, cached.text, cached.content_type)
+                    # Entrée évincée entre l'envoi et la réponse : on redemande
+                    # sans condition (cas rare, plutôt qu'un 304 sans corps).
+                    sent["cache_key"] = None
+                    resp = self._send(spec, sent)
+                    content_type = resp.headers.get("Content-Type") if getattr(resp, "headers", None) else None
+                elif resp.status_code == 200:
+                    self._cache.store(cache_key, resp.headers, resp.text, content_type)
             # Le JSON n'est décodé que si le content-type est compatible ; sinon
             # data reste None (réponse HTML/vide/malformée -> pas de crash).
-            return NetResult.from_response(resp.status_code, resp.text, content_type)
+            return self._decoded(spec, resp.status_code, resp.text, content_type)
+        except _Dropped as e:
+            logger.debug("[cid=%s] requête lâchée avant envoi (%s)", cid, e.reason)
+            return _dropped_result(e.reason)
+        except TransportCancelled:
+            logger.debug("[cid=%s] requête coupée en vol (annulée)", cid)
+            return NetResult.cancelled("requête annulée en vol")
         except RequestException as e:
             elapsed = time.time() - start
             logger.warning("[cid=%s] échec réseau après %.3fs : %s", cid, elapsed, e)
@@ -266,54 +855,366 @@ class NetworkManager(QObject):
             logger.exception("[cid=%s] erreur inattendue de requête", cid)
             return NetResult.network_error(str(e))
 
-    def _send(self, spec):
+    @staticmethod
+    def _decoded(spec, status, text, content_type):
+        result = NetResult.from_response(status, text, content_type)
+        spec.span.mark("decoded")
+        return result
+
+    def _send(self, spec, sent=None):
+        reason = spec.drop_reason()
+        if reason is not None:
+            raise _Dropped(reason)
+        if sent is not None:
+            sent["generation"] = self._token_generation
         headers = dict(spec.headers) if spec.headers else {}
+        headers[REQUEST_ID_HEADER] = spec.span.request_id
         if spec.idempotency_key:
             headers["X-Idempotency-Key"] = spec.idempotency_key
-        timeout = spec.timeout or self._timeout
-        # Le jeton courant est porté par la session (posé sous verrou). La session
-        # n'est lue/écrite que dans ce worker -> aucun accès concurrent.
+        if sent is not None and sent.get("cache_key") is not None:
+            headers.update(self._cache.conditional_headers(sent["cache_key"]))
+        # Timeout explicite de l'appelant, sinon déduit de la latence observée
+        # (avec un plancher plus large si la requête n'est pas rejouable).
+        timeout = spec.timeout or self._timeouts.timeout_for(spec.url,
+                                                             retryable=spec.idempotent)
+        data = spec.data
+        body = form_body(data) if spec.method == "POST" else None
+        wire_body = body
+        if sent is not None:
+            sent["compressed"] = False
+        if (body is not None and self._compress_requests and sent is not None
+                and base_url(spec.url) not in self._gzip_refused):
+            compressed = compress_body(body, self._compress_min_bytes)
+            if compressed is not None:
+                if isinstance(data, (dict, list, tuple)):
+                    headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+                headers["Content-Encoding"] = "gzip"
+                data = wire_body = compressed
+                sent["compressed"] = True
+        # Annulation en vol si le transport la permet (moteur asyncio).
+        extra = {}
+        if getattr(self._session, "supports_cancel", False):
+            extra["cancel_token"] = spec.cancel_token
+        # Le jeton courant est porté par la session. Ses en-têtes ne sont jamais
+        # modifiés en place (voir _set_token_header) : plusieurs workers peuvent
+        # envoyer en parallèle sans lire un dict en cours de modification.
         if spec.method == "GET":
-            return self._session.get(spec.url, headers=headers or None, timeout=timeout)
+            send = lambda: self._session.get(spec.url, headers=headers or None, timeout=timeout,
+                                             **extra)
         elif spec.method == "POST":
-            return self._session.post(spec.url, data=spec.data, headers=headers or None, timeout=timeout)
-        raise ValueError(f"Méthode HTTP non supportée: {spec.method}")
+            send = lambda: self._session.post(spec.url, data=data, headers=headers or None,
+                                              timeout=timeout, **extra)
+        else:
+            raise ValueError(f"Méthode HTTP non supportée: {spec.method}")
+        span = spec.span
+        span.mark("sent")
+        resp = self._timed(spec.url, send, len(body or b""), len(wire_body or b""))
+        span.mark("received")
+        span.connect_s = getattr(resp, "connect_s", None)
+        span.server_s = server_time_s(getattr(resp, "headers", None))
+        return resp
+
+    def _timed(self, url, send, request_bytes=0, request_wire_bytes=0):
+        """Exécute ``send()`` en alimentant l'estimation de latence du point
+        d'accès (durée de toute réponse HTTP ; recul sur timeout) et ses
+        compteurs d'octets (corps envoyé et reçu, avant/après compression)."""
+        self._bytes.record_request(url, request_bytes, request_wire_bytes)
+        start = time.monotonic()
+        try:
+            resp = send()
+        except Timeout:
+            self._timeouts.observe_timeout(url)
+            raise
+        finally:
+            self._last_activity = time.monotonic()
+        self._timeouts.observe(url, self._last_activity - start)
+        self._bytes.record_response(url, *response_sizes(resp))
+        return resp
+
+    def _reauth(self, sent_generation=None):
+        """Renouvellement du jeton déclenché par un 401 (dans le worker).
 
-    def _reauth(self):
-        """Renouvellement du jeton déclenché par un 401 (dans le worker)."""
+        ``sent_generation`` : génération du jeton présenté. Si un renouvellement
+        s'est terminé depuis, on rejoue avec son résultat sans nouveau POST."""
         logger.info("401 reçu -> renouvellement du jeton puis rejeu unique")
-        return self._do_token_fetch() is not None
+        self._observe_token_lifetime(sent_generation)
+        return self._do_token_fetch(sent_generation) is not None
+
+    def _observe_token_lifetime(self, sent_generation):
+        """Mémorise la durée de vie constatée du jeton courant (installation ->
+        premier 401) quand le serveur n'en annonce pas : elle sert à programmer
+        le renouvellement proactif des jetons suivants."""
+        installed_at = self._token_installed_at
+        if sent_generation != self._token_generation or installed_at is None:
+            return
+        lifetime = time.monotonic() - installed_at
+        if lifetime >= MIN_OBSERVED_TOKEN_TTL_S:
+            self._observed_token_ttl = lifetime
+            logger.info("Durée de vie du jeton constatée : %.0fs", lifetime)
+
+    def _set_token_header(self, token):
+        """Pose (ou retire si ``token`` est vide) l'en-tête du jeton en
+        copie-puis-remplacement : les requêtes déjà lancées gardent l'ancien
+        dict, les suivantes voient le nouveau."""
+        with self._session_lock:
+            headers = self._session.headers.copy()
+            if token:
+                headers["X-App-Token"] = token
+            else:
+                headers.pop("X-App-Token", None)
+            self._session.headers = headers
+
+    def _do_token_fetch(self, seen_generation=None):
+        """Obtient un jeton, un seul renouvellement à la fois (``_token_lock``).
 
-    def _do_token_fetch(self):
+        ``seen_generation`` : génération connue du demandeur. Si une obtention
+        s'est terminée depuis (le demandeur attendait le verrou pendant qu'un
+        autre renouvelait), son résultat est partagé : pas de second POST."""
+        with self._token_lock:
+            if seen_generation is not None and seen_generation != self._token_generation:
+                logger.debug("Jeton déjà renouvelé entre-temps : pas de nouvelle demande")
+                return self.current_token()
+            try:
+                return self._fetch_token_locked()
+            finally:
+                self._token_generation += 1
+
+    def _fetch_token_locked(self):
         """POST le secret applicatif pour obtenir un jeton, met à jour la session
-        et notifie le thread GUI. Retourne le jeton (str) ou None. Exécuté dans le
+        et notifie le thread GUI. Retourne le jeton (str) ou None. Exécuté dans un
         worker uniquement."""
         url = self._token_url_provider()
         secret = self._secret_provider()
+        if not self._circuits.breaker_for(url).allow():
+            logger.debug("Circuit ouvert -> obtention du jeton non tentée")
+            self.token_failed.emit()
+            return None
         try:
-            resp = self._session.post(url, data={"app_secret": secret}, timeout=self._timeout)
+            resp = self._timed(url, lambda: self._session.post(
+                url, data={"app_secret": secret}, timeout=self._timeouts.timeout_for(url)))
         except RequestException as e:
             logger.warning("Échec réseau lors de l'obtention du jeton : %s", e)
+            self._record_outcome(url, reachable=False)
             self.token_failed.emit()
             return None
+        self._record_outcome(url, reachable=True)
 
         if resp.status_code == 200:
             try:
-                token = resp.json().get("token")
+                payload = resp.json()
             except ValueError:
-                token = None
-            with self._session_lock:
-                if token:
-                    self._session.headers["X-App-Token"] = token
-                else:
-                    self._session.headers.pop("X-App-Token", None)
+                payload = None
+            token = payload.get("token") if isinstance(payload, dict) else None
+            self._set_token_header(token)
             if token:
+                self._token_installed_at = time.monotonic()
+                self._token_ttl = token_ttl_from_payload(payload)
+                self._schedule_refresh(self._token_ttl or self._observed_token_ttl)
                 self.token_refreshed.emit(token)
                 logger.debug("Jeton applicatif obtenu et installé")
                 return token
 
-        with self._session_lock:
-            self._session.headers.pop("X-App-Token", None)
+        self._cancel_refresh_timer()
+        self._set_token_header(None)
         logger.warning("Obtention du jeton refusée (statut %s)", resp.status_code)
         self.token_failed.emit()
         return None
+
+    # ------------------------------------------------------------------ #
+    # Renouvellement proactif (minuterie, hors worker)
+    # ------------------------------------------------------------------ #
+    def _schedule_refresh(self, ttl_s):
+        """Programme le renouvellement du jeton qui vient d'être installé, avant
+        son expiration. Sans durée de vie connue, rien n'est programmé (le 401
+        suivi d'un rejeu reste le filet de sécurité)."""
+        delay = proactive_refresh_delay(ttl_s)
+        with self._timer_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+            if delay is None or self._stopping:
+                return
+            timer = threading.Timer(delay, self._on_refresh_due)
+            timer.daemon = True
+            self._refresh_timer = timer
+            timer.start()
+        logger.debug("Renouvellement proactif du jeton dans %.0fs", delay)
+
+    def _cancel_refresh_timer(self):
+        with self._timer_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _on_refresh_due(self):
+        """Échéance de la minuterie : met un job de jeton en file de fond (sans
+        attendre). Regroupé avec toute autre demande de jeton en attente, et
+        ignoré si un renouvellement a eu lieu depuis (génération changée)."""
+        if self._stopping:
+            return
+        logger.info("Renouvellement proactif du jeton avant expiration")
+        job = _Job("token", lane=LANE_BACKGROUND)
+        job.token_generation = self._token_generation
+        self._submit_job(job)
+
+    # ------------------------------------------------------------------ #
+    # Disjoncteur : bilan des requêtes et sonde de fond (hors worker)
+    # ------------------------------------------------------------------ #
+    def _record_outcome(self, url, reachable):
+        breaker = self._circuits.breaker_for(url)
+        changed = breaker.record_success() if reachable else breaker.record_failure()
+        if changed:
+            self._on_circuit_transition(base_url(url), breaker)
+
+    def _on_circuit_transition(self, base, breaker):
+        state = breaker.state
+        if state == OPEN:
+            logger.warning("Serveur %s injoignable : requêtes suspendues, nouvel "
+                           "essai dans %.0fs", base, breaker.reset_timeout)
+            self._schedule_probe(base, breaker.reset_timeout)
+        else:
+            logger.info("Serveur %s de nouveau joignable", base)
+        self.circuit_changed.emit(base, state)
+
+    def _schedule_probe(self, base, delay):
+        with self._timer_lock:
+            if self._stopping:
+                return
+            previous = self._probe_timers.get(base)
+            if previous is not None:
+                previous.cancel()
+            timer = threading.Timer(delay, self._run_probe, args=(base,))
+            timer.daemon = True
+            self._probe_timers[base] = timer
+            timer.start()
+
+    def _cancel_probe_timers(self):
+        with self._timer_lock:
+            for timer in self._probe_timers.values():
+                timer.cancel()
+            self._probe_timers.clear()
+
+    def _run_probe(self, base):
+        """Sonde de demi-ouverture : une requête légère hors de la file, pour ne
+        pas retarder les jobs (qui échouent vite en attendant)."""
+        breaker = self._circuits.breaker_for(base)
+        if self._stopping or not breaker.try_begin_probe():
+            return
+        self.circuit_changed.emit(base, breaker.state)
+        try:
+            self._probe(base)
+            reachable = True
+        except RequestException as e:
+            logger.debug("Sonde %s : toujours injoignable (%s)", base, e)
+            reachable = False
+        except Exception:
+            logger.exception("Erreur inattendue de la sonde réseau")
+            reachable = False
+        self._record_outcome(base, reachable)
+
+    def _default_probe(self, base):
+        # Toute réponse HTTP (même 404) prouve que le serveur est joignable.
+        self._session.head(base, timeout=self._timeout, allow_redirects=False)
+
+    # ------------------------------------------------------------------ #
+    # Préchauffage, keep-alive et premier clic
+    # ------------------------------------------------------------------ #
+    def _warm(self, base, connections, counter):
+        """``connections`` HEAD simultanés vers ``base`` : chacun prend (ou
+        ouvre) sa propre connexion du pool, qui y reste ensuite disponible."""
+        with self._warm_lock:
+            if self._stopping:
+                return
+            if self._warm_pool_size < connections:
+                if self._warm_pool is not None:
+                    self._warm_pool.shutdown(wait=False)
+                self._warm_pool = ThreadPoolExecutor(max_workers=connections,
+                                                     thread_name_prefix="net-warm")
+                self._warm_pool_size = connections
+            pool = self._warm_pool
+        for _ in range(connections):
+            pool.submit(self._warm_one, base, counter)
+
+    def _warm_one(self, base, counter):
+        if self._stopping or not self._circuits.breaker_for(base).allow():
+            return
+        url = base + WARM_PATH
+        try:
+            self._session.head(url, timeout=self._timeouts.timeout_for(url),
+                               allow_redirects=False)
+            key = counter
+        except Exception as e:
+            # Le préchauffage n'est qu'une optimisation : son échec ne touche
+            # pas au disjoncteur (le trafic réel s'en charge).
+            logger.debug("Préchauffage de %s impossible : %s", base, e)
+            key = "failures"
+        with self._warm_lock:
+            self._warm_counts[key] += 1
+
+    def _schedule_keepalive(self):
+        with self._timer_lock:
+            if self._keepalive_timer is not None:
+                self._keepalive_timer.cancel()
+                self._keepalive_timer = None
+            if self._stopping or not self._warm_targets or not self._keepalive_interval:
+                return
+            timer = threading.Timer(self._keepalive_interval, self._on_keepalive_due)
+            timer.daemon = True
+            self._keepalive_timer = timer
+            timer.start()
+
+    def _cancel_keepalive_timer(self):
+        with self._timer_lock:
+            if self._keepalive_timer is not None:
+                self._keepalive_timer.cancel()
+                self._keepalive_timer = None
+
+    def _on_keepalive_due(self):
+        """Réseau inactif depuis un intervalle : HEAD sur chaque cible pour que
+        le serveur ne ferme pas les connexions. Avec du trafic récent, les
+        connexions sont déjà entretenues : rien à envoyer."""
+        if self._stopping:
+            return
+        if time.monotonic() - self._last_activity >= self._keepalive_interval:
+            with self._warm_lock:
+                targets = dict(self._warm_targets)
+            for base, connections in targets.items():
+                self._warm(base, connections, "keepalives")
+        self._schedule_keepalive()
+
+    def _take_first_click(self):
+        """True pour la première action utilisateur après le démarrage, un
+        préchauffage ou une période d'inactivité (sa latence est mesurée)."""
+        with self._warm_lock:
+            idle = time.monotonic() - self._last_activity
+            first = self._first_click_pending or (
+                bool(self._keepalive_interval) and idle >= self._keepalive_interval)
+            self._first_click_pending = False
+            return first
+
+    def _record_first_click(self, elapsed_s):
+        with self._warm_lock:
+            self._first_clicks.append(elapsed_s)
+        logger.debug("Latence du premier clic : %.3fs", elapsed_s)
+
+
+def _is_dropped_job(item):
+    return (isinstance(item, _Job) and item.kind == "request"
+            and item.spec.drop_reason() is not None)
+
+
+def _dropped_result(reason):
+    if reason == DROP_EXPIRED:
+        return NetResult.cancelled("échéance dépassée avant envoi", message=EXPIRED_MESSAGE)
+    return NetResult.cancelled("requête annulée avant envoi")
+
+
+def _resolve_future(future, result):
+    """Résout ``future`` avec ``result``, sauf s'il a été annulé ou déjà résolu."""
+    if future is None or future.done():
+        return
+    try:
+        if future.set_running_or_notify_cancel():
+            future.set_result(result)
+    except (RuntimeError, InvalidStateError):
+        pass  # annulé/résolu entre-temps par un autre thread
@@ -22,3 +22,10 @@ def coerce_counter_id(value):
     except (TypeError, ValueError):
         return None
     return cid if cid > 0 else None
+
+
+def counter_tag(counter_id):
+    """Étiquette réseau des actions d'un comptoir : elles sont annulées d'un
+    coup (``NetworkManager.cancel_tag``) quand on change de comptoir ou de
+    serveur. Normalisée pour que ``"1"`` et ``1`` désignent le même comptoir."""
+    return ("counter", coerce_counter_id(counter_id))
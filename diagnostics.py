@@ -0,0 +1,278 @@
+"""Diagnostic de performance du client (sans dépendance PySide, testable seul).
+
+Rassemble en un instantané ce qui permet au support de comprendre un comptoir
+lent sur place : file et latences du gestionnaire réseau, état du WebSocket
+(RTT, reconnexions, évènements/s), retard de la boucle d'évènements GUI,
+mémoire (RSS, ramasse-miettes ; objets Python recensés à la demande) et
+actions en cours (``TaskRegistry``). La page
+Qt (``diagnostics_dialog``) ne fait qu'afficher ``format_report`` et ne
+rafraîchit que lorsqu'elle est visible.
+"""
+
+import collections
+import gc
+import os
+import sys
+import threading
+import time
+
+from click_latency import percentile
+
+try:  # optionnel : mesure mémoire multiplateforme
+    import psutil
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    psutil = None
+
+DEFAULT_RATE_WINDOW_S = 10.0
+DEFAULT_LAG_WINDOW = 300
+TOP_OBJECT_TYPES = 8
+
+
+class RateMeter:
+    """Évènements par seconde sur une fenêtre glissante (partagé entre
+    threads)."""
+
+    def __init__(self, window_s=DEFAULT_RATE_WINDOW_S, clock=time.monotonic):
+        self._window_s = window_s
+        self._clock = clock
+        self._hits = collections.deque()
+        self._total = 0
+        self._last_at = None
+        self._lock = threading.Lock()
+
+    def _expire_locked(self, now):
+        while self._hits and now - self._hits[0] > self._window_s:
+            self._hits.popleft()
+
+    def hit(self):
+        now = self._clock()
+        with self._lock:
+            self._hits.append(now)
+            self._total += 1
+            self._last_at = now
+            self._expire_locked(now)
+
+    def snapshot(self):
+        """``{total, per_s, last_age_s}`` (``last_age_s`` : None sans évènement)."""
+        now = self._clock()
+        with self._lock:
+            self._expire_locked(now)
+            recent = len(self._hits)
+            total = self._total
+            last_at = self._last_at
+        return {
+            "total": total,
+            "per_s": recent / self._window_s,
+            "last_age_s": None if last_at is None else max(0.0, now - last_at),
+        }
+
+
+class LoopLagProbe:
+    """Retard de la boucle d'évènements : appelé par un minuteur de période
+    ``interval_s``, ``tick()`` mesure de combien le réveil a été en retard (le
+    thread GUI était occupé ailleurs)."""
+
+    def __init__(self, interval_s, window=DEFAULT_LAG_WINDOW, clock=time.monotonic):
+        self.interval_s = interval_s
+        self._clock = clock
+        self._lags = collections.deque(maxlen=max(1, window))
+        self._last = None
+
+    def reset(self):
+        """À appeler au (re)démarrage du minuteur : la pause précédente n'est
+        pas un retard."""
+        self._last = None
+
+    def tick(self):
+        now = self._clock()
+        lag = None
+        if self._last is not None:
+            lag = max(0.0, now - self._last - self.interval_s)
+            self._lags.append(lag)
+        self._last = now
+        return lag
+
+    def snapshot(self):
+        """``{samples, last_s, p95_s, max_s}``."""
+        lags = list(self._lags)
+        ordered = sorted(lags)
+        return {
+            "samples": len(lags),
+            "last_s": lags[-1] if lags else None,
+            "p95_s": percentile(ordered, 95),
+            "max_s": ordered[-1] if ordered else None,
+        }
+
+
+def process_rss_bytes():
+    """Mémoire résidente du processus (octets), ou None si indisponible."""
+    if psutil is not None:
+        try:
+            return psutil.Process().memory_info().rss
+        except Exception:
+            pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        return _windows_rss_bytes()
+    return None
+
+
+def _windows_rss_bytes():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t),
+                        ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters),
+                                                    counters.cb):
+            return counters.WorkingSetSize
+    except Exception:
+        pass
+    return None
+
+
+def gc_counters():
+    """Compteurs du ramasse-miettes, sans parcourir le tas (assez bon marché
+    pour chaque rafraîchissement) : ``{gc_counts, collections}`` (allocations
+    en attente et collectes effectuées, par génération)."""
+    return {"gc_counts": list(gc.get_count()),
+            "collections": [stats["collections"] for stats in gc.get_stats()]}
+
+
+def object_census(top=TOP_OBJECT_TYPES):
+    """Recensement des objets suivis : ``{total, top}`` (``top`` : les types
+    les plus nombreux). Parcourt tout le tas : à la demande seulement."""
+    objects = gc.get_objects()
+    counter = collections.Counter(type(o).__name__ for o in objects)
+    census = {"total": len(objects), "top": counter.most_common(top)}
+    del objects
+    return census
+
+
+def collect_diagnostics(network_manager=None, ws_client=None, tasks=None,
+                        click_latency=None, loop_lag=None, census=None):
+    """Instantané du diagnostic. Chaque source est optionnelle (écran de
+    connexion, WebSocket pas encore démarré...) : la section vaut alors None.
+    ``census`` : dernier ``object_census`` demandé, repris tel quel."""
+    network = None
+    if network_manager is not None:
+        network = {
+            "workers": network_manager.worker_count,
+            "lanes": network_manager.lane_stats(),
+            "latency": network_manager.latency_histograms(),
+            "circuits": network_manager.circuit_states(),
+        }
+    stats = getattr(ws_client, "stats", None)
+    return {
+        "network": network,
+        "websocket": stats() if callable(stats) else None,
+        "gui": {"loop_lag": loop_lag.snapshot()} if loop_lag is not None else None,
+        "click_latency": click_latency.summary() if click_latency is not None else None,
+        "process": {"rss_bytes": process_rss_bytes(),
+                    "objects": dict(gc_counters(), census=census)},
+        "tasks": sorted(str(k) for k in tasks.active_keys()) if tasks is not None else None,
+        "task_count": len(tasks) if tasks is not None else None,
+    }
+
+
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:.0f} ms"
+
+
+def format_histogram(histogram):
+    """Histogramme compact : ``≤50ms:3 ≤100ms:1 … >10s:0``."""
+    def label(bound):
+        return f"{bound * 1000:.0f}ms" if bound < 1 else f"{bound:g}s"
+
+    parts = [f"≤{label(b)}:{n}" for b, n in zip(histogram["bounds"], histogram["counts"])]
+    parts.append(f">{label(histogram['bounds'][-1])}:{histogram['counts'][-1]}")
+    return " ".join(parts)
+
+
+def format_report(snapshot):
+    """Texte lisible de l'instantané (affiché tel quel, copiable pour le
+    support)."""
+    lines = []
+    network = snapshot.get("network")
+    lines.append("== Réseau ==")
+    if network is None:
+        lines.append("  indisponible")
+    else:
+        lines.append(f"  workers : {network['workers']}")
+        for lane, stats in sorted(network["lanes"].items()):
+            lines.append(f"  file {lane} : profondeur {stats.get('depth', 0)}, "
+                         f"attente moy. {_ms(stats.get('avg_wait_s'))}, "
+                         f"max {_ms(stats.get('max_wait_s'))}")
+        for lane, histogram in sorted(network["latency"].items()):
+            mean = histogram["sum_s"] / histogram["count"] if histogram["count"] else None
+            lines.append(f"  latence {lane} (n={histogram['count']}, moy. {_ms(mean)}) : "
+                         f"{format_histogram(histogram)}")
+        opened = [url for url, state in network["circuits"].items() if state != "closed"]
+        if opened:
+            lines.append(f"  disjoncteurs ouverts : {', '.join(sorted(opened))}")
+
+    ws = snapshot.get("websocket")
+    lines.append("== WebSocket ==")
+    if ws is None:
+        lines.append("  indisponible")
+    else:
+        age = ws.get("last_event_age_s")
+        lines.append(f"  connecté : {'oui' if ws.get('connected') else 'non'}, "
+                     f"reconnexions : {ws.get('reconnects', 0)}, RTT : {_ms(ws.get('rtt_s'))}")
+        lines.append(f"  évènements : {ws.get('events', 0)} ({ws.get('events_per_s', 0.0):.2f}/s), "
+                     f"dernier il y a {'-' if age is None else f'{age:.1f} s'}, "
+                     f"files regroupées (écartées) : {ws.get('coalesced_dropped', 0)}, "
+                     f"liens muets reconnectés : {ws.get('dead_links', 0)}")
+
+    gui = snapshot.get("gui")
+    lines.append("== Interface ==")
+    if gui is not None:
+        lag = gui["loop_lag"]
+        lines.append(f"  retard de la boucle : dernier {_ms(lag['last_s'])}, "
+                     f"p95 {_ms(lag['p95_s'])}, max {_ms(lag['max_s'])}")
+    for action, stats in (snapshot.get("click_latency") or {}).items():
+        lines.append(f"  clic -> écran {action} (n={stats['count']}) : "
+                     f"p50 {_ms(stats['p50_s'])}, p95 {_ms(stats['p95_s'])}, "
+                     f"p99 {_ms(stats['p99_s'])}")
+
+    process = snapshot.get("process") or {}
+    lines.append("== Processus ==")
+    rss = process.get("rss_bytes")
+    lines.append(f"  RSS : {'-' if rss is None else f'{rss / (1024 * 1024):.1f} Mo'}")
+    objects = process.get("objects")
+    if objects is not None:
+        lines.append(f"  ramasse-miettes : en attente {objects['gc_counts']}, "
+                     f"collectes {objects['collections']}")
+        census = objects.get("census")
+        if census is None:
+            lines.append("  objets Python : non recensés")
+        else:
+            lines.append(f"  objets Python : {census['total']}")
+            if census.get("top"):
+                lines.append("  " + ", ".join(f"{name} {n}" for name, n in census["top"]))
+
+    lines.append("== Tâches en cours ==")
+    tasks = snapshot.get("tasks")
+    if tasks is None:
+        lines.append("  indisponible")
+    else:
+        lines.append(f"  {snapshot.get('task_count', 0)} tâche(s) ; actions : "
+                     f"{', '.join(tasks) if tasks else 'aucune'}")
+    return "\n".join(lines)
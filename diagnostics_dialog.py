@@ -0,0 +1,90 @@
+"""Page « Diagnostics » : santé du client en direct (voir ``diagnostics``).
+
+Fenêtre non modale ouverte depuis les Préférences ou la fenêtre de log. Ses
+minuteurs (rafraîchissement et sonde de retard de la boucle GUI) ne tournent
+que pendant qu'elle est visible : fermée, elle ne coûte rien. Le recensement
+des objets Python parcourt tout le tas dans le thread GUI : il n'est fait que
+sur demande (bouton « Recenser les objets »).
+"""
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFontDatabase, QGuiApplication
+from PySide6.QtWidgets import QDialog, QHBoxLayout, QPlainTextEdit, QPushButton, QVBoxLayout
+
+from diagnostics import LoopLagProbe, collect_diagnostics, format_report, object_census
+
+REFRESH_INTERVAL_MS = 1000
+LAG_PROBE_INTERVAL_MS = 100
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, main_window, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.resize(640, 480)
+        self._main_window = main_window
+        self._census = None
+
+        self.report = QPlainTextEdit(self)
+        self.report.setReadOnly(True)
+        self.report.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.census_button = QPushButton("Recenser les objets", self)
+        self.census_button.clicked.connect(self.take_census)
+        self.copy_button = QPushButton("Copier", self)
+        self.copy_button.clicked.connect(self.copy_report)
+        self.close_button = QPushButton("Fermer", self)
+        self.close_button.clicked.connect(self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.census_button)
+        buttons.addStretch()
+        buttons.addWidget(self.copy_button)
+        buttons.addWidget(self.close_button)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.report)
+        layout.addLayout(buttons)
+
+        self.loop_lag = LoopLagProbe(LAG_PROBE_INTERVAL_MS / 1000.0)
+        self.lag_timer = QTimer(self)
+        self.lag_timer.setTimerType(Qt.PreciseTimer)
+        self.lag_timer.setInterval(LAG_PROBE_INTERVAL_MS)
+        self.lag_timer.timeout.connect(self.loop_lag.tick)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.loop_lag.reset()
+        self.lag_timer.start()
+        self.refresh_timer.start()
+        self.refresh()
+
+    def hideEvent(self, event):
+        self.lag_timer.stop()
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def snapshot(self):
+        window = self._main_window
+        return collect_diagnostics(
+            network_manager=getattr(window, "network_manager", None),
+            ws_client=getattr(window, "socket_io_client", None),
+            tasks=getattr(window, "_tasks", None),
+            click_latency=getattr(window, "click_latency", None),
+            loop_lag=self.loop_lag,
+            census=self._census,
+        )
+
+    def take_census(self):
+        self._census = object_census()
+        self.refresh()
+
+    def refresh(self):
+        # Position de défilement conservée : le texte est remplacé à chaque tick.
+        scroll = self.report.verticalScrollBar().value()
+        self.report.setPlainText(format_report(self.snapshot()))
+        self.report.verticalScrollBar().setValue(scroll)
+
+    def copy_report(self):
+        QGuiApplication.clipboard().setText(self.report.toPlainText())
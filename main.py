@@ -2,25 +2,46 @@ import sys
 import os
 import time
 import uuid
+import functools
 import threading
+from collections.abc import Mapping
 import keyboard
 from PySide6.QtWidgets import QApplication, QMainWindow, QSystemTrayIcon, QMenu, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QWidget, QCheckBox, QSizePolicy, QPlainTextEdit, QDockWidget, QBoxLayout, QFrame, QListView, QAbstractItemView, QDialog
-from PySide6.QtCore import QUrl, Signal, Slot, QSettings, QTimer, QThread, Qt, QCoreApplication, QFile, QTextStream, QObject, QDateTime
+from PySide6.QtCore import QUrl, Signal, Slot, QSettings, QTimer, QThread, Qt, QCoreApplication, QFile, QTextStream, QObject, QDateTime, QEvent
 from PySide6.QtGui import QIcon, QAction, QPainter, QGuiApplication, QShortcut, QKeySequence, QColor
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtSvg import QSvgRenderer
 
 from websocket_client import WebSocketClient
+from ws_events import PatchConflict, apply_patch_ops, normalize_patients
+from ws_heartbeat import format_link_health
 from preferences import PreferencesDialog
+from diagnostics_dialog import DiagnosticsDialog
 from buttons import DebounceButton, IconeButton
 from patient_list_model import PatientListModel
 from notification import CustomNotification, NotificationManager
 from connections import NetworkManager
-from my_logger import AppLogger, register_secret
-from secret_store import load_secret
+from net_result import NetResult
+from net_scheduler import LANE_INTERACTIVE
+from net_transport import make_transport
+from offline_journal import OFFLINE_JOURNAL_FILENAME, OfflineJournal, stale_reason
+from my_logger import AppLogger, default_log_dir, register_secret
+from secret_store import clear_token, load_secret, load_token, save_token, token_scope
 from task_registry import TaskRegistry
-from resync_coordinator import ResyncCoordinator, snapshot_is_fresh
-from counter_id_utils import coerce_counter_id
+from click_latency import ClickLatencyTracker
+from stall_watchdog import StallWatchdog, setup_stall_logger
+from metrics import (
+    MetricsExporter, MetricsRegistry, MetricsServer, collect_click_latency, collect_network,
+    collect_notifications, collect_patient_list, collect_websocket,
+)
+from resync_coordinator import (
+    CHANGES_UNSUPPORTED_STATUSES,
+    ResyncCoordinator,
+    StateDelta,
+    decode_changes,
+    snapshot_is_fresh,
+)
+from counter_id_utils import coerce_counter_id, counter_tag
 from shortcut_defaults import default_shortcut, migrate_shortcut
 from preferences_diff import needs_service_reconnect
 from window_geometry import resolve_target_geometry
@@ -44,6 +65,19 @@ import logging
 # n'ont pas de self.logger (ex. AudioPlayer).
 logger = logging.getLogger("appcomptoir.main")
 
+# Clé d'ordre réseau des actions sur la file du comptoir (suivant, valider,
+# pause, remise en attente, connexion staff...) : jamais deux en vol à la fois,
+# toujours dans l'ordre des clics, même avec plusieurs workers réseau.
+ORDER_COUNTER = "counter"
+
+# Clé d'ordre des écritures du jeton mémorisé (trousseau) : un effacement puis
+# un enregistrement s'appliquent dans l'ordre où ils ont été demandés.
+ORDER_TOKEN_STORE = "token_store"
+
+# Une action qui n'a pas pu partir dans ce délai (file bloquée, serveur lent)
+# est abandonnée plutôt qu'envoyée en retard : l'utilisateur est passé à autre chose.
+ACTION_DEADLINE_S = 30
+
 # from line_profiler import profile
 def profile(func):
     return func
@@ -121,6 +155,16 @@ class LoadingScreen(QWidget):
         layout.addWidget(self.progress)
         self.setLayout(layout)
 
+        # Accès à la page « Diagnostics » (mode debug, voir enable_diagnostics).
+        self.diagnostics_button = QPushButton("Diagnostics")
+        self.diagnostics_button.hide()
+        layout.addWidget(self.diagnostics_button)
+
+    def enable_diagnostics(self, callback):
+        """Affiche le bouton « Diagnostics » (fenêtre de log gardée ouverte)."""
+        self.diagnostics_button.clicked.connect(callback)
+        self.diagnostics_button.show()
+
     def update_progress(self, message):
         """Met à jour l'affichage des logs dans l'interface"""
         self.progress.appendPlainText(message)
@@ -133,6 +177,21 @@ class LoadingScreen(QWidget):
             self.logger.removeHandler(self.ui_handler)
         super().closeEvent(event)
 
+class LoopPinger(QObject):
+    """ Relais du chien de garde des gels (stall_watchdog) : ``ping`` est émis
+    depuis son thread, le rappel s'exécute dans le thread GUI (connexion mise en
+    file) — il n'y est donc exécuté que si la boucle d'évènements tourne. """
+    ping = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ping.connect(self._run)
+
+    @Slot(object)
+    def _run(self, callback):
+        callback()
+
+
 class StartupWorker(QThread):
     """ Exécute en arrière-plan la séquence réseau de démarrage (token + état
     initial) pour ne pas geler le thread GUI pendant que le serveur répond. """
@@ -143,53 +202,19 @@ class StartupWorker(QThread):
         self.main_window = main_window
 
     def run(self):
-        mw = self.main_window
-        connected = False
-        state = None
-
-        try:
-            mw.get_app_token()
-            # si on a un token, on se considère comme connecté
-            connected = True
-        except Exception as e:
-            logger.error("Erreur lors de l'obtention du token : %s", e)
-            connected = False
-
-        if connected:
-            # Une seule snapshot atomique (patient en cours + liste + réglages +
-            # révision) au lieu de deux requêtes séparées qui pouvaient se
-            # chevaucher avant l'ouverture de Socket.IO (course de démarrage).
-            state = mw.init_state()
-
+        connected, state = self.main_window.run_startup_sequence()
         self.finished_startup.emit(connected, state)
 
 
-class ResyncWorker(QThread):
-    """ Récupère en arrière-plan l'état courant (patient en cours + liste des
-    patients) après une reconnexion WebSocket.
-
-    SocketIO ne rejoue pas les évènements manqués pendant une coupure : sans
-    ça, un comptoir qui perd la connexion quelques secondes/minutes reste
-    figé sur son dernier état connu jusqu'au prochain évènement poussé, qui
-    peut ne jamais arriver si rien d'autre ne change côté serveur entretemps.
-    """
-    finished_resync = Signal(object)  # state (dict ou None)
-
-    def __init__(self, main_window):
-        super().__init__()
-        self.main_window = main_window
-
-    def run(self):
-        mw = self.main_window
-        # Même snapshot atomique qu'au démarrage : on récupère l'état autoritatif
-        # complet (dont la révision) en une requête.
-        state = mw.init_state()
-        self.finished_resync.emit(state)
-
-
 class MainWindow(QMainWindow):
 
     patient_data_received = Signal(object)
+    # Snapshot ``/state`` d'une resync (dict ou None), émis depuis un worker
+    # réseau (rappel du futur) et reçu dans le thread GUI.
+    resync_state_ready = Signal(object)
+    # Serveur sans rattrapage incrémental (/changes), constaté par un worker
+    # réseau : le drapeau changes_supported n'est modifié que dans le thread GUI.
+    changes_unsupported = Signal()
 
     # Signal de raccourci clavier (point 27). Les callbacks de la bibliothèque
     # `keyboard` (mode global) s'exécutent HORS du thread graphique : ils se
@@ -226,6 +251,13 @@ class MainWindow(QMainWindow):
     # révision est <= à celle-ci (périmés/dupliqués) et on recharge l'état
     # autoritatif si on détecte un trou. -1 = aucun état chargé pour l'instant.
     queue_revision = -1
+    # Révision de la file réellement affichée (list_patients). Diffère de
+    # queue_revision après un trou (qui avance queue_revision sans appliquer
+    # la file) : c'est la base du rattrapage incrémental (/changes?since=).
+    list_revision = -1
+    # Le serveur connaît-il /changes ? Faux après un 404/405/501 : on ne
+    # redemande alors plus que /state.
+    changes_supported = True
 
     def __init__(self):
         super().__init__()
@@ -268,6 +300,10 @@ class MainWindow(QMainWindow):
         # LOAD PREFERENCES
         self.load_preferences()
 
+        # Chien de garde des gels de l'UI (préférence stall_threshold_ms) : pile
+        # du thread GUI écrite dans stalls.log quand la boucle ne répond plus.
+        self._start_stall_watchdog()
+
         # on créé un timer qui permet d'alerter si le patient reste en Calling
         self.create_call_timer()
 
@@ -284,17 +320,29 @@ class MainWindow(QMainWindow):
         self.app_token = None
         self.connected = False
 
-        # Gestionnaire réseau centralisé : un unique worker possède la seule
-        # requests.Session (plus d'accès concurrent depuis plusieurs threads),
-        # et centralise jeton, timeout, format d'erreur, renouvellement sur 401
+        # Gestionnaire réseau centralisé : il possède le seul transport HTTP
+        # (préférence network_engine : requests par défaut, ou asyncio) et centralise jeton, timeout, format d'erreur, renouvellement sur 401
         # et idempotence. Les providers lisent web_url/app_secret à la volée
-        # (rechargés dans load_preferences).
+        # (rechargés dans load_preferences). Les actions utilisateur (_submit)
+        # passent dans la voie interactive, devant le trafic de fond
+        # (request_blocking : démarrage, resync). Avec plusieurs workers
+        # (préférence network_workers), les actions de même order_key restent
+        # sérialisées (voir _submit).
         self.network_manager = NetworkManager(
             token_url_provider=lambda: f"{self.web_url}/api/get_app_token",
             secret_provider=lambda: self.app_secret,
+            workers=self.network_workers,
+            # Pool assez grand pour les connexions préchauffées (préférence
+            # prewarm_connections) en plus des workers.
+            transport=make_transport(self.network_engine,
+                                     max(self.network_workers, self.prewarm_connections)),
+            compress_requests=self.compress_requests,
         )
         self.network_manager.token_refreshed.connect(self._on_token_refreshed)
         self.network_manager.token_failed.connect(self._on_token_failed)
+        self.network_manager.circuit_changed.connect(self._on_circuit_changed)
+        self.resync_state_ready.connect(self._on_resync_ready)
+        self.changes_unsupported.connect(self._on_changes_unsupported)
 
         # Registre des tâches réseau actives. Conserve une référence forte à
         # chaque RequestHandle/worker tant qu'il n'est pas terminé, pour ne plus
@@ -304,9 +352,18 @@ class MainWindow(QMainWindow):
         # première est en cours.
         self._tasks = TaskRegistry()
 
+        # Latence ressentie des actions comptoir : de l'appui (bouton ou
+        # raccourci) à l'affichage de la réponse. Percentiles en mémoire,
+        # résumé journalisé à la fermeture.
+        self.click_latency = ClickLatencyTracker()
+
+        # Métriques (metrics.py) : export périodique sur disque et, en option,
+        # serveur local /metrics (préférences metrics_export_interval/metrics_port).
+        self._start_metrics()
+
         # Coalescing des resynchronisations : une seule resync réseau active à la
         # fois ; les demandes reçues pendant une resync sont fusionnées en une
-        # seule relance (pas de rafale de ResyncWorker).
+        # seule relance (pas de rafale de requêtes /state).
         self._resync = ResyncCoordinator()
 
         # Sérialisation de l'(ré)installation des raccourcis (point 7) : un verrou
@@ -328,9 +385,59 @@ class MainWindow(QMainWindow):
         # dans _on_startup_ready() une fois le résultat disponible.
         self._start_startup_sequence()
 
+    def _start_stall_watchdog(self):
+        self.stall_watchdog = None
+        if self.stall_threshold_ms <= 0:
+            return
+        self._loop_pinger = LoopPinger(self)
+        self.stall_watchdog = StallWatchdog(self._loop_pinger.ping.emit,
+                                            threshold_s=self.stall_threshold_ms / 1000.0,
+                                            stall_logger=setup_stall_logger())
+        self.stall_watchdog.start()
+
+    def _start_metrics(self):
+        """ Crée le registre de métriques, ses collecteurs (composants relus à
+        chaque export : liste, notifications et WebSocket peuvent être créés ou
+        remplacés plus tard) et démarre export et serveur selon les préférences. """
+        self.metrics = MetricsRegistry()
+        self.metrics.add_collector(lambda r: collect_network(r, self.network_manager))
+        self.metrics.add_collector(
+            lambda r: collect_websocket(r, getattr(self, "socket_io_client", None)))
+        self.metrics.add_collector(
+            lambda r: collect_patient_list(r, getattr(self, "patient_model", None)))
+        self.metrics.add_collector(
+            lambda r: collect_notifications(r, getattr(self, "notification_manager", None)))
+        self.metrics.add_collector(lambda r: collect_click_latency(r, self.click_latency))
+        self.metrics.add_collector(lambda r: r.gauge("counter_info", "Comptoir de ce client").set(
+            1, counter_id=getattr(self, "counter_id", None)))
+        self.metrics.add_collector(self._collect_stall_metrics)
+
+        self._metrics_exporter = None
+        self._metrics_server = None
+        if self.metrics_export_interval > 0:
+            self._metrics_exporter = MetricsExporter(self.metrics, default_log_dir(),
+                                                     interval_s=self.metrics_export_interval)
+            self._metrics_exporter.start()
+        if self.metrics_port > 0:
+            self._metrics_server = MetricsServer(self.metrics, self.metrics_port)
+            self._metrics_server.start()
+
+    def _collect_stall_metrics(self, registry):
+        watchdog = getattr(self, "stall_watchdog", None)
+        if watchdog is None:
+            return
+        stats = watchdog.stats()
+        registry.counter("gui_stalls_total", "Gels de la boucle GUI au-delà du seuil").set(
+            stats["stalls"])
+        registry.gauge("gui_stall_longest_seconds", "Plus long gel de la boucle GUI").set(
+            stats["longest_s"])
+
     def _start_startup_sequence(self):
         """ (Re)lance la séquence réseau de démarrage en arrière-plan. Rappelée
         après (re)configuration d'un comptoir valide. """
+        # Connexions ouvertes pendant que le worker obtient jeton et état : le
+        # premier clic ne paie pas l'établissement de la connexion.
+        self.network_manager.prewarm(self.web_url, self.prewarm_connections)
         worker = StartupWorker(self)
         worker.finished_startup.connect(self._on_startup_ready)
         self._track_worker(worker)
@@ -361,6 +468,11 @@ class MainWindow(QMainWindow):
 
         self.setup_ui()
 
+        # Actions mémorisées hors ligne lors d'une session précédente : rejouées
+        # une fois l'état du serveur connu.
+        if connected and state and self._offline_journal_active() is not None:
+            self._replay_offline_journal()
+
         self.init_audio()
 
         self.setup_user()
@@ -383,6 +495,8 @@ class MainWindow(QMainWindow):
 
         if not self.debug_window:
             self.loading_screen.close()
+        else:
+            self.loading_screen.enable_diagnostics(lambda: self.show_diagnostics())
 
     def _require_valid_counter_id(self):
         """ Ouvre l'écran de configuration tant qu'aucun comptoir valide n'est
@@ -431,6 +545,21 @@ class MainWindow(QMainWindow):
         # URL / notification patient courant / délai après appel).
         settings_schema.migrate_settings(settings)
         self.web_url = settings_schema.read(settings, "web_url")
+        # Lu ici mais appliqué seulement à la création du gestionnaire réseau
+        # (au démarrage) : un changement demande un redémarrage.
+        self.network_workers = settings_schema.read(settings, "network_workers")
+        self.network_engine = settings_schema.read(settings, "network_engine")
+        self.prewarm_connections = settings_schema.read(settings, "prewarm_connections")
+        self.compress_requests = settings_schema.read(settings, "compress_requests")
+        # Seuil du chien de garde des gels (lu au démarrage ; 0 = désactivé).
+        self.stall_threshold_ms = settings_schema.read(settings, "stall_threshold_ms")
+        # Export des métriques : lus au démarrage seulement.
+        self.metrics_export_interval = settings_schema.read(settings, "metrics_export_interval")
+        self.metrics_port = settings_schema.read(settings, "metrics_port")
+        # Mode hors ligne (journal ouvert à la première utilisation).
+        self.offline_journal_enabled = settings_schema.read(settings, "offline_journal")
+        self.ws_coalesce_window_ms = settings_schema.read(settings, "ws_coalesce_window_ms")
+        self.ws_dead_link_timeout_s = settings_schema.read(settings, "ws_dead_link_timeout_s")
         # Le secret applicatif est lu depuis le magasin sécurisé (keyring /
         # Gestionnaire d'identifiants Windows), avec migration automatique de
         # l'ancienne valeur en clair éventuellement présente dans QSettings.
@@ -689,12 +818,12 @@ class MainWindow(QMainWindow):
         self.main_button_layout = QHBoxLayout() if self.horizontal_mode else QVBoxLayout()
 
         buttons_config = [
-            ("btn_next", "Suivant", self.next_patient_shortcut, self.call_web_function_validate_and_call_next),
-            ("btn_validate", "Valider", self.validate_patient_shortcut, self.call_web_function_validate),
-            ("btn_pause", "Pause", self.pause_shortcut, self.call_web_function_pause)
+            ("btn_next", "next", "Suivant", self.next_patient_shortcut, self.call_web_function_validate_and_call_next),
+            ("btn_validate", "validate", "Valider", self.validate_patient_shortcut, self.call_web_function_validate),
+            ("btn_pause", "pause", "Pause", self.pause_shortcut, self.call_web_function_pause)
         ]
 
-        for attr_name, text, shortcut, callback in buttons_config:
+        for attr_name, action, text, shortcut, callback in buttons_config:
             base_label = f"{text}\n{shortcut}"
             button = DebounceButton(base_label)
             # Nom accessible = action (sans le raccourci), infobulle explicite :
@@ -704,6 +833,8 @@ class MainWindow(QMainWindow):
             # Libellé de base mémorisé : permet de restaurer le texte après un
             # marquage d'alerte (bouton Valider) sans reconstruire le bouton.
             button._base_label = base_label
+            # Début de la mesure clic -> écran, branché AVANT l'action.
+            button.clicked.connect(lambda _checked=False, a=action: self.click_latency.press(a))
             button.clicked.connect(callback)
             setattr(self, attr_name, button)  # Stocke le bouton comme attribut de la classe
             self.main_button_layout.addWidget(button)
@@ -762,7 +893,7 @@ class MainWindow(QMainWindow):
         self.icone_widget.setLayout(self.icone_layout)       
 
 
-    def _create_icon_button(self, icon_path, icon_inactive_path, flask_url, tooltip_text, tooltip_inactive_text, state, is_always_visible=True, accessible_name=None):
+    def _create_icon_button(self, icon_path, icon_inactive_path, flask_url, tooltip_text, tooltip_inactive_text, state, is_always_visible=True, accessible_name=None, offline_action=None):
         return IconeButton(
             icon_path=resource_path(icon_path),
             icon_inactive_path=resource_path(icon_inactive_path),
@@ -773,6 +904,7 @@ class MainWindow(QMainWindow):
             parent=self,
             is_always_visible=is_always_visible,
             accessible_name=accessible_name,
+            offline_action=offline_action,
         )
 
     def _create_auto_calling_button(self):
@@ -797,7 +929,8 @@ class MainWindow(QMainWindow):
             "Indiquer qu'il faut changer le papier",
             self.add_paper,
             is_always_visible=False,
-            accessible_name="État du papier de l'imprimante")
+            accessible_name="État du papier de l'imprimante",
+            offline_action="paper")
         
     def trigger_paper_button(self):
         if hasattr(self, 'btn_paper'):
@@ -821,7 +954,8 @@ class MainWindow(QMainWindow):
         # donc le rejeu interne après 401 réutilise bien la même valeur.
         headers = {'X-Idempotency-Key': str(uuid.uuid4())}
         self._submit(url, method='POST', headers=headers, on_result=self.handle_result,
-                     key="validate_and_call_next", busy_button=self.btn_next)
+                     key="validate_and_call_next", busy_button=self.btn_next,
+                     latency_action="next")
         self.update_my_buttons(self.my_patient)
         self.close_please_validate_notification()
 
@@ -838,9 +972,11 @@ class MainWindow(QMainWindow):
         self.close_please_validate_notification()
         if self.my_patient:
             self._submit(url, method='POST', on_result=self.handle_result,
-                         key="validate", busy_button=self.btn_validate)
+                         key="validate", busy_button=self.btn_validate,
+                         offline_action="validate", latency_action="validate")
         # permet de supprimer le Validate en rouge et l'alerte en si le bouton "Valider" est resté enclenché mais qu'il n'y a plus de patient
         else:
+            self.click_latency.cancel("validate")
             self.update_my_buttons(self.my_patient)
 
     def close_please_validate_notification(self):
@@ -854,7 +990,8 @@ class MainWindow(QMainWindow):
         self.logger.debug("Mise en pause du patient")
         url = f'{self.web_url}/pause_patient/{self.counter_id}/{self.patient_id}'
         self._submit(url, method='POST', on_result=self.handle_result,
-                     key="pause", busy_button=self.btn_pause)
+                     key="pause", busy_button=self.btn_pause, offline_action="pause",
+                     latency_action="pause")
 
     @profile
     def _create_choose_patient_button(self):
@@ -1205,7 +1342,7 @@ class MainWindow(QMainWindow):
         if not index.isValid():
             return
         patient = index.data(PatientListModel.PatientRole)
-        if not isinstance(patient, dict):
+        if not isinstance(patient, Mapping):
             return
         patient_id = patient.get("id")
         if patient_id is None:
@@ -1274,26 +1411,40 @@ class MainWindow(QMainWindow):
 
     def recall(self):
         url = f"{self.web_url}/app/counter/relaunch_patient_call/{self.counter_id}"
-        self._submit(url, method='POST', key="recall")
+        self.click_latency.press("recall")
+        self._submit(url, method='POST', key="recall", order_key="recall",
+                     offline_action="recall", latency_action="recall")
 
     def setup_user(self):
         """ Va chercher le staff sur le comptoir """
         self.logger.info("Paramétrage de l'utilisateur...")
         url = f'{self.web_url}/api/counter/is_staff_on_counter/{self.counter_id}'
-        self._submit(url, method='GET', on_result=self.handle_user_result, key="setup_user")
+        self._submit(url, method='GET', on_result=self.handle_user_result, key="setup_user",
+                     order_key="staff_lookup")
 
     def _notify_network_error(self, result):
         """ Affiche un message utilisateur court (distinct selon le statut :
         401/403/409-423/5xx/timeout) et journalise le détail technique. Le détail
-        n'est jamais montré à l'utilisateur. """
+        n'est jamais montré à l'utilisateur. Une action annulée (changement de
+        comptoir) reste silencieuse ; une action abandonnée faute d'avoir pu
+        partir à temps est signalée. """
+        if result.is_cancelled:
+            self.logger.debug("Action non envoyée : %s", result.detail)
+            if result.message and getattr(self, "notification_connection", True):
+                self.show_notification({"origin": "connection", "message": result.message},
+                                       internal=True)
+            return
         if result.message and getattr(self, "notification_connection", True):
             self.show_notification({"origin": "connection", "message": result.message}, internal=True)
         if result.detail:
-            self.logger.warning("Erreur réseau (statut=%s) : %s", result.status, result.detail)
+            self.logger.warning("Erreur réseau (statut=%s, %s tentative(s), requête %s) : %s",
+                                result.status, getattr(result, "attempts", 1),
+                                getattr(result, "request_id", None), result.detail)
 
     @Slot(object)
     def handle_result(self, result):
-        self.logger.debug("Réponse action patient (statut=%s)", result.status)
+        self.logger.debug("Réponse action patient (statut=%s, requête %s)", result.status,
+                          getattr(result, "request_id", None))
         status = result.status
         if status == 200:
             data = result.data
@@ -1361,7 +1512,8 @@ class MainWindow(QMainWindow):
     def start_socket_io_client(self, url):
         self.logger.info("Création de la connexion Socket.IO...")
         self.socket_io_client = WebSocketClient(self, username=f"Counter {self.counter_id} App")
-        self.socket_io_client.new_patient.connect(self.new_patient)
+        self.socket_io_client.new_patient.connect(self._on_patient_list_event)
+        self.socket_io_client.patient_patch.connect(self.new_patient_patch)
         self.socket_io_client.new_notification.connect(self.show_notification)
         self.socket_io_client.change_paper.connect(self.change_paper)
         self.socket_io_client.change_paper_button.connect(self.change_paper_button)
@@ -1371,6 +1523,7 @@ class MainWindow(QMainWindow):
         self.socket_io_client.ws_connection_status.connect(self.handle_socket_connection)
         self.socket_io_client.connection_lost.connect(self._handle_connection_lost)
         self.socket_io_client.refresh_after_clear_patient_list.connect(self.refresh_after_clear_patient_list)
+        self.connection_indicator.link_stats = self.socket_io_client.stats
         self.socket_io_client.start()
 
     def init_state(self):
@@ -1378,8 +1531,16 @@ class MainWindow(QMainWindow):
         (patient en cours + liste + réglages + révision). Utilisé au démarrage et
         à chaque resynchronisation pour garantir un état cohérent, plutôt que
         d'agréger plusieurs snapshots susceptibles de se contredire. """
-        url = f'{self.web_url}/api/counter/{self.counter_id}/state'
-        result = self.network_manager.request_blocking(url, method='GET')
+        result = self.network_manager.request_blocking(self._state_url(), method='GET')
+        return self._state_from_result(result)
+
+    def _state_url(self):
+        return f'{self.web_url}/api/counter/{self.counter_id}/state'
+
+    def _changes_url(self, since):
+        return f'{self.web_url}/api/counter/{self.counter_id}/changes?since={since}'
+
+    def _state_from_result(self, result):
         if result.status == 200 and isinstance(result.data, dict):
             return result.data
         self.logger.warning("Échec de récupération de l'état (statut=%s)", result.status)
@@ -1391,7 +1552,8 @@ class MainWindow(QMainWindow):
         démarrage/resync). """
         self.queue_revision = state.get("revision", self.queue_revision)
         self.my_patient = state.get("current_patient")
-        self.list_patients = state.get("standing_list") or []
+        self.list_patients = normalize_patients(state.get("standing_list"))
+        self.list_revision = state.get("revision")
         self.autocalling = "active" if state.get("autocalling") else "inactive"
         self.add_paper = "active" if state.get("add_paper") else "inactive"
         if state.get("counter_name"):
@@ -1405,16 +1567,70 @@ class MainWindow(QMainWindow):
 
         Si une resync est déjà en cours, on mémorise seulement qu'une nouvelle
         passe est demandée (coalescing) : une rafale d'évènements ou de
-        reconnexions ne crée donc pas une rafale de ResyncWorker. La passe en
+        reconnexions ne crée donc pas une rafale de requêtes /state. La passe en
         attente est relancée une seule fois à la fin (cf. _on_resync_ready). """
         if self.shutting_down:
             return
         if not self._resync.request():
             return  # une resync est déjà active : demande mémorisée
-        worker = ResyncWorker(self)
-        worker.finished_resync.connect(self._on_resync_ready)
-        self._track_worker(worker)
-        worker.start()
+        # Rattrapage incrémental d'abord (/changes depuis la révision affichée) :
+        # après une courte coupure, quelques opérations au lieu de toute la file.
+        # Pas de thread dédié : le futur du gestionnaire réseau est résolu par
+        # un worker, le résultat revient au thread GUI par resync_state_ready.
+        since = self._delta_base_revision()
+        if since is None:
+            self._submit_state_resync()
+            return
+        future = self.network_manager.submit(self._changes_url(since), method='GET')
+        future.add_done_callback(lambda f, since=since: self._on_changes_future(f, since))
+
+    def _delta_base_revision(self):
+        """Révision depuis laquelle demander /changes, ou None s'il faut l'état
+        complet (rien d'affiché, révision inconnue, serveur sans /changes)."""
+        revision = self.list_revision
+        if not self.changes_supported or isinstance(revision, bool) or not isinstance(revision, int):
+            return None
+        return revision if revision >= 0 else None
+
+    def _submit_state_resync(self):
+        # Même snapshot atomique qu'au démarrage.
+        future = self.network_manager.submit(self._state_url(), method='GET')
+        future.add_done_callback(self._on_state_future)
+
+    def _on_changes_future(self, future, since):
+        """ Rappel du futur /changes (thread worker réseau) : transmet le
+        rattrapage au thread GUI, ou enchaîne sur /state si le serveur ne peut
+        pas le fournir (historique tronqué, endpoint absent). """
+        if future.cancelled():
+            self.resync_state_ready.emit(None)
+            return
+        result = future.result()
+        if result.status == 0:
+            # Serveur injoignable : /state échouerait de même.
+            self.resync_state_ready.emit(None)
+            return
+        if result.status in CHANGES_UNSUPPORTED_STATUSES:
+            self.logger.info("Rattrapage incrémental non pris en charge par le serveur (statut=%s)",
+                             result.status)
+            self.changes_unsupported.emit()
+        delta = decode_changes(result.data, since) if result.success else None
+        if delta is None:
+            self.logger.debug("Rattrapage depuis la révision %s indisponible, état complet demandé", since)
+            self._submit_state_resync()
+            return
+        self.resync_state_ready.emit(delta)
+
+    def _on_changes_unsupported(self):
+        # Thread GUI : les resyncs suivantes demandent directement /state.
+        self.changes_supported = False
+
+    def _on_state_future(self, future):
+        """ Rappel du futur de resync (thread worker réseau, ou thread GUI si
+        déjà résolu) : transmet la snapshot au thread GUI. SocketIO ne rejoue
+        pas les évènements manqués pendant une coupure : sans cette snapshot, un
+        comptoir resterait figé sur son dernier état connu. """
+        state = None if future.cancelled() else self._state_from_result(future.result())
+        self.resync_state_ready.emit(state)
 
     def init_patient(self):
         url = f'{self.web_url}/api/counter/is_patient_on_counter/{self.counter_id}'
@@ -1465,6 +1681,14 @@ class MainWindow(QMainWindow):
         l'état connu) n'est jamais appliqué. """
         relaunch = self._resync.finish()
         try:
+            if isinstance(state, StateDelta):
+                state = self._state_from_delta(state)
+                if state is None:
+                    # La file affichée a bougé depuis la demande : l'état complet
+                    # est redemandé (une fois /state en vol, plus de /changes).
+                    if not self.shutting_down and self._resync.request():
+                        self._submit_state_resync()
+                    return
             if state and snapshot_is_fresh(state.get("revision"), self.queue_revision):
                 self._apply_resync_state(state)
             elif state:
@@ -1476,10 +1700,25 @@ class MainWindow(QMainWindow):
             if relaunch and not self.shutting_down:
                 self._request_resync()
 
+    def _state_from_delta(self, delta):
+        """État complet reconstitué à partir d'un rattrapage incrémental et de
+        la file affichée, ou None si celle-ci n'est plus à la révision de base
+        (ou si les opérations ne s'y appliquent pas)."""
+        if delta.patch.base_revision != self.list_revision:
+            return None
+        try:
+            standing_list = apply_patch_ops(self.list_patients, delta.patch.ops)
+        except PatchConflict as e:
+            self.logger.info("Rattrapage incrémental non applicable (%s)", e)
+            return None
+        return dict(delta.state, standing_list=standing_list)
+
     def _apply_resync_state(self, state):
         """ Applique effectivement la snapshot et rafraîchit l'UI (patient courant,
-        liste, papier, autocalling ET staff). """
+        liste, papier, autocalling ET staff). Les actions mémorisées hors ligne
+        sont rejouées une fois cet état frais connu. """
         self._apply_state(state)
+        self._replay_offline_journal()
 
         # Staff en premier : peut faire basculer entre l'écran de connexion et
         # l'interface principale (donc reconstruire les widgets patient).
@@ -1557,10 +1796,11 @@ class MainWindow(QMainWindow):
             self._update_menu_actions(False)
             return
 
-        # À partir d'ici on attend un dict patient. On valide explicitement la
-        # structure et on ne capture QUE les exceptions attendues (clé manquante,
-        # mauvais type), au lieu d'un except générique qui masquait l'erreur.
-        if not isinstance(patient, dict):
+        # À partir d'ici on attend un patient (dict ou PatientRecord : tout
+        # Mapping). On valide explicitement la structure et on ne capture QUE
+        # les exceptions attendues (clé manquante, mauvais type), au lieu d'un
+        # except générique qui masquait l'erreur.
+        if not isinstance(patient, Mapping):
             self._on_invalid_patient(patient)
             return
 
@@ -1818,6 +2058,22 @@ class MainWindow(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             self.apply_preferences()
 
+    def show_diagnostics(self, parent=None):
+        """ Ouvre la page « Diagnostics » (non modale, rafraîchie tant qu'elle
+        est visible). Depuis un dialogue modal (Préférences), ``parent`` doit être
+        ce dialogue, sinon la page serait bloquée par sa modalité ; elle se
+        ferme alors avec lui. Sinon, une seule instance est réutilisée. """
+        if parent is not None:
+            dialog = DiagnosticsDialog(self, parent)
+        else:
+            dialog = getattr(self, "_diagnostics_dialog", None)
+            if dialog is None:
+                dialog = self._diagnostics_dialog = DiagnosticsDialog(self, self)
+        dialog.show()
+        dialog.raise_()
+        dialog.activateWindow()
+        return dialog
+
     def _shortcut_items(self):
         """ Couples (action, texte du raccourci) dans un ordre stable. """
         texts = {
@@ -1955,6 +2211,10 @@ class MainWindow(QMainWindow):
             if not self._confirm_sensitive_action(label):
                 self.logger.debug("Action sensible '%s' annulée par l'utilisateur", action)
                 return
+        # La mesure clic -> écran part de l'appui sur la touche (le clic simulé
+        # du bouton qui suit ne la repousse pas).
+        if getattr(self, "click_latency", None) is not None:
+            self.click_latency.press(action)
         # Affiche brièvement quelle action a été déclenchée.
         if getattr(self, "shortcut_feedback", False):
             self._show_shortcut_feedback(label)
@@ -2022,13 +2282,173 @@ class MainWindow(QMainWindow):
     def _on_token_refreshed(self, token):
         """ Synchronise self.app_token quand le gestionnaire réseau renouvelle le
         jeton (utilisé par le WebSocket et la connexion staff). Le jeton n'est
-        jamais journalisé ; on l'enregistre pour masquage (défense en profondeur). """
+        jamais journalisé ; on l'enregistre pour masquage (défense en profondeur).
+        Il est aussi mémorisé (magasin sécurisé) pour le prochain démarrage à
+        chaud, depuis un worker réseau : le trousseau (D-Bus, Gestionnaire
+        d'identifiants) peut bloquer et ne doit pas figer l'interface. """
         self.app_token = token
         register_secret(token)
+        network_manager = getattr(self, "network_manager", None)
+        save = functools.partial(save_token, token, token_scope(self.web_url, self.app_secret),
+                                 ttl_s=getattr(network_manager, "token_ttl", None))
+        if network_manager is not None:
+            # Clé d'ordre : deux renouvellements rapprochés s'écrivent dans l'ordre.
+            network_manager.run_in_background(save, order_key=ORDER_TOKEN_STORE)
+        else:
+            save()
 
     def _on_token_failed(self):
+        # Le jeton mémorisé n'est PAS oublié ici : token_failed couvre aussi une
+        # panne réseau (serveur arrêté, circuit ouvert), où il reste valable. Un
+        # jeton réellement refusé est remplacé au prochain succès.
         self.app_token = None
 
+    @Slot(str, str)
+    def _on_circuit_changed(self, base_url, state):
+        """ Disjoncteur réseau : le serveur HTTP est réputé injoignable (« open »
+        ou sonde en cours) ou de nouveau joignable (« closed »). L'indicateur de
+        connexion le signale, les actions échouant vite en attendant. """
+        self.logger.info("Serveur %s : circuit %s", base_url, state)
+        indicator = getattr(self, "connection_indicator", None)
+        if indicator is not None:
+            indicator.set_server_reachable(state == "closed")
+        # Serveur revenu : état frais d'abord (resync), puis rejeu des actions
+        # mémorisées hors ligne (voir _apply_resync_state).
+        journal = getattr(self, "_offline_journal", None)
+        if state == "closed" and journal is not None and journal.pending():
+            self._request_resync()
+
+    # ------------------------------------------------------------------ #
+    # Mode hors ligne (journal des actions faites serveur injoignable)
+    # ------------------------------------------------------------------ #
+    def _offline_journal_active(self):
+        """ Journal hors ligne si le mode est activé (ouvert à la première
+        utilisation), sinon None. """
+        if not getattr(self, "offline_journal_enabled", False):
+            return None
+        journal = getattr(self, "_offline_journal", None)
+        if journal is None:
+            path = default_log_dir().parent / OFFLINE_JOURNAL_FILENAME
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                journal = self._offline_journal = OfflineJournal(path)
+            except OSError as e:
+                self.logger.error("Journal hors ligne indisponible (%s) : mode désactivé", e)
+                self.offline_journal_enabled = False
+                return None
+        return journal
+
+    def offline_wrap(self, action, url, method, data, headers, on_result):
+        """ Prépare une action éligible au mode hors ligne. Renvoie
+        ``(headers, on_result)`` à utiliser pour l'envoi :
+
+        - une clé d'idempotence est ajoutée (réutilisée au rejeu : le serveur
+          n'applique jamais l'action deux fois) ;
+        - si le résultat est une erreur réseau, l'action est journalisée et
+          ``on_result`` reçoit un ``NetResult.cancelled`` silencieux (l'utilisateur
+          est prévenu par la notification du journal, pas par « serveur
+          injoignable »).
+
+        Sans mode hors ligne, renvoie ``(headers, on_result)`` inchangés. """
+        if self._offline_journal_active() is None:
+            return headers, on_result
+        headers = dict(headers or {})
+        headers.setdefault("X-Idempotency-Key", str(uuid.uuid4()))
+        idempotency_key = headers["X-Idempotency-Key"]
+
+        def _on_result(result):
+            if result.is_timeout and self.journal_offline_action(
+                    action, url, method, data, idempotency_key):
+                result = NetResult.cancelled("action mémorisée hors ligne")
+            if on_result is not None:
+                on_result(result)
+
+        return headers, _on_result
+
+    def journal_offline_action(self, action, url, method, data, idempotency_key):
+        """ Mémorise une action non envoyée (serveur injoignable). Retourne True
+        si elle a été journalisée. """
+        journal = self._offline_journal_active()
+        if journal is None:
+            return False
+        patient = self.my_patient if isinstance(self.my_patient, Mapping) else {}
+        journal.append(action, url, method=method, data=data,
+                       idempotency_key=idempotency_key, counter_id=self.counter_id,
+                       patient_id=patient.get("id"), revision=self.queue_revision)
+        self.logger.info("Action '%s' mémorisée hors ligne (%s en attente)",
+                         action, len(journal.pending()))
+        if getattr(self, "notification_connection", True):
+            self.show_notification(
+                {"origin": "connection",
+                 "message": "Serveur injoignable : action mémorisée, elle sera envoyée "
+                            "au retour de la connexion."},
+                internal=True)
+        return True
+
+    def _replay_offline_journal(self):
+        """ Rejoue dans l'ordre les actions mémorisées hors ligne, une à la fois
+        (clé d'ordre du comptoir), après réconciliation avec l'état du serveur
+        qui vient d'être appliqué (``stale_reason``). S'arrête à la première
+        nouvelle erreur réseau (le reste attend le prochain retour du serveur).
+        Une resync finale aligne l'affichage sur la révision du serveur. """
+        journal = getattr(self, "_offline_journal", None)
+        if journal is None or getattr(self, "_offline_replaying", False) or self.shutting_down:
+            return
+        entries = journal.pending()
+        if not entries:
+            return
+        self._offline_replaying = True
+        self.logger.info("Rejeu de %s action(s) hors ligne", len(entries))
+        self._replay_next_offline(journal, entries, sent=0)
+
+    def _replay_next_offline(self, journal, entries, sent):
+        patient = self.my_patient if isinstance(self.my_patient, Mapping) else {}
+        while entries:
+            entry = entries[0]
+            reason = stale_reason(entry, self.counter_id, patient.get("id"), time.time(),
+                                  server_revision=self.queue_revision)
+            if reason is None:
+                break
+            self.logger.info("Action hors ligne '%s' écartée (%s)", entry.action, reason)
+            journal.mark_done(entry.id)
+            entries.pop(0)
+        if not entries or self.shutting_down:
+            self._finish_offline_replay(sent)
+            return
+        entry = entries.pop(0)
+        handle = self.network_manager.make_handle(
+            entry.url, method=entry.method, data=entry.data,
+            idempotency_key=entry.idempotency_key, order_key=ORDER_COUNTER,
+            tag=counter_tag(entry.counter_id))
+
+        def _on_result(result):
+            if result.is_timeout or result.is_cancelled:
+                self.logger.info("Rejeu hors ligne interrompu (statut=%s)", result.status)
+                self._finish_offline_replay(sent)
+                return
+            # Réponse du serveur (même un refus) : l'action a été traitée.
+            journal.mark_done(entry.id)
+            if not result.success:
+                self.logger.warning("Action hors ligne '%s' refusée (statut=%s)",
+                                    entry.action, result.status)
+            self._replay_next_offline(journal, entries, sent + (1 if result.success else 0))
+
+        handle.result.connect(_on_result)
+        self._offline_replay_handle = handle   # référence forte jusqu'au résultat
+        handle.start()
+
+    def _finish_offline_replay(self, sent):
+        self._offline_replaying = False
+        self._offline_replay_handle = None
+        if sent:
+            self.logger.info("%s action(s) hors ligne envoyée(s)", sent)
+            if getattr(self, "notification_connection", True):
+                self.show_notification(
+                    {"origin": "connection",
+                     "message": f"{sent} action(s) faite(s) hors ligne envoyée(s) au serveur."},
+                    internal=True)
+            self._request_resync()
+
     def get_app_token(self):
         """ Récupère un token applicatif via le gestionnaire réseau (qui l'installe
         sur sa session pour que toutes les requêtes l'envoient automatiquement).
@@ -2046,6 +2466,50 @@ class MainWindow(QMainWindow):
         self.app_token = token
         register_secret(token)
 
+    def try_cached_app_token(self):
+        """ Démarrage à chaud : installe le dernier jeton mémorisé (magasin
+        sécurisé) s'il est lié au même serveur/secret et pas encore expiré.
+        Retourne True si un jeton a été installé. """
+        cached = load_token(token_scope(self.web_url, self.app_secret))
+        if not cached:
+            return False
+        token, remaining_s = cached
+        self.network_manager.install_token(token, ttl_s=remaining_s)
+        self.app_token = token
+        register_secret(token)
+        return True
+
+    def run_startup_sequence(self):
+        """ Séquence réseau de démarrage (thread de fond) -> (connected, state).
+
+        Démarrage à chaud : avec un jeton mémorisé, ``/state`` est demandé tout
+        de suite (un seul aller-retour avant l'interface). Si ce jeton est refusé,
+        le gestionnaire réseau en obtient un nouveau sur le 401 et rejoue. En cas
+        d'échec, on retombe sur la séquence complète : jeton puis état (un jeton
+        mémorisé resté refusé est oublié). """
+        if self.try_cached_app_token():
+            result = self.network_manager.request_blocking(self._state_url(), method='GET')
+            state = self._state_from_result(result)
+            token = self.network_manager.current_token()
+            if state is not None and token:
+                self.app_token = token
+                return True, state
+            if result.status == 401:
+                # Jeton mémorisé refusé et non renouvelé : on l'oublie pour ne
+                # pas le re-présenter au prochain démarrage.
+                clear_token()
+            self.logger.info("Démarrage à chaud impossible : obtention d'un nouveau jeton")
+
+        try:
+            self.get_app_token()
+        except Exception as e:
+            self.logger.error("Erreur lors de l'obtention du token : %s", e)
+            return False, None
+        # Une seule snapshot atomique (patient en cours + liste + réglages +
+        # révision) au lieu de deux requêtes séparées qui pouvaient se
+        # chevaucher avant l'ouverture de Socket.IO (course de démarrage).
+        return True, self.init_state()
+
     def try_refresh_app_token(self):
         """ Variante de get_app_token() qui ne lève pas d'exception (à utiliser
         avant une reconnexion WebSocket). """
@@ -2056,21 +2520,27 @@ class MainWindow(QMainWindow):
             self.logger.warning("Échec du renouvellement du token : %s", e)
             return False
 
-    def make_request_thread(self, url, method='GET', data=None, headers=None):
-        """ Crée un RequestHandle via le gestionnaire réseau centralisé : la
-        requête est traitée par l'unique worker (jeton courant ajouté au moment de
-        l'appel, timeout, renouvellement sur 401 avec un seul rejeu). L'appelant
-        connecte ``result``/``finished`` puis appelle ``start()`` (comme avant). """
+    def make_request_thread(self, url, method='GET', data=None, headers=None,
+                            order_key=None, tag=None, deadline_s=None):
+        """ Crée un RequestHandle via le gestionnaire réseau centralisé (jeton
+        courant ajouté au moment de l'appel, timeout, renouvellement sur 401 avec
+        un seul rejeu). ``order_key`` : les requêtes de même clé ne partent
+        jamais en parallèle et gardent leur ordre. ``tag``/``deadline_s`` :
+        étiquette d'annulation groupée et échéance d'envoi. L'appelant connecte
+        ``result``/``finished`` puis appelle ``start()`` (comme avant). """
         idempotency_key = None
         if headers and "X-Idempotency-Key" in headers:
             # On passe la clé d'idempotence par le canal dédié du gestionnaire.
             headers = dict(headers)
             idempotency_key = headers.pop("X-Idempotency-Key")
         return self.network_manager.make_handle(url, method=method, data=data,
-                                                headers=headers, idempotency_key=idempotency_key)
+                                                headers=headers, idempotency_key=idempotency_key,
+                                                order_key=order_key, tag=tag,
+                                                deadline_s=deadline_s)
 
     def _submit(self, url, method='GET', data=None, headers=None,
-                on_result=None, key=None, busy_button=None):
+                on_result=None, key=None, busy_button=None, order_key=ORDER_COUNTER,
+                offline_action=None, latency_action=None):
         """ Crée, suit et démarre une requête réseau de façon sûre.
 
         - Conserve une référence forte au handle jusqu'à ``finished`` (le handle
@@ -2080,20 +2550,55 @@ class MainWindow(QMainWindow):
           seconde action identique tant que la première est en cours).
         - ``busy_button`` : passé en état occupé au lancement et rétabli à la fin
           (le rétablissement est branché AVANT start() -> pas de course).
+        - ``order_key`` : clé d'ordre réseau. Par défaut toutes les actions sur
+          la file du comptoir (suivant, valider, pause, remise en attente...)
+          partagent ORDER_COUNTER et restent donc strictement dans l'ordre des
+          clics, même avec plusieurs workers ; les actions indépendantes
+          (rappel, staff) passent leur propre clé.
+        - Chaque action est étiquetée par le comptoir courant (``counter_tag``,
+          purgée au changement de comptoir) et abandonnée si elle n'a pas pu
+          partir en ``ACTION_DEADLINE_S``.
+        - ``offline_action`` : nom d'action éligible au mode hors ligne (voir
+          ``offline_wrap``) : en cas de serveur injoignable, elle est journalisée
+          au lieu d'être perdue.
+        - ``latency_action`` : action dont la mesure clic -> écran
+          (``click_latency``) se termine quand ``on_result`` a appliqué la
+          réponse ; abandonnée si l'action est refusée ou échoue.
         Retourne le handle, ou None si l'action a été refusée (doublon/arrêt). """
+        latency = getattr(self, "click_latency", None) if latency_action else None
         if self.shutting_down:
             self.logger.debug("Action ignorée (arrêt en cours) : %s", key)
+            if latency is not None:
+                latency.cancel(latency_action)
             return None
         if self._tasks.is_active(key):
             self.logger.debug("Action ignorée (déjà en cours) : %s", key)
+            if latency is not None:
+                latency.cancel(latency_action)
             return None
 
-        handle = self.make_request_thread(url, method=method, data=data, headers=headers)
+        if offline_action is not None:
+            headers, on_result = self.offline_wrap(offline_action, url, method, data,
+                                                   headers, on_result)
+        handle = self.make_request_thread(url, method=method, data=data, headers=headers,
+                                          order_key=order_key,
+                                          tag=counter_tag(getattr(self, "counter_id", None)),
+                                          deadline_s=ACTION_DEADLINE_S)
         self._tasks.add(handle, key)
         if busy_button is not None:
             busy_button.set_busy(True)
         if on_result is not None:
             handle.result.connect(on_result)
+        if latency is not None:
+            # Branché APRÈS on_result : les slots s'exécutent dans l'ordre de
+            # connexion, la mesure inclut donc la mise à jour de l'écran.
+            def _latency_done(result):
+                if result.success:
+                    latency.shown(latency_action)
+                else:
+                    latency.cancel(latency_action, failed=not result.is_cancelled)
+
+            handle.result.connect(_latency_done)
 
         def _cleanup():
             self._tasks.remove(handle, key)
@@ -2107,7 +2612,7 @@ class MainWindow(QMainWindow):
         return handle
 
     def _track_worker(self, worker):
-        """ Garde une référence à un QThread (StartupWorker/ResyncWorker) jusqu'à
+        """ Garde une référence à un QThread (StartupWorker) jusqu'à
         sa fin, pour ne pas le détruire prématurément s'il est encore en cours
         ("QThread: Destroyed while thread is still running"). """
         self._tasks.add(worker)
@@ -2189,6 +2694,11 @@ class MainWindow(QMainWindow):
             self.socket_io_client.stop(timeout_ms=3000)
             self.socket_io_client = None
 
+        # 1 bis. Annuler les actions encore en file pour l'ancien comptoir : elles
+        #    ne doivent ni partir vers le nouveau contexte ni occuper la file.
+        if hasattr(self, "network_manager"):
+            self.network_manager.cancel_tag(counter_tag(old_config.get("counter_id")))
+
         # 2. Libérer l'ancien comptoir AVANT d'invalider le jeton (le jeton courant
         #    vaut pour l'ancien serveur). Best-effort borné : on n'empêche pas la
         #    reconnexion si l'ancien serveur ne répond pas.
@@ -2203,14 +2713,22 @@ class MainWindow(QMainWindow):
         self.staff_id = None
         if hasattr(self, "network_manager"):
             self.network_manager.clear_token()
+            # Jeton mémorisé pour le démarrage à chaud : effacé hors du thread GUI
+            # (trousseau potentiellement bloquant), avant tout nouvel enregistrement.
+            self.network_manager.run_in_background(clear_token, order_key=ORDER_TOKEN_STORE)
 
         # Repartir d'un état local vierge (rien de l'ancien comptoir).
         self.queue_revision = -1
+        self.list_revision = -1
+        self.changes_supported = True
         self.my_patient = None
         self.list_patients = []
         self.socket_was_disconnected = False
 
-        # 5. Nouveau jeton + snapshot en arrière-plan.
+        # 5. Nouveau jeton + snapshot en arrière-plan, connexions vers le
+        #    nouveau serveur préchauffées en parallèle.
+        if hasattr(self, "network_manager"):
+            self.network_manager.prewarm(self.web_url, self.prewarm_connections)
         worker = StartupWorker(self)
         worker.finished_startup.connect(self._on_reconnect_ready)
         self._track_worker(worker)
@@ -2293,6 +2811,11 @@ class MainWindow(QMainWindow):
         self.shutting_down = True
         self.logger.info("Fermeture de l'App : arrêt propre en cours")
 
+        # 0. L'arrêt bloque volontairement (attentes bornées) : ce ne sont pas
+        #    des gels à signaler.
+        if getattr(self, "stall_watchdog", None) is not None:
+            self.stall_watchdog.stop()
+
         # 1. Plus aucune nouvelle action déclenchée par les raccourcis clavier.
         #    On attend d'abord (borné) la fin d'un enregistrement global en cours
         #    pour qu'il ne rajoute pas de hook APRÈS le unhook (point 7).
@@ -2309,7 +2832,7 @@ class MainWindow(QMainWindow):
             self.call_timer.stop()
 
         # 3. Arrêt du WebSocket (drapeau + disconnect + attente bornée). Empêche
-        #    aussi le déclenchement de nouveaux ResyncWorker.
+        #    aussi le déclenchement de nouvelles resyncs.
         if getattr(self, 'socket_io_client', None):
             self.socket_io_client.stop(timeout_ms=3000)
 
@@ -2321,7 +2844,21 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'network_manager'):
             self.network_manager.stop(timeout_ms=3000)
 
-        # 6. Attente bornée des workers encore actifs (StartupWorker/ResyncWorker),
+        # 5 ter. Latence clic -> écran de la session (p50/p95/p99 par action).
+        if getattr(self, "click_latency", None) is not None:
+            self.logger.info("Latence clic -> écran : %s", self.click_latency.summary_line())
+
+        # 5 quater. Métriques : dernier export (état à la fermeture), serveur arrêté.
+        if getattr(self, "_metrics_exporter", None) is not None:
+            self._metrics_exporter.stop()
+        if getattr(self, "_metrics_server", None) is not None:
+            self._metrics_server.stop()
+
+        # 5 bis. Journal hors ligne : ce qui a été mémorisé est écrit sur disque.
+        if getattr(self, "_offline_journal", None) is not None:
+            self._offline_journal.close(timeout=1.0)
+
+        # 6. Attente bornée des workers encore actifs (StartupWorker),
         #    désormais débloqués, avant destruction -> pas de "QThread: Destroyed".
         self._wait_active_workers(total_timeout_ms=2000)
 
@@ -2349,8 +2886,11 @@ class MainWindow(QMainWindow):
         url = f'{base_url}/app/counter/remove_staff'
         data = {'counter_id': target_counter}
         try:
+            # Voie interactive : fermeture/changement de comptoir demandés par
+            # l'utilisateur, à ne pas faire attendre derrière une resync de fond.
             result = self.network_manager.request_blocking(
-                url, method='POST', data=data, timeout=(2, 3), timeout_s=4)
+                url, method='POST', data=data, timeout=(2, 3), timeout_s=4,
+                lane=LANE_INTERACTIVE)
             if result.status == 200:
                 self.logger.info("Comptoir libéré côté serveur")
             else:
@@ -2373,7 +2913,7 @@ class MainWindow(QMainWindow):
     # nom du comptoir) a été supprimé : ces informations sont désormais fournies
     # de façon atomique par /api/counter/<id>/state via _apply_state().
 
-    def refresh_patient_lists(self):
+    def refresh_patient_lists(self, patch_ops=None):
         """Rafraîchit l'affichage de la file après un changement.
 
         La vue (modèle) est mise à jour de façon différentielle et le compteur du
@@ -2381,9 +2921,12 @@ class MainWindow(QMainWindow):
         « Patients » et systray) NE sont PAS reconstruits ici : ils le sont
         paresseusement à leur ouverture (``aboutToShow``) et lisent
         ``self.list_patients``. Inutile donc de les reconstruire à chaque
-        évènement de file alors qu'ils sont fermés la plupart du temps."""
+        évènement de file alors qu'ils sont fermés la plupart du temps.
+
+        ``patch_ops`` : opérations d'un patch serveur déjà appliquées à
+        ``self.list_patients``, rejouées telles quelles sur le modèle."""
         self._update_patient_count_label()
-        self.update_patient_widget()
+        self.update_patient_widget(patch_ops)
 
     def _update_patient_count_label(self):
         """Met à jour le libellé du bouton « Patients (N) » (toujours visible)."""
@@ -2404,9 +2947,16 @@ class MainWindow(QMainWindow):
         except TypeError:
             self.logger.warning("Liste de patients invalide (TypeError)")
 
-    def new_patient(self, patient, revision=None):
+    def _on_patient_list_event(self, event):
+        """Réception d'un ``PatientListEvent`` (déjà décodé et normalisé dans le
+        thread Socket.IO, rafales regroupées)."""
+        self.new_patient(event.patients, event.revision, first_revision=event.first_revision)
+
+    def new_patient(self, patient, revision=None, first_revision=None):
+        """``first_revision`` : après regroupement d'une rafale, première révision
+        de la suite continue aboutissant à ``revision`` (None : ``revision``)."""
         self.logger.debug("new_patient reçu (revision=%s, %s patients)",
-                          revision, len(patient) if isinstance(patient, list) else "?")
+                          revision, len(patient) if isinstance(patient, (list, tuple)) else "?")
 
         # Convergence via révision : Socket.IO est une notification, pas la
         # source de vérité. On compare la révision reçue à celle connue.
@@ -2417,9 +2967,12 @@ class MainWindow(QMainWindow):
                     # on a déjà un état au moins aussi récent, on l'ignore.
                     self.logger.debug("new_patient ignoré (rev %s <= %s)", revision, self.queue_revision)
                     return
-                if revision > self.queue_revision + 1:
-                    # Trou : au moins un évènement a été manqué. On ne fait pas
-                    # confiance à ce seul message et on recharge l'état autoritatif.
+                first = revision if first_revision is None else first_revision
+                if first > self.queue_revision + 1:
+                    # Trou : au moins un évènement a été manqué (les files d'une
+                    # rafale regroupée, elles, se suivent depuis ``first``). On ne
+                    # fait pas confiance à ce seul message et on recharge l'état
+                    # autoritatif.
                     self.logger.info("Trou de révision (%s -> %s), rechargement de l'état",
                                      self.queue_revision, revision)
                     self.queue_revision = revision
@@ -2430,8 +2983,40 @@ class MainWindow(QMainWindow):
 
         # mise à jour de self.patient
         self.list_patients = patient
+        self.list_revision = revision
         self.refresh_patient_lists()
 
+    def new_patient_patch(self, event):
+        """Patch de la file (``PatientPatchEvent``) : appliqué directement, sans
+        diff, si sa révision de base est la révision connue. Sinon (pas de
+        référence, trou, opérations qui ne correspondent pas à la file locale),
+        on retombe sur la resynchronisation ; un patch périmé est ignoré."""
+        current = self.queue_revision
+        if current is None or current < 0:
+            self.logger.debug("Patch de file sans révision de référence, rechargement de l'état")
+            self._request_resync()
+            return
+        if event.revision <= current:
+            self.logger.debug("Patch de file ignoré (rev %s <= %s)", event.revision, current)
+            return
+        if event.base_revision != current:
+            self.logger.info("Patch de file sur une autre base (%s, connue %s), rechargement de l'état",
+                             event.base_revision, current)
+            self.queue_revision = event.revision
+            self._request_resync()
+            return
+        try:
+            patients = apply_patch_ops(self.list_patients, event.ops)
+        except PatchConflict as e:
+            self.logger.info("Patch de file non applicable (%s), rechargement de l'état", e)
+            self.queue_revision = event.revision
+            self._request_resync()
+            return
+        self.queue_revision = event.revision
+        self.list_patients = patients
+        self.list_revision = event.revision
+        self.refresh_patient_lists(patch_ops=event.ops)
+
     def _rebuild_tray_patient_menu(self):
         """Reconstruit le menu contextuel du systray « Prochain patient » (appelé
         à son ouverture via aboutToShow)."""
@@ -2445,14 +3030,18 @@ class MainWindow(QMainWindow):
             action = menu.addAction(action_text)
             action.triggered.connect(lambda checked, p=patient: self.select_patient(p['id']))
 
-    def update_patient_widget(self):
+    def update_patient_widget(self, patch_ops=None):
         """Met la vue de la file à jour via son modèle, de façon différentielle :
         seuls les patients ajoutés/retirés/modifiés provoquent un changement (plus
         de suppression/recréation de tous les boutons, plus de clignotement ni de
-        perte de la position de défilement)."""
+        perte de la position de défilement). Un patch serveur (``patch_ops``)
+        est appliqué sans diff ; s'il ne correspond pas aux lignes affichées, la
+        file complète est reprise."""
         if not hasattr(self, 'patient_model'):
             return
         self.patient_model.set_staff_id(self.staff_id)
+        if patch_ops is not None and self.patient_model.apply_patch(patch_ops):
+            return
         self.patient_model.set_patients(self.list_patients or [])
 
     def _ensure_notification_manager(self):
@@ -2654,6 +3243,12 @@ class ConnectionStatusIndicator(QWidget):
         self.status = "connected"
         self.last_connection_time = None
         self.reconnection_attempts = 0
+        # Joignabilité du serveur HTTP (disjoncteur du gestionnaire réseau),
+        # distincte de l'état du temps réel (WebSocket).
+        self.server_reachable = True
+        # Source des mesures du lien (WebSocketClient.stats) : aller-retour et
+        # âge du dernier évènement, relus à chaque affichage de l'infobulle.
+        self.link_stats = None
         self.setMouseTracking(True)
 
         # Charger les SVG avec vos noms de fichiers
@@ -2689,18 +3284,53 @@ class ConnectionStatusIndicator(QWidget):
         except RuntimeError:
             pass
 
+    def set_server_reachable(self, reachable):
+        """État du serveur HTTP (disjoncteur réseau) : quand il est injoignable,
+        les actions échouent immédiatement ; un badge et l'infobulle le disent."""
+        try:
+            if self.server_reachable != reachable:
+                self.server_reachable = reachable
+                self.update_tooltip()
+                self.update()
+        except RuntimeError:
+            pass
+
     def _status_tooltip(self):
-        """Texte d'état complet (base + horodatage/tentatives)."""
+        """Texte d'état complet (base + horodatage/tentatives + serveur HTTP)."""
+        text = self._realtime_tooltip()
+        if not self.server_reachable:
+            text += ("\nServeur injoignable : actions suspendues "
+                     "(nouvel essai automatique)")
+        return text
+
+    def _realtime_tooltip(self):
         base = self._STATUS_LABEL.get(self.status, self._STATUS_LABEL["disconnected"])
         if self.status == "connected":
             if self.last_connection_time:
                 time_str = self.last_connection_time.toString("HH:mm:ss")
-                return f"{base} depuis {time_str}"
-            return base
+                base = f"{base} depuis {time_str}"
+            health = self._link_health()
+            return f"{base}\n{health}" if health else base
         if self.reconnection_attempts > 0:
             return f"{base}\nNombre de tentatives de reconnexion : {self.reconnection_attempts}"
         return base
 
+    def _link_health(self):
+        if not callable(self.link_stats):
+            return None
+        try:
+            return format_link_health(self.link_stats())
+        except Exception as e:  # client arrêté entre-temps
+            logger.debug("Mesures du lien indisponibles : %s", e)
+            return None
+
+    def event(self, event):
+        # Infobulle recalculée au survol : aller-retour et âge du dernier
+        # évènement en direct, sans minuteur.
+        if event.type() == QEvent.ToolTip:
+            self.setToolTip(self._status_tooltip())
+        return super().event(event)
+
     def _refresh_accessibility(self):
         """Nom accessible = état courant, pour les lecteurs d'écran (point 28)."""
         label = self._STATUS_LABEL.get(self.status, self._STATUS_LABEL["disconnected"])
@@ -2736,9 +3366,20 @@ class ConnectionStatusIndicator(QWidget):
                 # distinction non colorée.
                 if self.status == "connecting":
                     self._paint_progress_dots(painter)
+                if not self.server_reachable:
+                    self._paint_server_down_badge(painter)
         except RuntimeError:
             pass
 
+    def _paint_server_down_badge(self, painter):
+        """Pastille rouge cerclée de blanc en haut à droite : serveur HTTP
+        injoignable (repérable aussi en niveaux de gris grâce au contour)."""
+        rect = self.rect()
+        radius = max(3, rect.width() // 6)
+        painter.setPen(QColor("#ffffff"))
+        painter.setBrush(QColor(self._STATUS_COLOR["disconnected"]))
+        painter.drawEllipse(rect.right() - 2 * radius, rect.top(), 2 * radius, 2 * radius)
+
     def _paint_progress_dots(self, painter):
         rect = self.rect()
         dot_r = max(1, rect.width() // 12)
@@ -0,0 +1,448 @@
+"""Registre de métriques et export Prometheus / JSON (sans dépendance PySide,
+testable seul).
+
+Pour comparer les comptoirs d'une officine sans ramasser les journaux à la
+main, chaque client expose ses métriques :
+
+- ``MetricsRegistry`` : compteurs, jauges et histogrammes étiquetés. Les
+  composants ne dépendent pas du registre : ils gardent leurs propres
+  statistiques (``lane_stats``, ``stats()``...) et des collecteurs
+  (``collect_network``, ``collect_websocket``...) les recopient dans le
+  registre au moment de l'export ;
+- ``MetricsExporter`` : toutes les ``interval_s`` secondes, réécrit
+  ``metrics.prom`` (format d'exposition Prometheus, remplacement atomique :
+  lisible tel quel par le collecteur « textfile » de node_exporter) et ajoute
+  un instantané JSON à ``metrics.jsonl``, qui tourne à minuit et garde 7
+  fichiers comme le journal applicatif (``my_logger``) ;
+- ``MetricsServer`` (optionnel) : sert ``/metrics`` (Prometheus) et
+  ``/metrics.json`` sur 127.0.0.1 uniquement.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import TimedRotatingFileHandler
+
+logger = logging.getLogger("appcomptoir.metrics")
+
+PROMETHEUS_FILENAME = "metrics.prom"
+JSON_HISTORY_FILENAME = "metrics.jsonl"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_EXPORT_INTERVAL_S = 60
+# Comme le journal applicatif : rotation à minuit, 7 jours gardés.
+HISTORY_BACKUP_COUNT = 7
+METRIC_PREFIX = "pharmafile_"
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+class MetricFamily:
+    """Une métrique (nom, type, aide) et ses valeurs par jeu d'étiquettes."""
+
+    def __init__(self, name, kind, help_text="", bounds=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.bounds = tuple(sorted(bounds)) if bounds is not None else None
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def inc(self, amount=1, **labels):
+        """Compteur : ajoute ``amount``."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Jauge : valeur courante. Compteur : total cumulé relu d'une source
+        qui compte déjà elle-même."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def observe(self, value, **labels):
+        """Histogramme : ajoute une observation."""
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"counts": [0] * (len(self.bounds) + 1), "sum": 0.0}
+            index = len(self.bounds)
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    index = i
+                    break
+            entry["counts"][index] += 1
+            entry["sum"] += value
+
+    def load(self, snapshot, **labels):
+        """Histogramme : remplace l'état par celui d'un
+        ``net_trace.LatencyHistogram.snapshot()`` (mêmes bornes)."""
+        if tuple(snapshot["bounds"]) != self.bounds:
+            raise ValueError(f"bornes incompatibles pour {self.name}")
+        with self._lock:
+            self._values[self._key(labels)] = {"counts": list(snapshot["counts"]),
+                                               "sum": snapshot["sum_s"]}
+
+    def samples(self):
+        """``[(étiquettes triées, valeur)]`` (histogramme : dict counts/sum)."""
+        with self._lock:
+            return [(key, dict(value, counts=list(value["counts"]))
+                     if isinstance(value, dict) else value)
+                    for key, value in sorted(self._values.items())]
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=METRIC_PREFIX):
+        self._prefix = prefix
+        self._families = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _family(self, name, kind, help_text, bounds=None):
+        name = self._prefix + name
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, kind, help_text, bounds)
+            elif family.kind != kind:
+                raise ValueError(f"{name} déjà déclarée comme {family.kind}")
+            return family
+
+    def counter(self, name, help_text=""):
+        return self._family(name, COUNTER, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._family(name, GAUGE, help_text)
+
+    def histogram(self, name, help_text="", bounds=()):
+        return self._family(name, HISTOGRAM, help_text, bounds)
+
+    def add_collector(self, collector):
+        """``collector(registry)`` est appelé avant chaque export pour recopier
+        l'état courant d'un composant."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self):
+        """Exécute les collecteurs (une erreur n'empêche pas l'export des
+        autres) et renvoie les familles triées par nom."""
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                logger.debug("Collecteur de métriques en échec : %s", e)
+        with self._lock:
+            return [self._families[name] for name in sorted(self._families)]
+
+    def to_prometheus(self):
+        """Format d'exposition texte Prometheus (0.0.4)."""
+        lines = []
+        for family in self.collect():
+            samples = family.samples()
+            if not samples:
+                continue
+            if family.help:
+                lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for labels, value in samples:
+                if family.kind != HISTOGRAM:
+                    lines.append(f"{family.name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(family.bounds + (math.inf,), value["counts"]):
+                    cumulative += count
+                    bucket = labels + (("le", _format_value(float(bound))),)
+                    lines.append(f"{family.name}_bucket{_format_labels(bucket)} {cumulative}")
+                lines.append(f"{family.name}_sum{_format_labels(labels)} "
+                             f"{_format_value(value['sum'])}")
+                lines.append(f"{family.name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, now=None):
+        """Instantané JSON : ``{timestamp, metrics: {nom: {type, help, bounds?,
+        samples: [{labels, value}]}}}``."""
+        metrics = {}
+        for family in self.collect():
+            entry = {"type": family.kind, "help": family.help,
+                     "samples": [{"labels": dict(labels), "value": value}
+                                 for labels, value in family.samples()]}
+            if family.bounds is not None:
+                entry["bounds"] = list(family.bounds)
+            metrics[family.name] = entry
+        return {"timestamp": time.time() if now is None else now, "metrics": metrics}
+
+
+# --- Collecteurs --------------------------------------------------------------
+# Chacun accepte None (composant pas encore créé : écran de connexion, liste ou
+# notifications jamais affichées) et ne fait alors rien.
+
+def collect_network(registry, manager):
+    if manager is None:
+        return
+    depth = registry.gauge("http_queue_depth", "Requêtes en attente par voie")
+    dequeued = registry.counter("http_requests_dequeued_total", "Requêtes sorties de file")
+    max_wait = registry.gauge("http_queue_wait_max_seconds", "Attente maximale en file")
+    for lane, stats in manager.lane_stats().items():
+        depth.set(stats.get("depth", 0), lane=lane)
+        dequeued.set(stats.get("dequeued", 0), lane=lane)
+        max_wait.set(stats.get("max_wait_s") or 0.0, lane=lane)
+    for lane, snapshot in manager.latency_histograms().items():
+        registry.histogram("http_latency_seconds", "Création -> livraison d'une requête",
+                           snapshot["bounds"]).load(snapshot, lane=lane)
+    registry.counter("http_coalesced_total", "GET identiques regroupés").set(
+        manager.coalescing_stats().get("saved", 0))
+    registry.counter("http_cache_hits_total", "Réponses 304 servies du cache").set(
+        manager.cache_stats().get("hits", 0))
+    wire = registry.counter("http_wire_bytes_total", "Octets échangés sur le réseau")
+    saved = registry.counter("http_saved_bytes_total", "Octets évités par la compression")
+    sent = received = economy = 0
+    for endpoint in manager.bandwidth_stats().values():
+        sent += endpoint["request_wire_bytes"]
+        received += endpoint["response_wire_bytes"]
+        economy += endpoint["saved_bytes"]
+    wire.set(sent, direction="sent")
+    wire.set(received, direction="received")
+    saved.set(economy)
+    circuit = registry.gauge("http_circuit_open", "Disjoncteur ouvert (1) par serveur")
+    for base, state in manager.circuit_states().items():
+        circuit.set(int(state != "closed"), server=base)
+    first_click = manager.warmup_stats()["first_click"]["last_s"]
+    if first_click is not None:
+        registry.gauge("http_first_click_seconds",
+                       "Latence de la première action après inactivité").set(first_click)
+
+
+def collect_websocket(registry, client):
+    stats = getattr(client, "stats", None)
+    if not callable(stats):
+        return
+    stats = stats()
+    registry.gauge("ws_connected", "Lien temps réel connecté").set(int(stats["connected"]))
+    registry.counter("ws_reconnects_total", "Reconnexions du lien temps réel").set(
+        stats["reconnects"])
+    registry.counter("ws_events_total", "Évènements temps réel reçus").set(stats["events"])
+    registry.gauge("ws_events_per_second", "Débit d'évènements (fenêtre glissante)").set(
+        stats["events_per_s"])
+    if stats["last_event_age_s"] is not None:
+        registry.gauge("ws_last_event_age_seconds", "Âge du dernier évènement").set(
+            stats["last_event_age_s"])
+    if stats["rtt_s"] is not None:
+        registry.gauge("ws_rtt_seconds", "Aller-retour du lien temps réel").set(stats["rtt_s"])
+    registry.counter("ws_coalesced_dropped_total",
+                     "Mises à jour de file écartées par regroupement des rafales").set(
+        stats.get("coalesced_dropped", 0))
+    registry.counter("ws_dead_link_reconnects_total",
+                     "Reconnexions forcées pour lien temps réel muet").set(
+        stats.get("dead_links", 0))
+
+
+def collect_patient_list(registry, model):
+    stats = getattr(model, "stats", None)
+    if not callable(stats):
+        return
+    stats = stats()
+    registry.gauge("patient_list_rows", "Patients affichés").set(stats["rows"])
+    registry.counter("patient_list_updates_total", "Mises à jour de la liste").set(
+        stats["updates"])
+    changes = registry.counter("patient_list_row_changes_total", "Lignes modifiées par type")
+    for op in ("inserted", "removed", "moved", "changed"):
+        changes.set(stats.get(op, 0), op=op)
+    registry.counter("patient_list_patches_total", "Patchs de file appliqués sans diff").set(
+        stats.get("patches", 0))
+    duration = stats["duration"]
+    registry.histogram("patient_list_update_seconds", "Durée d'une mise à jour du modèle",
+                       duration["bounds"]).load(duration)
+
+
+def collect_notifications(registry, manager):
+    stats = getattr(manager, "stats", None)
+    if not callable(stats):
+        return
+    stats = stats()
+    total = registry.counter("notifications_total", "Notifications par issue")
+    for outcome in ("shown", "duplicates", "queued"):
+        total.set(stats[outcome], outcome=outcome)
+    registry.gauge("notifications_visible", "Notifications affichées").set(stats["visible"])
+    registry.gauge("notifications_pending", "Notifications en file").set(stats["pending"])
+
+
+def collect_click_latency(registry, tracker):
+    if tracker is None:
+        return
+    latency = registry.gauge("click_latency_seconds", "Latence clic -> écran (percentiles)")
+    count = registry.gauge("click_latency_window_samples", "Mesures clic -> écran en fenêtre")
+    for action, stats in tracker.summary().items():
+        count.set(stats["count"], action=action)
+        for quantile, key in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+            if stats[key] is not None:
+                latency.set(stats[key], action=action, quantile=quantile)
+
+
+# --- Export -------------------------------------------------------------------
+
+class MetricsExporter:
+    """Écrit périodiquement les métriques sur disque (voir docstring du module),
+    depuis un thread dédié : aucune écriture dans le thread GUI."""
+
+    def __init__(self, registry, directory, interval_s=DEFAULT_EXPORT_INTERVAL_S,
+                 backup_count=HISTORY_BACKUP_COUNT):
+        self._registry = registry
+        self._directory = str(directory)
+        self._interval_s = interval_s
+        self._backup_count = backup_count
+        self._history = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def prometheus_path(self):
+        return os.path.join(self._directory, PROMETHEUS_FILENAME)
+
+    @property
+    def history_path(self):
+        return os.path.join(self._directory, JSON_HISTORY_FILENAME)
+
+    def _history_handler(self):
+        if self._history is None:
+            self._history = TimedRotatingFileHandler(
+                filename=self.history_path, when="midnight", interval=1,
+                backupCount=self._backup_count, encoding="utf-8")
+            self._history.setFormatter(logging.Formatter("%(message)s"))
+        return self._history
+
+    def dump(self):
+        """Un export immédiat. Retourne False (journalisé) si l'écriture échoue."""
+        with self._lock:
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+                tmp = self.prometheus_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+                    f.write(self._registry.to_prometheus())
+                os.replace(tmp, self.prometheus_path)
+                line = json.dumps(self._registry.to_json(), ensure_ascii=False,
+                                  separators=(",", ":"))
+                self._history_handler().emit(logging.makeLogRecord({"msg": line}))
+                return True
+            except Exception as e:
+                logger.warning("Export des métriques impossible : %s", e)
+                return False
+
+    def start(self):
+        if self._thread is not None or self._interval_s <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval_s):
+            self.dump()
+
+    def stop(self, timeout_s=2.0):
+        """Arrête le thread et fait un dernier export (état à la fermeture)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+            self._thread = None
+            self.dump()
+        with self._lock:
+            if self._history is not None:
+                self._history.close()
+                self._history = None
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        registry = self.server.registry
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body, content_type = registry.to_prometheus().encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+        elif path == "/metrics.json":
+            body = json.dumps(registry.to_json(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer:
+    """Expose le registre sur ``127.0.0.1:port`` (jamais sur le réseau local)."""
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        self._registry = registry
+        self._address = (host, port)
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1] if self._httpd is not None else None
+
+    def start(self):
+        """Démarre le serveur. Retourne False (journalisé) si le port est pris."""
+        if self._httpd is not None:
+            return True
+        try:
+            httpd = ThreadingHTTPServer(self._address, _MetricsRequestHandler)
+        except OSError as e:
+            logger.warning("Serveur de métriques indisponible (%s:%s) : %s",
+                           self._address[0], self._address[1], e)
+            return False
+        httpd.daemon_threads = True
+        httpd.registry = self._registry
+        self._httpd = httpd
+        self._thread = threading.Thread(target=httpd.serve_forever, name="metrics-http",
+                                        daemon=True)
+        self._thread.start()
+        logger.info("Métriques servies sur http://%s:%s/metrics", self._address[0], self.port)
+        return True
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+        self._thread = None
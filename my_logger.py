@@ -35,6 +35,9 @@ APP_LOGGER_NAME = "appcomptoir"
 _FORMAT = "%(asctime)s [%(levelname)s] %(name)s %(message)s"
 _DATEFMT = "%Y-%m-%d %H:%M:%S"
 
+# Rotation des fichiers de log : un fichier par jour, une semaine gardée.
+LOG_BACKUP_COUNT = 7
+
 # Longueur minimale d'une valeur enregistrée pour être masquée telle quelle
 # (évite de masquer des fragments courts et fréquents).
 _MIN_SECRET_LEN = 4
@@ -128,6 +131,29 @@ def register_secret(value):
     _redacting_filter.register_secret(value)
 
 
+def rotating_file_handler(filename, directory=None):
+    """Fichier journal tournant (minuit, ``LOG_BACKUP_COUNT`` jours gardés) dans
+    ``directory`` (défaut : ``default_log_dir()``), au format et avec le masquage
+    du journal applicatif. Sert aussi aux journaux dédiés (ex. gels de l'UI).
+    Lève OSError si le dossier ou le fichier ne peut être créé."""
+    log_directory = Path(directory) if directory is not None else default_log_dir()
+    log_directory.mkdir(parents=True, exist_ok=True)
+    try:
+        os.chmod(log_directory, 0o700)
+    except OSError:
+        pass
+    handler = TimedRotatingFileHandler(
+        filename=str(log_directory / filename),
+        when="midnight",
+        interval=1,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    handler.setFormatter(logging.Formatter(_FORMAT, datefmt=_DATEFMT))
+    handler.addFilter(_redacting_filter)
+    return handler
+
+
 class LogHandler(logging.Handler):
     """Handler qui pousse chaque ligne formatée vers un callback (fenêtre UI)."""
 
@@ -193,20 +219,7 @@ class AppLogger:
 
         # Fichier tournant dans le dossier utilisateur.
         try:
-            log_directory = default_log_dir()
-            log_directory.mkdir(parents=True, exist_ok=True)
-            try:
-                os.chmod(log_directory, 0o700)
-            except OSError:
-                pass
-            file_handler = TimedRotatingFileHandler(
-                filename=str(log_directory / LOG_FILENAME),
-                when="midnight",
-                interval=1,
-                backupCount=7,
-                encoding="utf-8",
-            )
-            handlers.append(file_handler)
+            handlers.append(rotating_file_handler(LOG_FILENAME))
         except Exception as e:  # pragma: no cover - dépend de l'environnement
             logging.getLogger(APP_LOGGER_NAME).warning(
                 "Journalisation fichier indisponible (%s), sortie console seule.", e)
@@ -0,0 +1,141 @@
+"""Cache de réponses HTTP à revalidation conditionnelle (sans dépendance PySide,
+testable seule).
+
+``init_state`` (``/api/counter/<id>/state``), la liste des comptoirs ou celle des
+activités étaient retéléchargés en entier à chaque resync, reconnexion ou
+ouverture de dialogue, même sans changement. Quand le serveur fournit un
+validateur (``ETag`` et/ou ``Last-Modified``), on garde le corps de la dernière
+réponse 200 et on renvoie le validateur (``If-None-Match`` /
+``If-Modified-Since``) : un ``304 Not Modified`` ne coûte alors que des
+en-têtes, et l'appelant reçoit le corps mémorisé.
+
+Bornes : au plus ``max_entries`` entrées (la moins récemment utilisée est
+évincée) et chaque entrée expire ``ttl_s`` secondes après sa dernière
+validation (au-delà, la requête repart sans condition). Seul le TEXTE du corps
+est conservé : chaque lecture est redécodée, donc deux appelants ne partagent
+jamais le même objet JSON (pas de modification croisée).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_TTL_S = 300.0
+
+
+def _header(headers, name):
+    """Lecture d'en-tête insensible à la casse (dict simple ou
+    ``CaseInsensitiveDict`` de requests)."""
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is not None:
+        return value
+    lowered = name.lower()
+    for key, value in headers.items():
+        if str(key).lower() == lowered:
+            return value
+    return None
+
+
+class CachedResponse:
+    """Corps mémorisé d'une réponse 200 et ses validateurs."""
+
+    __slots__ = ("etag", "last_modified", "text", "content_type", "validated_at")
+
+    def __init__(self, etag, last_modified, text, content_type, validated_at):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.text = text
+        self.content_type = content_type
+        self.validated_at = validated_at
+
+
+class ResponseCache:
+    """Cache LRU + TTL, partagé entre workers (accès sous verrou).
+
+    Flux d'utilisation :
+    - ``conditional_headers(key)`` avant l'envoi (vide si rien de frais) ;
+    - réponse 200 -> ``store(key, en-têtes, texte, content_type)`` ;
+    - réponse 304 -> ``revalidated(key)`` renvoie l'entrée à servir.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_s=DEFAULT_TTL_S,
+                 clock=time.monotonic):
+        self._max_entries = max(1, max_entries)
+        self._ttl_s = ttl_s
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0        # 304 servis depuis le cache
+        self._stores = 0
+        self._evictions = 0
+
+    def _fresh_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() - entry.validated_at > self._ttl_s:
+            del self._entries[key]
+            self._evictions += 1
+            return None
+        return entry
+
+    def conditional_headers(self, key):
+        """En-têtes conditionnels pour ``key`` (``{}`` si aucune entrée fraîche)."""
+        with self._lock:
+            entry = self._fresh_locked(key)
+            if entry is None:
+                return {}
+            headers = {}
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            return headers
+
+    def store(self, key, response_headers, text, content_type=None):
+        """Mémorise une réponse 200 si elle porte un validateur. Retourne True si
+        elle a été conservée (sinon, toute entrée précédente est oubliée)."""
+        etag = _header(response_headers, "ETag")
+        last_modified = _header(response_headers, "Last-Modified")
+        cache_control = (_header(response_headers, "Cache-Control") or "").lower()
+        with self._lock:
+            if (not etag and not last_modified) or "no-store" in cache_control:
+                self._entries.pop(key, None)
+                return False
+            self._entries[key] = CachedResponse(etag, last_modified, text or "",
+                                                content_type, self._clock())
+            self._entries.move_to_end(key)
+            self._stores += 1
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            return True
+
+    def revalidated(self, key):
+        """Le serveur a répondu 304 : renvoie l'entrée (rafraîchie et marquée
+        récemment utilisée), ou None si elle a disparu entre-temps."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.validated_at = self._clock()
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """``{entries, hits (304 servis), stores, evictions}``."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits,
+                    "stores": self._stores, "evictions": self._evictions}
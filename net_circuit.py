@@ -0,0 +1,128 @@
+"""Disjoncteur (« circuit breaker ») par serveur pour le gestionnaire réseau
+(sans dépendance PySide, testable seul).
+
+Quand le serveur de l'officine est arrêté, chaque job en file payait le timeout
+de connexion (5 s) l'un après l'autre : une rafale de clics devenait une minute
+d'actions périmées envoyées en retard. Le disjoncteur compte les échecs réseau
+consécutifs (``status == 0``) par URL de base :
+
+- ``closed``    : fonctionnement normal ;
+- ``open``      : après ``failure_threshold`` échecs consécutifs, les requêtes
+  échouent immédiatement (sans toucher au réseau) ;
+- ``half_open`` : après ``reset_timeout_s``, UNE sonde (hors file) vérifie que le
+  serveur répond ; succès -> ``closed``, échec -> ``open`` avec un délai doublé
+  (plafonné à ``max_reset_timeout_s``).
+
+Toute réponse HTTP, même une erreur 4xx/5xx, prouve que le serveur est joignable
+et referme le circuit.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def base_url(url):
+    """URL de base (``schéma://hôte[:port]``) servant de clé au disjoncteur."""
+    parts = urlsplit(url or "")
+    if not parts.scheme or not parts.netloc:
+        return url or ""
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class CircuitBreaker:
+    """Disjoncteur d'un serveur. Les méthodes ``record_*`` renvoient True quand
+    l'état a changé (pour notifier l'interface une seule fois par transition)."""
+
+    def __init__(self, failure_threshold=3, reset_timeout_s=5.0,
+                 max_reset_timeout_s=60.0, clock=time.monotonic):
+        self._threshold = max(1, failure_threshold)
+        self._base_reset = reset_timeout_s
+        self._max_reset = max(reset_timeout_s, max_reset_timeout_s)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._reset_timeout = reset_timeout_s
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    @property
+    def reset_timeout(self):
+        """Délai courant avant la prochaine sonde (doublé à chaque sonde ratée)."""
+        with self._lock:
+            return self._reset_timeout
+
+    def allow(self):
+        """Une requête normale peut-elle partir ? (False tant que le circuit
+        n'est pas refermé : seule la sonde passe en demi-ouverture)."""
+        with self._lock:
+            return self._state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            changed = self._state != CLOSED
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._reset_timeout = self._base_reset
+            return changed
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                # Sonde ratée : on rouvre avec un délai allongé.
+                self._reset_timeout = min(self._reset_timeout * 2, self._max_reset)
+                self._open_locked()
+                return True
+            self._failures += 1
+            if self._state == CLOSED and self._failures >= self._threshold:
+                self._open_locked()
+                return True
+            return False
+
+    def _open_locked(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+
+    def try_begin_probe(self):
+        """Réserve la sonde si le délai d'ouverture est écoulé (passe en
+        ``half_open``). Renvoie True pour l'appelant qui doit sonder."""
+        with self._lock:
+            if self._state != OPEN:
+                return False
+            if self._clock() - self._opened_at < self._reset_timeout:
+                return False
+            self._state = HALF_OPEN
+            return True
+
+
+class CircuitRegistry:
+    """Un disjoncteur par URL de base, créés à la demande avec les mêmes
+    réglages."""
+
+    def __init__(self, **breaker_kwargs):
+        self._kwargs = breaker_kwargs
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker_for(self, url):
+        key = base_url(url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(**self._kwargs)
+            return breaker
+
+    def states(self):
+        """``{url de base: état}``."""
+        with self._lock:
+            return {key: breaker.state for key, breaker in self._breakers.items()}
@@ -0,0 +1,158 @@
+"""Compression HTTP et compteurs d'octets par point d'accès (sans dépendance
+PySide, testable seul).
+
+``/state`` renvoie toute la file (``standing_list``) et ``activities_staff`` à
+chaque resync : sur un lien VPN ou 4G de secours, ces corps JSON dominent la
+latence alors qu'ils se compressent d'un facteur 5 à 10.
+
+- Réponses : le client annonce ``Accept-Encoding: gzip, deflate`` (plus ``br``
+  si un module brotli est installé localement, import optionnel) et décode le
+  corps reçu. Le moteur ``requests`` le fait déjà via urllib3 ; le moteur
+  asyncio (``net_transport``) s'appuie sur ``accept_encoding``/``decode_body``.
+- Requêtes : optionnellement (préférence ``compress_requests``), un corps de
+  POST d'au moins ``min_bytes`` est envoyé compressé en gzip
+  (``Content-Encoding: gzip``). Le serveur doit le décompresser : s'il répond
+  ``415``, la requête est renvoyée en clair et la compression est abandonnée
+  pour ce serveur.
+- ``ByteCounters`` : octets avant/après compression, par motif de point d'accès
+  (``net_timeouts.endpoint_pattern``), pour mesurer la bande passante économisée.
+"""
+
+import gzip
+import threading
+import zlib
+from urllib.parse import urlencode
+
+from net_timeouts import endpoint_pattern
+
+try:  # optionnel : décodage brotli (Content-Encoding: br)
+    import brotli
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    brotli = None
+
+# Taille minimale d'un corps de requête pour qu'il vaille la peine d'être
+# compressé (en dessous, l'en-tête gzip et le CPU coûtent plus qu'ils ne gagnent).
+DEFAULT_MIN_REQUEST_BYTES = 1024
+
+# Statut d'un serveur qui refuse un corps compressé.
+UNSUPPORTED_MEDIA_TYPE = 415
+
+
+def accept_encoding():
+    """Valeur de ``Accept-Encoding`` pour les encodages décodables localement."""
+    encodings = ["gzip", "deflate"]
+    if brotli is not None:
+        encodings.append("br")
+    return ", ".join(encodings)
+
+
+def decode_body(content, content_encoding):
+    """Décode ``content`` selon ``Content-Encoding`` (liste éventuellement
+    chaînée, appliquée dans l'ordre inverse). Lève ValueError si l'encodage est
+    inconnu ou le corps corrompu."""
+    encodings = [e.strip().lower() for e in (content_encoding or "").split(",") if e.strip()]
+    for encoding in reversed(encodings):
+        if encoding == "identity":
+            continue
+        try:
+            if encoding in ("gzip", "x-gzip"):
+                content = gzip.decompress(content)
+            elif encoding == "deflate":
+                # « deflate » est tantôt zlib (RFC), tantôt deflate brut.
+                try:
+                    content = zlib.decompress(content)
+                except zlib.error:
+                    content = zlib.decompress(content, -zlib.MAX_WBITS)
+            elif encoding == "br" and brotli is not None:
+                content = brotli.decompress(content)
+            else:
+                raise ValueError(f"encodage de contenu non supporté : {encoding}")
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"corps {encoding} invalide : {e}") from None
+    return content
+
+
+def form_body(data):
+    """Corps ``bytes`` d'un POST tel que ``requests`` l'enverrait (formulaire
+    pour un dict, UTF-8 pour une chaîne), ou None sans corps."""
+    if data is None:
+        return None
+    if isinstance(data, (dict, list, tuple)):
+        return urlencode(data, doseq=True).encode("ascii")
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return bytes(data)
+
+
+def compress_body(body, min_bytes=DEFAULT_MIN_REQUEST_BYTES):
+    """Corps gzip si ``body`` atteint ``min_bytes`` ET y gagne, sinon None."""
+    if body is None or len(body) < min_bytes:
+        return None
+    compressed = gzip.compress(body, compresslevel=6)
+    return compressed if len(compressed) < len(body) else None
+
+
+def response_sizes(resp):
+    """``(octets reçus, octets décodés)`` d'une réponse. Les octets reçus sont
+    ceux du transport quand il les connaît (``wire_bytes`` du moteur asyncio,
+    ``raw.tell()`` d'urllib3), sinon la taille décodée."""
+    content = getattr(resp, "content", None)
+    if not isinstance(content, (bytes, bytearray)):
+        content = (getattr(resp, "text", "") or "").encode("utf-8")
+    decoded = len(content)
+    wire = getattr(resp, "wire_bytes", None)
+    if wire is None:
+        tell = getattr(getattr(resp, "raw", None), "tell", None)
+        try:
+            wire = tell() if callable(tell) else None
+        except Exception:
+            wire = None
+    if not isinstance(wire, int) or (wire == 0 and decoded):
+        wire = decoded
+    return wire, decoded
+
+
+class ByteCounters:
+    """Octets par motif de point d'accès, avant (``*_bytes``) et après
+    (``*_wire_bytes``) compression. Partagés entre workers (sous verrou)."""
+
+    _FIELDS = ("requests", "request_bytes", "request_wire_bytes",
+               "responses", "response_bytes", "response_wire_bytes")
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _counters_locked(self, url):
+        pattern = endpoint_pattern(url)
+        counters = self._endpoints.get(pattern)
+        if counters is None:
+            counters = self._endpoints[pattern] = dict.fromkeys(self._FIELDS, 0)
+        return counters
+
+    def record_request(self, url, raw_bytes, wire_bytes):
+        with self._lock:
+            counters = self._counters_locked(url)
+            counters["requests"] += 1
+            counters["request_bytes"] += raw_bytes
+            counters["request_wire_bytes"] += wire_bytes
+
+    def record_response(self, url, wire_bytes, decoded_bytes):
+        with self._lock:
+            counters = self._counters_locked(url)
+            counters["responses"] += 1
+            counters["response_bytes"] += decoded_bytes
+            counters["response_wire_bytes"] += wire_bytes
+
+    def snapshot(self):
+        """``{motif: {compteurs..., saved_bytes}}`` ; ``saved_bytes`` : octets
+        évités sur le réseau (requêtes et réponses)."""
+        with self._lock:
+            snapshot = {}
+            for pattern, counters in self._endpoints.items():
+                entry = dict(counters)
+                entry["saved_bytes"] = (
+                    counters["request_bytes"] - counters["request_wire_bytes"]
+                    + counters["response_bytes"] - counters["response_wire_bytes"])
+                snapshot[pattern] = entry
+            return snapshot
@@ -5,6 +5,9 @@ Isolée pour être testable seule. Ne fait pas d'I/O : on lui injecte un ``send`
 un ``reauth`` (qui renouvelle le jeton et renvoie un booléen de succès).
 """
 
+import random
+import threading
+
 
 def perform_with_reauth(send, reauth, max_retries_on_401=1):
     """Exécute une requête avec renouvellement du jeton sur 401 et UN SEUL rejeu.
@@ -25,3 +28,136 @@ def perform_with_reauth(send, reauth, max_retries_on_401=1):
         response = send()
         retries += 1
     return response
+
+
+def token_ttl_from_payload(payload):
+    """Durée de vie (secondes) annoncée dans la réponse de ``/api/get_app_token``
+    (``expires_in`` ou ``ttl``), ou None si absente/invalide."""
+    if not isinstance(payload, dict):
+        return None
+    for field in ("expires_in", "ttl"):
+        value = payload.get(field)
+        if isinstance(value, bool):
+            continue
+        try:
+            ttl = float(value)
+        except (TypeError, ValueError):
+            continue
+        if ttl > 0:
+            return ttl
+    return None
+
+
+def proactive_refresh_delay(ttl_s, margin_ratio=0.2, min_margin_s=30.0, min_delay_s=5.0):
+    """Délai (secondes) avant de renouveler un jeton de durée de vie ``ttl_s``,
+    pour qu'il soit remplacé AVANT d'expirer (plus de 401 suivi d'un rejeu sur
+    le chemin d'une action utilisateur).
+
+    La marge vaut ``margin_ratio`` de la durée de vie, au moins ``min_margin_s``,
+    sans dépasser la moitié de la durée de vie (jeton très court). Le délai ne
+    descend pas sous ``min_delay_s`` (pas de boucle de renouvellement). None si
+    la durée de vie est inconnue (aucun renouvellement programmé)."""
+    if not ttl_s or ttl_s <= 0:
+        return None
+    margin = min(max(ttl_s * margin_ratio, min_margin_s), ttl_s / 2.0)
+    return max(min_delay_s, ttl_s - margin)
+
+
+class CancelToken:
+    """Jeton d'annulation d'une requête, partageable entre threads.
+
+    Avec le moteur ``requests``, annuler ne coupe pas une requête déjà partie :
+    le gestionnaire la lâche avant son (prochain) envoi et livre un
+    ``NetResult.cancelled``. Un transport qui sait couper une requête en vol
+    (``net_transport``, moteur asyncio) s'abonne via ``add_callback``."""
+
+    __slots__ = ("_event", "_callbacks", "_lock")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Appelle ``callback()`` à l'annulation (tout de suite si déjà annulé).
+        Retourne une fonction qui désabonne ``callback``."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def wait(self, timeout):
+        """Attend au plus ``timeout`` secondes ; True si annulé entre-temps
+        (une attente de rejeu s'interrompt dès l'annulation)."""
+        return self._event.wait(timeout)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+DROP_CANCELLED = "cancelled"
+DROP_EXPIRED = "expired"
+
+
+def drop_reason(cancel_token, deadline, now):
+    """Raison de lâcher une requête AVANT son envoi : ``DROP_CANCELLED`` si son
+    jeton est annulé, ``DROP_EXPIRED`` si son échéance (horloge monotone) est
+    dépassée, None si elle peut partir."""
+    if cancel_token is not None and cancel_token.cancelled:
+        return DROP_CANCELLED
+    if deadline is not None and now >= deadline:
+        return DROP_EXPIRED
+    return None
+
+
+# Statuts transitoires pour lesquels un rejeu a des chances d'aboutir : erreur
+# réseau/timeout (0) et passerelle/serveur momentanément indisponible.
+RETRYABLE_STATUSES = frozenset({0, 502, 503, 504})
+
+
+def backoff_delay(attempt, base, cap, rand=random.random):
+    """Délai avant la tentative n° ``attempt`` (>=1) : backoff exponentiel
+    plafonné avec jitter (« equal jitter »).
+
+    exp = min(cap, base * 2**(attempt-1)) ; délai = exp/2 + jitter dans [0, exp/2]."""
+    exp = min(cap, base * (2 ** (max(1, attempt) - 1)))
+    return exp / 2 + (exp / 2) * rand()
+
+
+class RetryPolicy:
+    """Rejeu automatique d'une requête idempotente sur échec transitoire.
+
+    ``max_attempts`` compte l'envoi initial (3 = un envoi + deux rejeux). Les
+    délais suivent ``backoff_delay`` (base ``base_s``, plafond ``cap_s``)."""
+
+    def __init__(self, max_attempts=3, base_s=0.25, cap_s=2.0,
+                 retry_statuses=RETRYABLE_STATUSES):
+        self.max_attempts = max(1, max_attempts)
+        self.base_s = base_s
+        self.cap_s = cap_s
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def should_retry(self, status, attempt):
+        """La tentative n° ``attempt`` a renvoyé ``status`` : faut-il rejouer ?"""
+        return attempt < self.max_attempts and status in self.retry_statuses
+
+    def delay(self, attempt, rand=random.random):
+        """Attente avant de rejouer après l'échec de la tentative n° ``attempt``."""
+        return backoff_delay(attempt, self.base_s, self.cap_s, rand)
@@ -7,7 +7,12 @@ livrer aux appelants un objet homogène plutôt qu'un triplet brut :
 - ``data`` : JSON décodé UNIQUEMENT si le corps est du JSON (content-type
   compatible), sinon None -> une réponse HTML/vide/malformée ne fait pas planter ;
 - ``message`` : message utilisateur court et distinct selon le statut ;
-- ``detail`` : détail technique à journaliser (jamais montré à l'utilisateur).
+- ``detail`` : détail technique à journaliser (jamais montré à l'utilisateur) ;
+- ``is_cancelled`` : requête lâchée avant envoi (annulée ou échéance dépassée) ;
+  ce n'est pas une panne réseau (``is_timeout`` reste faux) ;
+- ``attempts`` : nombre d'envois effectués (> 1 après rejeu automatique) ;
+- ``request_id`` : identifiant de corrélation (``X-Request-Id``) de la requête
+  envoyée, pour retrouver sa décomposition temporelle (``net_trace``).
 """
 
 import json
@@ -47,15 +52,20 @@ def parse_json_if_possible(text, content_type):
 class NetResult:
     """Résultat homogène d'une requête réseau."""
 
-    __slots__ = ("status", "data", "text", "message", "detail", "content_type")
+    __slots__ = ("status", "data", "text", "message", "detail", "content_type",
+                 "is_cancelled", "attempts", "request_id")
 
-    def __init__(self, status, data=None, text="", message="", detail="", content_type=None):
+    def __init__(self, status, data=None, text="", message="", detail="", content_type=None,
+                 is_cancelled=False):
         self.status = status
         self.data = data
         self.text = text
         self.message = message
         self.detail = detail
         self.content_type = content_type
+        self.is_cancelled = is_cancelled
+        self.attempts = 1
+        self.request_id = None
 
     @property
     def success(self):
@@ -63,7 +73,7 @@ class NetResult:
 
     @property
     def is_timeout(self):
-        return self.status == 0
+        return self.status == 0 and not self.is_cancelled
 
     @classmethod
     def from_response(cls, status, text, content_type=None, detail=""):
@@ -79,5 +89,12 @@ class NetResult:
         return cls(status=0, data=None, text="", message=user_message_for_status(0),
                    detail=detail or "erreur réseau")
 
+    @classmethod
+    def cancelled(cls, detail="", message=""):
+        """Requête lâchée avant envoi. ``message`` vide par défaut : une
+        annulation voulue (changement de comptoir) ne s'affiche pas."""
+        return cls(status=0, data=None, text="", message=message,
+                   detail=detail or "requête annulée", is_cancelled=True)
+
     def __repr__(self):  # pragma: no cover - confort de debug
         return f"NetResult(status={self.status}, success={self.success})"
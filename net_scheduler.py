@@ -0,0 +1,222 @@
+"""File d'attente à priorités du gestionnaire réseau (sans dépendance PySide,
+testable seule).
+
+Le worker réseau traitait une unique file FIFO : une action utilisateur (« patient
+suivant ») pouvait attendre derrière une resync ``/state`` lente ou un
+``setup_user`` en train d'expirer. On sépare donc les requêtes en *voies* :
+
+- ``LANE_INTERACTIVE`` : actions déclenchées par l'utilisateur (clics, raccourcis) ;
+- ``LANE_BACKGROUND``  : trafic de fond (démarrage, resync, jeton).
+
+Le worker sert toujours la voie interactive en premier ; l'ordre FIFO est conservé
+À L'INTÉRIEUR de chaque voie. Chaque voie tient ses compteurs (profondeur, nombre
+de jobs servis, temps d'attente cumulé/max/dernier) pour pouvoir vérifier que le
+délai clic -> envoi reste plat même quand le serveur est lent.
+
+Ordre par clé : quand plusieurs workers consomment la même file, deux éléments
+portant la même ``order_key`` (p. ex. les actions sur le patient du comptoir) ne
+sont jamais servis en même temps et restent dans l'ordre d'arrivée. Un élément
+dont la clé est « occupée » est sauté (les suivants, d'autres clés, passent) ;
+le consommateur libère la clé par ``task_done(item)`` une fois le travail fini.
+Un élément sans clé (``None``) n'a aucune contrainte d'ordre.
+
+L'interface reprend celle de ``queue.Queue`` utilisée jusqu'ici (``put``, ``get``,
+``get_nowait`` qui lève ``queue.Empty``, ``task_done``).
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+# Ordre de priorité : la première voie non vide est servie en premier.
+LANES = (LANE_INTERACTIVE, LANE_BACKGROUND)
+
+
+class LaneStats:
+    """Compteurs d'une voie (mis à jour sous le verrou de la file)."""
+
+    __slots__ = ("depth", "enqueued", "dequeued", "total_wait", "max_wait", "last_wait")
+
+    def __init__(self):
+        self.depth = 0
+        self.enqueued = 0
+        self.dequeued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def snapshot(self):
+        avg = self.total_wait / self.dequeued if self.dequeued else 0.0
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "dequeued": self.dequeued,
+            "avg_wait_s": avg,
+            "max_wait_s": self.max_wait,
+            "last_wait_s": self.last_wait,
+        }
+
+
+class PriorityJobQueue:
+    """File multi-voies, servie par ordre de priorité des voies puis FIFO.
+
+    ``put(item)`` sans voie explicite utilise ``item.lane`` s'il existe, sinon la
+    voie de fond (la moins prioritaire). La clé d'ordre est lue dans
+    ``item.order_key`` (absente = aucune contrainte). ``clock`` est injectable
+    pour les tests.
+    """
+
+    def __init__(self, lanes=LANES, clock=time.monotonic):
+        self._lanes = tuple(lanes)
+        self._clock = clock
+        self._items = {lane: deque() for lane in self._lanes}
+        self._stats = {lane: LaneStats() for lane in self._lanes}
+        self._seq = 0
+        # Par clé d'ordre : numéros d'arrivée encore en file (le premier est le
+        # seul servable, même s'il est dans une voie moins prioritaire).
+        self._pending_keys = {}
+        self._busy_keys = set()   # clés d'ordre en cours de traitement
+        self._cond = threading.Condition()
+
+    def _resolve_lane(self, item, lane):
+        if lane is None:
+            lane = getattr(item, "lane", None) or self._lanes[-1]
+        if lane not in self._items:
+            raise ValueError(f"Voie inconnue : {lane}")
+        return lane
+
+    def put(self, item, lane=None):
+        with self._cond:
+            lane = self._resolve_lane(item, lane)
+            self._seq += 1
+            key = getattr(item, "order_key", None)
+            if key is not None:
+                self._pending_keys.setdefault(key, deque()).append(self._seq)
+            self._items[lane].append((self._clock(), self._seq, item))
+            stats = self._stats[lane]
+            stats.depth += 1
+            stats.enqueued += 1
+            self._cond.notify()
+
+    def _find_ready_locked(self):
+        """Premier élément servable : voie la plus prioritaire, puis FIFO, en
+        sautant les éléments dont la clé d'ordre est occupée ou qui ont un
+        prédécesseur de même clé encore en file. Renvoie ``(voie, index)`` ou
+        None."""
+        for lane in self._lanes:
+            for index, (_, seq, item) in enumerate(self._items[lane]):
+                key = getattr(item, "order_key", None)
+                if key is None:
+                    return lane, index
+                if key not in self._busy_keys and self._pending_keys[key][0] == seq:
+                    return lane, index
+        return None
+
+    def _forget_key_locked(self, key):
+        pending = self._pending_keys[key]
+        pending.popleft()
+        if not pending:
+            del self._pending_keys[key]
+
+    def _pop_locked(self):
+        found = self._find_ready_locked()
+        if found is None:
+            raise queue.Empty
+        lane, index = found
+        items = self._items[lane]
+        enqueued_at, _, item = items[index]
+        del items[index]
+        key = getattr(item, "order_key", None)
+        if key is not None:
+            self._forget_key_locked(key)
+            self._busy_keys.add(key)
+        waited = max(0.0, self._clock() - enqueued_at)
+        stats = self._stats[lane]
+        stats.depth -= 1
+        stats.dequeued += 1
+        stats.total_wait += waited
+        stats.last_wait = waited
+        if waited > stats.max_wait:
+            stats.max_wait = waited
+        return item
+
+    def get(self, timeout=None):
+        """Retire le prochain élément (bloquant). Lève ``queue.Empty`` si rien
+        n'est disponible au bout de ``timeout`` secondes."""
+        with self._cond:
+            if not self._cond.wait_for(self._has_ready_locked, timeout):
+                raise queue.Empty
+            return self._pop_locked()
+
+    def get_nowait(self):
+        with self._cond:
+            return self._pop_locked()
+
+    def task_done(self, item):
+        """Libère la clé d'ordre de ``item`` (sans effet s'il n'en a pas) : le
+        prochain élément de même clé redevient servable."""
+        key = getattr(item, "order_key", None)
+        if key is None:
+            return
+        with self._cond:
+            self._busy_keys.discard(key)
+            self._cond.notify_all()
+
+    def drain(self):
+        """Retire et renvoie TOUS les éléments en file, clés occupées comprises
+        (purge à l'arrêt)."""
+        with self._cond:
+            drained = []
+            for lane in self._lanes:
+                items = self._items[lane]
+                drained.extend(item for _, _, item in items)
+                self._stats[lane].depth -= len(items)
+                items.clear()
+            self._pending_keys.clear()
+            return drained
+
+    def remove_if(self, predicate):
+        """Retire et renvoie (ordre de file) les éléments pour lesquels
+        ``predicate(item)`` est vrai : purge ciblée, p. ex. des requêtes annulées.
+        ``predicate`` est appelé sous le verrou de la file : il doit être rapide
+        et ne jamais rappeler la file."""
+        with self._cond:
+            removed = []
+            for lane in self._lanes:
+                items = self._items[lane]
+                kept = deque()
+                for entry in items:
+                    item = entry[2]
+                    if not predicate(item):
+                        kept.append(entry)
+                        continue
+                    removed.append((entry[1], item))
+                    key = getattr(item, "order_key", None)
+                    if key is not None:
+                        pending = self._pending_keys[key]
+                        pending.remove(entry[1])
+                        if not pending:
+                            del self._pending_keys[key]
+                self._stats[lane].depth -= len(items) - len(kept)
+                self._items[lane] = kept
+            if removed:
+                # Un élément retiré pouvait bloquer le suivant de même clé.
+                self._cond.notify_all()
+            return [item for _, item in sorted(removed, key=lambda pair: pair[0])]
+
+    def _has_ready_locked(self):
+        return self._find_ready_locked() is not None
+
+    def qsize(self, lane=None):
+        with self._cond:
+            if lane is not None:
+                return len(self._items[lane])
+            return sum(len(items) for items in self._items.values())
+
+    def stats(self):
+        """Copie des compteurs par voie : ``{voie: {depth, enqueued, ...}}``."""
+        with self._cond:
+            return {lane: self._stats[lane].snapshot() for lane in self._lanes}
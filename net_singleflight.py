@@ -0,0 +1,68 @@
+"""Regroupement (« single-flight ») des GET identiques en vol (sans dépendance
+PySide, testable seule).
+
+La resync, le démarrage et la fenêtre principale peuvent demander le même
+``GET`` (p. ex. ``/api/counter/<id>/state``) alors qu'une copie identique attend
+déjà dans la file réseau : chaque copie coûtait un aller-retour complet. Ici, le
+premier demandeur d'une clé devient le *meneur* (sa requête part réellement) ;
+les suivants s'y *rattachent* et recevront le même résultat à la fin.
+
+Seules les requêtes sans effet de bord sont regroupables : ``GET`` sans corps
+ni clé d'idempotence (voir ``flight_key``). Un POST n'est JAMAIS fusionné, même
+identique (deux clics = deux actions).
+"""
+
+import threading
+
+
+def flight_key(method, url, headers=None, data=None, idempotency_key=None):
+    """Clé de regroupement d'une requête, ou None si elle n'est pas regroupable.
+
+    Deux GET de même URL et de mêmes en-têtes (ordre indifférent) ont la même
+    clé. Le jeton n'en fait pas partie : il est porté par la session, identique
+    pour tous les demandeurs au moment de l'envoi."""
+    if method != "GET" or data is not None or idempotency_key:
+        return None
+    header_items = tuple(sorted((str(k).lower(), str(v)) for k, v in (headers or {}).items()))
+    return (url, header_items)
+
+
+class SingleFlight:
+    """Registre des vols en cours : ``{clé: [meneur, rattachés...]}``.
+
+    ``join(key, waiter)`` renvoie True si ``waiter`` est le meneur (l'appelant
+    doit exécuter la requête), False s'il a été rattaché à un vol existant.
+    ``finish(key)`` clôt le vol et renvoie tous ses demandeurs (meneur en tête)
+    pour leur distribuer le résultat ; un ``join`` ultérieur ouvre un nouveau vol.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._leaders = 0
+        self._saved = 0
+
+    def join(self, key, waiter):
+        with self._lock:
+            waiters = self._flights.get(key)
+            if waiters is None:
+                self._flights[key] = [waiter]
+                self._leaders += 1
+                return True
+            waiters.append(waiter)
+            self._saved += 1
+            return False
+
+    def finish(self, key):
+        with self._lock:
+            return self._flights.pop(key, [])
+
+    def pending(self):
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self):
+        """``{"leaders": requêtes réellement envoyées, "saved": requêtes
+        économisées (rattachées à un vol existant)}``."""
+        with self._lock:
+            return {"leaders": self._leaders, "saved": self._saved}
@@ -0,0 +1,162 @@
+"""Timeouts adaptatifs par point d'accès, déduits de la latence observée (sans
+dépendance PySide, testable seul).
+
+Un timeout fixe ``(5, 10)`` est à la fois trop long pour un appel de quelques
+millisecondes sur le réseau local de l'officine (une panne met 5 à 10 s à être
+constatée) et trop court pour un snapshot ``/state`` lourd sur un serveur
+chargé. On tient donc, par *motif* de point d'accès (hôte + chemin, les
+segments numériques remplacés par ``{id}``), une estimation glissante de la
+latence à la manière du RTO de TCP (RFC 6298) :
+
+    srtt   <- (1 - alpha) * srtt + alpha * mesure
+    rttvar <- (1 - beta) * rttvar + beta * |srtt - mesure|
+    timeout de lecture = marge * (srtt + 4 * rttvar), borné [plancher, plafond]
+
+Le timeout de connexion suit la même estimation, tenue par hôte, bornée entre
+son plancher et le timeout de connexion par défaut. Tant qu'un motif n'a pas
+``min_samples`` mesures, le timeout par défaut s'applique. Un timeout constaté
+double le délai du motif (jusqu'à ``max_backoff``) jusqu'à la mesure suivante :
+un point d'accès devenu lent retrouve vite de la marge.
+
+Une requête qui ne peut pas être rejouée (POST sans clé d'idempotence :
+validation, pause…) garde un plancher de lecture de quelques secondes : sur
+le réseau local, une pause ponctuelle du serveur ferait sinon échouer, et
+compter dans le disjoncteur, une action pourtant appliquée côté serveur.
+"""
+
+import re
+import threading
+from urllib.parse import urlsplit
+
+# Bornes par défaut (secondes). Le plafond de lecture dépasse le timeout par
+# défaut : un point d'accès lent mais fiable garde sa marge.
+CONNECT_FLOOR_S = 0.5
+READ_FLOOR_S = 0.5
+NON_RETRYABLE_READ_FLOOR_S = 5.0
+READ_CEILING_S = 30.0
+MIN_SAMPLES = 5
+SAFETY_FACTOR = 2.0
+MAX_BACKOFF = 8
+
+_NUMERIC_SEGMENT = re.compile(r"^\d+$")
+
+
+def endpoint_pattern(url):
+    """Motif d'un point d'accès : ``hôte/chemin`` sans requête, segments
+    numériques remplacés par ``{id}`` (``/api/counter/3/state`` et
+    ``/api/counter/4/state`` partagent la même estimation)."""
+    parts = urlsplit(url or "")
+    segments = ["{id}" if _NUMERIC_SEGMENT.match(seg) else seg
+                for seg in parts.path.split("/")]
+    return f"{parts.netloc}{'/'.join(segments)}"
+
+
+class LatencyEstimator:
+    """Moyenne (srtt) et variation (rttvar) glissantes d'une latence."""
+
+    __slots__ = ("srtt", "rttvar", "samples", "backoff", "_alpha", "_beta")
+
+    def __init__(self, alpha=0.125, beta=0.25):
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoff = 1
+        self._alpha = alpha
+        self._beta = beta
+
+    def observe(self, elapsed_s):
+        if self.srtt is None:
+            self.srtt = elapsed_s
+            self.rttvar = elapsed_s / 2.0
+        else:
+            self.rttvar = (1 - self._beta) * self.rttvar + self._beta * abs(self.srtt - elapsed_s)
+            self.srtt = (1 - self._alpha) * self.srtt + self._alpha * elapsed_s
+        self.samples += 1
+        self.backoff = 1
+
+    def timed_out(self, max_backoff=MAX_BACKOFF):
+        self.backoff = min(self.backoff * 2, max_backoff)
+
+    def bound(self):
+        """``srtt + 4 * rttvar`` (multiplié par le recul en cours), ou None sans
+        mesure."""
+        if self.srtt is None:
+            return None
+        return (self.srtt + 4.0 * self.rttvar) * self.backoff
+
+
+class AdaptiveTimeouts:
+    """Timeouts ``(connexion, lecture)`` par point d'accès, partagés entre
+    workers (accès sous verrou).
+
+    - ``timeout_for(url, retryable)`` avant l'envoi (``retryable`` faux pour
+      une requête non rejouable : plancher ``non_retryable_read_floor_s``) ;
+    - ``observe(url, durée)`` après une réponse (quel que soit son statut) ;
+    - ``observe_timeout(url)`` après un timeout.
+    """
+
+    def __init__(self, default=(5, 10), connect_floor_s=CONNECT_FLOOR_S,
+                 read_floor_s=READ_FLOOR_S, read_ceiling_s=READ_CEILING_S,
+                 min_samples=MIN_SAMPLES, safety_factor=SAFETY_FACTOR,
+                 non_retryable_read_floor_s=NON_RETRYABLE_READ_FLOOR_S):
+        self._default = default
+        self._connect_floor = connect_floor_s
+        self._read_floor = read_floor_s
+        self._non_retryable_read_floor = max(non_retryable_read_floor_s, read_floor_s)
+        self._read_ceiling = max(read_ceiling_s, read_floor_s)
+        self._min_samples = max(1, min_samples)
+        self._safety = safety_factor
+        self._endpoints = {}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _estimators_locked(self, url):
+        pattern = endpoint_pattern(url)
+        host = urlsplit(url or "").netloc
+        endpoint = self._endpoints.get(pattern)
+        if endpoint is None:
+            endpoint = self._endpoints[pattern] = LatencyEstimator()
+        hosted = self._hosts.get(host)
+        if hosted is None:
+            hosted = self._hosts[host] = LatencyEstimator()
+        return endpoint, hosted
+
+    def _timeout_locked(self, endpoint, hosted, retryable=True):
+        default_connect, default_read = self._default
+        connect, read = default_connect, default_read
+        if hosted.samples >= self._min_samples:
+            connect = min(max(self._safety * hosted.bound(), self._connect_floor),
+                          default_connect)
+        if endpoint.samples >= self._min_samples:
+            floor = self._read_floor if retryable else self._non_retryable_read_floor
+            read = min(max(self._safety * endpoint.bound(), floor),
+                       max(self._read_ceiling, floor))
+        return connect, read
+
+    def timeout_for(self, url, retryable=True):
+        with self._lock:
+            return self._timeout_locked(*self._estimators_locked(url), retryable=retryable)
+
+    def observe(self, url, elapsed_s):
+        with self._lock:
+            for estimator in self._estimators_locked(url):
+                estimator.observe(elapsed_s)
+
+    def observe_timeout(self, url):
+        with self._lock:
+            for estimator in self._estimators_locked(url):
+                estimator.timed_out()
+
+    def snapshot(self):
+        """``{motif: {srtt_s, rttvar_s, samples, timeout}}`` (diagnostic)."""
+        with self._lock:
+            snapshot = {}
+            for pattern, endpoint in self._endpoints.items():
+                hosted = self._hosts.get(pattern.split("/", 1)[0]) or LatencyEstimator()
+                snapshot[pattern] = {
+                    "srtt_s": endpoint.srtt,
+                    "rttvar_s": endpoint.rttvar,
+                    "samples": endpoint.samples,
+                    "timeout": self._timeout_locked(endpoint, hosted),
+                }
+            return snapshot
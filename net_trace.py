@@ -0,0 +1,217 @@
+"""Traçage des requêtes : identifiant de corrélation et décomposition du temps
+(sans dépendance PySide, testable seul).
+
+Chaque requête du gestionnaire réseau porte un identifiant (en-tête
+``X-Request-Id``, le même pour ses rejeux) que le serveur peut journaliser : un
+« patient suivant » lent se retrouve des deux côtés. Côté client, un
+``RequestSpan`` horodate (horloge monotone) les étapes de la requête :
+
+    créée -> sortie de file -> envoyée -> réponse reçue -> décodée -> livrée
+          -> traitée par le slot du thread GUI (handles asynchrones)
+
+et ``breakdown()`` en déduit :
+
+- ``queue_wait_s`` : attente en file (priorité, clé d'ordre, workers occupés) ;
+- ``connect_s``    : établissement de connexion, si le transport le mesure
+  (moteur asyncio ; 0 sur une connexion réutilisée) ;
+- ``server_s``     : temps annoncé par le serveur (``Server-Timing`` ou
+  ``X-Response-Time``), s'il l'annonce ;
+- ``network_s``    : envoi -> réponse, moins le temps serveur connu (réseau,
+  connexion, attente du serveur non détaillée) ;
+- ``decode_s``     : décodage de la réponse (JSON) ;
+- ``dispatch_s``   : livraison -> exécution du slot dans le thread GUI (charge
+  de la boucle d'événements) ;
+- ``total_s``.
+
+Les spans terminés sont gardés dans un tampon circulaire en mémoire
+(``TraceBuffer``), consultable à chaud ; leur durée totale alimente aussi un
+histogramme par voie (``LatencyHistogram``, seuils fixes, sans limite de
+nombre).
+"""
+
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+REQUEST_ID_HEADER = "X-Request-Id"
+DEFAULT_TRACE_CAPACITY = 256
+
+# Bornes supérieures (secondes) des classes de l'histogramme de latence ; une
+# dernière classe reçoit tout ce qui dépasse.
+DEFAULT_LATENCY_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_DUR_PARAM = re.compile(r"(?:^|;)\s*dur\s*=\s*\"?([0-9.]+)\"?", re.IGNORECASE)
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+def server_time_s(headers):
+    """Temps de traitement annoncé par le serveur (secondes), ou None.
+
+    ``Server-Timing: total;dur=12.5, db;dur=3`` (millisecondes) : la métrique
+    ``total`` si présente, sinon la plus longue (les métriques se recouvrent
+    souvent). À défaut, ``X-Response-Time`` (``12ms``, ``0.012s`` ou un nombre
+    de millisecondes)."""
+    if not headers:
+        return None
+    timing = headers.get("Server-Timing")
+    if timing:
+        durations = {}
+        for metric in timing.split(","):
+            name = metric.split(";", 1)[0].strip().lower()
+            match = _DUR_PARAM.search(metric)
+            if match:
+                try:
+                    durations[name] = float(match.group(1)) / 1000.0
+                except ValueError:
+                    continue
+        if durations:
+            return durations.get("total", max(durations.values()))
+    value = (headers.get("X-Response-Time") or "").strip().lower()
+    if value:
+        try:
+            if value.endswith("ms"):
+                return float(value[:-2]) / 1000.0
+            if value.endswith("s"):
+                return float(value[:-1])
+            return float(value) / 1000.0
+        except ValueError:
+            return None
+    return None
+
+
+class RequestSpan:
+    """Étapes horodatées d'une requête (voir docstring du module)."""
+
+    __slots__ = ("request_id", "method", "url", "lane", "created_at", "dequeued_at",
+                 "sent_at", "received_at", "decoded_at", "delivered_at", "dispatched_at",
+                 "connect_s", "server_s", "status", "attempts", "leader_id", "wall_time",
+                 "_clock")
+
+    def __init__(self, method, url, lane=None, request_id=None, clock=time.monotonic):
+        self.request_id = request_id or new_request_id()
+        self.method = method
+        self.url = url
+        self.lane = lane
+        self._clock = clock
+        self.created_at = clock()
+        self.wall_time = time.time()
+        self.dequeued_at = None
+        self.sent_at = None
+        self.received_at = None
+        self.decoded_at = None
+        self.delivered_at = None
+        self.dispatched_at = None
+        self.connect_s = None
+        self.server_s = None
+        self.status = None
+        self.attempts = None
+        # Requête regroupée avec un GET identique déjà en vol : identifiant de
+        # celle qui est réellement partie.
+        self.leader_id = None
+
+    def mark(self, stage):
+        """Horodate l'étape ``stage`` (``dequeued``, ``sent``, ``received``,
+        ``decoded``, ``delivered``, ``dispatched``)."""
+        setattr(self, f"{stage}_at", self._clock())
+
+    @staticmethod
+    def _between(start, end):
+        if start is None or end is None:
+            return None
+        return max(0.0, end - start)
+
+    def breakdown(self):
+        network = self._between(self.sent_at, self.received_at)
+        if network is not None:
+            known = (self.server_s or 0.0) + (self.connect_s or 0.0)
+            network = max(0.0, network - known)
+        end = self.dispatched_at or self.delivered_at
+        return {
+            "queue_wait_s": self._between(self.created_at, self.dequeued_at),
+            "connect_s": self.connect_s,
+            "server_s": self.server_s,
+            "network_s": network,
+            "decode_s": self._between(self.received_at, self.decoded_at),
+            "dispatch_s": self._between(self.delivered_at, self.dispatched_at),
+            "total_s": self._between(self.created_at, end),
+        }
+
+    def to_dict(self):
+        record = {
+            "request_id": self.request_id,
+            "method": self.method,
+            "url": self.url,
+            "lane": self.lane,
+            "status": self.status,
+            "attempts": self.attempts,
+            "leader_id": self.leader_id,
+            "wall_time": self.wall_time,
+        }
+        record.update(self.breakdown())
+        return record
+
+
+class TraceBuffer:
+    """Derniers spans terminés (tampon circulaire, partagé entre threads)."""
+
+    def __init__(self, capacity=DEFAULT_TRACE_CAPACITY):
+        self._spans = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def recent(self, limit=None):
+        """Spans du plus ancien au plus récent (les ``limit`` derniers)."""
+        with self._lock:
+            spans = list(self._spans)
+        return spans[-limit:] if limit else spans
+
+    def get(self, request_id):
+        with self._lock:
+            for span in reversed(self._spans):
+                if span.request_id == request_id:
+                    return span
+        return None
+
+    def slowest(self, limit=10):
+        """Les ``limit`` spans les plus longs (durée totale connue)."""
+        spans = [s for s in self.recent() if s.breakdown()["total_s"] is not None]
+        spans.sort(key=lambda s: s.breakdown()["total_s"], reverse=True)
+        return spans[:limit]
+
+
+class LatencyHistogram:
+    """Histogramme de durées à classes fixes (partagé entre threads) :
+    ``counts[i]`` compte les durées ``<= bounds[i]`` (et > la borne
+    précédente), ``counts[-1]`` celles au-delà de la dernière borne."""
+
+    def __init__(self, bounds=DEFAULT_LATENCY_BOUNDS):
+        self.bounds = tuple(sorted(bounds))
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        """``{bounds, counts, count, sum_s}``."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        return {"bounds": list(self.bounds), "counts": counts,
+                "count": sum(counts), "sum_s": total}
@@ -0,0 +1,432 @@
+"""Moteurs de transport HTTP du gestionnaire réseau (sans dépendance PySide,
+testable seul).
+
+Le gestionnaire (``connections.NetworkManager``) ne parle qu'à un *transport*,
+objet au contrat d'une ``requests.Session`` réduite :
+
+- ``headers`` : en-têtes communs à toutes les requêtes (le jeton y est posé en
+  copie-puis-remplacement, jamais modifié en place) ;
+- ``get(url, headers=None, timeout=None)``,
+  ``post(url, data=None, headers=None, timeout=None)``,
+  ``head(url, timeout=None, allow_redirects=False)`` -> réponse portant
+  ``status_code``, ``text``, ``headers`` et ``json()`` ; les erreurs réseau sont
+  des ``requests.exceptions.RequestException`` (``Timeout`` pour un timeout) ;
+- ``close()`` ;
+- ``supports_cancel`` (optionnel) : True si les méthodes acceptent un
+  ``cancel_token`` qui coupe la requête EN VOL (``TransportCancelled``).
+
+Deux moteurs (préférence ``network_engine``, lue au démarrage) :
+
+- ``requests`` (défaut, comportement historique) : ``requests.Session`` avec un
+  pool de connexions dimensionné sur les workers. Chaque requête en cours occupe
+  un thread bloqué dans un appel socket ; une annulation attend la réponse ou le
+  timeout ;
+- ``asyncio`` : client HTTP/1.1 minimal sur une boucle asyncio dans UN thread
+  dédié (bibliothèque standard uniquement). Toutes les connexions, lectures et
+  timeouts de toutes les requêtes sont multiplexés sur cette boucle ; les
+  workers ne font qu'attendre un futur. Annuler le ``CancelToken`` annule la
+  tâche : la connexion est fermée immédiatement, sans attendre le timeout.
+  Les connexions sont gardées ouvertes (keep-alive) et réutilisées, au plus
+  ``max_connections_per_host`` par hôte.
+
+Le moteur ``asyncio`` couvre ce dont le client a besoin (GET/POST/HEAD, corps
+de formulaire ou JSON, réponses ``Content-Length``/``chunked``/jusqu'à
+fermeture, compressées gzip/deflate/br via ``net_compression``, HTTPS) ; pas de
+redirections, de cookies ni de proxy.
+"""
+
+import asyncio
+import json
+import logging
+import ssl
+import threading
+from concurrent.futures import CancelledError as FutureCancelled
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import (
+    ConnectTimeout, ContentDecodingError, ReadTimeout, RequestException,
+)
+from requests.structures import CaseInsensitiveDict
+
+from net_compression import accept_encoding, decode_body, form_body
+
+logger = logging.getLogger("appcomptoir.net_transport")
+
+ENGINE_REQUESTS = "requests"
+ENGINE_ASYNCIO = "asyncio"
+ENGINES = (ENGINE_REQUESTS, ENGINE_ASYNCIO)
+DEFAULT_ENGINE = ENGINE_REQUESTS
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+
+# Bornes de lecture d'une réponse (protection contre un serveur défaillant).
+_MAX_HEADER_LINES = 100
+_MAX_LINE_BYTES = 64 * 1024
+
+# Statuts sans corps (RFC 9112 §6.3).
+_BODYLESS_STATUSES = (204, 304)
+# Méthodes rejouables sans risque quand une connexion réutilisée se ferme après
+# l'envoi complet de la requête (le serveur a pu la traiter).
+_IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+_USER_AGENT = "AppComptoir"
+
+
+def normalize_engine(value):
+    """Nom de moteur connu, sinon le moteur par défaut."""
+    value = str(value or "").strip().lower()
+    return value if value in ENGINES else DEFAULT_ENGINE
+
+
+def requests_transport(pool_maxsize=1):
+    """Moteur historique : ``requests.Session`` dont le pool par hôte garde
+    ``pool_maxsize`` connexions (workers et connexions préchauffées)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max(1, pool_maxsize))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def make_transport(engine=DEFAULT_ENGINE, pool_maxsize=1):
+    """Construit le transport du moteur ``engine`` (voir docstring du module)."""
+    if normalize_engine(engine) == ENGINE_ASYNCIO:
+        return AsyncioTransport(max_connections_per_host=max(1, pool_maxsize))
+    return requests_transport(pool_maxsize)
+
+
+class TransportCancelled(RequestException):
+    """La requête a été coupée en vol par son ``CancelToken``."""
+
+
+class AsyncioResponse:
+    """Réponse du moteur asyncio (sous-ensemble de ``requests.Response``)."""
+
+    __slots__ = ("status_code", "headers", "content", "url", "wire_bytes", "connect_s")
+
+    def __init__(self, status_code, headers, content, url, wire_bytes=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content          # corps décodé (décompressé)
+        self.url = url
+        # Octets du corps reçus sur le réseau (avant décompression).
+        self.wire_bytes = len(content) if wire_bytes is None else wire_bytes
+        # Établissement de la connexion (0 si elle a été réutilisée).
+        self.connect_s = None
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get("Content-Type") or ""
+        for param in content_type.split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "charset" and value.strip():
+                return value.strip().strip('"')
+        return "utf-8"
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def _split_timeout(timeout):
+    """``(connexion, lecture)`` depuis un timeout à la ``requests``."""
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+def _encode_body(data, headers):
+    """Corps à envoyer (bytes ou None) ; pose ``Content-Type`` pour un
+    formulaire, comme ``requests`` avec ``data=dict``."""
+    if isinstance(data, (dict, list, tuple)):
+        headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+    return form_body(data)
+
+
+class _Connection:
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncioTransport:
+    """Moteur asyncio (voir docstring du module). Thread-safe : les méthodes
+    sont appelées depuis n'importe quel thread et bloquent jusqu'à la réponse ;
+    tout le travail réseau s'exécute dans le thread de la boucle."""
+
+    supports_cancel = True
+
+    def __init__(self, max_connections_per_host=DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                 ssl_context=None):
+        self.headers = CaseInsensitiveDict({
+            "User-Agent": _USER_AGENT,
+            "Accept": "*/*",
+            "Accept-Encoding": accept_encoding(),
+            "Connection": "keep-alive",
+        })
+        self._max_per_host = max(1, max_connections_per_host)
+        self._ssl_context = ssl_context
+        self._idle = {}        # (schéma, hôte, port) -> [_Connection], boucle seulement
+        self._slots = {}       # (schéma, hôte, port) -> asyncio.Semaphore
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="net-asyncio",
+                                        daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ #
+    # API (n'importe quel thread)
+    # ------------------------------------------------------------------ #
+    def get(self, url, headers=None, timeout=None, cancel_token=None):
+        return self.request("GET", url, headers=headers, timeout=timeout,
+                            cancel_token=cancel_token)
+
+    def post(self, url, data=None, headers=None, timeout=None, cancel_token=None):
+        return self.request("POST", url, data=data, headers=headers, timeout=timeout,
+                            cancel_token=cancel_token)
+
+    def head(self, url, timeout=None, allow_redirects=False, cancel_token=None):
+        return self.request("HEAD", url, timeout=timeout, cancel_token=cancel_token)
+
+    def request(self, method, url, data=None, headers=None, timeout=None, cancel_token=None):
+        if self._closed:
+            raise RequestsConnectionError("transport fermé")
+        merged = CaseInsensitiveDict(self.headers)
+        for name, value in (headers or {}).items():
+            if value is None:
+                merged.pop(name, None)
+            else:
+                merged[name] = value
+        future = asyncio.run_coroutine_threadsafe(
+            self._request(method, url, merged, data, timeout), self._loop)
+        unregister = None
+        if cancel_token is not None:
+            unregister = cancel_token.add_callback(future.cancel)
+        try:
+            return future.result()
+        except FutureCancelled:
+            raise TransportCancelled("requête annulée en vol") from None
+        finally:
+            if unregister is not None:
+                unregister()
+
+    def close(self, timeout=2.0):
+        """Ferme les connexions gardées ouvertes et arrête la boucle
+        (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_idle(), self._loop).result(timeout)
+        except Exception:
+            logger.debug("Fermeture des connexions du transport asyncio incomplète")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
+
+    # ------------------------------------------------------------------ #
+    # Boucle asyncio
+    # ------------------------------------------------------------------ #
+    async def _close_idle(self):
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+    async def _request(self, method, url, headers, data, timeout):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise requests.exceptions.InvalidURL(f"URL invalide : {url!r}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{port}"
+        body = _encode_body(data, headers)
+        connect_timeout, read_timeout = _split_timeout(timeout)
+
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self._max_per_host)
+        try:
+            await asyncio.wait_for(slots.acquire(), connect_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectTimeout(f"aucune connexion libre vers {host_header}") from None
+        try:
+            # Une connexion gardée ouverte a pu être fermée par le serveur : si
+            # elle échoue avant toute réponse, on réessaie sur une neuve — sauf
+            # si la requête est partie en entier et n'est pas idempotente (un
+            # POST « patient suivant » déjà traité ne doit pas l'être deux
+            # fois : RetryPolicy et la clé d'idempotence en décident).
+            reused = True
+            while True:
+                connection = self._take_idle(key)
+                connect_s = 0.0
+                if connection is None:
+                    reused = False
+                    started = self._loop.time()
+                    connection = await self._connect(key, connect_timeout)
+                    connect_s = self._loop.time() - started
+                try:
+                    response, keep_alive = await self._exchange(
+                        connection, method, target, host_header, headers, body,
+                        read_timeout, url)
+                except _StaleConnection as e:
+                    connection.close()
+                    if reused and (not e.sent or method in _IDEMPOTENT_METHODS):
+                        continue
+                    raise RequestsConnectionError(
+                        f"connexion fermée par le serveur ({host_header})") from None
+                except BaseException:
+                    connection.close()
+                    raise
+                if keep_alive and not self._closed:
+                    self._idle.setdefault(key, []).append(connection)
+                else:
+                    connection.close()
+                response.connect_s = connect_s
+                return response
+        finally:
+            slots.release()
+
+    def _take_idle(self, key):
+        connections = self._idle.get(key)
+        while connections:
+            connection = connections.pop()
+            if not connection.reader.at_eof() and not connection.writer.is_closing():
+                return connection
+            connection.close()
+        return None
+
+    async def _connect(self, key, connect_timeout):
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            ssl_context = self._ssl_context or ssl.create_default_context()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context,
+                                        limit=_MAX_LINE_BYTES),
+                connect_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectTimeout(f"connexion à {host}:{port} : délai dépassé") from None
+        except OSError as e:
+            raise RequestsConnectionError(f"connexion à {host}:{port} impossible : {e}") from None
+        return _Connection(reader, writer)
+
+    async def _exchange(self, connection, method, target, host_header, headers, body,
+                        read_timeout, url):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}"]
+        if body is not None or method == "POST":
+            headers["Content-Length"] = str(len(body or b""))
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+        try:
+            connection.writer.write(payload)
+            await connection.writer.drain()
+        except (ConnectionError, OSError):
+            raise _StaleConnection(sent=False) from None
+        try:
+            return await asyncio.wait_for(
+                self._read_response(connection.reader, method, url), read_timeout)
+        except asyncio.TimeoutError:
+            raise ReadTimeout(f"lecture de {url} : délai dépassé") from None
+
+    async def _read_response(self, reader, method, url):
+        try:
+            status_line = await reader.readline()
+        except (ConnectionError, OSError):
+            raise _StaleConnection(sent=True) from None
+        if not status_line:
+            raise _StaleConnection(sent=True)
+        try:
+            version, status, _reason = (status_line.decode("latin-1").rstrip("\r\n") + " ").split(" ", 2)
+            status_code = int(status)
+        except ValueError:
+            raise RequestsConnectionError(f"réponse HTTP invalide : {status_line[:80]!r}") from None
+        try:
+            headers = await _read_headers(reader)
+            connection_header = (headers.get("Connection") or "").lower()
+            keep_alive = (version == "HTTP/1.1" and connection_header != "close") or \
+                         (version == "HTTP/1.0" and connection_header == "keep-alive")
+            if method == "HEAD" or status_code in _BODYLESS_STATUSES or 100 <= status_code < 200:
+                content = b""
+            elif "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+                content = await _read_chunked(reader)
+            elif headers.get("Content-Length") is not None:
+                content = await reader.readexactly(int(headers["Content-Length"]))
+            else:
+                content = await reader.read()
+                keep_alive = False
+        except (asyncio.IncompleteReadError, ValueError, ConnectionError, OSError) as e:
+            raise RequestsConnectionError(f"réponse incomplète de {url} : {e}") from None
+        wire_bytes = len(content)
+        if content and headers.get("Content-Encoding"):
+            try:
+                content = decode_body(content, headers["Content-Encoding"])
+            except ValueError as e:
+                raise ContentDecodingError(f"corps de {url} illisible : {e}") from None
+        return AsyncioResponse(status_code, headers, content, url, wire_bytes), keep_alive
+
+
+class _StaleConnection(Exception):
+    """Connexion fermée avant la moindre réponse. ``sent`` : la requête avait
+    été écrite en entier (le serveur a pu la recevoir et la traiter)."""
+
+    def __init__(self, sent):
+        super().__init__()
+        self.sent = sent
+
+
+async def _read_headers(reader):
+    headers = CaseInsensitiveDict()
+    for _ in range(_MAX_HEADER_LINES):
+        line = await reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        line = line.decode("latin-1").rstrip("\r\n")
+        if not line:
+            return headers
+        name, _, value = line.partition(":")
+        name, value = name.strip(), value.strip()
+        if name in headers:
+            headers[name] = f"{headers[name]}, {value}"
+        else:
+            headers[name] = value
+    raise ValueError("trop d'en-têtes")
+
+
+async def _read_chunked(reader):
+    chunks = []
+    while True:
+        size_line = await reader.readline()
+        if not size_line:
+            raise asyncio.IncompleteReadError(size_line, None)
+        size = int(size_line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            # En-têtes de fin (trailers) éventuels, jusqu'à la ligne vide.
+            while (await reader.readline()).strip():
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)  # CRLF de fin de bloc
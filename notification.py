@@ -1,4 +1,5 @@
 from collections import deque
+from collections.abc import Mapping
 
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QApplication
 from PySide6.QtCore import Qt, QTimer, Signal, QThread, QMetaObject, Slot
@@ -29,14 +30,15 @@ logger = logging.getLogger("appcomptoir.notification")
 
 def _extract_origin_message(data, internal):
     """Origine + message d'une notification, quel que soit le format d'entrée
-    (dict interne ou chaîne JSON venue du serveur). Sert au calcul de signature."""
+    (dict interne, ``NotificationEvent`` déjà décodé, ou chaîne JSON héritée).
+    Sert au calcul de signature."""
     payload = data
     if not internal and isinstance(data, str):
         try:
             payload = json.loads(data)
         except (json.JSONDecodeError, TypeError):
             return (str(data), "")
-    if isinstance(payload, dict):
+    if isinstance(payload, Mapping):
         return (payload.get("origin", ""), payload.get("message", ""))
     return (str(payload), "")
 
@@ -56,6 +58,8 @@ class NotificationManager:
         self.pending = deque()
         # signature -> notification visible, pour dédupliquer et raviver le timer.
         self._active_signatures = {}
+        # Compteurs exportés (metrics) : affichées, doublons ignorés, mises en file.
+        self._counts = {"shown": 0, "duplicates": 0, "queued": 0}
 
     # --- API publique ---------------------------------------------------
 
@@ -69,21 +73,29 @@ class NotificationManager:
         existing = self._active_signatures.get(signature)
         if existing is not None:
             existing.restart_auto_close()
+            self._counts["duplicates"] += 1
             logger.debug("Notification dupliquée ignorée (origin=%s)", origin)
             return None
 
         # Déjà en file : on ignore le doublon.
         if any(sig == signature for (_d, _i, _f, sig) in self.pending):
+            self._counts["duplicates"] += 1
             logger.debug("Notification dupliquée déjà en file (origin=%s)", origin)
             return None
 
         spec = (data, internal, font_size, signature)
         if should_queue(len(self.active_notifications), self.max_visible):
             self.pending.append(spec)
+            self._counts["queued"] += 1
             logger.debug("Notification mise en file (%s en attente)", len(self.pending))
             return None
         return self._create_and_show(spec)
 
+    def stats(self):
+        """``{shown, duplicates, queued, visible, pending}``."""
+        return dict(self._counts, visible=len(self.active_notifications),
+                    pending=len(self.pending))
+
     def update_positions(self):
         """Repositionne toutes les notifications visibles sur l'écran courant de
         la fenêtre principale (et non plus toujours l'écran principal)."""
@@ -105,6 +117,7 @@ class NotificationManager:
                                    parent=self.main_window, internal=internal,
                                    manager=self)
         notif.signature = signature
+        self._counts["shown"] += 1
         self.active_notifications.append(notif)
         self._active_signatures[signature] = notif
         notif.closed.connect(lambda n=notif: self._on_closed(n))
@@ -227,7 +240,9 @@ class CustomNotification(QDialog):
         self.resize(NOTIFICATION_WIDTH, 120)
 
     def format_data(self, notification_data):
-        if not self.internal:
+        # Les notifications serveur arrivent déjà décodées (NotificationEvent) :
+        # seule une chaîne JSON (format hérité) est encore parsée ici.
+        if isinstance(notification_data, str):
             try:
                 notification_data = json.loads(notification_data)
             except json.JSONDecodeError:
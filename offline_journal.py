@@ -0,0 +1,257 @@
+"""Journal persistant des actions faites hors ligne (sans dépendance PySide,
+testable seul).
+
+Mode hors ligne (optionnel, préférence ``offline_journal``) : quand le serveur
+est injoignable, les actions de comptoir éligibles (valider, pause, rappel,
+papier) ne sont plus perdues ; elles sont inscrites dans un journal sur disque,
+avec leur clé d'idempotence, puis rejouées dans l'ordre au retour du serveur
+(le serveur reconnaît la clé : une action déjà reçue n'est pas appliquée deux
+fois).
+
+Format : fichier JSON Lines en ajout seul, un enregistrement par ligne :
+
+- ``{"op": "add", "id": ..., "action": ..., "url": ..., ...}`` : action mémorisée ;
+- ``{"op": "done", "id": ...}`` : action rejouée (ou écartée).
+
+Au chargement, les actions ``add`` sans ``done`` sont en attente. Une dernière
+ligne tronquée (arrêt brutal pendant l'écriture) est ignorée et retirée du
+fichier : l'enregistrement suivant ne s'y recolle pas. Quand plus rien n'est en
+attente, le fichier est vidé (compaction).
+
+Écritures : ``append``/``mark_done`` ne font qu'empiler l'enregistrement en
+mémoire (appel instantané depuis le thread GUI) ; un thread d'écriture les
+ajoute au fichier par lots et fait UN ``fsync`` par lot, au plus un toutes les
+``fsync_interval_s`` secondes. ``flush()`` attend que tout soit sur disque.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("appcomptoir.offline_journal")
+
+OFFLINE_JOURNAL_FILENAME = "offline_journal.jsonl"
+
+# Actions éligibles au mode hors ligne.
+OFFLINE_ACTIONS = ("validate", "pause", "recall", "paper")
+
+# Au-delà, une action mémorisée n'a plus de sens (patient parti, papier déjà
+# changé...) : elle est écartée au lieu d'être rejouée.
+DEFAULT_MAX_AGE_S = 15 * 60
+
+# Actions portant sur le patient en cours du comptoir.
+_PATIENT_ACTIONS = ("validate", "pause", "recall")
+
+
+class JournalEntry:
+    """Action mémorisée hors ligne."""
+
+    __slots__ = ("id", "action", "url", "method", "data", "idempotency_key",
+                 "counter_id", "patient_id", "revision", "created_at")
+
+    _FIELDS = __slots__
+
+    def __init__(self, id, action, url, method="POST", data=None, idempotency_key=None,
+                 counter_id=None, patient_id=None, revision=None, created_at=None):
+        self.id = id
+        self.action = action
+        self.url = url
+        self.method = method
+        self.data = data
+        self.idempotency_key = idempotency_key
+        self.counter_id = counter_id
+        self.patient_id = patient_id
+        self.revision = revision          # révision de file connue à la mémorisation
+        self.created_at = created_at      # horodatage (time.time())
+
+    def to_record(self):
+        record = {"op": "add"}
+        record.update({field: getattr(self, field) for field in self._FIELDS})
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(**{field: record.get(field) for field in cls._FIELDS})
+
+
+def _is_revision(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def stale_reason(entry, counter_id, current_patient_id, now, max_age_s=DEFAULT_MAX_AGE_S,
+                 server_revision=None):
+    """Réconciliation avec l'état du serveur (``/state`` fraîchement appliqué,
+    de révision ``server_revision``) : raison d'écarter ``entry`` au lieu de la
+    rejouer, ou None pour la rejouer.
+
+    - trop ancienne ;
+    - faite pour un autre comptoir ;
+    - faite sur une file plus récente que celle du serveur (révision revenue
+      en arrière : serveur redémarré ou file purgée depuis) ;
+    - action patient (valider, pause, rappel) alors que le patient en cours du
+      comptoir n'est plus celui de l'action (déjà validé ailleurs, appelé par un
+      autre poste...)."""
+    if entry.created_at is not None and now - entry.created_at > max_age_s:
+        return "trop ancienne"
+    if entry.counter_id != counter_id:
+        return "autre comptoir"
+    if (_is_revision(entry.revision) and _is_revision(server_revision)
+            and server_revision < entry.revision):
+        return "état du serveur antérieur à l'action"
+    if entry.action in _PATIENT_ACTIONS and entry.patient_id != current_patient_id:
+        return "patient en cours différent"
+    return None
+
+
+class OfflineJournal:
+    """Journal sur disque des actions hors ligne (voir docstring du module).
+
+    ``clock`` est injectable pour les tests."""
+
+    def __init__(self, path, fsync_interval_s=0.2, clock=time.time):
+        self._path = str(path)
+        self._fsync_interval = fsync_interval_s
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._pending = {}        # id -> JournalEntry, ordre d'insertion = ordre d'action
+        self._buffer = []         # enregistrements pas encore écrits
+        self._compact = False     # vider le fichier une fois le lot écrit
+        self._writing = False
+        self._closed = False
+        self._stop = threading.Event()
+        self._load()
+        self._writer = threading.Thread(target=self._write_loop, name="offline-journal",
+                                        daemon=True)
+        self._writer.start()
+
+    @property
+    def path(self):
+        return self._path
+
+    def _load(self):
+        try:
+            with open(self._path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning("Journal hors ligne illisible (%s) : ignoré", e)
+            return
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            # Dernière ligne tronquée (arrêt pendant l'écriture) : retirée du
+            # fichier, sinon le prochain ajout s'y recollerait et serait perdu.
+            logger.warning("Ligne tronquée retirée du journal hors ligne")
+            self._truncate(complete)
+        for line in content[:complete].decode("utf-8", errors="replace").splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Ligne illisible ignorée dans le journal hors ligne")
+                continue
+            if not isinstance(record, dict):
+                continue
+            if record.get("op") == "add" and record.get("id"):
+                self._pending[record["id"]] = JournalEntry.from_record(record)
+            elif record.get("op") == "done":
+                self._pending.pop(record.get("id"), None)
+        if self._pending:
+            logger.info("%s action(s) hors ligne en attente de rejeu", len(self._pending))
+
+    def _truncate(self, size):
+        try:
+            with open(self._path, "r+b") as f:
+                f.truncate(size)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error("Réparation du journal hors ligne impossible : %s", e)
+
+    def append(self, action, url, method="POST", data=None, idempotency_key=None,
+               counter_id=None, patient_id=None, revision=None):
+        """Mémorise une action et la renvoie (``JournalEntry``). Ne bloque pas :
+        l'écriture sur disque est faite par le thread d'écriture."""
+        entry = JournalEntry(uuid.uuid4().hex, action, url, method, data,
+                             idempotency_key or str(uuid.uuid4()), counter_id,
+                             patient_id, revision, self._clock())
+        with self._cond:
+            self._pending[entry.id] = entry
+            self._buffer.append(entry.to_record())
+            self._cond.notify_all()
+        return entry
+
+    def mark_done(self, entry_id):
+        """L'action a été rejouée (ou écartée) : elle ne sera plus proposée."""
+        with self._cond:
+            if self._pending.pop(entry_id, None) is None:
+                return
+            self._buffer.append({"op": "done", "id": entry_id})
+            if not self._pending:
+                self._compact = True
+            self._cond.notify_all()
+
+    def pending(self):
+        """Actions en attente, dans l'ordre où elles ont été faites."""
+        with self._cond:
+            return list(self._pending.values())
+
+    def flush(self, timeout=2.0):
+        """Attend que tout ce qui a été mémorisé soit sur disque. Retourne False
+        si le délai est dépassé."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._buffer and not self._writing, timeout)
+
+    def close(self, timeout=2.0):
+        """Écrit ce qui reste puis arrête le thread d'écriture (idempotent)."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._stop.set()
+        self._writer.join(timeout)
+        return flushed
+
+    # ------------------------------------------------------------------ #
+    # Thread d'écriture
+    # ------------------------------------------------------------------ #
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._closed)
+                if not self._buffer and self._closed:
+                    return
+                batch, self._buffer = self._buffer, []
+                compact = self._compact and not self._pending
+                self._compact = False
+                self._writing = True
+            try:
+                self._write_batch(batch, compact)
+            except OSError as e:
+                logger.error("Écriture du journal hors ligne impossible : %s", e)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+            # Regroupe les enregistrements suivants : au plus un fsync par
+            # intervalle (seule la fermeture écourte l'attente).
+            self._stop.wait(self._fsync_interval)
+
+    def _write_batch(self, batch, compact):
+        if compact:
+            # Plus rien en attente : repartir d'un fichier vide.
+            with open(self._path, "w", encoding="utf-8") as f:
+                f.flush()
+                os.fsync(f.fileno())
+            return
+        with open(self._path, "a", encoding="utf-8") as f:
+            for record in batch:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(self._path, 0o600)
+        except OSError:
+            pass
@@ -15,6 +15,8 @@ La logique de diff (``compute_list_diff``) et la mise en forme du texte
 """
 
 import logging
+import time
+from collections.abc import Mapping
 
 from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
 from PySide6.QtGui import QBrush, QColor, QFont
@@ -24,6 +26,8 @@ from accessibility import (
     clamp_font_size,
     staff_highlight_text,
 )
+from net_trace import LatencyHistogram
+from ws_events import PatchConflict, apply_patch_ops, merge_patient
 
 logger = logging.getLogger("appcomptoir.patient_list_model")
 
@@ -37,6 +41,10 @@ MAX_DISPLAYED_PATIENTS = 500
 _STAFF_HIGHLIGHT_BG = "#f98517"
 _STAFF_HIGHLIGHT_FG = "#000000"
 
+# Classes (secondes) de l'histogramme de durée de set_patients : quelques
+# millisecondes attendues, au-delà la mise à jour se ressent dans l'UI.
+UPDATE_DURATION_BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
 
 def patient_display_text(patient):
     """Texte affiché pour un patient (identique à l'ancien libellé de bouton)."""
@@ -130,6 +138,12 @@ class PatientListModel(QAbstractListModel):
         self._font.setPointSize(clamp_font_size(font_size))
         self._highlight_brush = QBrush(QColor(_STAFF_HIGHLIGHT_BG))
         self._highlight_fg = QBrush(QColor(_STAFF_HIGHLIGHT_FG))
+        # Compteurs de mise à jour (exportés par metrics) : appels, patchs
+        # appliqués, lignes insérées/supprimées/déplacées/modifiées, durée des
+        # mises à jour.
+        self._counts = {"updates": 0, "patches": 0, "inserted": 0, "removed": 0,
+                        "moved": 0, "changed": 0}
+        self._update_durations = LatencyHistogram(UPDATE_DURATION_BOUNDS)
 
     def set_font_size(self, size):
         """Change la taille de police de la liste (bornée au plancher de
@@ -206,12 +220,13 @@ class PatientListModel(QAbstractListModel):
         On ne recrée jamais tout le modèle : on n'émet que les insertions,
         suppressions et ``dataChanged`` correspondant aux changements réels.
         """
+        started = time.perf_counter()
         # Normalisation : on ignore les entrées sans id ou en double (un id doit
         # identifier une ligne de façon unique pour le diff).
         ordered = []
         new_by_id = {}
         for patient in (patients or []):
-            if not isinstance(patient, dict):
+            if not isinstance(patient, Mapping):
                 continue
             pid = patient.get("id")
             if pid is None or pid in new_by_id:
@@ -231,11 +246,13 @@ class PatientListModel(QAbstractListModel):
                 self.beginRemoveRows(QModelIndex(), idx, idx)
                 del self._patients[idx]
                 self.endRemoveRows()
+                self._counts["removed"] += 1
             else:  # insert
                 _, idx, pid = op
                 self.beginInsertRows(QModelIndex(), idx, idx)
                 self._patients.insert(idx, new_by_id[pid])
                 self.endInsertRows()
+                self._counts["inserted"] += 1
 
         # 2) Mises à jour de contenu : à ce stade l'ordre correspond à new_ids ;
         # on remplace les lignes conservées dont le contenu a changé (ex. activité
@@ -245,3 +262,77 @@ class PatientListModel(QAbstractListModel):
                 self._patients[row] = patient
                 index = self.index(row, 0)
                 self.dataChanged.emit(index, index)
+                self._counts["changed"] += 1
+
+        self._counts["updates"] += 1
+        self._update_durations.observe(time.perf_counter() - started)
+
+    def apply_patch(self, ops):
+        """Applique directement les opérations d'un patch serveur (voir
+        ``ws_events.decode_patient_patch``), sans recalculer de diff.
+
+        Les opérations sont d'abord validées sur une copie : si elles ne
+        correspondent pas aux lignes affichées (file tronquée, divergence), rien
+        n'est modifié et False est retourné — l'appelant repasse alors par
+        ``set_patients``."""
+        started = time.perf_counter()
+        try:
+            expected = apply_patch_ops(self._patients, ops)
+        except PatchConflict as e:
+            logger.debug("Patch non applicable au modèle : %s", e)
+            return False
+        if len(expected) > MAX_DISPLAYED_PATIENTS:
+            return False
+
+        for op in ops:
+            kind = op[0]
+            if kind == "insert":
+                _, row, patient = op
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._patients.insert(row, patient)
+                self.endInsertRows()
+                self._counts["inserted"] += 1
+            elif kind == "remove":
+                row = self._row_of(op[1])
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._patients[row]
+                self.endRemoveRows()
+                self._counts["removed"] += 1
+            elif kind == "move":
+                _, pid, target = op
+                row = self._row_of(pid)
+                if row == target:
+                    continue
+                # beginMoveRows attend la position *avant* retrait de la ligne.
+                destination = target + 1 if target > row else target
+                self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+                self._patients.insert(target, self._patients.pop(row))
+                self.endMoveRows()
+                self._counts["moved"] += 1
+            else:  # update
+                _, pid, fields = op
+                row = self._row_of(pid)
+                patient = merge_patient(self._patients[row], fields)
+                if patient != self._patients[row]:
+                    self._patients[row] = patient
+                    index = self.index(row, 0)
+                    self.dataChanged.emit(index, index)
+                    self._counts["changed"] += 1
+
+        self._counts["patches"] += 1
+        self._update_durations.observe(time.perf_counter() - started)
+        return True
+
+    def _row_of(self, pid):
+        for row, patient in enumerate(self._patients):
+            if patient.get("id") == pid:
+                return row
+        raise KeyError(pid)
+
+    def stats(self):
+        """``{rows, updates, patches, inserted, removed, moved, changed,
+        duration}`` (``duration`` : histogramme de durée de ``set_patients`` et
+        ``apply_patch``, voir ``LatencyHistogram``)."""
+        stats = dict(self._counts, rows=len(self._patients))
+        stats["duration"] = self._update_durations.snapshot()
+        return stats
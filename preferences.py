@@ -1,5 +1,6 @@
 import requests
 import os
+import json
 import logging
 from datetime import datetime
 
@@ -7,6 +8,8 @@ logger = logging.getLogger("appcomptoir.preferences")
 from PySide6.QtWidgets import QDialog, QHBoxLayout, QListWidget, QListWidgetItem, QStackedWidget, QWidget, QVBoxLayout, QCheckBox, QLineEdit, QTextEdit, QPushButton, QLabel, QMessageBox, QComboBox, QSpinBox, QSlider
 from PySide6.QtCore import Signal, Slot, QSettings, Qt, QThread
 from connections import DEFAULT_TIMEOUT
+from net_cache import ResponseCache
+from net_transport import ENGINES
 from secret_store import load_secret, save_secret
 from counter_id_utils import coerce_counter_id
 from shortcut_defaults import default_shortcut, migrate_shortcut
@@ -48,6 +51,11 @@ class TestConnectionWorker(QThread):
             self.connection_tested.emit(False, f"Erreur: {e} à {current_time}")
 
 
+# Liste des comptoirs mémorisée entre deux ouvertures du dialogue : revalidée par
+# ETag/Last-Modified (304 = en-têtes seulement) quand le serveur en fournit.
+_COUNTERS_CACHE = ResponseCache(max_entries=8)
+
+
 class CountersWorker(QThread):
     """ Récupère la liste des comptoirs en arrière-plan pour ne pas geler la
     boîte de dialogue Préférences pendant l'appel réseau.
@@ -81,13 +89,21 @@ class CountersWorker(QThread):
                 self.result.emit(False, "Réponse du serveur invalide (jeton manquant).")
                 return
 
-            response = requests.get(f"{self.web_url}/api/counters",
-                                     headers={'X-App-Token': token}, timeout=DEFAULT_TIMEOUT)
-            if response.status_code != 200:
+            url = f"{self.web_url}/api/counters"
+            headers = {'X-App-Token': token}
+            headers.update(_COUNTERS_CACHE.conditional_headers(url))
+            response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+            cached = _COUNTERS_CACHE.revalidated(url) if response.status_code == 304 else None
+            if cached is None and response.status_code != 200:
                 self.result.emit(False, f"Erreur de chargement des comptoirs: {response.status_code}")
                 return
             try:
-                counters = response.json()
+                if cached is not None:
+                    counters = json.loads(cached.text)
+                else:
+                    counters = response.json()
+                    _COUNTERS_CACHE.store(url, getattr(response, "headers", None),
+                                          getattr(response, "text", ""))
             except ValueError:
                 self.result.emit(False, "Réponse du serveur invalide (liste des comptoirs illisible).")
                 return
@@ -250,6 +266,39 @@ class PreferencesDialog(QDialog):
         self.reset_position_button.clicked.connect(self._reset_window_position)
         self.general_layout.addWidget(self.reset_position_button)
 
+        # Santé du client en direct (file réseau, WebSocket, boucle GUI, mémoire).
+        self.diagnostics_button = QPushButton("Diagnostics de performance", self.general_page)
+        self.diagnostics_button.clicked.connect(self._show_diagnostics)
+        self.general_layout.addWidget(self.diagnostics_button)
+
+        # Export des métriques (metrics.prom / metrics.jsonl dans le dossier des
+        # journaux) et serveur local /metrics, pour comparer les comptoirs.
+        self.metrics_interval_layout = QHBoxLayout()
+        self.metrics_interval_label = QLabel("Export des métriques (s, 0 = désactivé, redémarrage requis):", self.general_page)
+        self.metrics_interval_spinbox = QSpinBox(self.general_page)
+        self.metrics_interval_spinbox.setRange(*settings_schema.SETTINGS["metrics_export_interval"].bounds)
+        self.metrics_interval_layout.addWidget(self.metrics_interval_label)
+        self.metrics_interval_layout.addWidget(self.metrics_interval_spinbox)
+        self.general_layout.addLayout(self.metrics_interval_layout)
+
+        self.metrics_port_layout = QHBoxLayout()
+        self.metrics_port_label = QLabel("Port local des métriques (0 = désactivé, redémarrage requis):", self.general_page)
+        self.metrics_port_spinbox = QSpinBox(self.general_page)
+        self.metrics_port_spinbox.setRange(*settings_schema.SETTINGS["metrics_port"].bounds)
+        self.metrics_port_layout.addWidget(self.metrics_port_label)
+        self.metrics_port_layout.addWidget(self.metrics_port_spinbox)
+        self.general_layout.addLayout(self.metrics_port_layout)
+
+        # Chien de garde des gels : pile du thread GUI dans stalls.log.
+        self.stall_threshold_layout = QHBoxLayout()
+        self.stall_threshold_label = QLabel("Seuil de détection des gels (ms, 0 = désactivé, redémarrage requis):", self.general_page)
+        self.stall_threshold_spinbox = QSpinBox(self.general_page)
+        self.stall_threshold_spinbox.setRange(*settings_schema.SETTINGS["stall_threshold_ms"].bounds)
+        self.stall_threshold_spinbox.setSingleStep(100)
+        self.stall_threshold_layout.addWidget(self.stall_threshold_label)
+        self.stall_threshold_layout.addWidget(self.stall_threshold_spinbox)
+        self.general_layout.addLayout(self.stall_threshold_layout)
+
         # Ajout de la sélection de skins
         self.skin_label = QLabel("Sélectionner un skin:", self.general_page)
         self.general_layout.addWidget(self.skin_label)
@@ -301,6 +350,74 @@ class PreferencesDialog(QDialog):
         
         self.counter_combobox = QComboBox(self.connexion_page)
         self.connexion_layout.addWidget(self.counter_combobox)
+
+        # Requêtes simultanées : permet aux actions indépendantes (rappel, papier,
+        # appel automatique...) de ne pas s'attendre quand le serveur est lent.
+        self.network_workers_layout = QHBoxLayout()
+        self.network_workers_label = QLabel("Requêtes simultanées (redémarrage requis):", self.connexion_page)
+        self.network_workers_spinbox = QSpinBox(self.connexion_page)
+        self.network_workers_spinbox.setRange(*settings_schema.SETTINGS["network_workers"].bounds)
+        self.network_workers_layout.addWidget(self.network_workers_label)
+        self.network_workers_layout.addWidget(self.network_workers_spinbox)
+        self.connexion_layout.addLayout(self.network_workers_layout)
+
+        # Moteur HTTP : asyncio multiplexe les requêtes sur un seul thread et
+        # coupe immédiatement une requête annulée (voir net_transport).
+        self.network_engine_layout = QHBoxLayout()
+        self.network_engine_label = QLabel("Moteur réseau (redémarrage requis):", self.connexion_page)
+        self.network_engine_combobox = QComboBox(self.connexion_page)
+        for engine in ENGINES:
+            self.network_engine_combobox.addItem(engine, engine)
+        self.network_engine_layout.addWidget(self.network_engine_label)
+        self.network_engine_layout.addWidget(self.network_engine_combobox)
+        self.connexion_layout.addLayout(self.network_engine_layout)
+
+        # Connexions préchauffées : le premier clic après démarrage ou inactivité
+        # ne paie pas l'ouverture de connexion.
+        self.prewarm_connections_layout = QHBoxLayout()
+        self.prewarm_connections_label = QLabel("Connexions préchauffées (0 = aucune):", self.connexion_page)
+        self.prewarm_connections_spinbox = QSpinBox(self.connexion_page)
+        self.prewarm_connections_spinbox.setRange(*settings_schema.SETTINGS["prewarm_connections"].bounds)
+        self.prewarm_connections_layout.addWidget(self.prewarm_connections_label)
+        self.prewarm_connections_layout.addWidget(self.prewarm_connections_spinbox)
+        self.connexion_layout.addLayout(self.prewarm_connections_layout)
+
+        # Compression des envois volumineux (liens VPN/4G lents).
+        self.compress_requests_checkbox = QCheckBox(
+            "Compresser les envois volumineux (redémarrage requis)", self.connexion_page)
+        self.connexion_layout.addWidget(self.compress_requests_checkbox)
+
+        # Mode hors ligne : actions mémorisées sur disque si le serveur ne répond
+        # pas, puis envoyées automatiquement à son retour.
+        self.offline_journal_checkbox = QCheckBox(
+            "Mode hors ligne : mémoriser les actions si le serveur est injoignable",
+            self.connexion_page)
+        self.connexion_layout.addWidget(self.offline_journal_checkbox)
+
+        # Rafales de mises à jour de la file (appel automatique, affluence) :
+        # regroupées pour ne rafraîchir l'écran qu'une fois par fenêtre.
+        self.ws_coalesce_window_layout = QHBoxLayout()
+        self.ws_coalesce_window_label = QLabel(
+            "Regroupement des mises à jour de la file (ms, 0 = aucun, reconnexion requise):",
+            self.connexion_page)
+        self.ws_coalesce_window_spinbox = QSpinBox(self.connexion_page)
+        self.ws_coalesce_window_spinbox.setRange(*settings_schema.SETTINGS["ws_coalesce_window_ms"].bounds)
+        self.ws_coalesce_window_spinbox.setSingleStep(10)
+        self.ws_coalesce_window_layout.addWidget(self.ws_coalesce_window_label)
+        self.ws_coalesce_window_layout.addWidget(self.ws_coalesce_window_spinbox)
+        self.connexion_layout.addLayout(self.ws_coalesce_window_layout)
+
+        # Lien coupé sans prévenir (NAT, Wi-Fi) : reconnexion forcée après ce
+        # délai de silence du serveur.
+        self.ws_dead_link_timeout_layout = QHBoxLayout()
+        self.ws_dead_link_timeout_label = QLabel(
+            "Reconnexion si le serveur ne répond plus depuis (s, 0 = jamais, reconnexion requise):",
+            self.connexion_page)
+        self.ws_dead_link_timeout_spinbox = QSpinBox(self.connexion_page)
+        self.ws_dead_link_timeout_spinbox.setRange(*settings_schema.SETTINGS["ws_dead_link_timeout_s"].bounds)
+        self.ws_dead_link_timeout_layout.addWidget(self.ws_dead_link_timeout_label)
+        self.ws_dead_link_timeout_layout.addWidget(self.ws_dead_link_timeout_spinbox)
+        self.connexion_layout.addLayout(self.ws_dead_link_timeout_layout)
         
         self.connexion_layout.addStretch()
         
@@ -595,6 +712,14 @@ class PreferencesDialog(QDialog):
         self.counter_id = coerce_counter_id(settings.value("counter_id", None))
         label = f"{self.counter_id} - Chargement en cours..." if self.counter_id else "Sélectionnez un comptoir..."
         self.counter_combobox.addItem(label, self.counter_id)
+        self.network_workers_spinbox.setValue(settings_schema.read(settings, "network_workers"))
+        self.prewarm_connections_spinbox.setValue(settings_schema.read(settings, "prewarm_connections"))
+        self.compress_requests_checkbox.setChecked(settings_schema.read(settings, "compress_requests"))
+        self.network_engine_combobox.setCurrentIndex(max(0, self.network_engine_combobox.findData(
+            settings_schema.read(settings, "network_engine"))))
+        self.offline_journal_checkbox.setChecked(settings_schema.read(settings, "offline_journal"))
+        self.ws_coalesce_window_spinbox.setValue(settings_schema.read(settings, "ws_coalesce_window_ms"))
+        self.ws_dead_link_timeout_spinbox.setValue(settings_schema.read(settings, "ws_dead_link_timeout_s"))
         vertical_position = settings_schema.read(settings, "patient_list_vertical_position")
         horizontal_position = settings_schema.read(settings, "patient_list_horizontal_position")
 
@@ -641,6 +766,9 @@ class PreferencesDialog(QDialog):
         self.patient_list_position_vertical.setCurrentText(REVERSE_POSITION_MAPPING.get(vertical_position, BOTTOM_TEXT))
         self.patient_list_position_horizontal.setCurrentText(REVERSE_POSITION_MAPPING.get(horizontal_position, RIGHT_TEXT))
         self.debug_window.setChecked(settings_schema.read(settings, "debug_window"))
+        self.metrics_interval_spinbox.setValue(settings_schema.read(settings, "metrics_export_interval"))
+        self.metrics_port_spinbox.setValue(settings_schema.read(settings, "metrics_port"))
+        self.stall_threshold_spinbox.setValue(settings_schema.read(settings, "stall_threshold_ms"))
 
         # pour les skins
         selected_skin = settings_schema.read(settings, "selected_skin")
@@ -797,6 +925,13 @@ class PreferencesDialog(QDialog):
         # Valeurs relues des widgets (le dialogue est modal : elles n'ont pas
         # changé depuis la validation). counter_id normalisé en entier.
         settings.setValue("counter_id", coerce_counter_id(self.counter_combobox.currentData()))
+        settings.setValue("network_workers", self.network_workers_spinbox.value())
+        settings.setValue("network_engine", self.network_engine_combobox.currentData())
+        settings.setValue("prewarm_connections", self.prewarm_connections_spinbox.value())
+        settings.setValue("compress_requests", self.compress_requests_checkbox.isChecked())
+        settings.setValue("offline_journal", self.offline_journal_checkbox.isChecked())
+        settings.setValue("ws_coalesce_window_ms", self.ws_coalesce_window_spinbox.value())
+        settings.setValue("ws_dead_link_timeout_s", self.ws_dead_link_timeout_spinbox.value())
         settings.setValue("next_patient_shortcut", self.get_shortcut_text(self.next_patient_shortcut_input))
         settings.setValue("validate_patient_shortcut", self.get_shortcut_text(self.validate_patient_shortcut_input))
         settings.setValue("pause_shortcut", self.get_shortcut_text(self.pause_shortcut_input))
@@ -830,6 +965,9 @@ class PreferencesDialog(QDialog):
         settings.setValue("patient_list_vertical_position", POSITION_MAPPING[self.patient_list_position_vertical.currentText()])
         settings.setValue("patient_list_horizontal_position", POSITION_MAPPING[self.patient_list_position_horizontal.currentText()])
         settings.setValue("debug_window", self.debug_window.isChecked())
+        settings.setValue("metrics_export_interval", self.metrics_interval_spinbox.value())
+        settings.setValue("metrics_port", self.metrics_port_spinbox.value())
+        settings.setValue("stall_threshold_ms", self.stall_threshold_spinbox.value())
 
         # skins
         settings.setValue("selected_skin", self.skin_combo.currentText())
@@ -873,6 +1011,13 @@ class PreferencesDialog(QDialog):
         if parent is not None and hasattr(parent, "reset_window_position"):
             parent.reset_window_position()
 
+    def _show_diagnostics(self):
+        """Ouvre la page « Diagnostics » de la fenêtre principale, rattachée à
+        ce dialogue (modal)."""
+        parent = self.parent()
+        if parent is not None and hasattr(parent, "show_diagnostics"):
+            parent.show_diagnostics(parent=self)
+
     def get_shortcut_text(self, widget):
         keys = []
         if widget.findChild(QCheckBox, "Ctrl").isChecked():
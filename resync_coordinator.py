@@ -7,8 +7,23 @@ Deux mécanismes séparés du reste (widgets, réseau) pour être vérifiables s
   une rafale d'évènements/reconnexions ne produit pas une rafale de threads.
 - ``snapshot_is_fresh`` : garde de révision. Un snapshot dont la révision est plus
   ancienne que l'état déjà connu ne doit jamais l'écraser.
+- ``decode_changes`` : rattrapage incrémental. Après une courte coupure, le
+  client demande ``/changes?since=<révision>`` (quelques centaines d'octets) au
+  lieu de l'état complet ``/state`` ; celui-ci n'est redemandé que si le
+  serveur signale un historique tronqué (ou ne connaît pas ``/changes``).
 """
 
+from ws_events import EventDecodeError, decode_patient_patch
+
+# Statuts indiquant un serveur sans ``/changes`` (version antérieure) : le
+# client repasse alors durablement par ``/state``.
+CHANGES_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+# Champs de ``/state`` que la réponse de ``/changes`` doit reprendre tels quels
+# (seule ``standing_list`` y est remplacée par ``ops``). Sans eux, appliquer le
+# rattrapage effacerait le patient en cours ou déconnecterait l'équipier.
+DELTA_STATE_KEYS = ("current_patient", "staff", "autocalling", "add_paper")
+
 
 class ResyncCoordinator:
     def __init__(self):
@@ -49,3 +64,46 @@ def snapshot_is_fresh(snapshot_revision, known_revision):
     if snapshot_revision is None or known_revision is None or known_revision < 0:
         return True
     return snapshot_revision >= known_revision
+
+
+class StateDelta:
+    """Rattrapage incrémental décodé : ``patch`` (``PatientPatchEvent`` de
+    ``base_revision`` -> ``revision``) et ``state`` (champs de ``/state`` hors
+    ``standing_list``, ``revision`` comprise)."""
+
+    __slots__ = ("patch", "state")
+
+    def __init__(self, patch, state):
+        self.patch = patch
+        self.state = state
+
+    @property
+    def revision(self):
+        return self.patch.revision
+
+
+def decode_changes(data, since):
+    """``StateDelta`` depuis la réponse de ``/changes?since=<since>`` :
+
+        {"base_revision": since, "revision": n, "truncated": false,
+         "ops": [...], "current_patient": ..., "staff": ..., ...}
+
+    (``ops`` : voir ``ws_events.decode_patient_patch``). Retourne None s'il faut
+    repasser par ``/state`` : historique tronqué côté serveur, réponse mal
+    formée, autre base, ou champs d'état manquants."""
+    if not isinstance(data, dict) or data.get("truncated") or "revision" not in data:
+        return None
+    if any(key not in data for key in DELTA_STATE_KEYS):
+        return None
+    payload = dict(data)
+    payload.setdefault("base_revision", since)
+    try:
+        patch = decode_patient_patch(payload)
+    except EventDecodeError:
+        return None
+    if patch.base_revision != since or patch.revision < since:
+        return None
+    state = {k: v for k, v in data.items()
+             if k not in ("ops", "base_revision", "truncated", "standing_list")}
+    state["revision"] = patch.revision
+    return StateDelta(patch, state)
@@ -19,15 +19,34 @@ Migration
 ---------
 ``load_secret`` migre automatiquement une éventuelle valeur héritée stockée en
 clair dans QSettings : elle est déplacée vers keyring puis effacée de QSettings.
+
+Jeton mémorisé (démarrage à chaud)
+----------------------------------
+Le dernier jeton applicatif valide est conservé à côté du secret (même service
+keyring, entrée ``app_token``) avec son échéance, pour que le démarrage puisse
+interroger ``/state`` directement au lieu d'attendre d'abord
+``/api/get_app_token``. Contrairement au secret, il n'y a PAS de repli en clair :
+sans keyring, on ne mémorise simplement rien (un jeton se redemande). Le jeton
+est lié au couple (URL serveur, secret) par une empreinte (``token_scope``) :
+changer de serveur ou de secret l'invalide.
 """
 
+import hashlib
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 # Namespace de l'entrée dans le magasin d'identifiants.
 SERVICE_NAME = "GestionFile-AppComptoir"
 SECRET_ENTRY = "app_secret"
+TOKEN_ENTRY = "app_token"
+
+# Jeton sans échéance annoncée par le serveur : réutilisable au plus ce temps.
+MAX_UNDATED_TOKEN_AGE_S = 12 * 3600
+# Un jeton qui expire dans moins de ce délai n'est pas réutilisé au démarrage.
+TOKEN_EXPIRY_MARGIN_S = 60
 
 # Clé QSettings historique (secret en clair) : lue pour migration, puis effacée.
 _LEGACY_QSETTINGS_KEY = "app_secret"
@@ -45,27 +64,44 @@ except Exception as exc:  # pragma: no cover - dépend de l'environnement
     logger.warning("keyring indisponible (%s) : repli sur QSettings pour le secret.", exc)
 
 
-def _keyring_get():
+def _keyring_read(entry):
     if not _KEYRING_AVAILABLE:
         return None
     try:
-        return keyring.get_password(SERVICE_NAME, SECRET_ENTRY)
+        return keyring.get_password(SERVICE_NAME, entry)
     except (KeyringError, Exception) as exc:  # pragma: no cover
-        logger.warning("Lecture keyring impossible (%s) : repli sur QSettings.", exc)
+        logger.warning("Lecture keyring impossible (%s, entrée %s).", exc, entry)
         return None
 
 
-def _keyring_set(value) -> bool:
+def _keyring_write(entry, value) -> bool:
     if not _KEYRING_AVAILABLE:
         return False
     try:
-        keyring.set_password(SERVICE_NAME, SECRET_ENTRY, value)
+        keyring.set_password(SERVICE_NAME, entry, value)
         return True
     except (KeyringError, Exception) as exc:  # pragma: no cover
-        logger.warning("Écriture keyring impossible (%s) : repli sur QSettings.", exc)
+        logger.warning("Écriture keyring impossible (%s, entrée %s).", exc, entry)
         return False
 
 
+def _keyring_delete(entry):
+    if not _KEYRING_AVAILABLE:
+        return
+    try:
+        keyring.delete_password(SERVICE_NAME, entry)
+    except (KeyringError, Exception):  # pragma: no cover - entrée absente
+        pass
+
+
+def _keyring_get():
+    return _keyring_read(SECRET_ENTRY)
+
+
+def _keyring_set(value) -> bool:
+    return _keyring_write(SECRET_ENTRY, value)
+
+
 def load_secret(settings) -> str:
     """Retourne le secret applicatif, en le migrant depuis QSettings si besoin.
 
@@ -109,3 +145,60 @@ def save_secret(settings, value) -> bool:
     logger.warning("Secret applicatif stocké en clair dans QSettings (keyring indisponible).")
     settings.setValue(_LEGACY_QSETTINGS_KEY, value)
     return False
+
+
+def token_scope(web_url, app_secret) -> str:
+    """Empreinte du couple (URL serveur, secret) à laquelle un jeton mémorisé
+    est lié. Le secret n'est jamais stocké tel quel avec le jeton."""
+    raw = f"{web_url or ''}\0{app_secret or ''}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def save_token(token, scope, ttl_s=None, now=None) -> bool:
+    """Mémorise ``token`` (lié à ``scope``) dans le magasin sécurisé, avec son
+    échéance si la durée de vie ``ttl_s`` est connue. Retourne False si le
+    magasin est indisponible (rien n'est écrit : pas de repli en clair)."""
+    if not token:
+        return False
+    now = time.time() if now is None else now
+    record = {
+        "token": token,
+        "scope": scope,
+        "saved_at": now,
+        "expires_at": now + ttl_s if ttl_s else None,
+    }
+    return _keyring_write(TOKEN_ENTRY, json.dumps(record))
+
+
+def load_token(scope, now=None):
+    """Jeton mémorisé pour ``scope`` encore utilisable : ``(jeton, durée de vie
+    restante en secondes ou None)``, sinon None (absent, autre serveur/secret,
+    expiré ou proche de l'expiration, enregistrement illisible)."""
+    raw = _keyring_read(TOKEN_ENTRY)
+    if not raw:
+        return None
+    try:
+        record = json.loads(raw)
+        token = record["token"]
+        saved_at = float(record["saved_at"])
+        expires_at = record.get("expires_at")
+        expires_at = float(expires_at) if expires_at is not None else None
+    except (ValueError, TypeError, KeyError):
+        logger.warning("Jeton mémorisé illisible : ignoré.")
+        return None
+    if not token or record.get("scope") != scope:
+        return None
+    now = time.time() if now is None else now
+    if expires_at is None:
+        if now - saved_at > MAX_UNDATED_TOKEN_AGE_S:
+            return None
+        return token, None
+    remaining = expires_at - now
+    if remaining <= TOKEN_EXPIRY_MARGIN_S:
+        return None
+    return token, remaining
+
+
+def clear_token():
+    """Oublie le jeton mémorisé (refusé par le serveur, ou déconnexion)."""
+    _keyring_delete(TOKEN_ENTRY)
@@ -34,8 +34,11 @@ from typing import Any, Callable, Optional, Tuple
 from accessibility import (
     DEFAULT_LIST_FONT_SIZE, DEFAULT_TONE, clamp_font_size, normalize_tone,
 )
+from net_transport import DEFAULT_ENGINE, normalize_engine
 from panel_layout import DEFAULT_PANEL_THICKNESS, clamp_thickness
 from shortcut_config import DEFAULT_MODE, normalize_mode
+from ws_events import DEFAULT_COALESCE_WINDOW_MS
+from ws_heartbeat import DEFAULT_DEAD_LINK_TIMEOUT_S
 
 
 @dataclass(frozen=True)
@@ -115,6 +118,43 @@ SETTINGS = {
     "patient_list_vertical_position": Setting(default="bottom", kind=str),
     "patient_list_horizontal_position": Setting(default="right", kind=str),
 
+    # --- Réseau --------------------------------------------------------------
+    # Requêtes HTTP simultanées (workers du gestionnaire réseau). 1 = exécution
+    # en série historique. Lu au démarrage seulement (redémarrage nécessaire).
+    "network_workers": Setting(default=1, kind=int, bounds=(1, 8)),
+    # Moteur HTTP du gestionnaire réseau (net_transport) : "requests" (défaut)
+    # ou "asyncio" (requêtes multiplexées sur une boucle, annulables en vol).
+    # Lu au démarrage seulement.
+    "network_engine": Setting(default=DEFAULT_ENGINE, kind=str, coerce=normalize_engine),
+    # Connexions ouvertes d'avance vers le serveur (démarrage, reconnexion) et
+    # gardées ouvertes pendant l'inactivité. 0 = pas de préchauffage.
+    "prewarm_connections": Setting(default=2, kind=int, bounds=(0, 8)),
+    # Corps de POST volumineux envoyés compressés (gzip). Le serveur doit savoir
+    # les décompresser ; s'il répond 415, le client repasse en clair.
+    "compress_requests": Setting(default=False, kind=bool),
+    # Mode hors ligne : les actions éligibles (valider, pause, rappel, papier)
+    # faites serveur injoignable sont journalisées puis rejouées au retour.
+    "offline_journal": Setting(default=False, kind=bool),
+    # Fenêtre (ms) de regroupement des rafales de mises à jour de la file
+    # reçues en temps réel : une seule mise à jour de l'écran par fenêtre.
+    # 0 = pas de regroupement. Lu à la connexion du lien temps réel.
+    "ws_coalesce_window_ms": Setting(default=DEFAULT_COALESCE_WINDOW_MS, kind=int, bounds=(0, 1000)),
+    # Délai (s) sans aucun message du serveur (évènement ou réponse au battement
+    # de cœur) au-delà duquel le lien temps réel est réputé mort et reconnecté.
+    # 0 = détection désactivée. Lu à la connexion du lien temps réel.
+    "ws_dead_link_timeout_s": Setting(default=DEFAULT_DEAD_LINK_TIMEOUT_S, kind=int, bounds=(0, 120)),
+
+    # --- Métriques (metrics.py) ---------------------------------------------
+    # Export périodique (secondes) vers metrics.prom / metrics.jsonl dans le
+    # dossier des journaux. 0 = désactivé. Lu au démarrage.
+    "metrics_export_interval": Setting(default=60, kind=int, bounds=(0, 3600)),
+    # Port local (127.0.0.1) où servir /metrics. 0 = pas de serveur.
+    "metrics_port": Setting(default=0, kind=int, bounds=(0, 65535)),
+
+    # Chien de garde des gels de l'UI : seuil (ms) au-delà duquel la pile du
+    # thread GUI est écrite dans stalls.log. 0 = désactivé. Lu au démarrage.
+    "stall_threshold_ms": Setting(default=1000, kind=int, bounds=(0, 10000)),
+
     # --- Divers --------------------------------------------------------------
     "debug_window": Setting(default=False, kind=bool),
     "selected_skin": Setting(default="", kind=str),
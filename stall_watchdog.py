@@ -0,0 +1,162 @@
+"""Chien de garde des gels de la boucle d'évènements GUI (sans dépendance
+PySide, testable seul).
+
+La fenêtre du comptoir se fige parfois une à deux secondes sans qu'on sache
+quel code bloque le thread GUI (``processEvents`` de ``LoadingScreen``, accès
+au trousseau dans ``load_preferences``, application d'un skin...). Un thread
+dédié envoie périodiquement un « ping » à la boucle Qt (``post`` : le rappel
+doit être exécuté par le thread GUI) ; si la réponse (``pong``) tarde au-delà
+de ``threshold_s``, il capture la pile Python du thread principal
+(``sys._current_frames``) et l'écrit, avec la durée, dans un journal dédié
+(``stalls.log``, tournant et masqué comme le journal applicatif). Les rapports
+avec pile sont limités à un par ``report_interval_s`` ; les gels non détaillés
+sont comptés et signalés dans le rapport suivant.
+"""
+
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from my_logger import rotating_file_handler
+
+STALL_LOG_FILENAME = "stalls.log"
+STALL_LOGGER_NAME = "appcomptoir.stalls"
+DEFAULT_THRESHOLD_S = 1.0
+DEFAULT_REPORT_INTERVAL_S = 30.0
+MAX_STACK_FRAMES = 40
+
+
+def capture_stack(thread_id, limit=MAX_STACK_FRAMES):
+    """Pile courante (texte, frame la plus récente en dernier) du thread
+    ``thread_id``, ou None s'il n'existe plus."""
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return None
+    return "".join(traceback.format_stack(frame, limit=limit)).rstrip()
+
+
+def setup_stall_logger(directory=None):
+    """Logger des gels écrivant dans ``stalls.log`` (tournant, masqué). Ne
+    propage pas au journal applicatif : les piles n'y ont pas leur place.
+    Idempotent ; en cas d'échec d'ouverture du fichier, le logger propage."""
+    stall_logger = logging.getLogger(STALL_LOGGER_NAME)
+    if getattr(stall_logger, "_stall_file_configured", False):
+        return stall_logger
+    try:
+        stall_logger.addHandler(rotating_file_handler(STALL_LOG_FILENAME, directory))
+    except OSError as e:
+        stall_logger.warning("Journal des gels indisponible (%s), journal applicatif utilisé.", e)
+        return stall_logger
+    stall_logger.setLevel(logging.INFO)
+    stall_logger.propagate = False
+    stall_logger._stall_file_configured = True
+    return stall_logger
+
+
+class StallWatchdog:
+    """Surveille la réactivité de la boucle d'évènements (voir docstring du
+    module). ``check()`` fait un tour de surveillance ; ``start()`` l'appelle
+    toutes les ``interval_s`` depuis un thread démon."""
+
+    def __init__(self, post, main_thread_id=None, threshold_s=DEFAULT_THRESHOLD_S,
+                 interval_s=None, report_interval_s=DEFAULT_REPORT_INTERVAL_S,
+                 stall_logger=None, clock=time.monotonic, capture=capture_stack):
+        self._post = post
+        self._main_thread_id = (main_thread_id if main_thread_id is not None
+                                else threading.main_thread().ident)
+        self.threshold_s = threshold_s
+        # Sondage assez fin pour détecter un gel peu après le seuil.
+        self._interval_s = interval_s if interval_s is not None else max(0.05, threshold_s / 4)
+        self._report_interval_s = report_interval_s
+        self._logger = stall_logger or logging.getLogger(STALL_LOGGER_NAME)
+        self._clock = clock
+        self._capture = capture
+        self._lock = threading.Lock()
+        self._ping_at = None          # ping en attente de réponse
+        self._detected = False        # gel en cours déjà détecté
+        self._detailed = False        # ... et détaillé (pile écrite)
+        self._last_report_at = None
+        self._suppressed = 0
+        self._stats = {"stalls": 0, "reported": 0, "longest_s": 0.0, "last_s": None}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Envoie un ping si aucun n'est en attente ; sinon, si la boucle ne
+        répond plus depuis ``threshold_s``, détaille le gel (une fois par gel)."""
+        now = self._clock()
+        with self._lock:
+            if self._ping_at is None:
+                self._ping_at = now
+                send = True
+            else:
+                send = False
+                waited = now - self._ping_at
+                detect = waited >= self.threshold_s and not self._detected
+                if detect:
+                    self._detected = True
+                    allowed = (self._last_report_at is None
+                               or now - self._last_report_at >= self._report_interval_s)
+                    self._detailed = allowed
+                    if allowed:
+                        self._last_report_at = now
+                        suppressed, self._suppressed = self._suppressed, 0
+                    else:
+                        self._suppressed += 1
+        if send:
+            self._post(self.pong)
+            return
+        if detect and allowed:
+            stack = self._capture(self._main_thread_id) or "(pile indisponible)"
+            extra = f" ; {suppressed} gel(s) précédent(s) non détaillé(s)" if suppressed else ""
+            self._logger.warning(
+                "Boucle GUI bloquée depuis %.0f ms (seuil %.0f ms)%s. Pile du thread principal :\n%s",
+                waited * 1000, self.threshold_s * 1000, extra, stack)
+            with self._lock:
+                self._stats["reported"] += 1
+
+    def pong(self):
+        """Réponse de la boucle GUI (exécutée par le thread GUI)."""
+        now = self._clock()
+        with self._lock:
+            ping_at, self._ping_at = self._ping_at, None
+            detailed, self._detailed = self._detailed, False
+            self._detected = False
+            if ping_at is None:
+                return
+            duration = now - ping_at
+            if duration < self.threshold_s:
+                return
+            self._stats["stalls"] += 1
+            self._stats["last_s"] = duration
+            self._stats["longest_s"] = max(self._stats["longest_s"], duration)
+        if detailed:
+            self._logger.warning("Boucle GUI débloquée après %.0f ms", duration * 1000)
+
+    def stats(self):
+        """``{stalls, reported, longest_s, last_s}`` (gels terminés ; ``reported`` :
+        rapports avec pile écrits)."""
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.check()
+            except Exception as e:  # le chien de garde ne doit jamais tomber
+                self._logger.debug("Chien de garde GUI : %s", e)
+
+    def stop(self, timeout_s=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+            self._thread = None
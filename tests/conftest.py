@@ -11,6 +11,9 @@ QGuiApplication, lui-même un QCoreApplication) pour toute la session, avant tou
 test. Les fixtures ``qapp`` des modules réutilisent alors cette instance via
 ``*.instance()`` sans en recréer une. Backend « offscreen » : pas besoin d'un
 affichage réel (fonctionne aussi en CI headless).
+
+On y trouve aussi ``FakeClock``, horloge manuelle partagée par les tests des
+modules qui acceptent un paramètre ``clock`` (``from conftest import FakeClock``).
 """
 
 import os
@@ -26,3 +29,14 @@ def _shared_qapplication():
 
     app = QApplication.instance() or QApplication([])
     yield app
+
+
+class FakeClock:
+    """Horloge manuelle : appelable comme ``time.monotonic``, avancée en
+    modifiant ``now``."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
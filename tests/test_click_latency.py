@@ -0,0 +1,63 @@
+"""Tests de la mesure de latence clic -> écran (click_latency)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from click_latency import ClickLatencyTracker, percentile  # noqa: E402
+
+
+def test_percentile_nearest_rank():
+    values = sorted(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_press_then_shown_records_elapsed():
+    tracker = ClickLatencyTracker()
+    tracker.press("next", t=10.0)
+    assert tracker.pending("next")
+    assert tracker.shown("next", t=10.75) == 0.75
+    assert not tracker.pending("next")
+    # Réponse sans appui en attente (action déclenchée autrement) : ignorée.
+    assert tracker.shown("next", t=12.0) is None
+    assert tracker.summary()["next"]["count"] == 1
+
+
+def test_first_press_wins_until_stale():
+    tracker = ClickLatencyTracker(stale_after_s=30.0)
+    tracker.press("next", t=1.0)      # raccourci clavier
+    tracker.press("next", t=1.1)      # clic simulé du bouton qui suit
+    assert tracker.shown("next", t=1.5) == 0.5
+    tracker.press("pause", t=0.0)     # appui resté sans suite
+    tracker.press("pause", t=100.0)
+    assert tracker.shown("pause", t=100.25) == 0.25
+
+
+def test_cancel_counts_failures_outside_percentiles():
+    tracker = ClickLatencyTracker()
+    tracker.press("validate", t=0.0)
+    tracker.cancel("validate")                 # refusée : ni mesure ni échec
+    tracker.press("validate", t=1.0)
+    tracker.cancel("validate", failed=True)
+    stats = tracker.summary()["validate"]
+    assert stats["count"] == 0 and stats["failures"] == 1
+    assert stats["p50_s"] is None
+    assert "validate n=0 p50=- " in tracker.summary_line()
+
+
+def test_rolling_window_and_summary_line():
+    tracker = ClickLatencyTracker(window=3)
+    for i, elapsed in enumerate((5.0, 0.1, 0.2, 0.3)):
+        tracker.press("next", t=i * 10.0)
+        tracker.shown("next", t=i * 10.0 + elapsed)
+    stats = tracker.summary()["next"]
+    assert stats["count"] == 3                 # la mesure de 5 s est sortie
+    assert round(stats["p50_s"], 3) == 0.2
+    assert round(stats["max_s"], 3) == 0.3
+    assert tracker.summary_line() == "next n=3 p50=200ms p95=300ms p99=300ms max=300ms"
+    assert ClickLatencyTracker().summary_line() == "aucune mesure"
@@ -24,6 +24,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pa
 
 import main  # noqa: E402
 from resync_coordinator import ResyncCoordinator  # noqa: E402
+from ws_events import decode_patient_patch, normalize_patients  # noqa: E402
 
 
 # --- new_patient : garde de révision + robustesse (#6, #7, #8) ---------------
@@ -80,6 +81,70 @@ def test_new_patient_revision_gap_triggers_resync():
     assert w.calls["refresh"] == 0           # pas d'application directe
 
 
+def test_new_patient_coalesced_burst_is_contiguous():
+    # Rafale regroupée 6..8 : révisions continues depuis 5, pas de trou.
+    w = _wnp(queue_revision=5)
+    w.new_patient([{"id": 3}], revision=8, first_revision=6)
+    assert w.queue_revision == 8
+    assert w.calls["refresh"] == 1
+    assert w.calls["resync"] == 0
+
+
+def test_new_patient_coalesced_burst_with_gap_triggers_resync():
+    # La suite continue de la rafale ne commence qu'en 7 : la 6 a été manquée.
+    w = _wnp(queue_revision=5)
+    w.new_patient([{"id": 3}], revision=8, first_revision=7)
+    assert w.queue_revision == 8
+    assert w.calls["resync"] == 1
+    assert w.calls["refresh"] == 0
+
+
+def _wpatch(queue_revision, ids=(1, 2)):
+    w = _wnp(queue_revision=queue_revision)
+    w.list_patients = normalize_patients([{"id": i} for i in ids])
+    w.patch_ops = []
+    w.refresh_patient_lists = lambda patch_ops=None: w.patch_ops.append(patch_ops)
+    w.new_patient_patch = types.MethodType(main.MainWindow.new_patient_patch, w)
+    return w
+
+
+def _patch(base_revision, *ops):
+    return decode_patient_patch({"base_revision": base_revision, "ops": list(ops)})
+
+
+def test_patch_on_known_revision_is_applied_without_full_list():
+    w = _wpatch(queue_revision=5)
+    event = _patch(5, {"op": "insert", "index": 2, "patient": {"id": 3}})
+    w.new_patient_patch(event)
+    assert w.queue_revision == 6
+    assert [p["id"] for p in w.list_patients] == [1, 2, 3]
+    assert w.patch_ops == [event.ops]        # rejoué tel quel sur le modèle
+    assert w.calls["resync"] == 0
+
+
+def test_stale_patch_is_ignored():
+    w = _wpatch(queue_revision=5)
+    w.new_patient_patch(_patch(4, {"op": "remove", "id": 1}))
+    assert w.queue_revision == 5 and [p["id"] for p in w.list_patients] == [1, 2]
+    assert w.patch_ops == [] and w.calls["resync"] == 0
+
+
+@pytest.mark.parametrize("queue_revision, base", [(5, 6), (-1, 0), (None, 0)])
+def test_patch_on_other_base_falls_back_to_resync(queue_revision, base):
+    w = _wpatch(queue_revision=queue_revision)
+    w.new_patient_patch(_patch(base, {"op": "remove", "id": 1}))
+    assert w.calls["resync"] == 1
+    assert w.patch_ops == [] and [p["id"] for p in w.list_patients] == [1, 2]
+
+
+def test_patch_not_matching_local_list_falls_back_to_resync():
+    w = _wpatch(queue_revision=5)
+    w.new_patient_patch(_patch(5, {"op": "remove", "id": 9}))
+    assert w.calls["resync"] == 1
+    assert w.queue_revision == 6
+    assert w.patch_ops == []
+
+
 def test_new_patient_without_revision_is_applied():
     # Évènement hérité sans numéro de révision : appliqué tel quel.
     w = _wnp(queue_revision=5)
@@ -200,3 +265,173 @@ def test_no_pending_pass_does_not_relaunch():
     w = _wrr(queue_revision=10, pending=False)
     w._on_resync_ready({"revision": 11})
     assert w.calls["resync"] == 0
+
+
+# --- Resync par futur (sans thread dédié) ------------------------------------
+
+def test_resync_uses_network_future_and_signals_gui_thread():
+    from concurrent.futures import Future
+    from net_result import NetResult
+
+    submitted = []
+
+    def submit(url, method="GET"):
+        submitted.append(url)
+        return Future()
+
+    emitted = []
+    w = types.SimpleNamespace(
+        logger=logging.getLogger("test.convergence.future"),
+        shutting_down=False,
+        web_url="http://srv",
+        counter_id=3,
+        _resync=ResyncCoordinator(),
+        network_manager=types.SimpleNamespace(submit=submit),
+        resync_state_ready=types.SimpleNamespace(emit=emitted.append),
+        list_revision=-1,               # rien d'affiché : état complet
+        changes_supported=True,
+    )
+    for name in ("_request_resync", "_on_state_future", "_state_url", "_state_from_result",
+                 "_delta_base_revision", "_submit_state_resync"):
+        setattr(w, name, types.MethodType(getattr(main.MainWindow, name), w))
+
+    w._request_resync()
+    w._request_resync()               # déjà active : mémorisée, pas de 2e requête
+    assert submitted == ["http://srv/api/counter/3/state"]
+
+    future = Future()
+    future.set_result(NetResult.from_response(200, '{"revision": 4}', "application/json"))
+    w._on_state_future(future)
+    cancelled = Future()
+    cancelled.cancel()
+    w._on_state_future(cancelled)
+    assert emitted == [{"revision": 4}, None]
+
+
+# --- Rattrapage incrémental (/changes?since=) --------------------------------
+
+def _changes_body(base=7, revision=9, **overrides):
+    body = {"base_revision": base, "revision": revision, "truncated": False,
+            "ops": [{"op": "remove", "id": 1},
+                    {"op": "insert", "index": 1, "patient": {"id": 3}}],
+            "current_patient": None, "staff": {"id": 2, "name": "Léa"},
+            "autocalling": False, "add_paper": False}
+    body.update(overrides)
+    return body
+
+
+def _wdelta(list_revision=7, changes_supported=True):
+    from concurrent.futures import Future
+
+    submitted, emitted, unsupported = [], [], []
+
+    def submit(url, method="GET"):
+        submitted.append(url)
+        return Future()
+
+    w = types.SimpleNamespace(
+        logger=logging.getLogger("test.convergence.delta"),
+        shutting_down=False,
+        web_url="http://srv",
+        counter_id=3,
+        queue_revision=8,
+        list_revision=list_revision,
+        changes_supported=changes_supported,
+        list_patients=normalize_patients([{"id": 1}, {"id": 2}]),
+        _resync=ResyncCoordinator(),
+        network_manager=types.SimpleNamespace(submit=submit),
+        resync_state_ready=types.SimpleNamespace(emit=emitted.append),
+        changes_unsupported=types.SimpleNamespace(emit=lambda: unsupported.append(True)),
+        unsupported=unsupported,
+        submitted=submitted,
+        emitted=emitted,
+        applied=[],
+    )
+    for name in ("_request_resync", "_on_state_future", "_on_changes_future", "_state_url",
+                 "_changes_url", "_state_from_result", "_delta_base_revision",
+                 "_submit_state_resync", "_on_resync_ready", "_state_from_delta",
+                 "_on_changes_unsupported"):
+        setattr(w, name, types.MethodType(getattr(main.MainWindow, name), w))
+    w._apply_resync_state = w.applied.append
+    return w
+
+
+def _done(status, body):
+    import json
+    from concurrent.futures import Future
+    from net_result import NetResult
+
+    future = Future()
+    future.set_result(NetResult.from_response(status, json.dumps(body), "application/json"))
+    return future
+
+
+def test_resync_asks_changes_since_displayed_revision():
+    w = _wdelta(list_revision=7)
+    w._request_resync()
+    assert w.submitted == ["http://srv/api/counter/3/changes?since=7"]
+
+
+@pytest.mark.parametrize("list_revision, supported", [(-1, True), (None, True), (7, False)])
+def test_resync_falls_back_to_state_without_usable_base(list_revision, supported):
+    w = _wdelta(list_revision=list_revision, changes_supported=supported)
+    w._request_resync()
+    assert w.submitted == ["http://srv/api/counter/3/state"]
+
+
+def test_delta_is_applied_on_displayed_list():
+    w = _wdelta(list_revision=7)
+    w._request_resync()
+    w._on_changes_future(_done(200, _changes_body()), since=7)
+    (delta,) = w.emitted
+    w._on_resync_ready(delta)
+    (state,) = w.applied
+    assert state["revision"] == 9
+    assert [p["id"] for p in state["standing_list"]] == [2, 3]
+    assert state["staff"] == {"id": 2, "name": "Léa"}
+    assert w._resync.in_progress is False
+
+
+def test_truncated_history_requests_full_state():
+    w = _wdelta(list_revision=7)
+    w._request_resync()
+    w._on_changes_future(_done(200, _changes_body(truncated=True, ops=[])), since=7)
+    assert w.submitted[-1] == "http://srv/api/counter/3/state"
+    assert w.emitted == [] and w._resync.in_progress is True
+
+
+def test_server_without_changes_endpoint_is_remembered():
+    w = _wdelta(list_revision=7)
+    w._request_resync()
+    w._on_changes_future(_done(404, {"error": "not found"}), since=7)
+    assert w.submitted[-1] == "http://srv/api/counter/3/state"
+    # Le worker signale seulement ; le drapeau change dans le thread GUI.
+    assert w.unsupported == [True] and w.changes_supported is True
+    w._on_changes_unsupported()
+    assert w.changes_supported is False
+
+
+def test_unreachable_server_does_not_chain_state_request():
+    from concurrent.futures import Future
+    from net_result import NetResult
+
+    w = _wdelta(list_revision=7)
+    w._request_resync()
+    future = Future()
+    future.set_result(NetResult.network_error("timeout"))
+    w._on_changes_future(future, since=7)
+    assert w.emitted == [None]
+    assert len(w.submitted) == 1
+
+
+def test_delta_on_moved_list_requests_full_state():
+    # La file affichée a avancé (évènement appliqué entretemps) : la base du
+    # rattrapage ne correspond plus, l'état complet est redemandé.
+    w = _wdelta(list_revision=7)
+    w._request_resync()
+    w._on_changes_future(_done(200, _changes_body()), since=7)
+    w.list_revision = 8
+    w._on_resync_ready(w.emitted[0])
+    assert w.applied == []
+    assert w.submitted[-1] == "http://srv/api/counter/3/state"
+    assert w._resync.in_progress is True
@@ -14,7 +14,7 @@ import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 
-from counter_id_utils import coerce_counter_id  # noqa: E402
+from counter_id_utils import coerce_counter_id, counter_tag  # noqa: E402
 
 
 # --- helper pur -------------------------------------------------------------
@@ -47,6 +47,13 @@ def qapp():
     yield QCoreApplication.instance() or QCoreApplication([])
 
 
+
+def test_counter_tag_same_for_string_and_int():
+    # Une action lancée avec "1" (QSettings) est purgée par l'étiquette de 1.
+    assert counter_tag("1") == counter_tag(1)
+    assert counter_tag(1) != counter_tag(2)
+
+
 def _ws(counter_id):
     parent = types.SimpleNamespace(web_url="http://x", app_token="t", debug_window=False)
     parent.counter_id = counter_id  # entier (normalisé par load_preferences)
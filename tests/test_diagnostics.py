@@ -0,0 +1,125 @@
+"""Tests du diagnostic de performance (diagnostics) et de sa page Qt."""
+
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+import diagnostics  # noqa: E402
+from click_latency import ClickLatencyTracker  # noqa: E402
+from diagnostics import (  # noqa: E402
+    LoopLagProbe, RateMeter, collect_diagnostics, format_histogram, format_report, gc_counters,
+    object_census,
+)
+from task_registry import TaskRegistry  # noqa: E402
+
+
+class FakeManager:
+    worker_count = 2
+
+    def lane_stats(self):
+        return {"interactive": {"depth": 1, "avg_wait_s": 0.002, "max_wait_s": 0.01}}
+
+    def latency_histograms(self):
+        return {"interactive": {"bounds": [0.1, 1.0], "counts": [3, 1, 0],
+                                "count": 4, "sum_s": 0.6}}
+
+    def circuit_states(self):
+        return {"http://srv": "open", "http://ok": "closed"}
+
+
+def test_rate_meter_window_and_last_event_age():
+    clock = FakeClock(100.0)
+    meter = RateMeter(window_s=10, clock=clock)
+    for _ in range(5):
+        meter.hit()
+    clock.now += 4
+    meter.hit()
+    snapshot = meter.snapshot()
+    assert snapshot == {"total": 6, "per_s": 0.6, "last_age_s": 0.0}
+    clock.now += 8                      # les 5 premiers sortent de la fenêtre
+    assert meter.snapshot()["per_s"] == 0.1
+    assert meter.snapshot()["last_age_s"] == 8
+
+
+def test_loop_lag_probe_measures_late_wakeups():
+    clock = FakeClock(100.0)
+    probe = LoopLagProbe(0.1, clock=clock)
+    assert probe.tick() is None          # premier réveil : référence
+    clock.now += 0.1
+    assert probe.tick() == 0.0
+    clock.now += 0.6                     # thread GUI bloqué 500 ms
+    assert round(probe.tick(), 3) == 0.5
+    probe.reset()
+    clock.now += 30                      # page masquée : pas un retard
+    assert probe.tick() is None
+    snapshot = probe.snapshot()
+    assert snapshot["samples"] == 2 and round(snapshot["max_s"], 3) == 0.5
+
+
+def test_object_census_on_demand_and_cheap_gc_counters(monkeypatch):
+    census = object_census(top=3)
+    assert census["total"] > 0 and len(census["top"]) == 3
+    # Les compteurs de chaque rafraîchissement ne parcourent jamais le tas.
+    monkeypatch.setattr(diagnostics.gc, "get_objects", lambda *a, **k: pytest.fail("tas parcouru"))
+    counters = gc_counters()
+    assert len(counters["gc_counts"]) == len(counters["collections"]) == 3
+    objects = collect_diagnostics()["process"]["objects"]
+    assert objects["census"] is None
+
+
+def test_collect_and_format_report(monkeypatch):
+    monkeypatch.setattr(diagnostics, "process_rss_bytes", lambda: 50 * 1024 * 1024)
+    tasks = TaskRegistry()
+    tasks.add(object(), key="validate")
+    latency = ClickLatencyTracker()
+    latency.press("next", t=0.0)
+    latency.shown("next", t=0.4)
+    ws = types.SimpleNamespace(stats=lambda: {
+        "connected": True, "reconnects": 3, "rtt_s": 0.025, "events": 12,
+        "events_per_s": 1.5, "last_event_age_s": 2.0})
+    snapshot = collect_diagnostics(network_manager=FakeManager(), ws_client=ws, tasks=tasks,
+                                   click_latency=latency, loop_lag=LoopLagProbe(0.1),
+                                   census={"total": 1234, "top": [("dict", 900)]})
+    assert snapshot["tasks"] == ["validate"] and snapshot["task_count"] == 1
+    report = format_report(snapshot)
+    assert "file interactive : profondeur 1" in report
+    assert "latence interactive (n=4, moy. 150 ms) : ≤100ms:3 ≤1s:1 >1s:0" in report
+    assert "disjoncteurs ouverts : http://srv" in report
+    assert "reconnexions : 3, RTT : 25 ms" in report
+    assert "clic -> écran next (n=1) : p50 400 ms" in report
+    assert "RSS : 50.0 Mo" in report
+    assert "objets Python : 1234" in report and "dict 900" in report
+    assert "actions : validate" in report
+
+
+def test_report_without_sources():
+    report = format_report(collect_diagnostics())
+    assert report.count("indisponible") == 3
+
+
+def test_format_histogram_labels():
+    assert format_histogram({"bounds": [0.05, 2.5], "counts": [1, 2, 3]}) == \
+        "≤50ms:1 ≤2.5s:2 >2.5s:3"
+
+
+def test_dialog_refresh_only_while_visible():
+    from diagnostics_dialog import DiagnosticsDialog
+
+    window = types.SimpleNamespace(_tasks=TaskRegistry(), click_latency=ClickLatencyTracker())
+    dialog = DiagnosticsDialog(window)
+    assert not dialog.refresh_timer.isActive()
+    dialog.show()
+    try:
+        assert dialog.refresh_timer.isActive() and dialog.lag_timer.isActive()
+        assert "== Tâches en cours ==" in dialog.report.toPlainText()
+        assert "objets Python : non recensés" in dialog.report.toPlainText()
+        dialog.census_button.click()
+        assert "objets Python : non recensés" not in dialog.report.toPlainText()
+    finally:
+        dialog.hide()
+    assert not dialog.refresh_timer.isActive() and not dialog.lag_timer.isActive()
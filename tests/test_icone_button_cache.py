@@ -15,6 +15,7 @@ Tests réels avec PySide6 (QApplication offscreen) : IconeButton est un QWidget.
 
 import os
 import sys
+from unittest import mock
 
 import pytest
 
@@ -167,3 +168,32 @@ def test_accessible_description_reflects_current_state(qapp):
     assert btn.accessibleDescription() == "Activer"
     btn.change_state("waiting")
     assert btn.accessibleDescription() == "En attente d'une connexion"
+
+
+# --------------------------------------------------------------------------
+# Mode hors ligne : éligibilité déclarée à la construction, pas déduite de l'URL
+# --------------------------------------------------------------------------
+
+def _fake_window():
+    window = mock.MagicMock(counter_id=1)
+    window.offline_wrap.return_value = ({"Idempotency-Key": "k"}, mock.MagicMock())
+    return window
+
+
+def test_button_without_offline_action_is_never_journaled(qapp):
+    btn = IconeButton(ACTIVE_ICON, INACTIVE_ICON, "http://x/app/counter/paper_add",
+                      "Désactiver", "Activer", "inactive")
+    btn.main_window = _fake_window()
+    btn.send_request("activate")
+    btn.main_window.offline_wrap.assert_not_called()
+    assert btn.main_window.make_request_thread.call_args.kwargs["headers"] is None
+
+
+def test_button_with_offline_action_is_wrapped(qapp):
+    btn = IconeButton(ACTIVE_ICON, INACTIVE_ICON, "http://x/app/counter/paper_add",
+                      "Désactiver", "Activer", "inactive", offline_action="paper")
+    btn.main_window = _fake_window()
+    btn.send_request("activate")
+    assert btn.main_window.offline_wrap.call_args.args[0] == "paper"
+    assert btn.main_window.make_request_thread.call_args.kwargs["headers"] == {
+        "Idempotency-Key": "k"}
@@ -39,6 +39,8 @@ from PySide6.QtWidgets import QHBoxLayout, QMainWindow, QVBoxLayout  # noqa: E40
 
 import main  # noqa: E402
 from buttons import DebounceButton  # noqa: E402
+from patient_list_model import PatientListModel  # noqa: E402
+from ws_events import normalize_patients  # noqa: E402
 
 
 # --- toggle_orientation : logique de branchement (faux self, mocks) ---------
@@ -216,3 +218,59 @@ def test_toggle_orientation_rebuilds_layout_end_to_end(window):
 
     # Toujours pas de réseau réel après reconstruction.
     window.network_manager.request_blocking.assert_not_called()
+
+
+# --- Indicateur : serveur HTTP injoignable (disjoncteur réseau) --------------
+
+def test_indicator_reports_unreachable_server():
+    indicator = main.ConnectionStatusIndicator()
+    try:
+        assert "injoignable" not in indicator._status_tooltip()
+        indicator.set_server_reachable(False)
+        assert indicator.server_reachable is False
+        assert "Serveur injoignable" in indicator._status_tooltip()
+        indicator.set_server_reachable(True)
+        assert "injoignable" not in indicator._status_tooltip()
+    finally:
+        indicator.deleteLater()
+
+
+def test_indicator_tooltip_shows_live_link_health():
+    indicator = main.ConnectionStatusIndicator()
+    try:
+        assert "Aller-retour" not in indicator._status_tooltip()
+        indicator.link_stats = lambda: {"rtt_s": 0.031, "last_event_age_s": 7.0}
+        assert ("Aller-retour 31 ms, dernier évènement il y a 7 s"
+                in indicator._status_tooltip())
+        indicator.status = "disconnected"
+        assert "Aller-retour" not in indicator._status_tooltip()
+    finally:
+        indicator.deleteLater()
+
+
+def test_circuit_change_forwarded_to_indicator():
+    stub = types.SimpleNamespace(logger=logging.getLogger("test.circuit"),
+                                 connection_indicator=mock.MagicMock())
+    main.MainWindow._on_circuit_changed(stub, "http://srv", "open")
+    stub.connection_indicator.set_server_reachable.assert_called_with(False)
+    main.MainWindow._on_circuit_changed(stub, "http://srv", "closed")
+    stub.connection_indicator.set_server_reachable.assert_called_with(True)
+
+
+# --- Menu contextuel de la liste : lignes PatientRecord (Mapping) -------------
+
+def test_patient_list_context_menu_opens_for_patient_records():
+    model = PatientListModel()
+    model.set_patients(normalize_patients([{"id": 7, "call_number": "A7"}]))
+    view = mock.MagicMock()
+    view.indexAt.return_value = model.index(0)
+    stub = types.SimpleNamespace(patient_list_view=view, activities_staff=None,
+                                 on_action_validate=mock.MagicMock(),
+                                 on_action_delete=mock.MagicMock())
+    with mock.patch.object(main, "QMenu") as menu_class:
+        main.MainWindow._on_patient_list_context_menu(stub, mock.MagicMock())
+    menu = menu_class.return_value
+    menu.exec.assert_called_once()
+    validate = menu.addAction.return_value.triggered.connect.call_args_list[0].args[0]
+    validate()
+    stub.on_action_validate.assert_called_once_with(7)
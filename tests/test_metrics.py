@@ -0,0 +1,151 @@
+"""Tests du registre de métriques et de son export (metrics)."""
+
+import json
+import os
+import sys
+import types
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from click_latency import ClickLatencyTracker  # noqa: E402
+from metrics import (  # noqa: E402
+    MetricsExporter, MetricsRegistry, MetricsServer, collect_click_latency, collect_network,
+    collect_notifications, collect_websocket,
+)
+from net_trace import LatencyHistogram  # noqa: E402
+
+
+class FakeManager:
+    def lane_stats(self):
+        return {"interactive": {"depth": 0, "dequeued": 4, "max_wait_s": 0.01},
+                "background": {"depth": 2, "dequeued": 9, "max_wait_s": None}}
+
+    def latency_histograms(self):
+        histogram = LatencyHistogram(bounds=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(2.0)
+        return {"interactive": histogram.snapshot()}
+
+    def coalescing_stats(self):
+        return {"leaders": 3, "saved": 2}
+
+    def cache_stats(self):
+        return {"hits": 5}
+
+    def bandwidth_stats(self):
+        return {"srv/api/state": {"request_wire_bytes": 100, "response_wire_bytes": 900,
+                                  "saved_bytes": 4000}}
+
+    def circuit_states(self):
+        return {"http://srv": "open"}
+
+    def warmup_stats(self):
+        return {"first_click": {"last_s": None}}
+
+
+def test_counter_gauge_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.counter("actions_total", "Actions").inc(action="next")
+    registry.counter("actions_total").inc(2, action="next")
+    registry.gauge("label_test").set(1.5, note='a"b\\c')
+    text = registry.to_prometheus()
+    assert "# TYPE pharmafile_actions_total counter" in text
+    assert 'pharmafile_actions_total{action="next"} 3' in text
+    assert 'pharmafile_label_test{note="a\\"b\\\\c"} 1.5' in text
+    with pytest.raises(ValueError):
+        registry.gauge("actions_total")
+
+
+def test_histogram_exposition_is_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("wait_seconds", "Attente", bounds=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, lane="ui")
+    text = registry.to_prometheus()
+    assert 'pharmafile_wait_seconds_bucket{lane="ui",le="0.1"} 1' in text
+    assert 'pharmafile_wait_seconds_bucket{lane="ui",le="1.0"} 3' in text
+    assert 'pharmafile_wait_seconds_bucket{lane="ui",le="+Inf"} 4' in text
+    assert 'pharmafile_wait_seconds_count{lane="ui"} 4' in text
+    assert 'pharmafile_wait_seconds_sum{lane="ui"} 4.25' in text
+
+
+def test_collectors_copy_component_state():
+    registry = MetricsRegistry()
+    ws = types.SimpleNamespace(stats=lambda: {
+        "connected": True, "reconnects": 2, "events": 40, "events_per_s": 0.5,
+        "last_event_age_s": 3.0, "rtt_s": None, "coalesced_dropped": 7, "dead_links": 1})
+    latency = ClickLatencyTracker()
+    latency.press("next", t=0.0)
+    latency.shown("next", t=0.3)
+    registry.add_collector(lambda r: collect_network(r, FakeManager()))
+    registry.add_collector(lambda r: collect_websocket(r, ws))
+    registry.add_collector(lambda r: collect_notifications(r, None))   # pas encore créé
+    registry.add_collector(lambda r: collect_click_latency(r, latency))
+    text = registry.to_prometheus()
+    assert 'pharmafile_http_queue_depth{lane="background"} 2' in text
+    assert 'pharmafile_http_latency_seconds_bucket{lane="interactive",le="+Inf"} 2' in text
+    assert 'pharmafile_http_wire_bytes_total{direction="received"} 900' in text
+    assert 'pharmafile_http_circuit_open{server="http://srv"} 1' in text
+    assert "pharmafile_ws_reconnects_total 2" in text
+    assert "pharmafile_ws_rtt_seconds" not in text
+    assert "pharmafile_ws_coalesced_dropped_total 7" in text
+    assert "pharmafile_ws_dead_link_reconnects_total 1" in text
+    assert "pharmafile_notifications_total" not in text
+    assert 'pharmafile_click_latency_seconds{action="next",quantile="0.95"} 0.3' in text
+
+
+def test_failing_collector_does_not_block_export():
+    registry = MetricsRegistry()
+    registry.add_collector(lambda r: 1 / 0)
+    registry.add_collector(lambda r: r.gauge("ok").set(1))
+    assert "pharmafile_ok 1" in registry.to_prometheus()
+
+
+def test_json_snapshot():
+    registry = MetricsRegistry()
+    registry.histogram("h", bounds=(1.0,)).observe(0.5)
+    registry.gauge("g").set(7, lane="x")
+    snapshot = registry.to_json(now=123.0)
+    assert snapshot["timestamp"] == 123.0
+    assert snapshot["metrics"]["pharmafile_g"]["samples"] == [{"labels": {"lane": "x"}, "value": 7}]
+    assert snapshot["metrics"]["pharmafile_h"]["bounds"] == [1.0]
+    json.dumps(snapshot)
+
+
+def test_exporter_writes_prom_file_and_json_history(tmp_path):
+    registry = MetricsRegistry()
+    gauge = registry.gauge("rows")
+    exporter = MetricsExporter(registry, tmp_path / "logs", interval_s=0)
+    gauge.set(1)
+    assert exporter.dump()
+    gauge.set(2)
+    assert exporter.dump()
+    exporter.stop()
+    prom = (tmp_path / "logs" / "metrics.prom").read_text(encoding="utf-8")
+    assert "pharmafile_rows 2" in prom
+    assert not (tmp_path / "logs" / "metrics.prom.tmp").exists()
+    lines = (tmp_path / "logs" / "metrics.jsonl").read_text(encoding="utf-8").splitlines()
+    values = [json.loads(line)["metrics"]["pharmafile_rows"]["samples"][0]["value"]
+              for line in lines]
+    assert values == [1, 2]
+
+
+def test_server_serves_metrics_on_localhost():
+    registry = MetricsRegistry()
+    registry.gauge("up").set(1)
+    server = MetricsServer(registry, port=0)
+    assert server.start()
+    try:
+        base = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(base + "/metrics", timeout=5) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "pharmafile_up 1" in resp.read().decode()
+        with urllib.request.urlopen(base + "/metrics.json", timeout=5) as resp:
+            assert "pharmafile_up" in json.loads(resp.read())["metrics"]
+        # Second serveur sur le même port : refusé sans exception.
+        assert MetricsServer(registry, port=server.port).start() is False
+    finally:
+        server.stop()
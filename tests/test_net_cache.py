@@ -0,0 +1,66 @@
+"""Tests du cache de réponses à revalidation conditionnelle (net_cache)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+from net_cache import ResponseCache  # noqa: E402
+
+
+def test_no_conditional_headers_without_entry():
+    assert ResponseCache().conditional_headers("k") == {}
+
+
+def test_store_requires_a_validator():
+    cache = ResponseCache()
+    assert cache.store("k", {"Content-Type": "application/json"}, "{}") is False
+    assert cache.conditional_headers("k") == {}
+
+
+def test_etag_and_last_modified_sent_back():
+    cache = ResponseCache()
+    assert cache.store("k", {"etag": '"v1"', "Last-Modified": "Tue, 01 Oct 2024"}, "{}")
+    assert cache.conditional_headers("k") == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Tue, 01 Oct 2024"}
+
+
+def test_revalidated_returns_body_and_counts_hit():
+    cache = ResponseCache()
+    cache.store("k", {"ETag": '"v1"'}, '{"a": 1}', "application/json")
+    entry = cache.revalidated("k")
+    assert entry.text == '{"a": 1}' and entry.content_type == "application/json"
+    assert cache.stats()["hits"] == 1
+    assert cache.revalidated("absent") is None
+
+
+def test_no_store_response_forgets_previous_entry():
+    cache = ResponseCache()
+    cache.store("k", {"ETag": '"v1"'}, "{}")
+    assert cache.store("k", {"ETag": '"v2"', "Cache-Control": "no-store"}, "{}") is False
+    assert cache.conditional_headers("k") == {}
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.store("a", {"ETag": "1"}, "a")
+    cache.store("b", {"ETag": "2"}, "b")
+    cache.revalidated("a")            # a devient la plus récente
+    cache.store("c", {"ETag": "3"}, "c")
+    assert cache.conditional_headers("b") == {}
+    assert cache.conditional_headers("a") == {"If-None-Match": "1"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry_since_last_validation():
+    clock = FakeClock()
+    cache = ResponseCache(ttl_s=10, clock=clock)
+    cache.store("k", {"ETag": "1"}, "x")
+    clock.now = 8
+    cache.revalidated("k")            # revalidé : le TTL repart
+    clock.now = 15
+    assert cache.conditional_headers("k") == {"If-None-Match": "1"}
+    clock.now = 30
+    assert cache.conditional_headers("k") == {}
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,75 @@
+"""Tests du disjoncteur par serveur (net_circuit)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+from net_circuit import (  # noqa: E402
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitRegistry, base_url,
+)
+
+
+def test_base_url_keeps_scheme_host_and_port():
+    assert base_url("https://srv.example:8443/api/counter/1/state?x=1") == "https://srv.example:8443"
+    assert base_url("pas-une-url") == "pas-une-url"
+
+
+def test_opens_after_consecutive_failures_only():
+    cb = CircuitBreaker(failure_threshold=3)
+    assert cb.record_failure() is False
+    assert cb.record_failure() is False
+    cb.record_success()                   # une réponse remet le compteur à zéro
+    assert cb.record_failure() is False
+    assert cb.record_failure() is False
+    assert cb.record_failure() is True
+    assert cb.state == OPEN and cb.allow() is False
+
+
+def test_probe_only_after_reset_timeout_and_only_once():
+    clock = FakeClock()
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout_s=5, clock=clock)
+    cb.record_failure()
+    clock.now = 4.9
+    assert cb.try_begin_probe() is False
+    clock.now = 5.0
+    assert cb.try_begin_probe() is True
+    assert cb.state == HALF_OPEN and cb.allow() is False
+    assert cb.try_begin_probe() is False  # une seule sonde à la fois
+
+
+def test_successful_probe_closes_circuit():
+    clock = FakeClock()
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout_s=5, clock=clock)
+    cb.record_failure()
+    clock.now = 5
+    cb.try_begin_probe()
+    assert cb.record_success() is True
+    assert cb.state == CLOSED and cb.allow() is True
+    assert cb.record_success() is False   # pas de transition : pas de notification
+
+
+def test_failed_probe_reopens_with_longer_delay_capped():
+    clock = FakeClock()
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout_s=5, max_reset_timeout_s=12,
+                        clock=clock)
+    cb.record_failure()
+    for expected in (10, 12, 12):
+        clock.now += cb.reset_timeout
+        assert cb.try_begin_probe() is True
+        assert cb.record_failure() is True
+        assert cb.state == OPEN and cb.reset_timeout == expected
+    clock.now += 12
+    cb.try_begin_probe()
+    cb.record_success()
+    assert cb.reset_timeout == 5          # délai de base rétabli
+
+
+def test_registry_one_breaker_per_server():
+    reg = CircuitRegistry(failure_threshold=1)
+    a = reg.breaker_for("http://srv:5000/a")
+    assert reg.breaker_for("http://srv:5000/b") is a
+    assert reg.breaker_for("http://autre/a") is not a
+    a.record_failure()
+    assert reg.states() == {"http://srv:5000": OPEN, "http://autre": CLOSED}
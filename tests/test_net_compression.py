@@ -0,0 +1,94 @@
+"""Tests de la compression HTTP et des compteurs d'octets (net_compression)."""
+
+import gzip
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import net_compression  # noqa: E402
+from net_compression import (  # noqa: E402
+    ByteCounters, accept_encoding, compress_body, decode_body, form_body, response_sizes,
+)
+
+BODY = b'{"standing_list": [' + b'{"id": 1, "status": "waiting"}, ' * 200 + b"]}"
+
+
+def test_accept_encoding_announces_only_decodable_encodings(monkeypatch):
+    monkeypatch.setattr(net_compression, "brotli", None)
+    assert accept_encoding() == "gzip, deflate"
+    monkeypatch.setattr(net_compression, "brotli", object())
+    assert accept_encoding() == "gzip, deflate, br"
+
+
+def test_decode_gzip_and_both_deflate_flavours():
+    assert decode_body(gzip.compress(BODY), "gzip") == BODY
+    assert decode_body(zlib.compress(BODY), "deflate") == BODY
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert decode_body(raw.compress(BODY) + raw.flush(), "Deflate") == BODY
+    # Encodages chaînés : décodés dans l'ordre inverse.
+    assert decode_body(gzip.compress(zlib.compress(BODY)), "deflate, gzip") == BODY
+    assert decode_body(BODY, "identity") == BODY
+
+
+def test_decode_rejects_unknown_or_corrupt_body(monkeypatch):
+    monkeypatch.setattr(net_compression, "brotli", None)
+    with pytest.raises(ValueError):
+        decode_body(BODY, "br")
+    with pytest.raises(ValueError):
+        decode_body(b"pas du gzip", "gzip")
+
+
+def test_form_body_matches_requests_encoding():
+    assert form_body({"counter_id": 3, "note": "é"}) == b"counter_id=3&note=%C3%A9"
+    assert form_body("texte") == b"texte"
+    assert form_body(None) is None
+
+
+def test_compress_body_only_when_large_and_worth_it():
+    assert compress_body(b"a=1", min_bytes=1024) is None
+    compressed = compress_body(BODY, min_bytes=1024)
+    assert compressed is not None and gzip.decompress(compressed) == BODY
+    assert compress_body(os.urandom(4096), min_bytes=1024) is None   # incompressible
+
+
+class _Raw:
+    def __init__(self, n):
+        self.n = n
+
+    def tell(self):
+        return self.n
+
+
+class _Resp:
+    def __init__(self, content=None, text=None, raw=None, wire_bytes=None):
+        if content is not None:
+            self.content = content
+        if text is not None:
+            self.text = text
+        if raw is not None:
+            self.raw = raw
+        if wire_bytes is not None:
+            self.wire_bytes = wire_bytes
+
+
+def test_response_sizes_prefers_transport_wire_count():
+    assert response_sizes(_Resp(content=BODY, wire_bytes=300)) == (300, len(BODY))
+    assert response_sizes(_Resp(content=BODY, raw=_Raw(250))) == (250, len(BODY))
+    # Sans information du transport : taille décodée.
+    assert response_sizes(_Resp(text="abc")) == (3, 3)
+
+
+def test_byte_counters_per_endpoint_pattern():
+    counters = ByteCounters()
+    counters.record_request("http://srv/api/counter/3/validate", 2000, 400)
+    counters.record_response("http://srv/api/counter/4/validate", 100, 100)
+    counters.record_response("http://srv/api/counter/3/state", 1000, 9000)
+    snapshot = counters.snapshot()
+    validate = snapshot["srv/api/counter/{id}/validate"]
+    assert validate["requests"] == 1 and validate["responses"] == 1
+    assert validate["saved_bytes"] == 1600
+    assert snapshot["srv/api/counter/{id}/state"]["saved_bytes"] == 8000
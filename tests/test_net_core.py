@@ -77,3 +77,87 @@ def test_non_401_error_not_retried():
     resp = perform_with_reauth(send, lambda: True)
     assert (resp.text, resp.status_code) == ("boom", 500)
     assert send.calls == 1
+
+
+# --- Renouvellement proactif du jeton ----------------------------------------
+
+from net_core import proactive_refresh_delay, token_ttl_from_payload  # noqa: E402
+
+
+def test_ttl_read_from_expires_in_or_ttl():
+    assert token_ttl_from_payload({"token": "t", "expires_in": 3600}) == 3600
+    assert token_ttl_from_payload({"token": "t", "ttl": "900"}) == 900
+    assert token_ttl_from_payload({"token": "t"}) is None
+    assert token_ttl_from_payload({"token": "t", "expires_in": 0}) is None
+    assert token_ttl_from_payload({"token": "t", "expires_in": "bientôt"}) is None
+    assert token_ttl_from_payload({"token": "t", "expires_in": True}) is None
+    assert token_ttl_from_payload(None) is None
+
+
+def test_refresh_delay_keeps_a_margin_before_expiry():
+    # 1 h : marge de 20 % (12 min) -> renouvellement à 48 min.
+    assert proactive_refresh_delay(3600) == 3600 - 720
+    # 2 min : marge minimale de 30 s.
+    assert proactive_refresh_delay(120) == 90
+    # Jeton très court : marge plafonnée à la moitié, délai plancher.
+    assert proactive_refresh_delay(40) == 20
+    assert proactive_refresh_delay(6) == 5
+
+
+def test_refresh_delay_none_when_ttl_unknown():
+    assert proactive_refresh_delay(None) is None
+    assert proactive_refresh_delay(0) is None
+
+
+# --- Annulation / échéance avant envoi ---------------------------------------
+
+from net_core import DROP_CANCELLED, DROP_EXPIRED, CancelToken, drop_reason  # noqa: E402
+
+
+def test_drop_reason_cancelled_then_expired():
+    token = CancelToken()
+    assert drop_reason(token, None, now=100.0) is None
+    assert drop_reason(token, 150.0, now=100.0) is None
+    assert drop_reason(token, 100.0, now=100.0) == DROP_EXPIRED
+    token.cancel()
+    assert token.cancelled is True
+    # L'annulation l'emporte sur l'échéance.
+    assert drop_reason(token, 100.0, now=100.0) == DROP_CANCELLED
+
+
+def test_drop_reason_without_token_nor_deadline():
+    assert drop_reason(None, None, now=0.0) is None
+
+
+def test_cancel_token_callbacks():
+    token = CancelToken()
+    calls = []
+    token.add_callback(lambda: calls.append("a"))
+    unregister = token.add_callback(lambda: calls.append("b"))
+    unregister()
+    token.cancel()
+    token.cancel()                      # une seule notification
+    assert calls == ["a"]
+    # Abonnement après coup : appelé tout de suite.
+    token.add_callback(lambda: calls.append("late"))
+    assert calls == ["a", "late"]
+
+
+# --- Rejeu automatique (backoff + jitter) -------------------------------------
+
+from net_core import RetryPolicy, backoff_delay  # noqa: E402
+
+
+def test_backoff_delay_equal_jitter_and_cap():
+    assert backoff_delay(1, base=0.5, cap=4, rand=lambda: 0.0) == 0.25
+    assert backoff_delay(3, base=0.5, cap=4, rand=lambda: 1.0) == 2.0
+    assert backoff_delay(10, base=0.5, cap=4, rand=lambda: 1.0) == 4.0   # plafond
+
+
+def test_retry_policy_only_transient_statuses_within_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry(0, 1) and policy.should_retry(503, 2)
+    assert not policy.should_retry(503, 3)         # tentatives épuisées
+    assert not policy.should_retry(500, 1)         # erreur applicative : pas de rejeu
+    assert not policy.should_retry(409, 1)
+    assert policy.delay(1, rand=lambda: 0.0) == policy.base_s / 2
@@ -81,3 +81,13 @@ def test_network_error_result():
     assert r.status == 0 and r.is_timeout is True
     assert r.success is False
     assert r.message and "connexion perdue" in r.detail
+
+
+def test_cancelled_result_is_silent_and_not_a_network_failure():
+    r = NetResult.cancelled("comptoir changé")
+    assert r.is_cancelled is True
+    assert r.success is False
+    assert r.is_timeout is False         # ne compte pas comme panne (disjoncteur)
+    assert r.message == ""               # rien à afficher
+    assert "comptoir changé" in r.detail
+    assert NetResult.network_error().is_cancelled is False
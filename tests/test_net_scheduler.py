@@ -0,0 +1,178 @@
+"""Tests de la file à priorités du gestionnaire réseau (net_scheduler).
+
+Vérifie que la voie interactive passe devant la voie de fond, que l'ordre FIFO
+est conservé dans chaque voie, et que les compteurs (profondeur, temps
+d'attente) reflètent ce qui s'est passé.
+"""
+
+import os
+import queue
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+from net_scheduler import (  # noqa: E402
+    LANE_BACKGROUND, LANE_INTERACTIVE, PriorityJobQueue,
+)
+
+
+def test_interactive_served_before_background():
+    q = PriorityJobQueue()
+    q.put("bg1", lane=LANE_BACKGROUND)
+    q.put("bg2", lane=LANE_BACKGROUND)
+    q.put("click", lane=LANE_INTERACTIVE)
+    assert q.get_nowait() == "click"
+    assert q.get_nowait() == "bg1"
+    assert q.get_nowait() == "bg2"
+
+
+def test_fifo_within_a_lane():
+    q = PriorityJobQueue()
+    for i in range(5):
+        q.put(i, lane=LANE_INTERACTIVE)
+    assert [q.get_nowait() for _ in range(5)] == [0, 1, 2, 3, 4]
+
+
+def test_lane_taken_from_item_attribute_or_defaults_to_background():
+    class Item:
+        lane = LANE_INTERACTIVE
+
+    q = PriorityJobQueue()
+    q.put("sans-voie")
+    item = Item()
+    q.put(item)
+    assert q.get_nowait() is item
+    assert q.qsize(LANE_BACKGROUND) == 1
+
+
+def test_unknown_lane_rejected():
+    with pytest.raises(ValueError):
+        PriorityJobQueue().put("x", lane="vip")
+
+
+def test_get_nowait_and_timeout_raise_empty():
+    q = PriorityJobQueue()
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
+
+
+def test_get_blocks_until_put():
+    q = PriorityJobQueue()
+    got = []
+    t = threading.Thread(target=lambda: got.append(q.get(timeout=2)))
+    t.start()
+    q.put("job", lane=LANE_INTERACTIVE)
+    t.join(2)
+    assert got == ["job"]
+
+
+def test_stats_track_depth_and_wait_per_lane():
+    clock = FakeClock()
+    q = PriorityJobQueue(clock=clock)
+    q.put("bg", lane=LANE_BACKGROUND)
+    q.put("click", lane=LANE_INTERACTIVE)
+    stats = q.stats()
+    assert stats[LANE_INTERACTIVE]["depth"] == 1
+    assert stats[LANE_BACKGROUND]["depth"] == 1
+
+    clock.now = 0.5
+    q.get_nowait()          # click : a attendu 0,5 s
+    clock.now = 2.0
+    q.get_nowait()          # bg : a attendu 2 s
+
+    stats = q.stats()
+    inter, bg = stats[LANE_INTERACTIVE], stats[LANE_BACKGROUND]
+    assert inter["depth"] == 0 and bg["depth"] == 0
+    assert inter["dequeued"] == 1 and bg["enqueued"] == 1
+    assert inter["last_wait_s"] == pytest.approx(0.5)
+    assert bg["max_wait_s"] == pytest.approx(2.0)
+    assert inter["avg_wait_s"] == pytest.approx(0.5)
+
+
+class Keyed:
+    def __init__(self, name, order_key=None, lane=LANE_INTERACTIVE):
+        self.name = name
+        self.order_key = order_key
+        self.lane = lane
+
+    def __repr__(self):
+        return self.name
+
+
+def test_same_key_not_served_until_task_done():
+    q = PriorityJobQueue()
+    a1, a2, b1 = Keyed("a1", "A"), Keyed("a2", "A"), Keyed("b1", "B")
+    for item in (a1, a2, b1):
+        q.put(item)
+    assert q.get_nowait() is a1
+    # a2 attend la fin de a1 ; b1 (autre clé) passe.
+    assert q.get_nowait() is b1
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+    q.task_done(a1)
+    assert q.get_nowait() is a2
+
+
+def test_key_order_holds_across_lanes():
+    q = PriorityJobQueue()
+    bg = Keyed("bg", "A", lane=LANE_BACKGROUND)
+    click = Keyed("click", "A", lane=LANE_INTERACTIVE)
+    other = Keyed("other", None, lane=LANE_INTERACTIVE)
+    q.put(bg)
+    q.put(click)
+    q.put(other)
+    # click est prioritaire par sa voie mais arrivé après bg de même clé.
+    assert q.get_nowait() is other
+    assert q.get_nowait() is bg
+    q.task_done(bg)
+    assert q.get_nowait() is click
+
+
+def test_blocked_get_wakes_on_task_done():
+    q = PriorityJobQueue()
+    a1, a2 = Keyed("a1", "A"), Keyed("a2", "A")
+    q.put(a1)
+    q.put(a2)
+    assert q.get_nowait() is a1
+    got = []
+    t = threading.Thread(target=lambda: got.append(q.get(timeout=2)))
+    t.start()
+    threading.Event().wait(0.05)
+    assert got == []
+    q.task_done(a1)
+    t.join(2)
+    assert got == [a2]
+
+
+def test_drain_returns_everything_including_blocked_keys():
+    q = PriorityJobQueue()
+    a1, a2 = Keyed("a1", "A"), Keyed("a2", "A")
+    q.put(a1)
+    q.put(a2)
+    q.put("bg", lane=LANE_BACKGROUND)
+    assert q.get_nowait() is a1
+    assert q.drain() == [a2, "bg"]
+    assert q.qsize() == 0
+    assert q.stats()[LANE_BACKGROUND]["depth"] == 0
+
+
+def test_remove_if_purges_matching_items_and_unblocks_their_key():
+    q = PriorityJobQueue()
+    a1, a2, a3 = Keyed("a1", "A"), Keyed("a2", "A"), Keyed("a3", "A")
+    bg = Keyed("bg", None, lane=LANE_BACKGROUND)
+    for item in (a1, bg, a2, a3):
+        q.put(item)
+    assert q.get_nowait() is a1
+    # a2 est retiré alors qu'il attend derrière a1 (clé occupée).
+    assert q.remove_if(lambda item: item in (a2, bg)) == [bg, a2]
+    assert q.stats()[LANE_BACKGROUND]["depth"] == 0
+    q.task_done(a1)
+    # a3 devient le premier de sa clé : servable.
+    assert q.get_nowait() is a3
+    assert q.qsize() == 0
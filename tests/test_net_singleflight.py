@@ -0,0 +1,41 @@
+"""Tests du regroupement des GET identiques en vol (net_singleflight)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from net_singleflight import SingleFlight, flight_key  # noqa: E402
+
+
+def test_flight_key_only_for_plain_gets():
+    assert flight_key("GET", "http://srv/state") == ("http://srv/state", ())
+    assert flight_key("POST", "http://srv/state") is None
+    assert flight_key("GET", "http://srv/state", data={"a": 1}) is None
+    assert flight_key("GET", "http://srv/state", idempotency_key="k") is None
+
+
+def test_flight_key_ignores_header_order_and_case():
+    a = flight_key("GET", "u", headers={"Accept": "x", "X-A": "1"})
+    b = flight_key("GET", "u", headers={"x-a": "1", "accept": "x"})
+    assert a == b
+    assert a != flight_key("GET", "u", headers={"Accept": "y", "X-A": "1"})
+
+
+def test_first_joiner_leads_and_others_attach():
+    sf = SingleFlight()
+    assert sf.join("k", "leader") is True
+    assert sf.join("k", "w1") is False
+    assert sf.join("k", "w2") is False
+    assert sf.join("other", "solo") is True
+    assert sf.stats() == {"leaders": 2, "saved": 2}
+    assert sf.finish("k") == ["leader", "w1", "w2"]
+    assert sf.pending() == 1
+
+
+def test_finish_closes_flight_so_next_join_leads_again():
+    sf = SingleFlight()
+    sf.join("k", "a")
+    sf.finish("k")
+    assert sf.finish("k") == []
+    assert sf.join("k", "b") is True
@@ -0,0 +1,92 @@
+"""Tests des timeouts adaptatifs par point d'accès (net_timeouts).
+
+Vérifie le regroupement des URL en motifs, l'estimation glissante (srtt/rttvar),
+les bornes (plancher sur réseau local rapide, plancher élargi pour les
+requêtes non rejouables, plafond pour les points d'accès lents), le repli sur
+le timeout par défaut faute de mesures, et le recul après un timeout.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from net_timeouts import AdaptiveTimeouts, LatencyEstimator, endpoint_pattern  # noqa: E402
+
+STATE = "http://srv:5000/api/counter/3/state"
+FAST = "http://srv:5000/app/counter/validate_patient/3"
+
+
+def test_pattern_groups_numeric_segments_and_drops_query():
+    assert endpoint_pattern(STATE) == "srv:5000/api/counter/{id}/state"
+    assert endpoint_pattern("http://srv:5000/api/counter/4/state?x=1") == endpoint_pattern(STATE)
+    assert endpoint_pattern("http://autre/api/counter/3/state") != endpoint_pattern(STATE)
+
+
+def test_estimator_follows_rfc6298_smoothing():
+    est = LatencyEstimator()
+    assert est.bound() is None
+    est.observe(0.2)
+    assert est.srtt == pytest.approx(0.2) and est.rttvar == pytest.approx(0.1)
+    est.observe(0.2)
+    assert est.srtt == pytest.approx(0.2)
+    assert est.rttvar == pytest.approx(0.075)       # l'écart se résorbe
+    assert est.bound() == pytest.approx(0.2 + 4 * 0.075)
+
+
+def test_default_timeout_until_enough_samples():
+    t = AdaptiveTimeouts(default=(5, 10), min_samples=3)
+    t.observe(FAST, 0.005)
+    t.observe(FAST, 0.005)
+    assert t.timeout_for(FAST) == (5, 10)
+    t.observe(FAST, 0.005)
+    assert t.timeout_for(FAST) != (5, 10)
+
+
+def test_fast_lan_endpoint_clamped_to_floors():
+    t = AdaptiveTimeouts(default=(5, 10), connect_floor_s=0.5, read_floor_s=0.5, min_samples=3)
+    for _ in range(10):
+        t.observe(FAST, 0.005)
+    assert t.timeout_for(FAST) == (0.5, 0.5)
+
+
+def test_non_retryable_request_keeps_larger_read_floor():
+    t = AdaptiveTimeouts(default=(5, 10), read_floor_s=0.5, non_retryable_read_floor_s=3.0,
+                         min_samples=3)
+    for _ in range(10):
+        t.observe(FAST, 0.005)
+    assert t.timeout_for(FAST)[1] == 0.5
+    assert t.timeout_for(FAST, retryable=False)[1] == 3.0
+
+
+def test_slow_endpoint_gets_headroom_up_to_ceiling():
+    t = AdaptiveTimeouts(default=(5, 10), read_ceiling_s=30, min_samples=3)
+    for elapsed in (6.0, 8.0, 7.0, 9.0):
+        t.observe(STATE, elapsed)
+    connect, read = t.timeout_for(STATE)
+    assert read > 10                    # au-delà du défaut : marge préservée
+    assert read <= 30
+    assert connect <= 5                 # la connexion ne dépasse jamais le défaut
+    # Un autre motif du même hôte garde le timeout de lecture par défaut.
+    assert t.timeout_for(FAST)[1] == 10
+
+
+def test_timeout_backs_off_until_next_sample():
+    t = AdaptiveTimeouts(default=(5, 10), read_floor_s=0.1, read_ceiling_s=30, min_samples=1)
+    t.observe(STATE, 1.0)
+    base = t.timeout_for(STATE)[1]
+    t.observe_timeout(STATE)
+    assert t.timeout_for(STATE)[1] == pytest.approx(min(base * 2, 30))
+    t.observe(STATE, 1.0)
+    assert t.timeout_for(STATE)[1] < base * 2
+
+
+def test_snapshot_reports_estimates():
+    t = AdaptiveTimeouts(min_samples=1)
+    t.observe(STATE, 0.3)
+    snap = t.snapshot()
+    entry = snap["srv:5000/api/counter/{id}/state"]
+    assert entry["samples"] == 1 and entry["srtt_s"] == pytest.approx(0.3)
+    assert len(entry["timeout"]) == 2
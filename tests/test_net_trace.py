@@ -0,0 +1,72 @@
+"""Tests du traçage des requêtes (net_trace)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+from net_trace import LatencyHistogram, RequestSpan, TraceBuffer, server_time_s  # noqa: E402
+
+
+def test_server_time_from_server_timing_or_response_time():
+    assert server_time_s({"Server-Timing": "db;dur=3, total;dur=12.5"}) == 0.0125
+    assert server_time_s({"Server-Timing": 'db;dur="3", app;desc="x";dur=8'}) == 0.008
+    assert server_time_s({"X-Response-Time": "15ms"}) == 0.015
+    assert server_time_s({"X-Response-Time": "0.2s"}) == 0.2
+    assert server_time_s({"X-Response-Time": "n/a"}) is None
+    assert server_time_s({"Server-Timing": "cache;desc=hit"}) is None
+    assert server_time_s(None) is None
+
+
+def test_breakdown_splits_client_and_server_time():
+    clock = FakeClock(100.0)
+    span = RequestSpan("POST", "http://srv/api/next", "interactive", clock=clock)
+    for stage, delta in (("dequeued", 0.05), ("sent", 0.001), ("received", 0.120),
+                         ("decoded", 0.002), ("delivered", 0.001), ("dispatched", 0.030)):
+        clock.now += delta
+        span.mark(stage)
+    span.server_s = 0.080
+    span.connect_s = 0.010
+    b = span.breakdown()
+    assert round(b["queue_wait_s"], 3) == 0.05
+    assert round(b["network_s"], 3) == 0.03      # 120 ms - 80 serveur - 10 connexion
+    assert round(b["decode_s"], 3) == 0.002
+    assert round(b["dispatch_s"], 3) == 0.03
+    assert round(b["total_s"], 3) == 0.204
+    record = span.to_dict()
+    assert record["request_id"] == span.request_id and record["lane"] == "interactive"
+
+
+def test_unfinished_stages_are_none():
+    span = RequestSpan("GET", "http://srv/state", clock=FakeClock(100.0))
+    b = span.breakdown()
+    assert b["queue_wait_s"] is None and b["total_s"] is None
+
+
+def test_trace_buffer_is_bounded_and_searchable():
+    clock = FakeClock(100.0)
+    buffer = TraceBuffer(capacity=3)
+    spans = []
+    for i in range(5):
+        span = RequestSpan("GET", f"http://srv/{i}", clock=clock)
+        clock.now += i
+        span.mark("delivered")
+        buffer.add(span)
+        spans.append(span)
+    assert [s.url for s in buffer.recent()] == ["http://srv/2", "http://srv/3", "http://srv/4"]
+    assert buffer.recent(1) == [spans[4]]
+    assert buffer.get(spans[0].request_id) is None           # sorti du tampon
+    assert buffer.get(spans[3].request_id) is spans[3]
+    assert buffer.slowest(1) == [spans[4]]
+
+
+def test_latency_histogram_buckets_and_overflow():
+    histogram = LatencyHistogram(bounds=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(seconds)
+    snapshot = histogram.snapshot()
+    assert snapshot["bounds"] == [0.1, 1.0]
+    assert snapshot["counts"] == [2, 1, 1]       # borne incluse ; >1 s à part
+    assert snapshot["count"] == 4
+    assert round(snapshot["sum_s"], 3) == 3.65
@@ -0,0 +1,245 @@
+"""Tests des moteurs de transport (net_transport) contre un petit serveur HTTP
+local (bibliothèque standard) : réponses, keep-alive, timeouts et annulation en
+vol du moteur asyncio.
+"""
+
+import gzip
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from net_core import CancelToken  # noqa: E402
+from net_transport import (  # noqa: E402
+    ENGINE_ASYNCIO, ENGINE_REQUESTS, AsyncioTransport, TransportCancelled, make_transport,
+    normalize_engine,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="application/json", extra=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._reply(200, b"")
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in ("Bon", "jour é"):
+                data = part.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.write(b"0\r\n\r\n")
+        elif self.path == "/slow":
+            time.sleep(2)
+            self._reply(200, b"{}")
+        elif self.path == "/gzip":
+            self.server.accept_encoding = self.headers.get("Accept-Encoding")
+            self._reply(200, gzip.compress(b'{"queue": []}'), extra={"Content-Encoding": "gzip"})
+        elif self.path == "/close":
+            self._reply(200, b"bye", "text/plain", {"Connection": "close"})
+            self.close_connection = True
+        else:
+            body = json.dumps({"path": self.path,
+                               "token": self.headers.get("X-App-Token")}).encode()
+            self._reply(200, body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode())
+        self._reply(201, json.dumps({"form": form}).encode())
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.connections = set()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def transport():
+    t = AsyncioTransport(max_connections_per_host=4)
+    yield t
+    t.close()
+
+
+def test_normalize_engine_and_factory():
+    assert normalize_engine("AsyncIO ") == ENGINE_ASYNCIO
+    assert normalize_engine("curl") == ENGINE_REQUESTS
+    assert normalize_engine(None) == ENGINE_REQUESTS
+    session = make_transport(ENGINE_REQUESTS, pool_maxsize=3)
+    assert isinstance(session, requests.Session)
+    assert session.get_adapter("http://srv/")._pool_maxsize == 3
+    asyncio_transport = make_transport(ENGINE_ASYNCIO)
+    try:
+        assert asyncio_transport.supports_cancel is True
+    finally:
+        asyncio_transport.close()
+
+
+def test_get_post_head_and_session_headers(server, transport):
+    _, base = server
+    transport.headers = dict(transport.headers, **{"X-App-Token": "tok"})
+    resp = transport.get(base + "/api/state?x=1", timeout=(1, 2))
+    assert resp.status_code == 200
+    assert resp.json() == {"path": "/api/state?x=1", "token": "tok"}
+    assert resp.headers["content-type"] == "application/json"
+
+    resp = transport.post(base + "/api/validate", data={"counter_id": 3}, timeout=2)
+    assert resp.status_code == 201
+    assert resp.json() == {"form": {"counter_id": ["3"]}}
+
+    assert transport.head(base + "/", timeout=2).status_code == 200
+
+
+def test_chunked_body_and_charset(server, transport):
+    _, base = server
+    assert transport.get(base + "/chunked", timeout=2).text == "Bonjour é"
+
+
+def test_gzip_response_negotiated_and_decoded(server, transport):
+    httpd, base = server
+    resp = transport.get(base + "/gzip", timeout=2)
+    assert "gzip" in httpd.accept_encoding
+    assert resp.json() == {"queue": []}
+    assert resp.wire_bytes == len(gzip.compress(b'{"queue": []}'))
+
+
+def test_connection_reused_across_requests(server, transport):
+    httpd, base = server
+    for _ in range(3):
+        assert transport.get(base + "/a", timeout=2).status_code == 200
+    assert len(httpd.connections) == 1
+    # « Connection: close » : la connexion suivante est neuve.
+    assert transport.get(base + "/close", timeout=2).text == "bye"
+    assert transport.get(base + "/a", timeout=2).status_code == 200
+    assert len(httpd.connections) == 2
+
+
+def test_read_timeout_raises_requests_timeout(server, transport):
+    _, base = server
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        transport.get(base + "/slow", timeout=(1, 0.2))
+
+
+def test_connection_refused_raises_connection_error(transport):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get(f"http://127.0.0.1:{port}/", timeout=1)
+
+
+def test_cancel_token_aborts_request_in_flight(server, transport):
+    _, base = server
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(TransportCancelled):
+        transport.get(base + "/slow", timeout=5, cancel_token=token)
+    assert time.monotonic() - start < 1.0
+    # Le transport reste utilisable après une annulation.
+    assert transport.get(base + "/a", timeout=2).status_code == 200
+
+
+def test_closed_transport_refuses_requests(server):
+    _, base = server
+    t = AsyncioTransport()
+    t.close()
+    t.close()  # idempotent
+    with pytest.raises(requests.exceptions.ConnectionError):
+        t.get(base + "/a", timeout=1)
+
+
+class _DropSecondRequestServer:
+    """Serveur brut keep-alive qui lit la 2e requête en entier puis ferme la
+    connexion sans répondre (serveur redémarré après traitement)."""
+
+    def __init__(self):
+        self.requests = []
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.base = f"http://127.0.0.1:{self._sock.getsockname()[1]}"
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        reader = conn.makefile("rb")
+        with conn, reader:
+            while True:
+                request_line = reader.readline()
+                if not request_line:
+                    return
+                length = 0
+                for line in iter(reader.readline, b"\r\n"):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                reader.read(length)
+                self.requests.append(request_line.split()[0].decode())
+                if len(self.requests) == 2:
+                    return
+                conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+
+    def close(self):
+        self._sock.close()
+
+
+@pytest.fixture
+def drop_server():
+    server = _DropSecondRequestServer()
+    yield server
+    server.close()
+
+
+def test_post_sent_on_stale_connection_is_not_replayed(drop_server, transport):
+    assert transport.post(drop_server.base + "/next", data={"a": 1}, timeout=2).status_code == 200
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.post(drop_server.base + "/next", data={"a": 1}, timeout=2)
+    assert drop_server.requests == ["POST", "POST"]
+
+
+def test_get_sent_on_stale_connection_is_retried(drop_server, transport):
+    assert transport.get(drop_server.base + "/a", timeout=2).status_code == 200
+    assert transport.get(drop_server.base + "/a", timeout=2).status_code == 200
+    assert drop_server.requests == ["GET", "GET", "GET"]
@@ -9,6 +9,7 @@ timeout par requête, purge à l'arrêt, obtention de jeton, NetResult).
 import os
 import sys
 import threading
+import time
 
 import pytest
 
@@ -60,8 +61,8 @@ class FakeSession:
 def mgr_factory(qapp):
     created = []
 
-    def _make(session=None, token_url="http://srv/token", secret="s3cret"):
-        m = NetworkManager(lambda: token_url, lambda: secret)
+    def _make(session=None, token_url="http://srv/token", secret="s3cret", workers=1):
+        m = NetworkManager(lambda: token_url, lambda: secret, workers=workers)
         if session is not None:
             m._session = session
         created.append(m)
@@ -218,3 +219,955 @@ def test_clear_token_removes_session_header(mgr_factory):
     assert m.current_token() == "TOK"
     m.clear_token()   # ex: changement de serveur/secret
     assert m.current_token() is None
+
+
+class GatedSession(FakeSession):
+    """Le premier GET bloque jusqu'à ``gate.set()`` (serveur lent) ; les appels
+    suivants répondent immédiatement. Permet de remplir la file pendant que le
+    worker est occupé."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append(("GET", url, timeout, headers))
+        if not self.entered.is_set():
+            self.entered.set()
+            self.gate.wait(5)
+        return FakeResp(200, "ok")
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.calls.append(("POST", url, timeout, data, headers))
+        return FakeResp(200, "ok")
+
+
+def test_interactive_action_jumps_ahead_of_background_requests(mgr_factory):
+    m = mgr_factory(GatedSession())
+    results = {}
+
+    def blocking(name):
+        results[name] = m.request_blocking(f"http://srv/{name}", timeout_s=5)
+
+    # Une resync lente occupe le worker, deux requêtes de fond attendent...
+    threads = [threading.Thread(target=blocking, args=("slow_state",))]
+    threads[0].start()
+    assert m._session.entered.wait(2)
+    # (mises en file l'une après l'autre : leur ordre relatif est déterministe)
+    for depth, name in enumerate(("bg1", "bg2"), start=1):
+        t = threading.Thread(target=blocking, args=(name,))
+        t.start()
+        threads.append(t)
+        while m.lane_stats()["background"]["depth"] < depth:
+            threading.Event().wait(0.01)
+
+    # ... puis l'utilisateur clique : son action doit passer devant.
+    h = m.make_handle("http://srv/next", method="POST")
+    h.start()
+    m._session.gate.set()
+    for t in threads:
+        t.join(5)
+    threading.Event().wait(0.1)
+
+    urls = [c[1] for c in m._session.calls]
+    assert urls == ["http://srv/slow_state", "http://srv/next",
+                    "http://srv/bg1", "http://srv/bg2"]
+    stats = m.lane_stats()
+    assert stats["interactive"]["dequeued"] == 1
+    assert stats["background"]["dequeued"] == 3
+    assert stats["background"]["max_wait_s"] >= stats["interactive"]["last_wait_s"]
+
+
+class SlowUrlSession(FakeSession):
+    """Les URL contenant « slow » bloquent jusqu'à ``gate.set()`` ; enregistre
+    aussi les requêtes en vol simultanément."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.slow_entered = threading.Event()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _call(self, method, url):
+        with self._lock:
+            self.calls.append((method, url))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if "slow" in url:
+                self.slow_entered.set()
+                self.gate.wait(5)
+            return FakeResp(200, "ok")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def get(self, url, headers=None, timeout=None):
+        return self._call("GET", url)
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        return self._call("POST", url)
+
+
+def _start_and_collect(m, url, order_key, done):
+    h = m.make_handle(url, method="POST", order_key=order_key)
+    h.finished.connect(lambda: done.append(url))
+    h.start()
+    return h
+
+
+def _wait_for(predicate, timeout=3.0):
+    loop = QEventLoop()
+    deadline = QTimer()
+    deadline.setSingleShot(True)
+    deadline.timeout.connect(loop.quit)
+    deadline.start(int(timeout * 1000))
+    poll = QTimer()
+    poll.timeout.connect(lambda: predicate() and loop.quit())
+    poll.start(10)
+    loop.exec()
+    poll.stop()
+    return predicate()
+
+
+def test_parallel_workers_run_independent_keys_concurrently(mgr_factory):
+    m = mgr_factory(SlowUrlSession(), workers=3)
+    assert m.worker_count == 3
+    done = []
+    handles = [_start_and_collect(m, "http://srv/slow_next", "counter", done)]
+    assert m._session.slow_entered.wait(2)
+    # Le rappel et le papier (autres clés) ne doivent pas attendre la requête lente.
+    handles.append(_start_and_collect(m, "http://srv/recall", "recall", done))
+    handles.append(_start_and_collect(m, "http://srv/paper", "paper", done))
+    assert _wait_for(lambda: len(done) == 2)
+    assert sorted(done) == ["http://srv/paper", "http://srv/recall"]
+    m._session.gate.set()
+    assert _wait_for(lambda: len(done) == 3)
+
+
+def test_parallel_workers_keep_order_within_a_key(mgr_factory):
+    m = mgr_factory(SlowUrlSession(), workers=3)
+    done = []
+    handles = [_start_and_collect(m, "http://srv/slow_validate", "counter", done)]
+    assert m._session.slow_entered.wait(2)
+    handles.append(_start_and_collect(m, "http://srv/next", "counter", done))
+    threading.Event().wait(0.1)
+    # Même clé : « next » n'est pas parti tant que « validate » est en vol.
+    assert [c[1] for c in m._session.calls] == ["http://srv/slow_validate"]
+    m._session.gate.set()
+    assert _wait_for(lambda: len(done) == 2)
+    assert done == ["http://srv/slow_validate", "http://srv/next"]
+    assert m._session.max_in_flight == 1
+
+
+def test_token_header_replaced_not_mutated(mgr_factory):
+    m = mgr_factory(FakeSession(post_responses=[FakeResp(200, json_data={"token": "T1"})]),
+                    workers=2)
+    before = m._session.headers
+    m.fetch_token_blocking(timeout_s=5)
+    # Copie-puis-remplacement : un worker qui envoyait avec l'ancien dict ne le
+    # voit jamais changer sous ses pieds.
+    assert m._session.headers is not before
+    assert "X-App-Token" not in before
+    assert m.current_token() == "T1"
+
+
+def test_stop_terminates_every_worker(mgr_factory):
+    m = mgr_factory(FakeSession(), workers=4)
+    assert m.stop(timeout_ms=3000) is True
+    assert all(w.isFinished() for w in m._workers)
+
+
+def test_pool_sized_on_worker_count(qapp):
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s", workers=4)
+    try:
+        adapter = m._session.get_adapter("https://srv/")
+        assert adapter._pool_maxsize == 4
+    finally:
+        m.stop()
+
+
+def test_identical_gets_in_flight_share_one_request(mgr_factory):
+    m = mgr_factory(GatedSession())
+    # Un GET lent occupe le worker : les GET /state identiques attendent en file.
+    blocker = threading.Thread(target=lambda: m.request_blocking("http://srv/slow", timeout_s=5))
+    blocker.start()
+    assert m._session.entered.wait(2)
+
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(
+        m.request_blocking("http://srv/state", timeout_s=5))) for _ in range(3)]
+    for t in waiters:
+        t.start()
+    async_results = []
+    h = m.make_handle("http://srv/state", method="GET")
+    h.result.connect(async_results.append)
+    h.start()
+    while m.coalescing_stats()["saved"] < 3:
+        threading.Event().wait(0.01)
+
+    m._session.gate.set()
+    for t in waiters + [blocker]:
+        t.join(5)
+    assert _wait_for(lambda: len(async_results) == 1)
+
+    urls = [c[1] for c in m._session.calls]
+    assert urls.count("http://srv/state") == 1
+    assert len(results) == 3 and all(r is async_results[0] for r in results)
+    assert m.coalescing_stats()["saved"] == 3
+
+
+def test_posts_are_never_coalesced(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = threading.Thread(target=lambda: m.request_blocking("http://srv/slow", timeout_s=5))
+    blocker.start()
+    assert m._session.entered.wait(2)
+    posts = [threading.Thread(target=lambda: m.request_blocking(
+        "http://srv/next", method="POST", timeout_s=5)) for _ in range(2)]
+    for t in posts:
+        t.start()
+    while m.lane_stats()["background"]["depth"] < 2:
+        threading.Event().wait(0.01)
+    m._session.gate.set()
+    for t in posts + [blocker]:
+        t.join(5)
+    assert [c[1] for c in m._session.calls].count("http://srv/next") == 2
+    assert m.coalescing_stats()["saved"] == 0
+
+
+class ExpiringTokenSession(FakeSession):
+    """Répond 401 tant que la session ne porte pas le jeton « fresh ». Les
+    ``parties`` premiers 401 se synchronisent sur une barrière : toutes les
+    requêtes ont bien reçu leur 401 avant qu'un renouvellement ne commence."""
+
+    def __init__(self, parties):
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=3)
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self._lock:
+            self.calls.append(("GET", url, timeout, headers))
+        if self.headers.get("X-App-Token") != "fresh":
+            self.barrier.wait()
+            return FakeResp(401, "expired")
+        return FakeResp(200, "{}")
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        with self._lock:
+            self.calls.append(("POST", url, timeout, data, headers))
+        return FakeResp(200, json_data={"token": "fresh"})
+
+
+def test_concurrent_401s_share_one_token_refresh(mgr_factory):
+    m = mgr_factory(ExpiringTokenSession(parties=3), workers=3)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(
+        m.request_blocking(f"http://srv/r{i}", timeout_s=5))) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    token_posts = [c for c in m._session.calls if c[0] == "POST"]
+    assert len(token_posts) == 1          # un seul renouvellement partagé
+    assert sorted(r.status for r in results) == [200, 200, 200]
+
+
+def test_pending_token_requests_are_coalesced(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = threading.Thread(target=lambda: m.request_blocking("http://srv/slow", timeout_s=5))
+    blocker.start()
+    assert m._session.entered.wait(2)
+    tokens = []
+    waiters = [threading.Thread(target=lambda: tokens.append(m.fetch_token_blocking(timeout_s=5)))
+               for _ in range(3)]
+    for t in waiters:
+        t.start()
+    while m._token_flights.stats()["saved"] < 2:
+        threading.Event().wait(0.01)
+    m._session.gate.set()
+    for t in waiters + [blocker]:
+        t.join(5)
+    assert [c[0] for c in m._session.calls].count("POST") == 1
+    assert len(tokens) == 3
+
+
+def test_token_refreshed_before_expiry_from_announced_ttl(mgr_factory, monkeypatch):
+    delays = []
+
+    def fast_delay(ttl_s):
+        delays.append(ttl_s)
+        return 0.05 if len(delays) == 1 else None
+
+    monkeypatch.setattr(connections, "proactive_refresh_delay", fast_delay)
+    m = mgr_factory(FakeSession(post_responses=[
+        FakeResp(200, json_data={"token": "t1", "expires_in": 3600}),
+        FakeResp(200, json_data={"token": "t2", "expires_in": 3600}),
+    ]))
+    assert m.fetch_token_blocking(timeout_s=5) == "t1"
+    deadline = threading.Event()
+    for _ in range(200):
+        if m.current_token() == "t2":
+            break
+        deadline.wait(0.01)
+    assert m.current_token() == "t2"       # renouvelé sans aucun 401
+    assert delays[0] == 3600
+    assert not [c for c in m._session.calls if c[0] == "GET"]
+
+
+def test_observed_lifetime_schedules_next_refresh(mgr_factory, monkeypatch):
+    monkeypatch.setattr(connections, "MIN_OBSERVED_TOKEN_TTL_S", 0.0)
+    m = mgr_factory(FakeSession(
+        get_responses=[FakeResp(401, "expired"), FakeResp(200, "{}")],
+        post_responses=[FakeResp(200, json_data={"token": "t1"}),
+                        FakeResp(200, json_data={"token": "t2"})],
+    ))
+    m.fetch_token_blocking(timeout_s=5)
+    assert m._refresh_timer is None        # durée de vie encore inconnue
+    assert m.request_blocking("http://srv/a", timeout_s=5).status == 200
+    assert m._observed_token_ttl is not None
+    assert m._refresh_timer is not None    # le jeton t2 sera renouvelé à temps
+    m.stop()
+    assert m._refresh_timer is None
+
+
+def test_conditional_get_serves_cached_body_on_304(mgr_factory):
+    first = FakeResp(200, '{"revision": 7, "standing_list": []}')
+    first.headers["ETag"] = '"rev-7"'
+    m = mgr_factory(FakeSession(get_responses=[first, FakeResp(304, "", content_type=None)]))
+
+    r1 = m.request_blocking("http://srv/state", timeout_s=5)
+    r2 = m.request_blocking("http://srv/state", timeout_s=5)
+
+    assert "If-None-Match" not in m._session.calls[0][3]          # 1er envoi sans condition
+    assert m._session.calls[1][3]["If-None-Match"] == '"rev-7"'
+    assert r2.status == 200 and r2.success
+    assert r2.data == r1.data and r2.data is not r1.data          # redécodé, jamais partagé
+    assert m.cache_stats()["hits"] == 1
+
+
+def test_posts_bypass_the_conditional_cache(mgr_factory):
+    resp = FakeResp(200, "{}")
+    resp.headers["ETag"] = '"x"'
+    m = mgr_factory(FakeSession(post_responses=[resp, FakeResp(200, "{}")]))
+    m.request_blocking("http://srv/act", method="POST", timeout_s=5)
+    m.request_blocking("http://srv/act", method="POST", timeout_s=5)
+    assert "If-None-Match" not in m._session.calls[1][4]
+    assert m.cache_stats()["entries"] == 0
+
+
+class DownSession(FakeSession):
+    """Serveur arrêté : toute requête lève une erreur réseau (et est comptée)."""
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append(("GET", url, timeout, headers))
+        raise connections.RequestException("connexion refusée")
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.calls.append(("POST", url, timeout, data, headers))
+        raise connections.RequestException("connexion refusée")
+
+
+def test_circuit_opens_and_fails_fast(qapp):
+    from net_circuit import CircuitRegistry
+    probes = []
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s",
+                       circuits=CircuitRegistry(failure_threshold=2, reset_timeout_s=60),
+                       probe=probes.append)
+    m._session = DownSession()
+    changes = []
+    m.circuit_changed.connect(lambda base, state: changes.append((base, state)))
+    try:
+        for _ in range(2):
+            assert m.request_blocking("http://srv/a", timeout_s=5).status == 0
+        assert m.circuit_states() == {"http://srv": "open"}
+
+        res = m.request_blocking("http://srv/next", method="POST", timeout_s=5)
+        assert res.status == 0 and "circuit" in res.detail
+        assert m.fetch_token_blocking(timeout_s=5) is None
+        # Ni l'action ni le jeton n'ont touché le réseau une fois le circuit ouvert.
+        assert len(m._session.calls) == 2
+        assert probes == []               # sonde pas encore due
+    finally:
+        m.stop()
+
+
+def test_background_probe_closes_circuit_when_server_returns(qapp):
+    from net_circuit import CircuitRegistry
+    server_up = threading.Event()
+    probed = threading.Event()
+
+    def probe(base):
+        probed.set()
+        if not server_up.is_set():
+            raise connections.RequestException("toujours arrêté")
+
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s",
+                       circuits=CircuitRegistry(failure_threshold=1, reset_timeout_s=0.05,
+                                                max_reset_timeout_s=0.05),
+                       probe=probe)
+    m._session = DownSession()
+    try:
+        m.request_blocking("http://srv/a", timeout_s=5)
+        assert probed.wait(2)
+        assert m.circuit_states()["http://srv"] in ("open", "half_open")
+        server_up.set()
+        for _ in range(200):
+            if m.circuit_states()["http://srv"] == "closed":
+                break
+            threading.Event().wait(0.01)
+        assert m.circuit_states()["http://srv"] == "closed"
+        m._session = FakeSession(get_responses=[FakeResp(200, "{}")])
+        assert m.request_blocking("http://srv/a", timeout_s=5).status == 200
+    finally:
+        m.stop()
+
+
+# --- Échéance et annulation ---------------------------------------------------
+
+def _block_worker(m):
+    """Occupe le worker avec un GET lent (GatedSession) ; renvoie son thread."""
+    blocker = threading.Thread(target=lambda: m.request_blocking("http://srv/slow", timeout_s=5))
+    blocker.start()
+    assert m._session.entered.wait(2)
+    return blocker
+
+
+def test_cancel_tag_purges_queued_actions_of_old_counter(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = _block_worker(m)
+    results = {}
+    handles = []
+    for name, tag in (("old1", ("counter", 1)), ("old2", ("counter", 1)), ("new", ("counter", 2))):
+        h = m.make_handle(f"http://srv/{name}", method="POST", tag=tag)
+        h.result.connect(lambda r, name=name: results.__setitem__(name, r))
+        h.start()
+        handles.append(h)
+
+    assert m.cancel_tag(("counter", 1)) == 2
+    # Livrés tout de suite, sans attendre que le worker se libère.
+    assert results["old1"].is_cancelled and results["old2"].is_cancelled
+    assert results["old1"].message == ""          # annulation silencieuse
+
+    m._session.gate.set()
+    blocker.join(5)
+    assert _wait_for(lambda: "new" in results)
+    assert results["new"].status == 200
+    posted = [c[1] for c in m._session.calls if c[0] == "POST"]
+    assert posted == ["http://srv/new"]
+    assert m.cancel_tag(("counter", 1)) == 0      # plus rien d'étiqueté
+
+
+def test_expired_request_dropped_before_send(mgr_factory):
+    m = mgr_factory(FakeSession())
+    res = m.request_blocking("http://srv/a", deadline_s=0, timeout_s=5)
+    assert res.is_cancelled is True
+    assert res.message == connections.EXPIRED_MESSAGE
+    assert m._session.calls == []
+    assert m.circuit_states().get("http://srv", "closed") == "closed"
+
+
+def test_handle_cancel_drops_queued_request(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = _block_worker(m)
+    results, finished = [], []
+    h = m.make_handle("http://srv/next", method="POST")
+    h.result.connect(results.append)
+    h.finished.connect(lambda: finished.append(True))
+    h.start()
+    h.cancel()
+    assert len(results) == 1 and results[0].is_cancelled
+    assert finished == [True]                     # le bouton est libéré
+    m._session.gate.set()
+    blocker.join(5)
+    assert all(c[1] != "http://srv/next" for c in m._session.calls)
+
+
+def test_cancelled_request_not_replayed_after_401(mgr_factory):
+    from net_core import CancelToken
+    m = mgr_factory(FakeSession(get_responses=[FakeResp(401, "expiré"), FakeResp(200, "ok")]))
+    token = CancelToken()
+
+    def reauth(sent_generation=None):
+        token.cancel()     # le comptoir change pendant le renouvellement
+        return True
+
+    m._reauth = reauth
+    res = m.request_blocking("http://srv/a", cancel_token=token, timeout_s=5)
+    assert res.is_cancelled is True
+    assert len(m._session.calls) == 1             # pas de rejeu
+    assert m.circuit_states()["http://srv"] == "closed"
+
+
+def test_cancelled_leader_hands_over_to_coalesced_follower(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = _block_worker(m)
+    got = {}
+    leader = m.make_handle("http://srv/state", method="GET")
+    leader.result.connect(lambda r: got.__setitem__("leader", r))
+    leader.start()
+    follower = m.make_handle("http://srv/state", method="GET")
+    follower.result.connect(lambda r: got.__setitem__("follower", r))
+    follower.start()
+    assert m.coalescing_stats()["saved"] == 1
+
+    leader.cancel()
+    assert got["leader"].is_cancelled
+    m._session.gate.set()
+    blocker.join(5)
+    assert _wait_for(lambda: "follower" in got)
+    assert got["follower"].status == 200
+    urls = [c[1] for c in m._session.calls]
+    assert urls.count("http://srv/state") == 1
+
+
+# --- Timeouts adaptatifs ------------------------------------------------------
+
+def test_timeout_adapts_to_observed_latency(qapp):
+    from net_timeouts import AdaptiveTimeouts
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s",
+                       timeouts=AdaptiveTimeouts(default=DEFAULT_TIMEOUT, min_samples=3))
+    m._session = FakeSession(get_responses=[FakeResp(200, "ok") for _ in range(5)])
+    try:
+        for _ in range(4):
+            m.request_blocking("http://srv/api/counter/1/state", timeout_s=5)
+        first, last = m._session.calls[0][2], m._session.calls[-1][2]
+        assert first == DEFAULT_TIMEOUT                 # pas encore de mesure
+        assert last[0] < DEFAULT_TIMEOUT[0] and last[1] < DEFAULT_TIMEOUT[1]
+        # Un timeout explicite de l'appelant reste prioritaire.
+        m.request_blocking("http://srv/api/counter/1/state", timeout=(2, 3), timeout_s=5)
+        assert m._session.calls[-1][2] == (2, 3)
+        assert m.timeout_stats()["srv/api/counter/{id}/state"]["samples"] == 5
+    finally:
+        m.stop()
+
+
+class ReadTimeoutSession(FakeSession):
+    """Honore le timeout de lecture : une réponse plus lente que le délai
+    accordé lève ``Timeout`` comme le ferait ``requests``."""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = list(delays)
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        from requests.exceptions import Timeout
+        self.calls.append(("POST", url, timeout, data, headers))
+        delay = self.delays.pop(0)
+        time.sleep(min(delay, timeout[1]))
+        if delay > timeout[1]:
+            raise Timeout("read timed out")
+        return FakeResp(200, "{}")
+
+
+def test_slow_non_retryable_post_succeeds_after_fast_warm_up(qapp):
+    from net_timeouts import AdaptiveTimeouts
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s",
+                       timeouts=AdaptiveTimeouts(default=DEFAULT_TIMEOUT, min_samples=3))
+    m._session = ReadTimeoutSession([0.002] * 5 + [0.6])
+    url = "http://srv/app/counter/validate_patient/1"
+    try:
+        for _ in range(5):
+            assert m.request_blocking(url, method="POST", timeout_s=5).status == 200
+        # Une pause ponctuelle du serveur ne fait pas échouer une action non
+        # rejouable, même sur un point d'accès réputé rapide.
+        res = m.request_blocking(url, method="POST", timeout_s=5)
+        assert res.status == 200 and not res.is_timeout
+    finally:
+        m.stop()
+
+
+# --- Rejeu automatique des requêtes idempotentes -----------------------------
+
+def _retrying_manager(session, **policy):
+    from net_core import RetryPolicy
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s",
+                       retry_policy=RetryPolicy(base_s=0.01, cap_s=0.02, **policy))
+    m._session = session
+    return m
+
+
+def test_idempotent_post_retried_with_same_key(qapp):
+    m = _retrying_manager(FakeSession(post_responses=[FakeResp(503, "busy"), FakeResp(200, "{}")]))
+    try:
+        res = m.request_blocking("http://srv/next", method="POST", idempotency_key="k-1",
+                                 timeout_s=5)
+        assert res.status == 200 and res.attempts == 2
+        keys = [c[4]["X-Idempotency-Key"] for c in m._session.calls]
+        assert keys == ["k-1", "k-1"]
+    finally:
+        m.stop()
+
+
+def test_non_idempotent_post_not_retried(qapp):
+    m = _retrying_manager(FakeSession(post_responses=[FakeResp(503, "busy"), FakeResp(200, "{}")]))
+    try:
+        res = m.request_blocking("http://srv/validate", method="POST", timeout_s=5)
+        assert res.status == 503 and res.attempts == 1
+        assert len(m._session.calls) == 1
+    finally:
+        m.stop()
+
+
+def test_retries_stop_at_max_attempts_and_respect_deadline(qapp):
+    m = _retrying_manager(FakeSession(get_responses=[FakeResp(502, "") for _ in range(5)]),
+                          max_attempts=3)
+    try:
+        res = m.request_blocking("http://srv/a", timeout_s=5)
+        assert res.status == 502 and res.attempts == 3
+        # Échéance plus proche que le prochain rejeu : un seul envoi.
+        m._retry.base_s = m._retry.cap_s = 10.0
+        res = m.request_blocking("http://srv/b", deadline_s=1.0, timeout_s=5)
+        assert res.attempts == 1
+    finally:
+        m.stop()
+
+
+def test_cancel_interrupts_retry_wait(qapp):
+    from net_core import CancelToken
+    m = _retrying_manager(FakeSession(get_responses=[FakeResp(503, "") for _ in range(3)]))
+    m._retry.base_s = m._retry.cap_s = 5.0
+    token = CancelToken()
+    try:
+        threading.Timer(0.1, token.cancel).start()
+        res = m.request_blocking("http://srv/a", cancel_token=token, timeout_s=3)
+        assert res.is_cancelled is True
+        assert len(m._session.calls) == 1
+    finally:
+        m.stop()
+
+
+# --- API par futurs / asyncio -------------------------------------------------
+
+def test_submit_returns_future_resolved_with_netresult(mgr_factory):
+    m = mgr_factory(FakeSession(get_responses=[FakeResp(200, '{"a": 1}'), FakeResp(200, '{"b": 2}')]))
+    futures = [m.submit("http://srv/a"), m.submit("http://srv/b")]
+    results = [f.result(timeout=5) for f in futures]
+    assert [r.data for r in results] == [{"a": 1}, {"b": 2}]
+
+
+def test_cancelled_future_drops_queued_request(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = _block_worker(m)
+    future = m.submit("http://srv/state")
+    assert future.cancel() is True
+    m._session.gate.set()
+    blocker.join(5)
+    # Le worker est passé : la requête annulée n'est jamais partie.
+    assert m.request_blocking("http://srv/other", timeout_s=5).status == 200
+    assert all(c[1] != "http://srv/state" for c in m._session.calls)
+
+
+def test_request_async_composes_requests_in_an_asyncio_loop(mgr_factory):
+    import asyncio
+    m = mgr_factory(FakeSession(get_responses=[FakeResp(200, '{"n": 1}'), FakeResp(200, '{"n": 2}')]))
+
+    async def both():
+        return await asyncio.gather(m.request_async("http://srv/a"),
+                                    m.request_async("http://srv/b"))
+
+    results = asyncio.run(both())
+    assert sorted(r.data["n"] for r in results) == [1, 2]
+
+
+def test_request_blocking_timeout_cancels_request(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = _block_worker(m)
+    res = m.request_blocking("http://srv/late", timeout_s=0.05)
+    assert res.status == 0 and "timeout interne" in res.detail
+    m._session.gate.set()
+    blocker.join(5)
+    assert m.request_blocking("http://srv/after", timeout_s=5).status == 200
+    assert all(c[1] != "http://srv/late" for c in m._session.calls)
+
+
+# --- Transport interchangeable (net_transport) --------------------------------
+
+class CancellableSession(FakeSession):
+    """Transport qui sait couper une requête en vol : le GET bloque jusqu'à
+    l'annulation de son jeton."""
+    supports_cancel = True
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.left = threading.Event()
+        self.closed = False
+
+    def get(self, url, headers=None, timeout=None, cancel_token=None):
+        from net_transport import TransportCancelled
+        self.calls.append(("GET", url, timeout, headers))
+        aborted = threading.Event()
+        cancel_token.add_callback(aborted.set)
+        self.entered.set()
+        try:
+            if aborted.wait(5):
+                raise TransportCancelled("coupée")
+            return FakeResp(200, "{}")
+        finally:
+            self.left.set()
+
+    def close(self):
+        self.closed = True
+
+
+def test_injected_transport_cancels_request_in_flight(qapp):
+    session = CancellableSession()
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s", transport=session)
+    try:
+        assert m._session is session
+        future = m.submit("http://srv/slow")
+        assert session.entered.wait(2)
+        assert future.cancel() is True
+        # La requête en vol est coupée : le worker est libéré tout de suite et
+        # l'annulation ne compte pas comme une panne du serveur.
+        assert session.left.wait(1)
+        assert m.circuit_states() == {"http://srv": "closed"}
+    finally:
+        assert m.stop() is True
+    assert session.closed is True
+
+
+# --- Préchauffage, keep-alive et premier clic ----------------------------------
+
+class WarmSession(FakeSession):
+    """Compte les HEAD (préchauffage) et leur simultanéité."""
+
+    def __init__(self):
+        super().__init__(get_responses=[FakeResp(200, "{}") for _ in range(5)])
+        self.heads = []
+        self.threads = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def head(self, url, timeout=None, allow_redirects=True):
+        with self._lock:
+            self.heads.append(url)
+            self.threads.add(threading.current_thread())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        threading.Event().wait(0.05)
+        with self._lock:
+            self.in_flight -= 1
+        return FakeResp(200)
+
+
+def _warm_manager(session, keepalive_interval_s=60.0):
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s", workers=2,
+                       keepalive_interval_s=keepalive_interval_s)
+    m._session = session
+    return m
+
+
+def test_prewarm_opens_connections_concurrently(qapp):
+    session = WarmSession()
+    m = _warm_manager(session)
+    try:
+        m.prewarm("http://srv:5000/api/anything", connections=3)
+        assert _wait_for(lambda: m.warmup_stats()["prewarms"] == 3)
+        assert session.heads == ["http://srv:5000/api/get_app_token"] * 3
+        assert session.max_in_flight == 3          # une connexion par HEAD
+        assert m.warmup_stats()["targets"] == {"http://srv:5000": 3}
+        # 0 désactive (plus de cible, plus de keep-alive).
+        m.prewarm("http://srv:5000", connections=0)
+        assert m.warmup_stats()["targets"] == {}
+        assert m._keepalive_timer is None
+    finally:
+        m.stop()
+
+
+def test_keepalive_only_when_network_idle(qapp):
+    session = WarmSession()
+    m = _warm_manager(session, keepalive_interval_s=0.1)
+    try:
+        m.prewarm("http://srv", connections=1)
+        assert _wait_for(lambda: m.warmup_stats()["keepalives"] >= 1)
+        # Trafic continu : les connexions sont déjà entretenues.
+        m._last_activity = time.monotonic() + 60
+        before = m.warmup_stats()["keepalives"]
+        threading.Event().wait(0.3)
+        assert m.warmup_stats()["keepalives"] == before
+    finally:
+        m.stop()
+    assert m._keepalive_timer is None
+
+
+def test_keepalive_rounds_reuse_warm_threads(qapp):
+    session = WarmSession()
+    m = _warm_manager(session, keepalive_interval_s=0.05)
+    try:
+        m.prewarm("http://srv", connections=2)
+        assert _wait_for(lambda: m.warmup_stats()["keepalives"] >= 6)
+        assert len(session.threads) <= 2
+    finally:
+        m.stop()
+
+
+def test_prewarm_fits_default_connection_pool(qapp, caplog):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            threading.Event().wait(0.05)     # HEAD simultanés : deux connexions
+            self.send_response(405)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s", workers=1)
+    try:
+        with caplog.at_level("WARNING", logger="urllib3.connectionpool"):
+            m.prewarm(f"http://127.0.0.1:{httpd.server_address[1]}", connections=2)
+            assert _wait_for(lambda: m.warmup_stats()["prewarms"] == 2)
+        assert "Connection pool is full" not in caplog.text
+    finally:
+        m.stop()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_first_click_latency_measured_after_idle_only(qapp):
+    m = _warm_manager(WarmSession(), keepalive_interval_s=60.0)
+    try:
+        for _ in range(2):
+            done = []
+            handle = m.make_handle("http://srv/action", method="GET")
+            handle.finished.connect(lambda: done.append(1))
+            handle.start()
+            assert _wait_for(lambda: done)
+        # Le premier clic est mesuré, pas le second (réseau encore actif).
+        assert m.warmup_stats()["first_click"]["count"] == 1
+        # Le trafic de fond ne compte pas comme un clic.
+        m._last_activity -= 120
+        assert m.request_blocking("http://srv/state", timeout_s=5).success
+        assert m.warmup_stats()["first_click"]["count"] == 1
+    finally:
+        m.stop()
+
+
+# --- Compression des requêtes et compteurs d'octets ----------------------------
+
+def _compressing_manager(session):
+    m = NetworkManager(lambda: "http://srv/token", lambda: "s",
+                       compress_requests=True, compress_min_bytes=100)
+    m._session = session
+    return m
+
+
+def test_large_post_sent_gzip_and_counted(qapp):
+    import gzip
+    session = FakeSession(post_responses=[FakeResp(200, "{}")])
+    m = _compressing_manager(session)
+    try:
+        data = {"note": "x" * 1000}
+        assert m.request_blocking("http://srv/api/note", method="POST", data=data,
+                                  timeout_s=5).success
+        _, _, _, body, headers = session.calls[0]
+        assert headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(body) == b"note=" + b"x" * 1000
+        stats = m.bandwidth_stats()["srv/api/note"]
+        assert stats["request_bytes"] == 1005
+        assert stats["request_wire_bytes"] == len(body)
+        assert stats["saved_bytes"] == 1005 - len(body)
+    finally:
+        m.stop()
+
+
+def test_gzip_refused_with_415_resent_plain_then_disabled(qapp):
+    session = FakeSession(post_responses=[FakeResp(415, ""), FakeResp(200, "{}"),
+                                          FakeResp(200, "{}")])
+    m = _compressing_manager(session)
+    try:
+        data = {"note": "x" * 1000}
+        assert m.request_blocking("http://srv/a", method="POST", data=data, timeout_s=5).success
+        assert m.request_blocking("http://srv/b", method="POST", data=data, timeout_s=5).success
+        encodings = [(c[4] or {}).get("Content-Encoding") for c in session.calls]
+        assert encodings == ["gzip", None, None]
+        assert session.calls[1][3] == data          # renvoyé tel quel
+    finally:
+        m.stop()
+
+
+def test_small_post_never_compressed(qapp):
+    session = FakeSession()
+    m = _compressing_manager(session)
+    try:
+        m.request_blocking("http://srv/a", method="POST", data={"id": 1}, timeout_s=5)
+        assert session.calls[0][3] == {"id": 1}
+    finally:
+        m.stop()
+
+
+# --- Traçage (X-Request-Id, spans) ---------------------------------------------
+
+def test_request_id_sent_and_kept_across_401_replay(mgr_factory):
+    m = mgr_factory(FakeSession(
+        get_responses=[FakeResp(401, "no"), FakeResp(200, "{}")],
+        post_responses=[FakeResp(200, json_data={"token": "t"})],
+    ))
+    res = m.request_blocking("http://srv/a", timeout_s=5)
+    gets = [c for c in m._session.calls if c[0] == "GET"]
+    ids = {c[3]["X-Request-Id"] for c in gets}
+    assert len(gets) == 2 and ids == {res.request_id}
+    span = m.trace(res.request_id)
+    assert span["status"] == 200 and span["url"] == "http://srv/a"
+    assert span["queue_wait_s"] is not None and span["decode_s"] is not None
+
+
+def test_async_handle_span_records_gui_dispatch(mgr_factory):
+    m = mgr_factory(FakeSession(get_responses=[FakeResp(200, "{}")]))
+    results = []
+    handle = m.make_handle("http://srv/next")
+    handle.result.connect(results.append)
+    handle.start()
+    assert _wait_for(lambda: results)
+    span = m.trace(results[0].request_id)
+    assert span["dispatch_s"] is not None
+    assert span["total_s"] >= span["dispatch_s"]
+
+
+def test_coalesced_get_span_points_to_leader(mgr_factory):
+    m = mgr_factory(GatedSession())
+    blocker = _block_worker(m)
+    leader, follower = m.submit("http://srv/state"), m.submit("http://srv/state")
+    m._session.gate.set()
+    blocker.join(5)
+    leader_id = leader.result(5).request_id
+    assert follower.result(5).request_id == leader_id
+    spans = [s for s in m.traces() if s["url"] == "http://srv/state"]
+    assert sorted(s["leader_id"] is None for s in spans) == [False, True]
+    assert all(s["leader_id"] in (None, leader_id) for s in spans)
+
+
+def test_latency_histograms_per_lane(mgr_factory):
+    m = mgr_factory(FakeSession())
+    m.request_blocking("http://srv/a", timeout_s=5)
+    m.request_blocking("http://srv/b", timeout_s=5)
+    histograms = m.latency_histograms()
+    assert list(histograms) == ["background"]
+    assert histograms["background"]["count"] == 2
+    assert sum(histograms["background"]["counts"]) == 2
+
+
+def test_run_in_background_runs_calls_in_worker_in_order(mgr_factory):
+    m = mgr_factory(FakeSession(), workers=3)
+    ran = []
+    done = threading.Event()
+    for i in range(5):
+        m.run_in_background(lambda i=i: ran.append((i, threading.current_thread())),
+                            order_key="store")
+    m.run_in_background(done.set, order_key="store")
+    assert done.wait(2.0)
+    assert [i for i, _ in ran] == [0, 1, 2, 3, 4]
+    assert all(thread is not threading.main_thread() for _, thread in ran)
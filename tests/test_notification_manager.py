@@ -100,6 +100,26 @@ def test_duplicate_in_queue_not_added_twice(main_window):
     assert len(mgr.pending) == 1
 
 
+def test_stats_count_outcomes(main_window):
+    mgr = NotificationManager(main_window, max_visible=1)
+    mgr.notify(_data(message="1"), internal=True)      # affichée
+    mgr.notify(_data(message="1"), internal=True)      # doublon visible
+    mgr.notify(_data(message="2"), internal=True)      # en file
+    assert mgr.stats() == {"shown": 1, "duplicates": 1, "queued": 1,
+                           "visible": 1, "pending": 1}
+
+
+def test_server_envelope_is_shown_and_deduplicated_without_parsing(main_window):
+    from ws_events import NotificationEvent
+
+    mgr = NotificationManager(main_window)
+    event = NotificationEvent(origin="low_paper", message="Papier bientôt vide")
+    notif = mgr.notify(event)
+    assert notif is not None and notif.origin == "low_paper"
+    assert notif.message == "Papier bientôt vide"
+    assert mgr.notify(NotificationEvent(origin="low_paper", message="Papier bientôt vide")) is None
+
+
 def test_notification_does_not_steal_focus(main_window):
     mgr = NotificationManager(main_window)
     notif = mgr.notify(_data(), internal=True)
@@ -0,0 +1,124 @@
+"""Tests du journal des actions hors ligne (offline_journal).
+
+Vérifie la persistance (rechargement après redémarrage/arrêt brutal), l'ordre
+des actions en attente, la compaction une fois tout rejoué, le regroupement des
+fsync par lots, et la réconciliation avec l'état du serveur (stale_reason).
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import offline_journal  # noqa: E402
+from offline_journal import JournalEntry, OfflineJournal, stale_reason  # noqa: E402
+
+
+def _journal(tmp_path, **kwargs):
+    return OfflineJournal(tmp_path / "journal.jsonl", fsync_interval_s=0.01, **kwargs)
+
+
+def test_pending_actions_survive_restart_in_order(tmp_path):
+    j = _journal(tmp_path)
+    first = j.append("validate", "http://srv/validate_patient/1/7", counter_id=1, patient_id=7)
+    second = j.append("paper", "http://srv/paper", data={"action": "activate", "counter_id": 1},
+                      idempotency_key="k-paper", counter_id=1)
+    assert j.close()
+
+    reloaded = _journal(tmp_path)
+    try:
+        pending = reloaded.pending()
+        assert [e.id for e in pending] == [first.id, second.id]
+        assert pending[0].idempotency_key          # clé générée et conservée
+        assert pending[1].idempotency_key == "k-paper"
+        assert pending[1].data == {"action": "activate", "counter_id": 1}
+    finally:
+        reloaded.close()
+
+
+def test_done_entries_not_replayed_and_file_compacted(tmp_path):
+    j = _journal(tmp_path)
+    a = j.append("pause", "http://srv/a", counter_id=1)
+    b = j.append("recall", "http://srv/b", counter_id=1)
+    j.mark_done(a.id)
+    assert j.flush()
+    assert [e.id for e in _reload_pending(tmp_path)] == [b.id]
+    j.mark_done(b.id)
+    j.close()
+    assert (tmp_path / "journal.jsonl").read_text(encoding="utf-8") == ""
+    assert _reload_pending(tmp_path) == []
+
+
+def _reload_pending(tmp_path):
+    j = _journal(tmp_path)
+    try:
+        return j.pending()
+    finally:
+        j.close()
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    entry = JournalEntry("e1", "pause", "http://srv/a", counter_id=1, created_at=0)
+    path.write_text(json.dumps(entry.to_record()) + "\n" + '{"op": "add", "id": "e2", "ac',
+                    encoding="utf-8")
+    assert [e.id for e in _reload_pending(tmp_path)] == ["e1"]
+
+
+def test_append_after_truncated_line_survives_restart(tmp_path):
+    # Arrêt brutal au milieu de u2, redémarrage, ajout de u3 : u3 ne doit pas
+    # se recoller à la ligne tronquée (et être perdu au redémarrage suivant).
+    j = _journal(tmp_path)
+    u1 = j.append("pause", "http://srv/u1", counter_id=1)
+    j.append("recall", "http://srv/u2", counter_id=1)
+    assert j.close()
+    path = tmp_path / "journal.jsonl"
+    content = path.read_bytes()
+    path.write_bytes(content[:content.rfind(b"\n", 0, len(content) - 1) + 20])
+
+    j = _journal(tmp_path)
+    u3 = j.append("validate", "http://srv/u3", counter_id=1)
+    assert j.close()
+    assert [e.id for e in _reload_pending(tmp_path)] == [u1.id, u3.id]
+
+
+def test_writes_are_batched_into_one_fsync(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(offline_journal.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    j = OfflineJournal(tmp_path / "journal.jsonl", fsync_interval_s=0.3)
+    try:
+        j.append("pause", "http://srv/a", counter_id=1)
+        assert j.flush()
+        # Pendant l'intervalle, plusieurs actions : un seul lot, un seul fsync.
+        for i in range(5):
+            j.append("recall", f"http://srv/{i}", counter_id=1)
+        assert j.flush()
+        assert len(synced) == 2
+    finally:
+        j.close()
+
+
+def test_stale_reason_reconciles_with_server_state():
+    now = 1000.0
+    entry = JournalEntry("e", "validate", "http://srv/v", counter_id=1, patient_id=7,
+                         created_at=now - 10)
+    assert stale_reason(entry, counter_id=1, current_patient_id=7, now=now) is None
+    assert stale_reason(entry, counter_id=2, current_patient_id=7, now=now) == "autre comptoir"
+    assert stale_reason(entry, counter_id=1, current_patient_id=8, now=now) \
+        == "patient en cours différent"
+    assert stale_reason(entry, 1, 7, now=now + 3600) == "trop ancienne"
+    paper = JournalEntry("p", "paper", "http://srv/p", counter_id=1, created_at=now)
+    # Le papier ne dépend pas du patient en cours.
+    assert stale_reason(paper, counter_id=1, current_patient_id=None, now=now) is None
+
+
+def test_stale_reason_discards_action_made_on_newer_queue():
+    entry = JournalEntry("e", "pause", "http://srv/p", counter_id=1, patient_id=7,
+                         revision=12, created_at=0)
+    assert stale_reason(entry, 1, 7, now=1, server_revision=12) is None
+    assert stale_reason(entry, 1, 7, now=1, server_revision=15) is None
+    assert stale_reason(entry, 1, 7, now=1, server_revision=3) \
+        == "état du serveur antérieur à l'action"
+    assert stale_reason(entry, 1, 7, now=1, server_revision=None) is None
@@ -0,0 +1,135 @@
+"""Mode hors ligne de la fenêtre principale : offline_wrap (journalisation sur
+erreur réseau) et rejeu du journal au retour du serveur, avec un faux ``self``
+et un vrai OfflineJournal dans un dossier temporaire.
+"""
+
+import logging
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import main  # noqa: E402
+from net_result import NetResult  # noqa: E402
+from offline_journal import OfflineJournal  # noqa: E402
+from ws_events import PatientRecord  # noqa: E402
+
+
+class FakeSignal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, fn):
+        self.slots.append(fn)
+
+
+class FakeHandle:
+    def __init__(self, outcome):
+        self.result = FakeSignal()
+        self._outcome = outcome
+
+    def start(self):
+        for slot in self.result.slots:
+            slot(self._outcome)
+
+
+class FakeNM:
+    """make_handle répond dans l'ordre avec les résultats fournis."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.sent = []
+
+    def make_handle(self, url, **kwargs):
+        self.sent.append((url, kwargs))
+        return FakeHandle(self.outcomes.pop(0))
+
+
+@pytest.fixture
+def journal(tmp_path):
+    j = OfflineJournal(tmp_path / "journal.jsonl", fsync_interval_s=0.01)
+    yield j
+    j.close()
+
+
+def _win(journal, enabled=True, outcomes=()):
+    w = types.SimpleNamespace(
+        logger=logging.getLogger("test.offline"),
+        offline_journal_enabled=enabled,
+        _offline_journal=journal,
+        counter_id=1,
+        my_patient={"id": 7},
+        queue_revision=12,
+        shutting_down=False,
+        notification_connection=True,
+        notifications=[],
+        resyncs=0,
+        network_manager=FakeNM(outcomes),
+    )
+    w.show_notification = lambda data, internal=False: w.notifications.append(data["message"])
+    w._request_resync = lambda: setattr(w, "resyncs", w.resyncs + 1)
+    for name in ("_offline_journal_active", "offline_wrap", "journal_offline_action",
+                 "_replay_offline_journal", "_replay_next_offline", "_finish_offline_replay"):
+        setattr(w, name, types.MethodType(getattr(main.MainWindow, name), w))
+    return w
+
+
+def test_wrap_is_a_noop_when_offline_mode_disabled(journal):
+    w = _win(journal, enabled=False)
+    cb = lambda r: None
+    assert w.offline_wrap("pause", "http://srv/p", "POST", None, None, cb) == (None, cb)
+
+
+def test_network_error_journals_action_with_its_idempotency_key(journal):
+    w = _win(journal)
+    got = []
+    headers, on_result = w.offline_wrap("validate", "http://srv/v/1/7", "POST", None, None,
+                                        got.append)
+    key = headers["X-Idempotency-Key"]
+    on_result(NetResult.network_error("wifi"))
+    [entry] = journal.pending()
+    assert (entry.action, entry.idempotency_key, entry.patient_id) == ("validate", key, 7)
+    # L'appelant reçoit une annulation silencieuse, l'utilisateur une notification.
+    assert got[0].is_cancelled and got[0].message == ""
+    assert len(w.notifications) == 1
+
+
+def test_current_patient_record_is_journaled_and_kept_on_replay(journal):
+    w = _win(journal, outcomes=[NetResult.from_response(200, "{}", "application/json")])
+    w.my_patient = PatientRecord(id=7, counter_id=1)
+    _, on_result = w.offline_wrap("validate", "http://srv/v/1/7", "POST", None, None,
+                                  lambda r: None)
+    on_result(NetResult.network_error("wifi"))
+    assert journal.pending()[0].patient_id == 7
+    w._replay_offline_journal()
+    assert [url for url, _ in w.network_manager.sent] == ["http://srv/v/1/7"]
+    assert journal.pending() == []
+
+
+def test_server_answer_is_passed_through_untouched(journal):
+    w = _win(journal)
+    got = []
+    _, on_result = w.offline_wrap("pause", "http://srv/p", "POST", None, None, got.append)
+    answer = NetResult.from_response(503, "busy", "text/plain")
+    on_result(answer)
+    assert got == [answer]
+    assert journal.pending() == []
+
+
+def test_replay_skips_stale_entries_and_stops_on_new_network_error(journal):
+    journal.append("validate", "http://srv/v/1/3", counter_id=1, patient_id=3)
+    journal.append("paper", "http://srv/paper", counter_id=1, idempotency_key="k-paper")
+    later = journal.append("pause", "http://srv/p/1/7", counter_id=1, patient_id=7)
+    w = _win(journal, outcomes=[NetResult.from_response(200, "{}", "application/json"),
+                                NetResult.network_error("encore coupé")])
+    w._replay_offline_journal()
+
+    # Le patient 3 n'est plus le patient en cours : écarté sans envoi.
+    assert [url for url, _ in w.network_manager.sent] == ["http://srv/paper", "http://srv/p/1/7"]
+    assert w.network_manager.sent[0][1]["idempotency_key"] == "k-paper"
+    assert [e.id for e in journal.pending()] == [later.id]
+    assert w._offline_replaying is False
+    assert w.resyncs == 1                 # réconciliation avec la révision serveur
@@ -120,6 +120,8 @@ class SignalCounter:
         model.rowsRemoved.connect(lambda *a: self._inc("removed"))
         model.dataChanged.connect(lambda *a: self._inc("data_changed"))
         model.modelReset.connect(lambda *a: self._inc("reset"))
+        self.moved = 0
+        model.rowsMoved.connect(lambda *a: self._inc("moved"))
 
     def _inc(self, name):
         setattr(self, name, getattr(self, name) + 1)
@@ -300,3 +302,67 @@ def test_empty_then_clears(qapp):
     assert m.rowCount() == 0
     assert c.removed >= 1
     assert c.reset == 0
+
+
+def test_stats_count_updates_and_row_changes(qapp):
+    m = PatientListModel()
+    m.set_patients([_patient(1), _patient(2)])
+    m.set_patients([_patient(2, activity="Autre"), _patient(3)])
+    stats = m.stats()
+    assert (stats["rows"], stats["updates"]) == (2, 2)
+    assert (stats["inserted"], stats["removed"], stats["changed"]) == (3, 1, 1)
+    assert stats["duration"]["count"] == 2
+
+
+def test_accepts_patient_records(qapp):
+    from ws_events import normalize_patients
+
+    m = PatientListModel()
+    m.set_patients(normalize_patients([_patient(1, call="A"), _patient(2, call="B")]))
+    c = SignalCounter(m)
+    m.set_patients(normalize_patients([_patient(1, call="A"), _patient(2, call="B")]))
+    assert m.rowCount() == 2 and m.id_at(1) == 2
+    assert c.data_changed == 0 and c.inserted == 0 and c.removed == 0
+    assert m.data(m.index(0, 0), Qt.DisplayRole) == "A"
+
+
+def _ops(*ops):
+    from ws_events import decode_patient_patch
+
+    return decode_patient_patch({"base_revision": 1, "ops": list(ops)}).ops
+
+
+def test_apply_patch_emits_targeted_signals_without_diff(qapp):
+    m = PatientListModel()
+    m.set_patients([_patient(1, call="A"), _patient(2, call="B"), _patient(3, call="C")])
+    c = SignalCounter(m)
+    assert m.apply_patch(_ops(
+        {"op": "insert", "index": 1, "patient": _patient(4, call="D")},
+        {"op": "remove", "id": 3},
+        {"op": "move", "id": 1, "index": 2},
+        {"op": "update", "id": 2, "patient": {"activity": "Vaccin"}},
+        {"op": "update", "id": 4, "patient": {"call_number": "D"}},   # inchangé
+    )) is True
+    assert [m.id_at(i) for i in range(3)] == [4, 2, 1]
+    assert m.patient_at(1)["activity"] == "Vaccin"
+    assert (c.inserted, c.removed, c.moved, c.data_changed, c.reset) == (1, 1, 1, 1, 0)
+    stats = m.stats()
+    assert (stats["patches"], stats["moved"], stats["updates"]) == (1, 1, 1)
+
+
+def test_apply_patch_move_up_and_down(qapp):
+    m = PatientListModel()
+    m.set_patients([_patient(i) for i in range(1, 5)])
+    assert m.apply_patch(_ops({"op": "move", "id": 4, "index": 0}))
+    assert [m.id_at(i) for i in range(4)] == [4, 1, 2, 3]
+    assert m.apply_patch(_ops({"op": "move", "id": 4, "index": 3}))
+    assert [m.id_at(i) for i in range(4)] == [1, 2, 3, 4]
+
+
+def test_apply_patch_conflict_leaves_model_untouched(qapp):
+    m = PatientListModel()
+    m.set_patients([_patient(1), _patient(2)])
+    c = SignalCounter(m)
+    assert m.apply_patch(_ops({"op": "remove", "id": 1}, {"op": "remove", "id": 9})) is False
+    assert [m.id_at(i) for i in range(2)] == [1, 2]
+    assert (c.inserted, c.removed, c.moved, c.data_changed) == (0, 0, 0, 0)
@@ -294,3 +294,22 @@ def test_load_counters_reenables_button_if_not_started(monkeypatch):
     w.load_counters = types.MethodType(preferences.PreferencesDialog.load_counters, w)
     w.load_counters()
     assert w.test_button._e is True
+
+
+def test_counters_revalidated_with_etag(monkeypatch):
+    monkeypatch.setattr(preferences, "_COUNTERS_CACHE", preferences.ResponseCache())
+    counters = [{"id": 1, "name": "Comptoir 1"}]
+    sent_headers = []
+
+    def _get(url, headers=None, timeout=None):
+        sent_headers.append(dict(headers))
+        if "If-None-Match" in headers:
+            return types.SimpleNamespace(status_code=304, headers={}, text="")
+        return types.SimpleNamespace(status_code=200, headers={"ETag": '"c1"'},
+                                     text='[{"id": 1, "name": "Comptoir 1"}]',
+                                     json=lambda: list(counters))
+
+    first = _run_counters(monkeypatch, _resp(200, {"token": "abc"}), get=_get)
+    second = _run_counters(monkeypatch, _resp(200, {"token": "abc"}), get=_get)
+    assert first["data"] == counters and second == {"ok": True, "data": counters}
+    assert sent_headers[1]["If-None-Match"] == '"c1"'
@@ -50,10 +50,22 @@ class FakeSocket:
 class FakeNM:
     def __init__(self):
         self.cleared = False
+        self.cancelled_tags = []
+        self.prewarmed = []
+        self.background = []
+
+    def run_in_background(self, call, order_key=None):
+        self.background.append((call, order_key))
+    def prewarm(self, url, connections):
+        self.prewarmed.append((url, connections))
 
     def clear_token(self):
         self.cleared = True
 
+    def cancel_tag(self, tag):
+        self.cancelled_tags.append(tag)
+        return 0
+
 
 def _win(monkeypatch, staff_id=7):
     monkeypatch.setattr(main, "StartupWorker", FakeWorker)
@@ -69,6 +81,7 @@ def _win(monkeypatch, staff_id=7):
         socket_was_disconnected=True,
         web_url="http://nouveau:5000",
         counter_id=2,
+        prewarm_connections=2,
         released=[],
     )
     w._release_counter_blocking = lambda url=None, counter_id=None: w.released.append((url, counter_id))
@@ -88,6 +101,16 @@ def test_reconnect_releases_old_counter_when_staff_present(monkeypatch):
     assert w.released == [("http://ancien:5000", 1)]
 
 
+def test_reconnect_cancels_queued_actions_of_old_counter(monkeypatch):
+    w = _win(monkeypatch, staff_id=7)
+    order = []
+    w.network_manager.cancel_tag = lambda tag: order.append(("cancel", tag))
+    w._release_counter_blocking = lambda url=None, counter_id=None: order.append(("release", counter_id))
+    w._reconnect_services(OLD, old_staff_present=True)
+    # Les actions de l'ancien comptoir sont annulées AVANT sa libération.
+    assert order == [("cancel", main.counter_tag(1)), ("release", 1)]
+
+
 def test_reconnect_skips_release_without_staff(monkeypatch):
     w = _win(monkeypatch, staff_id=None)
     w._reconnect_services(OLD, old_staff_present=False)
@@ -101,6 +124,8 @@ def test_reconnect_invalidates_token_and_state(monkeypatch):
     assert w.app_token is None                  # jeton invalidé
     assert w.staff_id is None                   # staff de l'ancien comptoir oublié
     assert w.network_manager.cleared is True    # session réseau purgée
+    # Jeton mémorisé (démarrage à chaud) effacé hors du thread GUI.
+    assert w.network_manager.background == [(main.clear_token, main.ORDER_TOKEN_STORE)]
     assert w.queue_revision == -1
     assert w.my_patient is None
     assert w.list_patients == []
@@ -115,6 +140,12 @@ def test_reconnect_starts_new_token_worker(monkeypatch):
     assert FakeWorker.last.finished_startup.slot is not None
 
 
+def test_reconnect_prewarms_new_server(monkeypatch):
+    w = _win(monkeypatch, staff_id=None)
+    w._reconnect_services(OLD, old_staff_present=False)
+    assert w.network_manager.prewarmed == [("http://nouveau:5000", 2)]
+
+
 # --- _on_reconnect_ready : succès vs échec ----------------------------------
 
 def _ready_win(monkeypatch):
@@ -9,7 +9,14 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 
-from resync_coordinator import ResyncCoordinator, snapshot_is_fresh  # noqa: E402
+import pytest  # noqa: E402
+
+from resync_coordinator import (  # noqa: E402
+    ResyncCoordinator,
+    StateDelta,
+    decode_changes,
+    snapshot_is_fresh,
+)
 
 
 # --- Coalescing -------------------------------------------------------------
@@ -77,3 +84,43 @@ def test_snapshot_applied_when_newer_or_equal():
 
 def test_stale_snapshot_rejected():
     assert snapshot_is_fresh(9, 10) is False
+
+
+# --- Rattrapage incrémental (/changes) ---------------------------------------
+
+def _changes(**overrides):
+    data = {"base_revision": 7, "revision": 9, "truncated": False,
+            "ops": [{"op": "remove", "id": 1},
+                    {"op": "insert", "index": 0, "patient": {"id": 4, "call_number": "A4"}}],
+            "current_patient": None, "staff": {"id": 2, "name": "Léa"},
+            "autocalling": True, "add_paper": False}
+    data.update(overrides)
+    return data
+
+
+def test_decode_changes_returns_patch_and_state_fields():
+    delta = decode_changes(_changes(), since=7)
+    assert isinstance(delta, StateDelta)
+    assert (delta.patch.base_revision, delta.revision) == (7, 9)
+    assert [op[0] for op in delta.patch.ops] == ["remove", "insert"]
+    assert delta.state == {"revision": 9, "current_patient": None,
+                           "staff": {"id": 2, "name": "Léa"},
+                           "autocalling": True, "add_paper": False}
+
+
+def test_decode_changes_defaults_base_to_requested_revision():
+    data = _changes()
+    del data["base_revision"]
+    assert decode_changes(data, since=7).patch.base_revision == 7
+
+
+@pytest.mark.parametrize("data", [
+    _changes(truncated=True),                 # historique purgé côté serveur
+    _changes(base_revision=6),                # autre base que celle demandée
+    _changes(ops=[{"op": "swap"}]),           # opération inconnue
+    {k: v for k, v in _changes().items() if k != "staff"},
+    {k: v for k, v in _changes().items() if k != "revision"},
+    None, [],
+])
+def test_decode_changes_requires_full_state_otherwise(data):
+    assert decode_changes(data, since=7) is None
@@ -98,3 +98,64 @@ def test_fallback_to_qsettings_when_keyring_broken(broken_keyring):
     assert save_secret(settings, "repli") is False
     assert settings.value("app_secret") == "repli"
     assert load_secret(settings) == "repli"
+
+
+# --- Jeton mémorisé (démarrage à chaud) ---------------------------------------
+
+from secret_store import clear_token, load_token, save_token, token_scope  # noqa: E402
+
+
+@pytest.fixture
+def token_keyring(monkeypatch):
+    """Keyring en mémoire pour les entrées génériques (jeton)."""
+    store = {}
+    monkeypatch.setattr(secret_store, "_keyring_read", lambda entry: store.get(entry))
+
+    def _write(entry, value):
+        store[entry] = value
+        return True
+
+    monkeypatch.setattr(secret_store, "_keyring_write", _write)
+    monkeypatch.setattr(secret_store, "_keyring_delete", lambda entry: store.pop(entry, None))
+    return store
+
+
+def test_token_roundtrip_with_remaining_lifetime(token_keyring):
+    scope = token_scope("https://srv", "s3cret")
+    assert save_token("TOK", scope, ttl_s=3600, now=1000.0) is True
+    assert load_token(scope, now=1600.0) == ("TOK", 3000.0)
+    # Le secret n'apparaît pas dans l'enregistrement.
+    assert "s3cret" not in token_keyring["app_token"]
+
+
+def test_token_bound_to_server_and_secret(token_keyring):
+    save_token("TOK", token_scope("https://srv", "s3cret"), ttl_s=3600, now=0.0)
+    assert load_token(token_scope("https://autre", "s3cret"), now=1.0) is None
+    assert load_token(token_scope("https://srv", "nouveau"), now=1.0) is None
+
+
+def test_token_near_expiry_not_reused(token_keyring):
+    scope = token_scope("u", "s")
+    save_token("TOK", scope, ttl_s=3600, now=0.0)
+    assert load_token(scope, now=3600 - secret_store.TOKEN_EXPIRY_MARGIN_S + 1) is None
+
+
+def test_undated_token_has_a_maximum_age(token_keyring):
+    scope = token_scope("u", "s")
+    save_token("TOK", scope, now=0.0)
+    assert load_token(scope, now=60.0) == ("TOK", None)
+    assert load_token(scope, now=secret_store.MAX_UNDATED_TOKEN_AGE_S + 1) is None
+
+
+def test_clear_and_corrupt_token(token_keyring):
+    scope = token_scope("u", "s")
+    save_token("TOK", scope, now=0.0)
+    clear_token()
+    assert load_token(scope, now=1.0) is None
+    token_keyring["app_token"] = "{pas du json"
+    assert load_token(scope, now=1.0) is None
+
+
+def test_token_not_stored_in_clear_without_keyring(monkeypatch):
+    monkeypatch.setattr(secret_store, "_keyring_write", lambda entry, value: False)
+    assert save_token("TOK", token_scope("u", "s")) is False
@@ -24,6 +24,7 @@ import pytest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 
 import main  # noqa: E402
+from click_latency import ClickLatencyTracker  # noqa: E402
 from net_result import NetResult  # noqa: E402
 
 
@@ -67,6 +68,14 @@ def test_submit_creates_request_when_idle():
     assert w.made == 1
 
 
+def test_refused_submit_drops_pending_click_latency():
+    w = _wsub(active=True)
+    w.click_latency = ClickLatencyTracker()
+    w.click_latency.press("next")
+    assert w._submit("http://srv/a", key="next", latency_action="next") is None
+    assert not w.click_latency.pending("next")
+
+
 # --- _release_counter_blocking : libération bornée du comptoir ---------------
 
 def _wrel(result=None, raises=None):
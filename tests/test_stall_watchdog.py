@@ -0,0 +1,126 @@
+"""Tests du chien de garde des gels de la boucle GUI (stall_watchdog)."""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+from my_logger import register_secret  # noqa: E402
+from stall_watchdog import StallWatchdog, capture_stack, setup_stall_logger  # noqa: E402
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _watchdog(report_interval_s=30.0):
+    clock = FakeClock()
+    posted = []
+    handler = ListHandler()
+    stall_logger = logging.getLogger(f"test.stalls.{id(handler)}")
+    stall_logger.addHandler(handler)
+    stall_logger.propagate = False
+    watchdog = StallWatchdog(posted.append, main_thread_id=1, threshold_s=1.0,
+                             report_interval_s=report_interval_s, stall_logger=stall_logger,
+                             clock=clock, capture=lambda tid: f"pile du thread {tid}")
+    return watchdog, clock, posted, handler.messages
+
+
+def test_responsive_loop_reports_nothing():
+    watchdog, clock, posted, messages = _watchdog()
+    for _ in range(3):
+        watchdog.check()                # ping
+        clock.now += 0.2
+        posted.pop()()                  # la boucle répond vite
+        watchdog.check()
+    assert messages == []
+    assert watchdog.stats()["stalls"] == 0
+
+
+def test_stall_captures_stack_once_then_reports_duration():
+    watchdog, clock, posted, messages = _watchdog()
+    watchdog.check()
+    clock.now += 0.5
+    watchdog.check()                    # sous le seuil : rien
+    assert messages == []
+    clock.now += 0.7
+    watchdog.check()                    # 1,2 s : pile capturée
+    clock.now += 1.0
+    watchdog.check()                    # toujours bloquée : pas de seconde pile
+    assert len(messages) == 1
+    assert "bloquée depuis 1200 ms" in messages[0] and "pile du thread 1" in messages[0]
+    posted.pop()()
+    assert messages[1] == "Boucle GUI débloquée après 2200 ms"
+    stats = watchdog.stats()
+    assert stats["stalls"] == 1 and stats["reported"] == 1
+    assert round(stats["longest_s"], 3) == 2.2
+
+
+def test_reports_are_rate_limited_and_suppressed_ones_counted():
+    watchdog, clock, posted, messages = _watchdog(report_interval_s=30.0)
+
+    def stall(seconds):
+        watchdog.check()
+        clock.now += seconds
+        watchdog.check()
+        posted.pop()()
+        clock.now += 1
+
+    stall(1.5)
+    stall(1.5)                          # trop tôt : ni pile ni « débloquée »
+    assert len(messages) == 2
+    clock.now += 30
+    stall(1.5)
+    assert "1 gel(s) précédent(s) non détaillé(s)" in messages[2]
+    assert watchdog.stats()["stalls"] == 3
+
+
+def test_capture_stack_of_blocked_thread():
+    release = threading.Event()
+    entered = threading.Event()
+
+    def _blocking_call():
+        entered.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=_blocking_call)
+    thread.start()
+    try:
+        assert entered.wait(2)
+        assert "_blocking_call" in capture_stack(thread.ident)
+    finally:
+        release.set()
+        thread.join()
+    assert capture_stack(-1) is None
+
+
+def test_watchdog_thread_detects_blocked_main_thread(tmp_path):
+    stall_logger = setup_stall_logger(tmp_path)
+    register_secret("jeton-tres-secret")
+    pending = []
+    watchdog = StallWatchdog(pending.append, threshold_s=0.1, interval_s=0.02,
+                             stall_logger=stall_logger)
+    watchdog.start()
+    try:
+        time.sleep(0.05)
+        time.sleep(0.4)  # thread « GUI » bloqué ; jeton-tres-secret (ligne de la pile)
+    finally:
+        watchdog.stop()
+    for callback in pending:
+        callback()
+    for handler in stall_logger.handlers:
+        handler.flush()
+    content = (tmp_path / "stalls.log").read_text(encoding="utf-8")
+    assert "Boucle GUI bloquée" in content
+    assert "test_watchdog_thread_detects_blocked_main_thread" in content
+    assert "ligne de la pile" in content
+    assert "jeton-tres-secret" not in content     # masqué comme le journal applicatif
@@ -0,0 +1,199 @@
+"""Chronologie réseau du démarrage (MainWindow.run_startup_sequence) contre un
+serveur local de substitution (http.server, aucun accès réseau externe).
+
+Démarrage à froid : ``/api/get_app_token`` PUIS ``/state`` (deux allers-retours
+avant l'interface). Démarrage à chaud avec un jeton mémorisé valide : ``/state``
+seul. Jeton mémorisé refusé : 401, renouvellement, rejeu — l'interface démarre
+quand même. Chaque requête du serveur local prend ``LATENCY_S`` pour que la
+chronologie soit mesurable.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import main  # noqa: E402
+import secret_store  # noqa: E402
+from connections import NetworkManager  # noqa: E402
+
+LATENCY_S = 0.15
+COUNTER_ID = 1
+
+
+class StandInServer:
+    """Serveur minimal : délivre un jeton et l'état du comptoir, refuse (401)
+    tout jeton différent du dernier délivré, et note chaque requête."""
+
+    def __init__(self):
+        self.valid_token = "jeton-serveur"
+        self.token_status = 200
+        self.timeline = []   # (chemin, statut, instant relatif)
+        self.t0 = time.monotonic()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload):
+                time.sleep(LATENCY_S)
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.timeline.append((self.path, status, time.monotonic() - server.t0))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                if self.path == "/api/get_app_token" and server.token_status != 200:
+                    self._reply(server.token_status, {"error": "secret refusé"})
+                elif self.path == "/api/get_app_token":
+                    self._reply(200, {"token": server.valid_token, "expires_in": 3600})
+                else:
+                    self._reply(404, {})
+
+            def do_GET(self):
+                if self.path != f"/api/counter/{COUNTER_ID}/state":
+                    self._reply(404, {})
+                elif self.headers.get("X-App-Token") != server.valid_token:
+                    self._reply(401, {"error": "jeton invalide"})
+                else:
+                    self._reply(200, {"revision": 3, "current_patient": None,
+                                      "standing_list": []})
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def reset_clock(self):
+        self.t0 = time.monotonic()
+        self.timeline.clear()
+
+    def paths(self):
+        return [(path, status) for path, status, _ in self.timeline]
+
+
+@pytest.fixture
+def server():
+    srv = StandInServer()
+    srv.thread.start()
+    yield srv
+    srv.httpd.shutdown()
+    srv.httpd.server_close()
+
+
+@pytest.fixture
+def token_store(monkeypatch):
+    store = {}
+    monkeypatch.setattr(secret_store, "_keyring_read", lambda entry: store.get(entry))
+    monkeypatch.setattr(secret_store, "_keyring_write",
+                        lambda entry, value: store.__setitem__(entry, value) or True)
+    monkeypatch.setattr(secret_store, "_keyring_delete", lambda entry: store.pop(entry, None))
+    return store
+
+
+@pytest.fixture
+def window(server):
+    w = types.SimpleNamespace(
+        logger=logging.getLogger("test.startup"),
+        web_url=server.url,
+        app_secret="s3cret",
+        counter_id=COUNTER_ID,
+        app_token=None,
+    )
+    w.network_manager = NetworkManager(
+        token_url_provider=lambda: f"{w.web_url}/api/get_app_token",
+        secret_provider=lambda: w.app_secret)
+    for name in ("run_startup_sequence", "try_cached_app_token", "get_app_token",
+                 "init_state", "_state_url", "_state_from_result"):
+        setattr(w, name, types.MethodType(getattr(main.MainWindow, name), w))
+    yield w
+    w.network_manager.stop()
+
+
+def _timed_startup(w, server):
+    server.reset_clock()
+    start = time.monotonic()
+    connected, state = w.run_startup_sequence()
+    return connected, state, time.monotonic() - start
+
+
+def test_cold_start_needs_token_then_state(window, server, token_store):
+    connected, state, elapsed = _timed_startup(window, server)
+    assert connected is True and state["revision"] == 3
+    assert server.paths() == [("/api/get_app_token", 200),
+                              (f"/api/counter/{COUNTER_ID}/state", 200)]
+    assert elapsed >= 2 * LATENCY_S
+
+
+def test_warm_start_goes_straight_to_state(window, server, token_store):
+    scope = secret_store.token_scope(server.url, "s3cret")
+    secret_store.save_token(server.valid_token, scope, ttl_s=3600)
+
+    connected, state, elapsed = _timed_startup(window, server)
+    assert connected is True and state["revision"] == 3
+    assert server.paths() == [(f"/api/counter/{COUNTER_ID}/state", 200)]
+    assert window.app_token == server.valid_token
+    # Un seul aller-retour avant l'interface (contre deux à froid).
+    assert elapsed < 2 * LATENCY_S
+
+
+def test_rejected_cached_token_falls_back_through_401(window, server, token_store):
+    scope = secret_store.token_scope(server.url, "s3cret")
+    secret_store.save_token("jeton-révoqué", scope, ttl_s=3600)
+
+    connected, state, _ = _timed_startup(window, server)
+    assert connected is True and state["revision"] == 3
+    assert server.paths() == [(f"/api/counter/{COUNTER_ID}/state", 401),
+                              ("/api/get_app_token", 200),
+                              (f"/api/counter/{COUNTER_ID}/state", 200)]
+    assert window.app_token == server.valid_token
+
+
+def test_rejected_cached_token_is_forgotten_when_not_renewed(window, server, token_store):
+    scope = secret_store.token_scope(server.url, "s3cret")
+    secret_store.save_token("jeton-révoqué", scope, ttl_s=3600)
+    server.token_status = 403
+
+    connected, _, _ = _timed_startup(window, server)
+    assert connected is False
+    assert secret_store.load_token(scope) is None
+    assert token_store.get(secret_store.TOKEN_ENTRY) is None
+
+
+def test_token_for_another_server_is_ignored(window, server, token_store):
+    secret_store.save_token(server.valid_token,
+                            secret_store.token_scope("https://autre", "s3cret"), ttl_s=3600)
+    connected, _, _ = _timed_startup(window, server)
+    assert connected is True
+    assert server.paths()[0] == ("/api/get_app_token", 200)
+
+
+def test_refreshed_token_is_stored_off_the_gui_thread(window, monkeypatch):
+    writes = []
+    written = threading.Event()
+
+    def keyring_write(entry, value):
+        writes.append((threading.current_thread(), json.loads(value)["token"]))
+        written.set()
+        return True
+
+    monkeypatch.setattr(secret_store, "_keyring_write", keyring_write)
+    window._on_token_refreshed = types.MethodType(main.MainWindow._on_token_refreshed, window)
+    window._on_token_refreshed("jeton-neuf")
+    assert window.app_token == "jeton-neuf"
+    assert written.wait(2.0)
+    assert writes[0][1] == "jeton-neuf"
+    assert writes[0][0] is not threading.main_thread()
@@ -17,6 +17,7 @@ import pytest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 
 import main  # noqa: E402
+from ws_events import PatientRecord  # noqa: E402
 
 
 class FakeLabel:
@@ -79,6 +80,14 @@ def test_valid_patient_enables_actions():
     assert w.menu_calls == [True]
 
 
+def test_patient_record_from_socket_event_enables_actions():
+    w = FakeWindow()
+    w.update_my_patient(PatientRecord.from_mapping(_valid_patient()))
+    assert w.patient_id == 42
+    assert "A-12" in w.label_patient.text
+    assert w.menu_calls == [True]
+
+
 def test_patient_without_id_disables_actions():
     p = _valid_patient()
     p["id"] = None
@@ -5,10 +5,14 @@ Vérifie que la boucle de (re)connexion se termine proprement et rapidement quan
 réelle (on remplace le client socketio interne par un faux).
 """
 
+import json
 import os
 import sys
 import threading
+import time
 import types
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
 
 import pytest
 
@@ -18,6 +22,9 @@ from PySide6.QtCore import QCoreApplication  # noqa: E402
 import socketio  # noqa: E402
 
 from websocket_client import WebSocketClient  # noqa: E402
+from patient_list_model import PatientListModel  # noqa: E402
+from ws_events import PatientListEvent, PatientPatchEvent, PatientRecord  # noqa: E402
+from ws_heartbeat import HeartbeatMonitor  # noqa: E402
 
 
 @pytest.fixture(scope="module")
@@ -147,3 +154,188 @@ def test_never_two_simultaneous_connections(qapp):
     ws.stop(timeout_ms=2000)
     assert sio.violation is False        # connect() jamais appelé si déjà connecté
     assert sio.connect_calls >= 1
+
+
+class RecordingSio(FailingSio):
+    """Mémorise les abonnements pour déclencher les évènements à la main."""
+
+    def __init__(self):
+        super().__init__()
+        self.handlers = {}
+        self.connected = True
+
+    def on(self, event, handler=None, namespace=None):
+        self.handlers[event] = handler
+
+
+def test_stats_count_events_and_reconnections(qapp):
+    ws = WebSocketClient(_make_parent())
+    ws.sio = RecordingSio()
+    ws.setup_socketio_events()
+    assert ws.stats()["last_event_age_s"] is None
+    ws.sio.handlers["connect"]()
+    ws.sio.handlers["paper"]({"data": {}})
+    ws.sio.handlers["refresh_after_clear_patient_list"]({})
+    ws.sio.handlers["connect"]()
+    stats = ws.stats()
+    assert stats["connected"] is True
+    assert (stats["connects"], stats["reconnects"], stats["events"]) == (2, 1, 2)
+    assert stats["events_per_s"] > 0 and stats["last_event_age_s"] is not None
+    assert stats["rtt_s"] is None
+
+
+class SilentSio(RecordingSio):
+    """Lien à demi ouvert : les battements partent, rien ne revient."""
+
+    def __init__(self):
+        super().__init__()
+        self.emitted = []
+
+    def emit(self, event, data=None, namespace=None, callback=None):
+        self.emitted.append(event)
+
+
+def test_silent_link_forces_reconnect(qapp):
+    ws = WebSocketClient(_make_parent())
+    ws.sio = SilentSio()
+    ws.setup_socketio_events()
+    ws._heartbeat = HeartbeatMonitor(timeout_s=0.1, interval_s=0.01)
+    ws._heartbeat.supported = True        # serveur ayant déjà répondu
+    ws.sio.handlers["connect"]()
+    try:
+        assert ws.sio.disconnected.wait(2.0)
+    finally:
+        ws._heartbeat_stop.set()
+    assert "heartbeat" in ws.sio.emitted
+    assert ws.stats()["dead_links"] == 1
+
+
+def test_events_cross_threads_as_decoded_envelopes(qapp):
+    parent = _make_parent()
+    parent.counter_id = 3
+    ws = WebSocketClient(parent)
+    ws.sio = RecordingSio()
+    ws.setup_socketio_events()
+    lists, notifications, paper = [], [], []
+    ws.new_patient.connect(lists.append)
+    ws.new_notification.connect(notifications.append)
+    ws.change_paper_button.connect(paper.append)
+
+    ws.sio.handlers["update_patient_list"](
+        {"data": json.dumps([{"id": 1, "call_number": "A1", "activity": "x"}]), "revision": 9})
+    ws.sio.handlers["update_patient_list"]({"data": "{pas du json"})
+    ws.sio.handlers["notification"](
+        {"data": json.dumps({"origin": "low_paper", "message": "m"}), "flag": 4})
+
+    assert len(lists) == 1
+    event = lists[0]
+    assert isinstance(event, PatientListEvent) and event.revision == 9
+    assert isinstance(event.patients[0], PatientRecord) and event.patients[0]["call_number"] == "A1"
+    assert notifications == []            # ciblait un autre comptoir
+    assert paper == ["low_paper"]         # le bouton papier suit quand même
+
+
+# --- Serveur Socket.IO local (vrai protocole, sans réseau externe) -------------
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer:
+    """Serveur python-socketio minimal sur 127.0.0.1 (long-polling, thread
+    dédié) jouant le rôle du serveur de la pharmacie."""
+
+    NAMESPACE = "/socket_app_counter"
+
+    def __init__(self):
+        self.sio = socketio.Server(async_mode="threading", transports=["polling"])
+        self.connected = threading.Event()
+        self.sio.on("heartbeat", lambda sid, data: data["seq"], namespace=self.NAMESPACE)
+        self.sio.on("connect", lambda sid, environ, auth=None: self.connected.set(),
+                    namespace=self.NAMESPACE)
+        self._httpd = make_server("127.0.0.1", 0, socketio.WSGIApp(self.sio),
+                                  server_class=_ThreadingWSGIServer,
+                                  handler_class=_QuietHandler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def emit(self, event, data):
+        self.sio.emit(event, data, namespace=self.NAMESPACE)
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def stand_in_server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+def _wait_until(qapp, predicate, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not predicate() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_patch_from_server_is_applied_to_model_without_diff(qapp, stand_in_server):
+    parent = _make_parent()
+    parent.web_url = stand_in_server.url
+    parent.counter_id = 1
+    parent.ws_coalesce_window_ms = 0
+    ws = WebSocketClient(parent)
+    received = []
+    ws.new_patient.connect(received.append)
+    ws.patient_patch.connect(received.append)
+    # Connexion directe du client Socket.IO du WebSocketClient (ses vrais
+    # gestionnaires d'évènements), sans la boucle de reconnexion de run().
+    ws.sio.connect(stand_in_server.url, namespaces=[StandInServer.NAMESPACE])
+    try:
+        assert stand_in_server.connected.wait(5.0)
+        stand_in_server.emit("update_patient_list", {
+            "data": json.dumps([{"id": 1, "call_number": "A1"}, {"id": 2, "call_number": "A2"}]),
+            "revision": 1})
+        stand_in_server.emit("patch_patient_list", {"base_revision": 1, "revision": 2, "ops": [
+            {"op": "insert", "index": 2, "patient": {"id": 3, "call_number": "A3"}},
+            {"op": "remove", "id": 1},
+            {"op": "update", "id": 2, "patient": {"activity": "Vaccin"}},
+        ]})
+        assert _wait_until(qapp, lambda: len(received) == 2)
+    finally:
+        ws.sio.disconnect()
+
+    full, patch = received
+    assert isinstance(full, PatientListEvent) and isinstance(patch, PatientPatchEvent)
+    assert patch.base_revision == full.revision == 1
+
+    model = PatientListModel()
+    model.set_patients(full.patients)
+    updates = model.stats()["updates"]
+    assert model.apply_patch(patch.ops) is True
+    assert [model.id_at(row) for row in range(model.rowCount())] == [2, 3]
+    assert model.patient_at(0)["activity"] == "Vaccin"
+    assert model.stats()["updates"] == updates       # aucun diff complet
+
+
+def test_heartbeat_measures_round_trip_against_server(qapp, stand_in_server):
+    parent = _make_parent()
+    parent.web_url = stand_in_server.url
+    parent.counter_id = 1
+    ws = WebSocketClient(parent)
+    ws._heartbeat = HeartbeatMonitor(timeout_s=5, interval_s=0.05)
+    ws.sio.connect(stand_in_server.url, namespaces=[StandInServer.NAMESPACE])
+    try:
+        assert _wait_until(qapp, lambda: ws.rtt_s is not None)
+    finally:
+        ws.sio.disconnect()
+    assert 0 < ws.stats()["rtt_s"] < 5
+    assert ws._heartbeat.supported is True and ws.stats()["dead_links"] == 0
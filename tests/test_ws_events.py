@@ -0,0 +1,285 @@
+"""Tests des enveloppes typées d'évènements Socket.IO (``ws_events``) : décodage
+unique (JSON imbriqué compris), normalisation compacte des patients,
+immuabilité et compatibilité ``Mapping`` avec les consommateurs de ``dict``."""
+
+import json
+import os
+import pickle
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from ws_events import (  # noqa: E402
+    EventDecodeError,
+    NotificationEvent,
+    PatchConflict,
+    PatientListCoalescer,
+    PatientPatchEvent,
+    PatientRecord,
+    apply_patch_ops,
+    decode_notification,
+    decode_patient_list,
+    decode_patient_patch,
+    normalize_patients,
+    notification_targets,
+)
+
+PATIENT = {"id": 7, "call_number": "A12", "activity": "Ordonnance",
+           "activity_is_staff": None, "language_code": "fr", "extra": "x" * 100}
+
+
+def test_patient_record_is_compact_and_reads_like_a_dict():
+    record = PatientRecord.from_mapping(PATIENT)
+    assert record["id"] == 7 and record.call_number == "A12"
+    assert record.get("activity") == "Ordonnance"
+    # Champs inconnus écartés ; champs absents : absents, comme dans un dict.
+    assert "extra" not in record and "status" not in record
+    assert record.get("status", "?") == "?"
+    with pytest.raises(KeyError):
+        record["status"]
+    assert not hasattr(record, "__dict__")
+    assert record == {k: v for k, v in PATIENT.items() if k != "extra"}
+
+
+def test_patient_record_is_immutable_and_hashable():
+    record = PatientRecord.from_mapping(PATIENT)
+    with pytest.raises(AttributeError):
+        record.activity = "autre"
+    with pytest.raises(TypeError):
+        record["activity"] = "autre"
+    assert record == PatientRecord.from_mapping(dict(PATIENT))
+    assert hash(record) == hash(PatientRecord.from_mapping(dict(PATIENT)))
+    assert record != PatientRecord.from_mapping(dict(PATIENT, activity="autre"))
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_from_mapping_returns_existing_record_unchanged():
+    record = PatientRecord.from_mapping(PATIENT)
+    assert PatientRecord.from_mapping(record) is record
+
+
+def test_decode_patient_list_parses_nested_json_once():
+    raw = json.dumps({"data": json.dumps([PATIENT, "bruit", {"id": 8}]), "revision": "4"})
+    event = decode_patient_list(raw)
+    assert event.revision == 4
+    assert [p["id"] for p in event.patients] == [7, 8]
+    assert isinstance(event.patients, tuple)
+    assert all(isinstance(p, PatientRecord) for p in event.patients)
+
+
+def test_decode_patient_list_without_revision():
+    event = decode_patient_list({"data": []})
+    assert event.patients == () and event.revision is None
+
+
+@pytest.mark.parametrize("data", ["{pas du json", {"data": "{pas du json"},
+                                  {"data": {"id": 1}}, ["liste"]])
+def test_decode_patient_list_rejects_unreadable_payloads(data):
+    with pytest.raises(EventDecodeError):
+        decode_patient_list(data)
+
+
+def test_decode_notification_returns_event_and_flag():
+    event, flag = decode_notification(
+        {"data": json.dumps({"origin": "low_paper", "message": "Papier"}), "flag": [3]})
+    assert isinstance(event, NotificationEvent)
+    assert (event.origin, event["message"], flag) == ("low_paper", "Papier", [3])
+
+
+@pytest.mark.parametrize("data", [{"data": "{pas du json"}, {"data": {"message": "x"}}, "[]"])
+def test_decode_notification_rejects_unreadable_payloads(data):
+    with pytest.raises(EventDecodeError):
+        decode_notification(data)
+
+
+@pytest.mark.parametrize("flag, expected", [
+    (None, True), ([], True), (3, True), ("3", True), (4, False),
+    ([1, "3"], True), ([1, 2], False),
+])
+def test_notification_targets(flag, expected):
+    assert notification_targets(flag, 3) is expected
+
+
+def test_normalize_patients_accepts_none():
+    assert normalize_patients(None) == ()
+
+
+# --- PatientListCoalescer ----------------------------------------------------
+
+class ManualTimer:
+    """Minuteur piloté à la main : ``fire()`` simule la fin de la fenêtre."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def __call__(self, delay_s, callback):
+        self.callbacks.append(callback)
+
+    def fire(self):
+        self.callbacks.pop(0)()
+
+
+def _list(revision, *ids):
+    return decode_patient_list({"data": [{"id": i} for i in ids], "revision": revision})
+
+
+def _coalescer(window_s=0.05):
+    emitted, timer = [], ManualTimer()
+    return PatientListCoalescer(emitted.append, window_s=window_s, schedule=timer), emitted, timer
+
+
+def test_isolated_event_is_emitted_immediately():
+    coalescer, emitted, timer = _coalescer()
+    coalescer.push(_list(1, 1))
+    assert [e.revision for e in emitted] == [1]
+    timer.fire()                          # fin de fenêtre sans rafale
+    assert timer.callbacks == []
+    coalescer.push(_list(2, 1, 2))        # fenêtre refermée : de nouveau immédiat
+    assert [e.revision for e in emitted] == [1, 2]
+
+
+def test_burst_keeps_newest_revision_and_counts_dropped():
+    coalescer, emitted, timer = _coalescer()
+    for revision in (1, 2, 3, 4):
+        coalescer.push(_list(revision, *range(revision)))
+    assert len(emitted) == 1
+    timer.fire()
+    assert len(emitted) == 2
+    last = emitted[-1]
+    assert (last.revision, last.first_revision, last.coalesced) == (4, 2, 3)
+    assert [p["id"] for p in last.patients] == [0, 1, 2, 3]
+    assert coalescer.stats() == {"received": 4, "emitted": 2, "dropped": 2}
+    timer.fire()                          # fenêtre rouverte, rien de neuf : fermée
+    assert len(emitted) == 2 and timer.callbacks == []
+
+
+def test_gap_inside_burst_is_preserved():
+    coalescer, emitted, timer = _coalescer()
+    coalescer.push(_list(1))
+    coalescer.push(_list(2))
+    coalescer.push(_list(4))              # la 3 n'est jamais arrivée
+    coalescer.push(_list(5))
+    timer.fire()
+    assert (emitted[-1].revision, emitted[-1].first_revision) == (5, 4)
+
+
+def test_late_or_duplicate_event_does_not_replace_newer_pending():
+    coalescer, emitted, timer = _coalescer()
+    coalescer.push(_list(1))
+    coalescer.push(_list(3, 3))
+    coalescer.push(_list(2, 2))           # arrivé en retard
+    timer.fire()
+    assert (emitted[-1].revision, emitted[-1].first_revision) == (3, 3)
+    assert [p["id"] for p in emitted[-1].patients] == [3]
+
+
+def test_zero_window_disables_coalescing():
+    coalescer, emitted, timer = _coalescer(window_s=0)
+    for revision in (1, 2, 3):
+        coalescer.push(_list(revision))
+    assert [e.revision for e in emitted] == [1, 2, 3]
+    assert timer.callbacks == [] and coalescer.stats()["dropped"] == 0
+
+
+def test_cancel_drops_pending_list():
+    coalescer, emitted, timer = _coalescer()
+    coalescer.push(_list(1))
+    coalescer.push(_list(2))
+    coalescer.cancel()
+    coalescer.push(_list(3))              # fenêtre refermée : émis tout de suite
+    assert [e.revision for e in emitted] == [1, 3]
+
+
+def test_ordered_event_flushes_pending_list_first():
+    coalescer, emitted, timer = _coalescer()
+    coalescer.push(_list(1))
+    coalescer.push(_list(2))
+    patch = decode_patient_patch({"base_revision": 2, "ops": []})
+    coalescer.push_ordered(patch)
+    assert [type(e).__name__ for e in emitted] == ["PatientListEvent", "PatientListEvent",
+                                                    "PatientPatchEvent"]
+    assert emitted[1].revision == 2
+    timer.fire()                          # plus rien en attente
+    assert len(emitted) == 3
+
+
+def test_real_timer_flushes_burst():
+    emitted = []
+    done = threading.Event()
+
+    def emit(event):
+        emitted.append(event)
+        if len(emitted) == 2:
+            done.set()
+
+    coalescer = PatientListCoalescer(emit, window_s=0.02)
+    for revision in (1, 2, 3):
+        coalescer.push(_list(revision))
+    assert done.wait(2.0)
+    assert [e.revision for e in emitted] == [1, 3]
+    coalescer.cancel()
+
+
+# --- Patchs de file ------------------------------------------------------------
+
+def _queue(*ids):
+    return normalize_patients([{"id": i, "call_number": f"A{i}", "activity": "x"} for i in ids])
+
+
+def test_decode_patient_patch_normalizes_ops():
+    event = decode_patient_patch(json.dumps({"base_revision": 4, "ops": [
+        {"op": "insert", "index": 1, "patient": {"id": 9, "call_number": "A9", "extra": 1}},
+        {"op": "remove", "id": 2},
+        {"op": "move", "id": 9, "index": "0"},
+        {"op": "update", "id": 1, "patient": {"activity": "Vaccin"}},
+    ]}))
+    assert isinstance(event, PatientPatchEvent)
+    assert (event.base_revision, event.revision) == (4, 5)
+    assert event.ops[0] == ("insert", 1, PatientRecord(id=9, call_number="A9"))
+    assert event.ops[1:3] == (("remove", 2), ("move", 9, 0))
+    assert event.ops[3] == ("update", 1, PatientRecord(activity="Vaccin"))
+
+
+@pytest.mark.parametrize("data", [
+    {"ops": []},                                            # pas de base
+    {"base_revision": 1, "ops": "pas une liste"},
+    {"base_revision": 1, "ops": [{"op": "swap", "id": 1}]},
+    {"base_revision": 1, "ops": [{"op": "insert", "index": 0, "patient": {"call_number": 1}}]},
+    {"base_revision": 1, "ops": [{"op": "move", "id": 1}]},
+    {"base_revision": 1, "ops": [{"op": "move", "id": 1, "index": "haut"}]},
+    {"base_revision": 1, "ops": [{"op": "update", "id": 1, "patient": None}]},
+])
+def test_decode_patient_patch_rejects_malformed_events(data):
+    with pytest.raises(EventDecodeError):
+        decode_patient_patch(data)
+
+
+def test_apply_patch_ops_insert_remove_move_update():
+    ops = decode_patient_patch({"base_revision": 1, "ops": [
+        {"op": "insert", "index": 3, "patient": {"id": 4, "call_number": "A4"}},
+        {"op": "remove", "id": 1},
+        {"op": "move", "id": 4, "index": 0},
+        {"op": "update", "id": 3, "patient": {"activity": "Vaccin", "id": 99}},
+    ]}).ops
+    before = _queue(1, 2, 3)
+    after = apply_patch_ops(before, ops)
+    assert [p["id"] for p in after] == [4, 2, 3]
+    assert after[2]["activity"] == "Vaccin" and after[2]["call_number"] == "A3"
+    assert after[1] is before[1]          # lignes intactes réutilisées
+    assert [p["id"] for p in before] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "remove", "id": 7},
+    {"op": "update", "id": 7, "patient": {}},
+    {"op": "move", "id": 1, "index": 3},
+    {"op": "insert", "index": 5, "patient": {"id": 8}},
+    {"op": "insert", "index": 0, "patient": {"id": 2}},
+])
+def test_apply_patch_ops_detects_divergence(op):
+    ops = decode_patient_patch({"base_revision": 1, "ops": [op]}).ops
+    with pytest.raises(PatchConflict):
+        apply_patch_ops(_queue(1, 2, 3), ops)
@@ -0,0 +1,85 @@
+"""Tests du battement de cœur applicatif (``ws_heartbeat``) : mesure de
+l'aller-retour, fraîcheur du lien et détection d'un lien mort, serveur sans
+support du battement compris."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from conftest import FakeClock  # noqa: E402
+from ws_heartbeat import HeartbeatMonitor, format_link_health  # noqa: E402
+
+
+def _monitor(timeout_s=9):
+    clock = FakeClock(100.0)
+    return HeartbeatMonitor(timeout_s, clock=clock), clock
+
+
+def test_interval_is_a_third_of_timeout_with_floor():
+    assert HeartbeatMonitor(9).interval_s == pytest.approx(3.0)
+    assert HeartbeatMonitor(1).interval_s == pytest.approx(1.0)
+    assert HeartbeatMonitor(0).interval_s == pytest.approx(5.0)   # mesures seules
+
+
+def test_ack_measures_round_trip():
+    monitor, clock = _monitor()
+    seq = monitor.next_ping()
+    clock.now += 0.04
+    assert monitor.ack(seq) == pytest.approx(0.04)
+    assert monitor.rtt_s == pytest.approx(0.04)
+    assert monitor.ack(seq) is None                # accusé dupliqué ignoré
+    assert monitor.stats() == {"sent": 1, "acked": 1, "dead_links": 0,
+                               "rtt_s": pytest.approx(0.04)}
+
+
+def test_silent_link_expires_only_once_server_answered():
+    monitor, clock = _monitor()
+    monitor.next_ping()
+    clock.now += 30
+    assert monitor.expired() is False              # serveur sans « heartbeat »
+    seq = monitor.next_ping()
+    clock.now += 0.01
+    monitor.ack(seq)
+    clock.now += 8.9
+    assert monitor.expired() is False
+    clock.now += 0.2
+    assert monitor.expired() is True
+
+
+def test_any_event_keeps_link_alive():
+    monitor, clock = _monitor()
+    monitor.ack(monitor.next_ping())
+    clock.now += 8
+    monitor.seen()
+    clock.now += 8
+    assert monitor.expired() is False and monitor.silence_s() == pytest.approx(8)
+
+
+def test_reset_forgets_pings_of_previous_connection():
+    monitor, clock = _monitor()
+    monitor.ack(monitor.next_ping())
+    stale = monitor.next_ping()
+    clock.now += 20
+    monitor.reset()
+    assert monitor.expired() is False              # nouvelle connexion : lien frais
+    assert monitor.ack(stale) is None
+    assert monitor.supported is True
+
+
+def test_zero_timeout_disables_detection():
+    monitor, clock = _monitor(timeout_s=0)
+    monitor.ack(monitor.next_ping())
+    clock.now += 1000
+    assert monitor.expired() is False
+
+
+@pytest.mark.parametrize("stats, expected", [
+    ({"rtt_s": 0.0234, "last_event_age_s": 4.2}, "Aller-retour 23 ms, dernier évènement il y a 4 s"),
+    ({"rtt_s": None, "last_event_age_s": 12.0}, "Dernier évènement il y a 12 s"),
+    ({"rtt_s": None, "last_event_age_s": None}, None),
+])
+def test_format_link_health(stats, expected):
+    assert format_link_health(stats) == expected
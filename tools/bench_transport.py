@@ -0,0 +1,173 @@
+"""Banc d'essai des moteurs de transport du gestionnaire réseau (net_transport).
+
+Lance un serveur local de substitution (``ThreadingHTTPServer`` : latence
+configurable avec gigue, réponse JSON de la taille d'un ``/state``) puis, pour
+chaque moteur (``requests`` et ``asyncio``), envoie ``--requests`` GET par le
+vrai ``NetworkManager`` avec ``--concurrency`` workers. Affiche :
+
+- le débit (requêtes/s) et les latences p50/p95/p99/max vues par l'appelant ;
+- le temps nécessaire pour libérer un worker quand une requête lente est
+  annulée en vol (le moteur ``requests`` attend la réponse, le moteur
+  ``asyncio`` coupe la connexion).
+
+Usage :
+    python tools/bench_transport.py [--requests 2000] [--concurrency 8]
+                                    [--latency-ms 20] [--jitter-ms 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+
+from connections import NetworkManager  # noqa: E402
+from net_core import CancelToken  # noqa: E402
+from net_transport import ENGINES, make_transport  # noqa: E402
+
+# Corps renvoyé : ordre de grandeur d'un /state (une file d'une vingtaine de
+# patients).
+_STATE = json.dumps({
+    "revision": 42,
+    "queue": [{"id": i, "call_number": f"A{i:03d}", "status": "waiting",
+               "activity": "Ordonnance"} for i in range(20)],
+}).encode()
+
+_SLOW_PATH = "/slow"
+_SLOW_S = 3.0
+
+
+def _make_handler(latency_s, jitter_s):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # En-têtes et corps envoyés sans attendre l'ACK différé du client
+        # (sinon ~40 ms de Nagle par réponse faussent la mesure).
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith(_SLOW_PATH):
+                time.sleep(_SLOW_S)
+            else:
+                time.sleep(max(0.0, latency_s + random.uniform(-jitter_s, jitter_s)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(_STATE)))
+            self.end_headers()
+            self.wfile.write(_STATE)
+
+    return Handler
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _run_engine(engine, base, total, concurrency):
+    manager = NetworkManager(lambda: f"{base}/token", lambda: "bench",
+                             workers=concurrency,
+                             transport=make_transport(engine, concurrency))
+    try:
+        # Échauffement : ouvre les connexions et amorce les timeouts adaptatifs.
+        for future in [manager.submit(f"{base}/warmup/{i}") for i in range(concurrency)]:
+            future.result(30)
+
+        # Boucle fermée : ``concurrency`` appelants, chacun enchaîne ses GET
+        # (la latence mesurée est celle du transport, pas l'attente en file).
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+
+        def caller(indexes):
+            for i in indexes:
+                started = time.perf_counter()
+                # URL distinctes : pas de regroupement des GET identiques.
+                result = manager.submit(f"{base}/api/counter/{i}/state").result(60)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if not result.success:
+                        errors[0] += 1
+
+        callers = [threading.Thread(target=caller, args=(range(c, total, concurrency),))
+                   for c in range(concurrency)]
+        start = time.perf_counter()
+        for thread in callers:
+            thread.start()
+        for thread in callers:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        # Annulation en vol : tous les workers occupés par une requête lente,
+        # annulée ; temps avant qu'une nouvelle requête aboutisse.
+        tokens = [CancelToken() for _ in range(concurrency)]
+        for i, token in enumerate(tokens):
+            manager.submit(f"{base}{_SLOW_PATH}?{i}", timeout=(5, 10), cancel_token=token)
+        time.sleep(0.2)
+        cancelled_at = time.perf_counter()
+        for token in tokens:
+            token.cancel()
+        manager.submit(f"{base}/after").result(30)
+        release = time.perf_counter() - cancelled_at
+    finally:
+        manager.stop()
+
+    latencies.sort()
+    return {
+        "engine": engine,
+        "throughput": total / wall if wall else 0.0,
+        "p50": _percentile(latencies, 0.50),
+        "p95": _percentile(latencies, 0.95),
+        "p99": _percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else 0.0,
+        "errors": errors[0],
+        "release": release,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des moteurs de transport")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--engine", choices=ENGINES, action="append",
+                        help="moteur(s) à mesurer (par défaut : tous)")
+    args = parser.parse_args(argv)
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), _make_handler(args.latency_ms / 1000.0, args.jitter_ms / 1000.0))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"{args.requests} GET, {args.concurrency} workers, latence serveur "
+          f"{args.latency_ms:.0f} ± {args.jitter_ms:.0f} ms\n")
+    print(f"{'moteur':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'erreurs':>9}{'libération ms':>15}")
+    try:
+        for engine in args.engine or ENGINES:
+            r = _run_engine(engine, base, args.requests, args.concurrency)
+            print(f"{r['engine']:<10}{r['throughput']:>9.0f}{r['p50'] * 1000:>9.1f}"
+                  f"{r['p95'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}{r['max'] * 1000:>9.1f}"
+                  f"{r['errors']:>9}{r['release'] * 1000:>15.0f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
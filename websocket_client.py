@@ -7,6 +7,20 @@ from PySide6.QtCore import Signal, QThread
 
 from socket_auth import build_socket_auth_headers
 from counter_id_utils import coerce_counter_id
+from net_core import backoff_delay
+from diagnostics import RateMeter
+from ws_events import (
+    DEFAULT_COALESCE_WINDOW_MS,
+    EventDecodeError,
+    PatientListCoalescer,
+    PatientPatchEvent,
+    PatientRecord,
+    decode_notification,
+    decode_patient_list,
+    decode_patient_patch,
+    notification_targets,
+)
+from ws_heartbeat import DEFAULT_DEAD_LINK_TIMEOUT_S, HEARTBEAT_EVENT, HeartbeatMonitor
 
 logger = logging.getLogger("appcomptoir.websocket")
 
@@ -27,29 +41,18 @@ def compute_reconnect_delay(attempt, base=RECONNECT_BASE_DELAY,
     Garantit un minimum (exp/2) tout en dispersant les tentatives (jitter) et en
     bornant la croissance (plafond) -> nombre de tentatives maîtrisé quand le
     serveur est indisponible."""
-    exp = min(cap, base * (2 ** (max(1, attempt) - 1)))
-    return exp / 2 + (exp / 2) * rand()
-
-
-def _safe_origin(data):
-    """Extrait l'origine (catégorie non sensible) d'une notification, pour les
-    logs, sans exposer le contenu (message, données patient)."""
-    try:
-        payload = data.get("data") if isinstance(data, dict) else None
-        if isinstance(payload, str):
-            payload = json.loads(payload)
-        if isinstance(payload, dict):
-            return payload.get("origin", "?")
-    except Exception:
-        pass
-    return "?"
+    return backoff_delay(attempt, base, cap, rand)
 
 
 class WebSocketClient(QThread):
-    # (liste_patients, revision) : la révision permet au thread principal
-    # d'écarter les messages périmés/dupliqués et de détecter un trou.
-    new_patient = Signal(object, object)
-    new_notification = Signal(str)
+    # Enveloppes décodées une fois dans ce thread (voir ``ws_events``).
+    # PatientListEvent : sa révision permet au thread principal d'écarter les
+    # messages périmés/dupliqués et de détecter un trou.
+    new_patient = Signal(object)
+    # PatientPatchEvent : modification incrémentale de la file (optionnelle
+    # côté serveur), appliquée sans diff si sa révision de base est la nôtre.
+    patient_patch = Signal(object)
+    new_notification = Signal(object)
     my_patient = Signal(object)
     change_paper = Signal(object)
     change_paper_button = Signal(str)
@@ -69,6 +72,27 @@ class WebSocketClient(QThread):
         # terminer proprement au lieu de se reconnecter indéfiniment.
         self._stop = threading.Event()
 
+        # Diagnostic (page « Diagnostics ») : connexions établies, évènements
+        # reçus (débit sur fenêtre glissante, âge du dernier) et RTT du lien
+        # (None tant qu'il n'est pas mesuré).
+        self._connects = 0
+        self._events = RateMeter()
+        self.rtt_s = None
+
+        # Battement de cœur applicatif (voir ``ws_heartbeat``) : mesure le RTT
+        # et force une reconnexion si le lien est mort sans que TCP le sache
+        # (préférence ws_dead_link_timeout_s, 0 = détection désactivée).
+        timeout_s = getattr(self.parent, "ws_dead_link_timeout_s", DEFAULT_DEAD_LINK_TIMEOUT_S)
+        self._heartbeat = HeartbeatMonitor(timeout_s)
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_stop.set()
+
+        # Rafales d'évènements de file regroupées avant le thread GUI : un seul
+        # new_patient par fenêtre (préférence ws_coalesce_window_ms).
+        window_ms = getattr(self.parent, "ws_coalesce_window_ms", DEFAULT_COALESCE_WINDOW_MS)
+        self._patient_lists = PatientListCoalescer(self._emit_queue_event,
+                                                   window_s=window_ms / 1000.0)
+
         # On garde l'URL HTTP/HTTPS d'origine et on laisse python-socketio
         # négocier le transport (polling puis montée en WebSocket). Forcer
         # ws://wss:// manuellement est inutile et fragile.
@@ -88,14 +112,43 @@ class WebSocketClient(QThread):
         # Connexion aux événements WebSocket
         self.sio.on('connect', self.on_connect, namespace='/socket_app_counter')
         self.sio.on('disconnect', self.on_disconnect)
-        self.sio.on('update', self.on_update, namespace='/socket_app_counter')
-        self.sio.on('paper', self.on_paper, namespace='/socket_app_counter')
-        self.sio.on('notification', self.on_notification, namespace='/socket_app_counter')     
-        self.sio.on('change_auto_calling', self.on_change_auto_calling, namespace='/socket_app_counter')
-        self.sio.on('update_auto_calling', self.on_update_auto_calling, namespace='/socket_app_counter')   
-        self.sio.on('disconnect_user', self.on_disconnect_user, namespace='/socket_app_counter')
-        self.sio.on('update_patient_list', self.on_update_patient_list, namespace='/socket_app_counter')
-        self.sio.on('refresh_after_clear_patient_list', self.on_refresh_after_clear_patient_list, namespace='/socket_app_counter')
+        self._on_event('update', self.on_update)
+        self._on_event('paper', self.on_paper)
+        self._on_event('notification', self.on_notification)
+        self._on_event('change_auto_calling', self.on_change_auto_calling)
+        self._on_event('update_auto_calling', self.on_update_auto_calling)
+        self._on_event('disconnect_user', self.on_disconnect_user)
+        self._on_event('update_patient_list', self.on_update_patient_list)
+        self._on_event('patch_patient_list', self.on_patch_patient_list)
+        self._on_event('refresh_after_clear_patient_list', self.on_refresh_after_clear_patient_list)
+
+    def _on_event(self, event, handler, namespace='/socket_app_counter'):
+        """Abonne ``handler`` à ``event`` en comptant chaque évènement reçu."""
+        def counted(*args):
+            self._events.hit()
+            self._heartbeat.seen()
+            return handler(*args)
+
+        self.sio.on(event, counted, namespace=namespace)
+
+    def stats(self):
+        """État du lien pour le diagnostic : ``{connected, connects, reconnects,
+        events, events_per_s, last_event_age_s, rtt_s, coalesced_dropped,
+        dead_links}`` (``coalesced_dropped`` : files intermédiaires écartées par
+        regroupement ; ``dead_links`` : reconnexions forcées par le battement
+        de cœur)."""
+        events = self._events.snapshot()
+        return {
+            "connected": bool(getattr(self.sio, "connected", False)),
+            "connects": self._connects,
+            "reconnects": max(0, self._connects - 1),
+            "events": events["total"],
+            "events_per_s": events["per_s"],
+            "last_event_age_s": events["last_age_s"],
+            "rtt_s": self.rtt_s,
+            "coalesced_dropped": self._patient_lists.stats()["dropped"],
+            "dead_links": self._heartbeat.stats()["dead_links"],
+        }
 
     def _current_token(self):
         return getattr(self.parent, "app_token", None)
@@ -162,6 +215,8 @@ class WebSocketClient(QThread):
         débloque sio.wait()), puis attend la fin du thread au plus timeout_ms.
         Retourne True si le thread s'est bien terminé dans le délai."""
         self._stop.set()
+        self._heartbeat_stop.set()
+        self._patient_lists.cancel()
         try:
             self.sio.disconnect()
         except Exception as e:
@@ -171,12 +226,53 @@ class WebSocketClient(QThread):
 
     def on_connect(self):
         logger.info("WebSocket connecté")
+        self._connects += 1
+        self._start_heartbeat()
         self.ws_connection_status.emit(True, 0, True)
 
     def on_disconnect(self):
         logger.info("WebSocket déconnecté")
+        self._heartbeat_stop.set()
         self.connection_lost.emit(0)
 
+    def _start_heartbeat(self):
+        """Lance le battement de cœur de la connexion qui vient de s'établir
+        (celui d'une connexion précédente s'arrête)."""
+        self._heartbeat_stop.set()
+        self._heartbeat_stop = stop = threading.Event()
+        self._heartbeat.reset()
+        threading.Thread(target=self._heartbeat_loop, args=(stop,),
+                         name="ws-heartbeat", daemon=True).start()
+
+    def _heartbeat_loop(self, stop):
+        heartbeat = self._heartbeat
+        while not stop.wait(heartbeat.interval_s) and not self._stop.is_set():
+            if heartbeat.expired():
+                logger.warning("Lien temps réel muet depuis %.1fs : reconnexion forcée",
+                               heartbeat.silence_s())
+                heartbeat.dead_link()
+                stop.set()
+                self._force_reconnect()
+                return
+            seq = heartbeat.next_ping()
+            try:
+                self.sio.emit(HEARTBEAT_EVENT, {"seq": seq}, namespace='/socket_app_counter',
+                              callback=lambda *_, seq=seq: self._on_heartbeat_ack(seq))
+            except Exception as e:  # lien déjà tombé : la boucle run() s'en charge
+                logger.debug("Battement de cœur non émis : %s", e)
+
+    def _on_heartbeat_ack(self, seq):
+        if self._heartbeat.ack(seq) is not None:
+            self.rtt_s = self._heartbeat.rtt_s
+
+    def _force_reconnect(self):
+        """Abandonne la connexion courante : ``sio.wait()`` rend la main et la
+        boucle run() se reconnecte."""
+        try:
+            self.sio.disconnect()
+        except Exception as e:
+            logger.debug("Déconnexion d'un lien mort : %s", e)
+
     def on_paper(self, data):
         logger.debug("Événement 'paper' reçu")
         self.change_paper.emit(data)
@@ -203,47 +299,51 @@ class WebSocketClient(QThread):
             self.disconnect_user.emit(data)
 
     def on_notification(self, data):
-        logger.debug("Notification reçue (origin=%s)", _safe_origin(data))
-
-        # Parser data["data"] si c'est une chaîne JSON
-        if isinstance(data["data"], str):
-            try:
-                notification_data = json.loads(data["data"])
-            except json.JSONDecodeError:
-                logger.warning("Notification illisible (JSON invalide)")
-                return
-        else:
-            notification_data = data["data"]
+        try:
+            event, flag = decode_notification(data)
+        except EventDecodeError as e:
+            logger.warning("Notification illisible : %s", e)
+            return
+        logger.debug("Notification reçue (origin=%s)", event.origin)
 
         # si on affiche à tous ou si on affiche seulement pour le counter
-        # (comparaison entière robuste : flag peut être un id, une liste d'ids,
-        # en int ou en chaîne selon le serveur)
-        flag = data["flag"]
-        targets_all = not flag
-        targets_this = coerce_counter_id(flag) == self.parent.counter_id
-        targets_in_list = isinstance(flag, list) and self.parent.counter_id in [coerce_counter_id(f) for f in flag]
-        if targets_all or targets_this or targets_in_list:
-            self.new_notification.emit(data['data'])
-        
+        if notification_targets(flag, self.parent.counter_id):
+            self.new_notification.emit(event)
+
         # si la notification concerne le papier, mettre à jour le bouton
-        if notification_data["origin"] in ["no_paper", "low_paper", "paper_ok"]:
-            self.change_paper_button.emit(notification_data["origin"])
+        if event.origin in ["no_paper", "low_paper", "paper_ok"]:
+            self.change_paper_button.emit(event.origin)
 
     def on_update_patient_list(self, data):
         try:
-            if isinstance(data, str):
-                data = json.loads(data)
-            if isinstance(data["data"], str):
-                data["data"] = json.loads(data["data"])
-            revision = data.get("revision") if isinstance(data, dict) else None
-            payload = data["data"]
-            logger.debug("Liste de patients reçue (%s patients, revision=%s)",
-                         len(payload) if isinstance(payload, list) else "?", revision)
-            self.new_patient.emit(payload, revision)
-            self.my_patient.emit(payload)
-
-        except json.JSONDecodeError as e:
-            logger.warning("Liste de patients illisible (JSON invalide) : %s", e)
+            event = decode_patient_list(data)
+        except EventDecodeError as e:
+            logger.warning("Liste de patients illisible : %s", e)
+            return
+        logger.debug("Liste de patients reçue (%s patients, revision=%s)",
+                     len(event.patients), event.revision)
+        self._patient_lists.push(event)
+
+    def on_patch_patient_list(self, data):
+        try:
+            event = decode_patient_patch(data)
+        except EventDecodeError as e:
+            logger.warning("Patch de la file illisible : %s", e)
+            return
+        logger.debug("Patch de la file reçu (%s opérations, revision %s -> %s)",
+                     len(event.ops), event.base_revision, event.revision)
+        # Après une éventuelle liste complète en attente de regroupement.
+        self._patient_lists.push_ordered(event)
+
+    def _emit_queue_event(self, event):
+        if isinstance(event, PatientPatchEvent):
+            self.patient_patch.emit(event)
+            return
+        if event.coalesced > 1:
+            logger.debug("%s listes de patients regroupées (revisions %s..%s)",
+                         event.coalesced, event.first_revision, event.revision)
+        self.new_patient.emit(event)
+        self.my_patient.emit(event.patients)
 
     def on_refresh_after_clear_patient_list(self, data):
         logger.debug("Rafraîchissement après purge de la liste des patients")
@@ -253,15 +353,12 @@ class WebSocketClient(QThread):
         logger.debug("Événement 'update' reçu")
         # Normalement cette partie peut être supprimée
         try:
-            if isinstance(data, str):
-                data = json.loads(data)
+            data = json.loads(data) if isinstance(data, str) else data
             if data['flag'] == 'update_patient_list':
-                if isinstance(data["data"], str):
-                    data["data"] = json.loads(data["data"])
-                self.new_patient.emit(data["data"], data.get("revision"))
+                self._patient_lists.push(decode_patient_list(data))
             elif data['flag'] == 'my_patient':
-                self.my_patient.emit(data["data"])
-        except json.JSONDecodeError as e:
-            logger.warning("Événement 'update' illisible (JSON invalide) : %s", e)
-            
-
+                patient = data["data"]
+                self.my_patient.emit(PatientRecord.from_mapping(patient)
+                                     if isinstance(patient, dict) else patient)
+        except (json.JSONDecodeError, EventDecodeError) as e:
+            logger.warning("Événement 'update' illisible : %s", e)
@@ -0,0 +1,408 @@
+"""Enveloppes typées des évènements Socket.IO (sans dépendance PySide,
+testable seul).
+
+Un évènement est décodé *une seule fois*, dans le thread Socket.IO : JSON
+éventuellement imbriqué (``data["data"]`` en chaîne), ciblage du comptoir,
+normalisation des patients en ``PatientRecord`` compacts. Seule l'enveloppe
+immuable obtenue traverse vers le thread GUI ; ni ``new_patient``, ni le
+modèle de la file, ni les notifications ne re-parsent la charge.
+
+Les enregistrements restent compatibles ``Mapping`` (``patient["id"]``,
+``patient.get("activity")``) : les consommateurs écrits pour des ``dict``
+(menus, ``patient_display_text``, ``update_my_patient``) les acceptent tels
+quels.
+"""
+
+import json
+import threading
+from collections.abc import Mapping
+
+from counter_id_utils import coerce_counter_id
+
+# Fenêtre (ms) de regroupement des rafales d'évènements de file (voir
+# ``PatientListCoalescer``).
+DEFAULT_COALESCE_WINDOW_MS = 50
+
+# Champs d'un patient utilisés par le client ; les autres clés envoyées par le
+# serveur sont écartées (enregistrement compact).
+PATIENT_FIELDS = ("id", "call_number", "activity", "activity_is_staff",
+                  "language_code", "status", "counter_id")
+
+
+class EventDecodeError(ValueError):
+    """Évènement illisible (JSON invalide ou structure inattendue)."""
+
+
+class _Record(Mapping):
+    """Enregistrement immuable à champs fixes (``__slots__``), lisible comme un
+    ``dict``. Un champ absent de la source reste absent (``KeyError`` /
+    ``get(..., défaut)``), comme dans le ``dict`` d'origine."""
+
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, **fields):
+        for name in self._fields:
+            if name in fields:
+                object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} est immuable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} est immuable")
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (name for name in self._fields if hasattr(self, name))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def _key(self):
+        return tuple(getattr(self, name, _MISSING) for name in self._fields)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self._key() == other._key()
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return (_rebuild, (type(self), dict(self)))
+
+    def __repr__(self):  # pragma: no cover - confort de debug
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+_MISSING = object()
+
+
+def _rebuild(cls, fields):
+    return cls(**fields)
+
+
+class PatientRecord(_Record):
+    """Patient de la file (``id``, ``call_number``, ``activity``...)."""
+
+    __slots__ = PATIENT_FIELDS
+    _fields = PATIENT_FIELDS
+
+    @classmethod
+    def from_mapping(cls, patient):
+        """Enregistrement depuis un ``dict`` serveur (déjà un ``PatientRecord`` :
+        renvoyé tel quel)."""
+        if isinstance(patient, cls):
+            return patient
+        return cls(**{name: patient[name] for name in PATIENT_FIELDS if name in patient})
+
+
+class PatientListEvent(_Record):
+    """File complète : ``patients`` (tuple de ``PatientRecord``) et ``revision``
+    (entier, ou None si le serveur n'en fournit pas).
+
+    Après regroupement d'une rafale, ``first_revision`` est la première révision
+    de la suite *continue* qui aboutit à ``revision`` (les files intermédiaires
+    ont été écartées) : le destinataire détecte un trou en la comparant à sa
+    propre révision. ``coalesced`` : nombre d'évènements fusionnés."""
+
+    __slots__ = ("patients", "revision", "first_revision", "coalesced")
+    _fields = ("patients", "revision", "first_revision", "coalesced")
+
+
+class PatientPatchEvent(_Record):
+    """Modification incrémentale de la file : ``ops`` (voir
+    ``decode_patient_patch``) transforment la file de révision
+    ``base_revision`` en celle de révision ``revision``."""
+
+    __slots__ = ("base_revision", "revision", "ops")
+    _fields = ("base_revision", "revision", "ops")
+
+
+class PatchConflict(ValueError):
+    """Les opérations d'un patch ne s'appliquent pas à la file locale (id
+    inconnu ou déjà présent, position hors bornes)."""
+
+
+class NotificationEvent(_Record):
+    """Notification serveur (``origin``, ``message``), déjà filtrée pour ce
+    comptoir."""
+
+    __slots__ = ("origin", "message")
+    _fields = ("origin", "message")
+
+
+def _load(value):
+    """Décode ``value`` si c'est une chaîne JSON, sinon la renvoie telle quelle."""
+    if isinstance(value, (str, bytes, bytearray)):
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise EventDecodeError(f"JSON invalide : {e}") from e
+    return value
+
+
+def _coerce_revision(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_patients(patients):
+    """Tuple de ``PatientRecord`` ; les entrées qui ne sont pas des objets sont
+    ignorées."""
+    return tuple(PatientRecord.from_mapping(p) for p in (patients or ())
+                 if isinstance(p, Mapping))
+
+
+def decode_patient_list(data):
+    """``PatientListEvent`` depuis un évènement ``update_patient_list``
+    (``{"data": [...], "revision": n}``, chaque niveau pouvant être une chaîne
+    JSON). Lève ``EventDecodeError`` si la charge n'est pas une liste."""
+    data = _load(data)
+    if not isinstance(data, Mapping):
+        raise EventDecodeError("évènement de file sans enveloppe")
+    payload = _load(data.get("data"))
+    if not isinstance(payload, list):
+        raise EventDecodeError("liste de patients attendue")
+    revision = _coerce_revision(data.get("revision"))
+    return PatientListEvent(patients=normalize_patients(payload), revision=revision,
+                            first_revision=revision, coalesced=1)
+
+
+def decode_notification(data):
+    """``(NotificationEvent, flag)`` depuis un évènement ``notification``
+    (``flag`` : destinataires, voir ``notification_targets``). Lève
+    ``EventDecodeError`` si la charge est illisible ou sans origine."""
+    data = _load(data)
+    if not isinstance(data, Mapping):
+        raise EventDecodeError("notification sans enveloppe")
+    payload = _load(data.get("data"))
+    if not isinstance(payload, Mapping) or "origin" not in payload:
+        raise EventDecodeError("notification sans origine")
+    event = NotificationEvent(origin=payload["origin"], message=payload.get("message", ""))
+    return event, data.get("flag")
+
+
+def _decode_patch_op(op):
+    if not isinstance(op, Mapping):
+        raise EventDecodeError("opération de patch invalide")
+    kind = op.get("op")
+    try:
+        if kind == "insert":
+            decoded = ("insert", int(op["index"]), op["patient"])
+        elif kind == "remove":
+            return ("remove", op["id"])
+        elif kind == "move":
+            return ("move", op["id"], int(op["index"]))
+        elif kind == "update":
+            decoded = ("update", op["id"], op["patient"])
+        else:
+            raise EventDecodeError(f"opération de patch inconnue : {kind!r}")
+    except (KeyError, TypeError) as e:
+        raise EventDecodeError(f"opération {kind!r} incomplète : {e}") from e
+    except EventDecodeError:
+        raise
+    except ValueError as e:
+        raise EventDecodeError(f"position invalide : {e}") from e
+    patient = decoded[2]
+    if not isinstance(patient, Mapping) or (kind == "insert" and patient.get("id") is None):
+        raise EventDecodeError(f"opération {kind!r} sans patient valide")
+    return decoded[:2] + (PatientRecord.from_mapping(patient),)
+
+
+def decode_patient_patch(data):
+    """``PatientPatchEvent`` depuis un évènement ``patch_patient_list`` :
+    ``{"base_revision": n, "revision": n + 1, "ops": [...]}`` (``revision``
+    vaut ``base_revision + 1`` si absente). Opérations, appliquées dans l'ordre :
+
+        {"op": "insert", "index": i, "patient": {...}} -> ("insert", i, PatientRecord)
+        {"op": "remove", "id": x}                      -> ("remove", x)
+        {"op": "move", "id": x, "index": i}            -> ("move", x, i)
+        {"op": "update", "id": x, "patient": {...}}    -> ("update", x, PatientRecord)
+
+    ``move`` : ``i`` est la position finale ; ``update`` : seuls les champs
+    fournis changent. Lève ``EventDecodeError`` si l'évènement est mal formé."""
+    data = _load(data)
+    if not isinstance(data, Mapping):
+        raise EventDecodeError("patch sans enveloppe")
+    base_revision = _coerce_revision(data.get("base_revision"))
+    if base_revision is None:
+        raise EventDecodeError("patch sans révision de base")
+    revision = _coerce_revision(data.get("revision"))
+    ops = _load(data.get("ops"))
+    if not isinstance(ops, list):
+        raise EventDecodeError("liste d'opérations attendue")
+    return PatientPatchEvent(
+        base_revision=base_revision,
+        revision=base_revision + 1 if revision is None else revision,
+        ops=tuple(_decode_patch_op(op) for op in ops))
+
+
+def merge_patient(patient, fields):
+    """``patient`` avec les champs de ``fields`` remplacés (l'id ne change pas)."""
+    merged = dict(patient)
+    merged.update((k, v) for k, v in fields.items() if k != "id")
+    return PatientRecord.from_mapping(merged)
+
+
+def _index_of(patients, pid):
+    for row, patient in enumerate(patients):
+        if patient.get("id") == pid:
+            return row
+    raise PatchConflict(f"patient {pid!r} absent de la file")
+
+
+def apply_patch_ops(patients, ops):
+    """Applique ``ops`` (voir ``decode_patient_patch``) à une copie de
+    ``patients`` et retourne la nouvelle file (tuple). Lève ``PatchConflict``
+    si une opération ne correspond pas à la file : elle a divergé du serveur."""
+    result = list(patients or ())
+    for op in ops:
+        kind = op[0]
+        if kind == "insert":
+            _, index, patient = op
+            if not 0 <= index <= len(result):
+                raise PatchConflict(f"insertion hors bornes ({index})")
+            if any(p.get("id") == patient["id"] for p in result):
+                raise PatchConflict(f"patient {patient['id']!r} déjà dans la file")
+            result.insert(index, patient)
+        elif kind == "remove":
+            del result[_index_of(result, op[1])]
+        elif kind == "move":
+            _, pid, index = op
+            row = _index_of(result, pid)
+            if not 0 <= index < len(result):
+                raise PatchConflict(f"déplacement hors bornes ({index})")
+            result.insert(index, result.pop(row))
+        else:  # update
+            _, pid, fields = op
+            row = _index_of(result, pid)
+            result[row] = merge_patient(result[row], fields)
+    return tuple(result)
+
+
+def notification_targets(flag, counter_id):
+    """Vrai si une notification de destinataires ``flag`` concerne le comptoir
+    ``counter_id`` : tous (flag vide), cet id, ou une liste qui le contient
+    (ids en entier ou en chaîne selon le serveur)."""
+    if not flag:
+        return True
+    if isinstance(flag, list):
+        return counter_id in [coerce_counter_id(f) for f in flag]
+    return coerce_counter_id(flag) == counter_id
+
+
+class PatientListCoalescer:
+    """Regroupe les rafales d'évènements de file (appel automatique, rush du
+    matin) avant le thread GUI : au plus un ``emit`` par fenêtre de
+    ``window_s``.
+
+    Un évènement isolé part immédiatement (pas de latence ajoutée) et ouvre une
+    fenêtre ; ceux qui arrivent pendant celle-ci ne gardent que la file la plus
+    récente, émise à la fin de la fenêtre (qui en rouvre une). La file étant
+    complète, les files intermédiaires peuvent être écartées sans perte ; elles
+    sont comptées (``stats()["dropped"]``). Un trou de révision *dans* la rafale
+    est conservé via ``first_revision`` (voir ``PatientListEvent``).
+
+    ``schedule(delay_s, callback)`` arme le minuteur de fin de fenêtre
+    (``threading.Timer`` par défaut). ``window_s <= 0`` : pas de regroupement.
+    """
+
+    def __init__(self, emit, window_s=DEFAULT_COALESCE_WINDOW_MS / 1000.0, schedule=None):
+        self._emit = emit
+        self.window_s = window_s
+        self._schedule = schedule or self._start_timer
+        self._lock = threading.Lock()
+        self._open = False        # fenêtre en cours (un minuteur est armé)
+        self._pending = None
+        self._timer = None
+        self._stats = {"received": 0, "emitted": 0, "dropped": 0}
+
+    def _start_timer(self, delay_s, callback):
+        timer = threading.Timer(delay_s, callback)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def push(self, event):
+        """Reçoit un ``PatientListEvent`` décodé (thread Socket.IO)."""
+        with self._lock:
+            self._stats["received"] += 1
+            if self.window_s <= 0:
+                self._emit_locked(event)
+            elif not self._open:
+                self._open = True
+                self._emit_locked(event)
+                self._schedule(self.window_s, self._flush)
+            else:
+                self._pending = self._merge_locked(self._pending, event)
+
+    def push_ordered(self, event):
+        """Émet ``event`` sans regroupement (ex. ``PatientPatchEvent``), après la
+        file en attente éventuelle : l'ordre de réception est conservé."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is not None:
+                self._emit_locked(pending)
+            self._emit(event)
+
+    def _emit_locked(self, event):
+        # Émission sous le verrou : le minuteur et le thread Socket.IO ne
+        # peuvent pas intervertir deux évènements.
+        self._stats["emitted"] += 1
+        self._emit(event)
+
+    def _merge_locked(self, pending, event):
+        if pending is None:
+            return event
+        self._stats["dropped"] += 1
+        newest, older = pending.revision, event.revision
+        if newest is not None and older is not None and older <= newest:
+            # Doublon ou évènement en retard : la file en attente est plus récente.
+            return pending
+        first = pending.first_revision
+        if newest is None or older is None or event.first_revision > newest + 1:
+            # Trou dans la rafale : seule la suite continue finale compte.
+            first = event.first_revision
+        return PatientListEvent(patients=event.patients, revision=event.revision,
+                                first_revision=first,
+                                coalesced=pending.coalesced + event.coalesced)
+
+    def _flush(self):
+        """Fin de fenêtre : émet la file en attente (et rouvre une fenêtre), ou
+        ferme la fenêtre."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is None:
+                self._open = False
+                self._timer = None
+                return
+            self._emit_locked(pending)
+            self._schedule(self.window_s, self._flush)
+
+    def cancel(self):
+        """Abandonne la file en attente (arrêt du client)."""
+        with self._lock:
+            self._pending = None
+            self._open = False
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def stats(self):
+        """``{received, emitted, dropped}``."""
+        with self._lock:
+            return dict(self._stats)
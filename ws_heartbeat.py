@@ -0,0 +1,128 @@
+"""Battement de cœur applicatif du lien temps réel (sans dépendance PySide,
+testable seul).
+
+Quand un NAT ou le Wi-Fi coupe silencieusement la session TCP, ``sio.wait()``
+peut rester bloqué jusqu'à l'expiration des pings engine.io : le comptoir
+affiche pendant ce temps une file périmée sans le savoir. Le client émet donc
+toutes les ``interval_s`` un évènement ``heartbeat`` avec accusé de réception ;
+chaque accusé donne une mesure d'aller-retour (lissée comme le RTO de TCP,
+voir ``net_timeouts.LatencyEstimator``), et tout message entrant (accusé ou
+évènement) prouve que le lien vit. Sans rien reçu depuis ``timeout_s``, le
+lien est réputé mort et le client force une reconnexion.
+
+Un serveur qui ne connaît pas ``heartbeat`` n'accuse jamais réception : tant
+qu'aucun accusé n'a été reçu, le lien n'est jamais déclaré mort (une file
+calme n'est pas une panne) et la détection reste celle d'engine.io.
+"""
+
+import threading
+import time
+
+from net_timeouts import LatencyEstimator
+
+HEARTBEAT_EVENT = "heartbeat"
+DEFAULT_DEAD_LINK_TIMEOUT_S = 15
+MIN_INTERVAL_S = 1.0
+
+
+class HeartbeatMonitor:
+    """Pings en vol, aller-retour lissé et fraîcheur du lien (voir docstring du
+    module). ``timeout_s`` nul désactive la détection (les mesures restent)."""
+
+    def __init__(self, timeout_s=DEFAULT_DEAD_LINK_TIMEOUT_S, interval_s=None,
+                 clock=time.monotonic):
+        self.timeout_s = timeout_s
+        # Trois battements par délai : une perte isolée ne suffit pas à conclure.
+        self.interval_s = (interval_s if interval_s is not None
+                           else max(MIN_INTERVAL_S,
+                                    (timeout_s or DEFAULT_DEAD_LINK_TIMEOUT_S) / 3.0))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._estimator = LatencyEstimator()
+        self._pending = {}            # numéro -> instant d'envoi
+        self._seq = 0
+        self._last_seen = clock()
+        self.supported = False        # au moins un accusé reçu du serveur
+        self._stats = {"sent": 0, "acked": 0, "dead_links": 0}
+
+    def reset(self):
+        """Nouvelle connexion : pings en vol oubliés, lien frais. La mesure
+        d'aller-retour et le support serveur sont conservés."""
+        with self._lock:
+            self._pending.clear()
+            self._last_seen = self._clock()
+
+    def seen(self):
+        """Message entrant (évènement quelconque) : le lien vit."""
+        now = self._clock()
+        with self._lock:
+            self._last_seen = now
+
+    def next_ping(self):
+        """Numéro du prochain battement à émettre (les pings restés sans
+        réponse au-delà de ``timeout_s`` sont oubliés)."""
+        now = self._clock()
+        with self._lock:
+            horizon = max(self.timeout_s, self.interval_s)
+            for seq in [s for s, sent in self._pending.items() if now - sent > horizon]:
+                del self._pending[seq]
+            self._seq += 1
+            self._pending[self._seq] = now
+            self._stats["sent"] += 1
+            return self._seq
+
+    def ack(self, seq):
+        """Accusé du battement ``seq`` : retourne l'aller-retour mesuré (s), ou
+        None pour un accusé inconnu (dupliqué, ou d'avant la reconnexion)."""
+        now = self._clock()
+        with self._lock:
+            sent = self._pending.pop(seq, None)
+            if sent is None:
+                return None
+            rtt = now - sent
+            self._estimator.observe(rtt)
+            self._last_seen = now
+            self.supported = True
+            self._stats["acked"] += 1
+            return rtt
+
+    def silence_s(self):
+        """Secondes écoulées depuis le dernier message entrant."""
+        with self._lock:
+            return self._clock() - self._last_seen
+
+    def expired(self):
+        """True si le lien est réputé mort : détection active, serveur ayant
+        déjà répondu aux battements, et rien reçu depuis ``timeout_s``."""
+        if not self.timeout_s or not self.supported:
+            return False
+        return self.silence_s() >= self.timeout_s
+
+    def dead_link(self):
+        """Compte une reconnexion forcée pour lien mort."""
+        with self._lock:
+            self._stats["dead_links"] += 1
+
+    @property
+    def rtt_s(self):
+        """Aller-retour lissé (s), ou None sans mesure."""
+        with self._lock:
+            return self._estimator.srtt
+
+    def stats(self):
+        """``{sent, acked, dead_links, rtt_s}``."""
+        with self._lock:
+            return dict(self._stats, rtt_s=self._estimator.srtt)
+
+
+def format_link_health(stats):
+    """Ligne d'état du lien pour l'infobulle de l'indicateur de connexion
+    (``stats`` : ``WebSocketClient.stats()``), ou None sans aucune mesure."""
+    parts = []
+    rtt = stats.get("rtt_s")
+    if rtt is not None:
+        parts.append(f"aller-retour {rtt * 1000:.0f} ms")
+    age = stats.get("last_event_age_s")
+    if age is not None:
+        parts.append(f"dernier évènement il y a {age:.0f} s")
+    return ", ".join(parts).capitalize() or None